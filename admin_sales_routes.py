@@ -6,9 +6,13 @@ import json
 from admin_sales_system import (
     init_sales_tables, create_coupon, get_coupons, update_coupon, delete_coupon,
     create_offer, get_offers, get_sales_summary, export_sales_report,
-    get_db_connection, update_seller, update_offer, get_seller_by_id, get_offer_by_id
+    get_db_connection, update_seller, update_offer, get_seller_by_id, get_offer_by_id,
+    build_coupons_query, build_sales_summary_query, COUPON_EXPORT_COLUMNS, SALES_EXPORT_COLUMNS
 )
+from streaming_export import stream_query_export
+from sales_dashboard import get_dashboard_snapshot, dump_snapshot
 from psycopg2.extras import RealDictCursor
+from request_db import read_only
 
 def admin_required(f):
     """Decorador para requerir permisos de administrador"""
@@ -32,66 +36,29 @@ def register_admin_sales_routes(app):
     def admin_sales_dashboard():
         """Dashboard principal del sistema de ventas"""
         try:
-            # Obtener estadísticas generales
-            connection = get_db_connection()
-            cursor = connection.cursor(cursor_factory=RealDictCursor)
-            
-            # Estadísticas de cupones
-            cursor.execute("""
-                SELECT 
-                    COUNT(*) as total_coupons,
-                    COUNT(CASE WHEN is_active = TRUE THEN 1 END) as active_coupons,
-                    SUM(usage_count) as total_usage
-                FROM discount_coupons
-            """)
-            coupon_stats = cursor.fetchone()
-            
-            # Estadísticas de ofertas
-            cursor.execute("""
-                SELECT 
-                    COUNT(*) as total_offers,
-                    COUNT(CASE WHEN status = 'active' AND start_date <= CURRENT_DATE AND end_date >= CURRENT_DATE THEN 1 END) as active_offers,
-                    COUNT(CASE WHEN end_date < CURRENT_DATE THEN 1 END) as expired_offers
-                FROM promotional_offers
-            """)
-            offer_stats = cursor.fetchone()
-            
-            # Estadísticas de ventas del mes actual
-            cursor.execute("""
-                SELECT 
-                    COUNT(*) as total_transactions,
-                    COALESCE(SUM(final_amount), 0) as total_revenue,
-                    COALESCE(SUM(commission_amount), 0) as total_commissions
-                FROM sales_transactions
-                WHERE DATE_TRUNC('month', created_at) = DATE_TRUNC('month', CURRENT_DATE)
-                AND status = 'completed'
-            """)
-            sales_stats = cursor.fetchone()
-            
-            # Ventas recientes
-            cursor.execute("""
-                SELECT st.*, s.name as seller_name, u.username
-                FROM sales_transactions st
-                LEFT JOIN sellers s ON st.seller_id = s.id
-                LEFT JOIN users u ON st.user_id = u.id
-                ORDER BY st.created_at DESC
-                LIMIT 10
-            """)
-            recent_sales = cursor.fetchall()
-            
-            cursor.close()
-            connection.close()
+            # Estadísticas generales desde el snapshot cacheado
+            snapshot = get_dashboard_snapshot()
             
             return render_template('admin/sales_dashboard.html',
-                                 coupon_stats=coupon_stats,
-                                 offer_stats=offer_stats,
-                                 sales_stats=sales_stats,
-                                 recent_sales=recent_sales)
+                                 coupon_stats=snapshot['coupon_stats'],
+                                 offer_stats=snapshot['offer_stats'],
+                                 sales_stats=snapshot['sales_stats'],
+                                 recent_sales=snapshot['recent_sales'],
+                                 generated_at=snapshot['generated_at'])
                                  
         except Exception as e:
             flash(f'Error cargando dashboard: {e}', 'error')
             return redirect(url_for('admin_dashboard'))
     
+    @app.route('/api/admin/sales/dashboard')
+    @admin_required
+    def api_sales_dashboard():
+        """Snapshot del dashboard de ventas en JSON (para refrescar la página)"""
+        try:
+            return jsonify(dump_snapshot(get_dashboard_snapshot()))
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+    
     # === RUTAS DE CUPONES ===
     
     @app.route('/admin/coupons')
@@ -103,7 +70,9 @@ def register_admin_sales_routes(app):
             seller_id = request.args.get('seller_id', type=int)
             is_active = request.args.get('is_active')
             search_term = request.args.get('search', '')
-            page = request.args.get('page', 1, type=int)
+            after = request.args.get('after')
+            before = request.args.get('before')
+            exact_count = request.args.get('count') == 'exact'
             
             # Convertir is_active a boolean si está presente
             if is_active == 'true':
@@ -114,7 +83,7 @@ def register_admin_sales_routes(app):
                 is_active = None
             
             # Obtener cupones
-            coupons = get_coupons(seller_id, is_active, search_term, page)
+            page = get_coupons(seller_id, is_active, search_term, after, before, exact_count=exact_count)
             
             # Obtener lista de vendedores para el filtro
             connection = get_db_connection()
@@ -125,13 +94,13 @@ def register_admin_sales_routes(app):
             connection.close()
             
             return render_template('admin/coupons.html',
-                                 coupons=coupons,
+                                 coupons=page.items,
+                                 page=page,
                                  sellers=sellers,
                                  current_filters={
                                      'seller_id': seller_id,
                                      'is_active': request.args.get('is_active'),
-                                     'search': search_term,
-                                     'page': page
+                                     'search': search_term
                                  })
                                  
         except Exception as e:
@@ -285,39 +254,12 @@ def register_admin_sales_routes(app):
     def admin_export_coupons():
         """Exportar cupones a CSV"""
         try:
-            # Obtener todos los cupones
-            coupons = get_coupons(page=1, per_page=10000)  # Obtener todos
-            
-            # Crear CSV
-            import io
-            import csv
-            
-            output = io.StringIO()
-            writer = csv.writer(output)
-            
-            # Encabezados
-            writer.writerow(['Código', 'Descuento %', 'Vendedor', 'Comisión %', 'Activo', 'Usos', 'Máx. Usos', 'Válido Hasta', 'Creado'])
-            
-            # Datos
-            for coupon in coupons:
-                writer.writerow([
-                    coupon['code'],
-                    coupon['discount_percentage'],
-                    coupon['seller_name'] or 'N/A',
-                    coupon['commission_percentage'],
-                    'Sí' if coupon['is_active'] else 'No',
-                    coupon['total_usage'],
-                    coupon['max_usage'] or 'Ilimitado',
-                    coupon['valid_until'] or 'Sin límite',
-                    coupon['created_at'].strftime('%Y-%m-%d')
-                ])
-            
-            # Crear respuesta
-            response = make_response(output.getvalue())
-            response.headers['Content-Type'] = 'text/csv'
-            response.headers['Content-Disposition'] = f'attachment; filename=cupones_{datetime.now().strftime("%Y%m%d")}.csv'
-            
-            return response
+            # Todos los cupones, leídos por bloques y enviados a medida que se formatean
+            query, params = build_coupons_query()
+            return stream_query_export(
+                query + " ORDER BY dc.created_at DESC, dc.id DESC", params, COUPON_EXPORT_COLUMNS,
+                f'cupones_{datetime.now().strftime("%Y%m%d")}.csv'
+            )
             
         except Exception as e:
             flash(f'Error exportando cupones: {e}', 'error')
@@ -334,7 +276,9 @@ def register_admin_sales_routes(app):
             status = request.args.get('status')
             start_date = request.args.get('start_date')
             end_date = request.args.get('end_date')
-            page = request.args.get('page', 1, type=int)
+            after = request.args.get('after')
+            before = request.args.get('before')
+            exact_count = request.args.get('count') == 'exact'
             
             # Preparar filtro de rango de fechas
             date_range = None
@@ -342,15 +286,15 @@ def register_admin_sales_routes(app):
                 date_range = (start_date, end_date)
             
             # Obtener ofertas
-            offers = get_offers(status, date_range, page)
+            page = get_offers(status, date_range, after, before, exact_count=exact_count)
             
             return render_template('admin/offers.html',
-                                 offers=offers,
+                                 offers=page.items,
+                                 page=page,
                                  current_filters={
                                      'status': status,
                                      'start_date': start_date,
-                                     'end_date': end_date,
-                                     'page': page
+                                     'end_date': end_date
                                  })
                                  
         except Exception as e:
@@ -403,6 +347,7 @@ def register_admin_sales_routes(app):
     
     @app.route('/admin/sales/reports')
     @admin_required
+    @read_only
     def admin_sales_reports():
         """Reportes de ventas"""
         try:
@@ -469,6 +414,7 @@ def register_admin_sales_routes(app):
     
     @app.route('/admin/sales/export')
     @admin_required
+    @read_only
     def admin_export_sales():
         """Exportar reporte de ventas"""
         try:
@@ -480,11 +426,11 @@ def register_admin_sales_routes(app):
             
             # Exportar datos
             if format_type == 'csv':
-                data = export_sales_report(start_date, end_date, seller_id, 'csv')
-                response = make_response(data)
-                response.headers['Content-Type'] = 'text/csv'
-                response.headers['Content-Disposition'] = f'attachment; filename=ventas_{datetime.now().strftime("%Y%m%d")}.csv'
-                return response
+                query, params = build_sales_summary_query(start_date, end_date, seller_id, 'day')
+                return stream_query_export(
+                    query, params, SALES_EXPORT_COLUMNS,
+                    f'ventas_{datetime.now().strftime("%Y%m%d")}.csv'
+                )
             
             elif format_type == 'pdf':
                 data = export_sales_report(start_date, end_date, seller_id, 'pdf')
@@ -585,6 +531,7 @@ def register_admin_sales_routes(app):
     
     @app.route('/api/admin/sales/chart-data')
     @admin_required
+    @read_only
     def api_sales_chart_data():
         """API para obtener datos de gráficos de ventas"""
         try:
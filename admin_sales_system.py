@@ -1,9 +1,10 @@
 # Sistema de gestión de cupones, ofertas y ventas para el panel de administrador
-import os
-import psycopg2
 from psycopg2.extras import RealDictCursor
+from request_db import get_pooled_read_connection
+from sales_rollup import sales_rollup_available
+from sales_dashboard import invalidate_sales_dashboard
+from keyset_pagination import KeysetPage, LISTING_PAGE_SIZE, fetch_keyset_page, count_listing
 from datetime import datetime, timedelta
-import csv
 import io
 from flask import jsonify, request, render_template, redirect, url_for, flash, make_response, session
 from functools import wraps
@@ -15,15 +16,12 @@ from reportlab.lib import colors
 from reportlab.lib.units import inch
 
 def get_db_connection():
-    """Obtener conexión a la base de datos"""
+    """Obtener conexión a la base de datos desde el pool del proceso
+
+    En las rutas de reportes marcadas con @read_only puede ser de la réplica.
+    """
     try:
-        connection = psycopg2.connect(
-            host=os.getenv('DB_HOST', 'localhost'),
-            port=os.getenv('DB_PORT', '5432'),
-            database=os.getenv('DB_NAME', 'armind_db'),
-            user=os.getenv('DB_USER', 'postgres'),
-            password=os.getenv('DB_PASSWORD', '')
-        )
+        connection = get_pooled_read_connection()
         return connection
     except Exception as e:
         print(f"Error conectando a la base de datos: {e}")
@@ -172,6 +170,7 @@ def create_coupon(code, discount_percentage, seller_id, commission_percentage, m
         connection.commit()
         cursor.close()
         connection.close()
+        invalidate_sales_dashboard()
         
         return True, f"Cupón creado con ID: {coupon_id}"
         
@@ -181,62 +180,62 @@ def create_coupon(code, discount_percentage, seller_id, commission_percentage, m
             connection.close()
         return False, f"Error creando cupón: {e}"
 
-def get_coupons(seller_id=None, is_active=None, search_term=None, page=1, per_page=20):
-    """Obtener lista de cupones con filtros"""
+def build_coupons_query(seller_id=None, is_active=None, search_term=None):
+    """Consulta de cupones con filtros (sin orden ni paginación) y sus parámetros"""
+    where_conditions = []
+    params = []
+    
+    if seller_id:
+        where_conditions.append("dc.seller_id = %s")
+        params.append(seller_id)
+    
+    if is_active is not None:
+        where_conditions.append("dc.is_active = %s")
+        params.append(is_active)
+    
+    if search_term:
+        where_conditions.append("(dc.code ILIKE %s OR s.name ILIKE %s)")
+        params.extend([f"%{search_term}%", f"%{search_term}%"])
+    
+    where_clause = "WHERE " + " AND ".join(where_conditions) if where_conditions else ""
+    
+    # Usos con subconsulta por cupón (índice idx_coupon_usage_coupon) en lugar de
+    # GROUP BY, para que la página se lea en orden desde el índice de created_at
+    query = f"""
+        SELECT dc.*, s.name as seller_name,
+               (SELECT COUNT(*) FROM coupon_usage cu WHERE cu.coupon_id = dc.id) as total_usage
+        FROM discount_coupons dc
+        LEFT JOIN sellers s ON dc.seller_id = s.id
+        {where_clause}
+    """
+    return query, params
+
+def get_coupons(seller_id=None, is_active=None, search_term=None, after=None, before=None,
+                per_page=LISTING_PAGE_SIZE, exact_count=False):
+    """Obtener una página de cupones con filtros"""
     connection = get_db_connection()
     if not connection:
-        return []
+        return KeysetPage()
     
     try:
-        cursor = connection.cursor(cursor_factory=RealDictCursor)
-        
         # Construir consulta con filtros
-        where_conditions = []
-        params = []
-        
-        if seller_id:
-            where_conditions.append("dc.seller_id = %s")
-            params.append(seller_id)
-        
-        if is_active is not None:
-            where_conditions.append("dc.is_active = %s")
-            params.append(is_active)
-        
-        if search_term:
-            where_conditions.append("(dc.code ILIKE %s OR s.name ILIKE %s)")
-            params.extend([f"%{search_term}%", f"%{search_term}%"])
-        
-        where_clause = "WHERE " + " AND ".join(where_conditions) if where_conditions else ""
-        
-        # Calcular offset para paginación
-        offset = (page - 1) * per_page
-        
-        query = f"""
-            SELECT dc.*, s.name as seller_name,
-                   COUNT(cu.id) as total_usage
-            FROM discount_coupons dc
-            LEFT JOIN sellers s ON dc.seller_id = s.id
-            LEFT JOIN coupon_usage cu ON dc.id = cu.coupon_id
-            {where_clause}
-            GROUP BY dc.id, s.name
-            ORDER BY dc.created_at DESC
-            LIMIT %s OFFSET %s
-        """
+        query, params = build_coupons_query(seller_id, is_active, search_term)
         
-        params.extend([per_page, offset])
-        cursor.execute(query, params)
-        coupons = cursor.fetchall()
+        page = fetch_keyset_page(connection, query, params, after, before, per_page)
+        filtered = seller_id or is_active is not None or search_term
+        page.total, page.total_is_estimate = count_listing(
+            connection, query, params, table=None if filtered else 'discount_coupons', exact=exact_count
+        )
         
-        cursor.close()
         connection.close()
         
-        return coupons
+        return page
         
     except Exception as e:
         print(f"Error obteniendo cupones: {e}")
         if connection:
             connection.close()
-        return []
+        return KeysetPage()
 
 def update_coupon(coupon_id, **kwargs):
     """Actualizar un cupón existente"""
@@ -278,6 +277,7 @@ def update_coupon(coupon_id, **kwargs):
         connection.commit()
         cursor.close()
         connection.close()
+        invalidate_sales_dashboard()
         
         return True, "Cupón actualizado correctamente"
         
@@ -315,6 +315,7 @@ def delete_coupon(coupon_id):
         connection.commit()
         cursor.close()
         connection.close()
+        invalidate_sales_dashboard()
         
         return True, message
         
@@ -360,6 +361,7 @@ def create_offer(title, description, discount_percentage, start_date, end_date):
         connection.commit()
         cursor.close()
         connection.close()
+        invalidate_sales_dashboard()
         
         return True, f"Oferta creada con ID: {offer_id}"
         
@@ -369,15 +371,14 @@ def create_offer(title, description, discount_percentage, start_date, end_date):
             connection.close()
         return False, f"Error creando oferta: {e}"
 
-def get_offers(status=None, date_range=None, page=1, per_page=20):
-    """Obtener lista de ofertas con filtros"""
+def get_offers(status=None, date_range=None, after=None, before=None,
+               per_page=LISTING_PAGE_SIZE, exact_count=False):
+    """Obtener una página de ofertas con filtros"""
     connection = get_db_connection()
     if not connection:
-        return []
+        return KeysetPage()
     
     try:
-        cursor = connection.cursor(cursor_factory=RealDictCursor)
-        
         # Construir consulta con filtros
         where_conditions = []
         params = []
@@ -393,9 +394,6 @@ def get_offers(status=None, date_range=None, page=1, per_page=20):
         
         where_clause = "WHERE " + " AND ".join(where_conditions) if where_conditions else ""
         
-        # Calcular offset para paginación
-        offset = (page - 1) * per_page
-        
         query = f"""
             SELECT *,
                    CASE 
@@ -405,77 +403,121 @@ def get_offers(status=None, date_range=None, page=1, per_page=20):
                    END as current_status
             FROM promotional_offers
             {where_clause}
-            ORDER BY created_at DESC
-            LIMIT %s OFFSET %s
         """
         
-        params.extend([per_page, offset])
-        cursor.execute(query, params)
-        offers = cursor.fetchall()
+        page = fetch_keyset_page(connection, query, params, after, before, per_page)
+        page.total, page.total_is_estimate = count_listing(
+            connection, query, params, table=None if where_conditions else 'promotional_offers',
+            exact=exact_count
+        )
         
-        cursor.close()
         connection.close()
         
-        return offers
+        return page
         
     except Exception as e:
         print(f"Error obteniendo ofertas: {e}")
         if connection:
             connection.close()
-        return []
+        return KeysetPage()
 
 # Funciones para reportes de ventas
-def get_sales_summary(start_date=None, end_date=None, seller_id=None, group_by='day'):
-    """Obtener resumen de ventas agrupado por periodo"""
+def _use_sales_rollup():
+    """Indica si los reportes pueden leer sales_daily_rollup (migración 0008)"""
     connection = get_db_connection()
     if not connection:
-        return []
-    
+        return False
     try:
-        cursor = connection.cursor(cursor_factory=RealDictCursor)
-        
-        # Determinar el formato de agrupación
-        date_format = {
-            'day': "DATE(st.created_at)",
-            'week': "DATE_TRUNC('week', st.created_at)",
-            'month': "DATE_TRUNC('month', st.created_at)",
-            'year': "DATE_TRUNC('year', st.created_at)"
-        }.get(group_by, "DATE(st.created_at)")
-        
-        # Construir consulta con filtros
-        where_conditions = ["st.status = 'completed'"]
-        params = []
-        
-        if start_date:
-            where_conditions.append("DATE(st.created_at) >= %s")
-            params.append(start_date)
-        
-        if end_date:
-            where_conditions.append("DATE(st.created_at) <= %s")
-            params.append(end_date)
-        
-        if seller_id:
-            where_conditions.append("st.seller_id = %s")
-            params.append(seller_id)
-        
-        where_clause = "WHERE " + " AND ".join(where_conditions)
-        
+        return sales_rollup_available(connection)
+    except Exception as e:
+        print(f"Error verificando el resumen de ventas: {e}")
+        return False
+    finally:
+        connection.close()
+
+def build_sales_summary_query(start_date=None, end_date=None, seller_id=None, group_by='day', use_rollup=None):
+    """Consulta del resumen de ventas agrupado por periodo y sus parámetros
+    
+    Con el resumen diario disponible se agrupan las filas (día, vendedor) de
+    sales_daily_rollup; si no, las transacciones completadas.
+    """
+    if use_rollup is None:
+        use_rollup = _use_sales_rollup()
+    
+    day_column = "r.day" if use_rollup else "st.created_at::date"
+    
+    # Determinar el formato de agrupación
+    date_format = {
+        'day': day_column,
+        'week': f"DATE_TRUNC('week', {day_column}::timestamp)",
+        'month': f"DATE_TRUNC('month', {day_column}::timestamp)",
+        'year': f"DATE_TRUNC('year', {day_column}::timestamp)"
+    }.get(group_by, day_column)
+    
+    # Construir consulta con filtros (rangos sobre la columna, que sí usan índices)
+    where_conditions = [] if use_rollup else ["st.status = 'completed'"]
+    params = []
+    
+    if start_date:
+        where_conditions.append("r.day >= %s" if use_rollup else "st.created_at >= %s::date")
+        params.append(start_date)
+    
+    if end_date:
+        where_conditions.append("r.day <= %s" if use_rollup else "st.created_at < %s::date + 1")
+        params.append(end_date)
+    
+    if seller_id:
+        where_conditions.append("r.seller_id = %s" if use_rollup else "st.seller_id = %s")
+        params.append(seller_id)
+    
+    where_clause = "WHERE " + " AND ".join(where_conditions) if where_conditions else ""
+    
+    if use_rollup:
         query = f"""
             SELECT 
                 {date_format} as period,
                 s.name as seller_name,
-                COUNT(st.id) as transaction_count,
-                SUM(st.original_amount) as total_original,
-                SUM(st.discount_amount) as total_discount,
-                SUM(st.final_amount) as total_final,
-                SUM(st.commission_amount) as total_commission
-            FROM sales_transactions st
-            LEFT JOIN sellers s ON st.seller_id = s.id
+                SUM(r.transaction_count) as transaction_count,
+                SUM(r.total_original) as total_original,
+                SUM(r.total_discount) as total_discount,
+                SUM(r.total_final) as total_final,
+                SUM(r.total_commission) as total_commission
+            FROM sales_daily_rollup r
+            LEFT JOIN sellers s ON r.seller_id = s.id
             {where_clause}
-            GROUP BY {date_format}, s.name, st.seller_id
+            GROUP BY {date_format}, s.name, r.seller_id
             ORDER BY period DESC, s.name
         """
+        return query, params
+    
+    query = f"""
+        SELECT 
+            {date_format} as period,
+            s.name as seller_name,
+            COUNT(st.id) as transaction_count,
+            SUM(st.original_amount) as total_original,
+            SUM(st.discount_amount) as total_discount,
+            SUM(st.final_amount) as total_final,
+            SUM(st.commission_amount) as total_commission
+        FROM sales_transactions st
+        LEFT JOIN sellers s ON st.seller_id = s.id
+        {where_clause}
+        GROUP BY {date_format}, s.name, st.seller_id
+        ORDER BY period DESC, s.name
+    """
+    return query, params
+
+def get_sales_summary(start_date=None, end_date=None, seller_id=None, group_by='day'):
+    """Obtener resumen de ventas agrupado por periodo"""
+    connection = get_db_connection()
+    if not connection:
+        return []
+    
+    try:
+        cursor = connection.cursor(cursor_factory=RealDictCursor)
         
+        query, params = build_sales_summary_query(start_date, end_date, seller_id, group_by,
+                                                  use_rollup=sales_rollup_available(connection))
         cursor.execute(query, params)
         results = cursor.fetchall()
         
@@ -501,28 +543,37 @@ def export_sales_report(start_date=None, end_date=None, seller_id=None, format='
     else:
         return None
 
+def _money(value):
+    return f"${value or 0:.2f}"
+
+# Columnas del CSV de ventas para la exportación en streaming (streaming_export)
+SALES_EXPORT_COLUMNS = [
+    ('Fecha', 'period'),
+    ('Vendedor', lambda row: row['seller_name'] or 'Casa Matriz'),
+    ('Transacciones', 'transaction_count'),
+    ('Monto Original', lambda row: _money(row['total_original'])),
+    ('Descuento', lambda row: _money(row['total_discount'])),
+    ('Monto Final', lambda row: _money(row['total_final'])),
+    ('Comisión', lambda row: _money(row['total_commission'])),
+]
+
+# Columnas del CSV de cupones
+COUPON_EXPORT_COLUMNS = [
+    ('Código', 'code'),
+    ('Descuento %', 'discount_percentage'),
+    ('Vendedor', lambda row: row['seller_name'] or 'N/A'),
+    ('Comisión %', 'commission_percentage'),
+    ('Activo', lambda row: 'Sí' if row['is_active'] else 'No'),
+    ('Usos', 'total_usage'),
+    ('Máx. Usos', lambda row: row['max_usage'] or 'Ilimitado'),
+    ('Válido Hasta', lambda row: row['valid_until'] or 'Sin límite'),
+    ('Creado', lambda row: row['created_at'].strftime('%Y-%m-%d')),
+]
+
 def export_to_csv(data):
     """Exportar datos a CSV"""
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # Escribir encabezados
-    writer.writerow(['Fecha', 'Vendedor', 'Transacciones', 'Monto Original', 'Descuento', 'Monto Final', 'Comisión'])
-    
-    # Escribir datos
-    for row in data:
-        writer.writerow([
-            row['period'],
-            row['seller_name'] or 'Casa Matriz',
-            row['transaction_count'],
-            f"${row['total_original']:.2f}",
-            f"${row['total_discount']:.2f}",
-            f"${row['total_final']:.2f}",
-            f"${row['total_commission']:.2f}"
-        ])
-    
-    output.seek(0)
-    return output.getvalue()
+    from streaming_export import iter_csv
+    return b''.join(iter_csv(data, SALES_EXPORT_COLUMNS)).decode('utf-8')
 
 def export_to_pdf(data, start_date=None, end_date=None):
     """Exportar datos a PDF"""
@@ -671,6 +722,7 @@ def update_offer(offer_id, **kwargs):
         connection.commit()
         cursor.close()
         connection.close()
+        invalidate_sales_dashboard()
         
         return True, "Oferta actualizada correctamente"
         
@@ -0,0 +1,89 @@
+"""Cache de los análisis de CV generados por los proveedores de IA
+
+Los usuarios suelen volver a subir el mismo CV y repetir el mismo tipo de
+análisis. El resultado se guarda en memoria del worker (LRU) y en Redis con una
+clave SHA-256 del texto del CV normalizado, el tipo de análisis, el proveedor,
+el modelo y ``ANALYSIS_PROMPT_VERSION``, así que un cambio de prompt o de
+modelo no reutiliza análisis anteriores.
+
+Los análisis de error (``get_error_analysis``, con ``error: True``) no se
+guardan: el siguiente intento vuelve a llamar a la IA.
+"""
+
+import os
+import re
+import copy
+import hashlib
+import logging
+import threading
+import unicodedata
+from typing import Dict, Any, Callable
+
+from cache_service import TwoTierCache
+
+logger = logging.getLogger(__name__)
+
+# Subir al modificar get_analysis_prompt o los prompts de sistema de los proveedores
+ANALYSIS_PROMPT_VERSION = '1'
+
+ANALYSIS_CACHE_TTL = int(os.getenv('ANALYSIS_CACHE_TTL', 7 * 24 * 3600))
+
+_analysis_cache = TwoTierCache(
+    'cv_analysis_result',
+    local_ttl=float(os.getenv('ANALYSIS_CACHE_LOCAL_TTL', 600)),
+    redis_ttl=max(ANALYSIS_CACHE_TTL, 1),
+    max_entries=int(os.getenv('ANALYSIS_CACHE_SIZE', 256))
+)
+
+_stats = {'llm_calls': 0, 'errors_not_cached': 0}
+_stats_lock = threading.Lock()
+
+_WHITESPACE_RE = re.compile(r'[^\S\n]+')
+_BLANK_LINES_RE = re.compile(r'\n\s*\n+')
+
+
+def normalize_cv_text(cv_text: str) -> str:
+    """Texto del CV sin diferencias de extracción (Unicode, espacios, saltos de línea)"""
+    text = unicodedata.normalize('NFC', cv_text or '').replace('\r\n', '\n').replace('\r', '\n')
+    text = _WHITESPACE_RE.sub(' ', text)
+    text = '\n'.join(line.strip() for line in text.split('\n'))
+    return _BLANK_LINES_RE.sub('\n\n', text).strip()
+
+
+def analysis_cache_key(cv_text: str, analysis_type: str, ai_provider: str, model: str) -> str:
+    digest = hashlib.sha256()
+    for part in (ANALYSIS_PROMPT_VERSION, ai_provider, model, analysis_type, normalize_cv_text(cv_text)):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def get_or_analyze(cv_text: str, analysis_type: str, ai_provider: str, model: str,
+                   analyze: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+    """Análisis cacheado o calculado con ``analyze()``; cada llamada recibe su copia"""
+    if ANALYSIS_CACHE_TTL <= 0:
+        return analyze()
+
+    key = analysis_cache_key(cv_text, analysis_type, ai_provider, model)
+    cached = _analysis_cache.get(key)
+    if cached is not None:
+        return copy.deepcopy(cached)
+
+    analysis = analyze()
+    with _stats_lock:
+        _stats['llm_calls'] += 1
+        if analysis.get('error'):
+            _stats['errors_not_cached'] += 1
+    if not analysis.get('error'):
+        _analysis_cache.set(key, copy.deepcopy(analysis))
+    return analysis
+
+
+def get_analysis_cache_stats() -> Dict[str, Any]:
+    """Aciertos del cache (llamadas a la IA ahorradas) y llamadas realizadas"""
+    stats = _analysis_cache.get_stats()
+    with _stats_lock:
+        stats.update(_stats)
+    stats['llm_calls_saved'] = stats['local_hits'] + stats['redis_hits']
+    stats['prompt_version'] = ANALYSIS_PROMPT_VERSION
+    return stats
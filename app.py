@@ -1,9 +1,33 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, send_file, make_response
-from subscription_system import check_user_limits, increment_usage
+from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, make_response, abort
+from subscription_system import check_user_limits, increment_usage, reserve_usage, invalidate_entitlements
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
+from werkzeug.exceptions import HTTPException
 import psycopg2
 from psycopg2.extras import RealDictCursor
+from db_pool import get_pooled_connection, get_pool_stats, get_replica_stats
+from request_db import init_request_db, get_request_connection, get_request_db_stats, read_only, end_request_unit
+from entitlements import get_entitlement_cache_stats
+from job_store import save_jobs
+from user_stats import get_user_stats
+from cv_search import search_cvs, build_search_sql, has_trigram_index, encode_cursor, decode_cursor, SEARCH_PAGE_SIZE
+from streaming_export import stream_query_export
+from keyset_pagination import fetch_keyset_page, count_listing
+from image_store import (store_image, delete_image, get_image_meta, image_response, legacy_image_response,
+                         select_image_variant)
+from image_ingest import prepare_image, schedule_variants, ImageValidationError
+from site_content_cache import get_site_content, get_daily_tips, bump_content_version, get_site_content_stats
+from user_identity import get_user_identity, invalidate_user_identity, get_user_identity_cache_stats
+from prepared_statements import prepared, get_prepared_statement_stats
+from dashboard_summary import (get_dashboard_summary, get_user_summary, invalidate_dashboard_summary,
+                               invalidate_jobs_total, get_dashboard_summary_stats)
+from analysis_cache import get_or_analyze, get_analysis_cache_stats
+from job_scoring import (score_jobs, get_job_scoring_stats, estimate_tokens, JOB_SCORING_CALL_TIMEOUT,
+                         SCORE_SOURCE_HEURISTIC)
+from job_ranking import prerank_jobs
+from compatibility_matcher import get_compatibility_matcher
+from blog_feed import (get_blog_feed, get_user_reactions, toggle_reaction, invalidate_blog_feed,
+                       get_blog_feed_cache_stats)
 import os
 import openai
 import PyPDF2
@@ -86,6 +110,9 @@ login_manager.login_view = 'login'
 login_manager.login_message = 'Por favor inicia sesión para acceder a esta página.'
 login_manager.login_message_category = 'info'
 
+# Compartir una conexión por request entre load_user, suscripción y la ruta
+init_request_db(app)
+
 # Hacer datetime disponible en todas las plantillas
 app.jinja_env.globals['datetime'] = datetime
 
@@ -137,20 +164,11 @@ class User(UserMixin):
 
 @login_manager.user_loader
 def load_user(user_id):
-    """Cargar usuario para Flask-Login"""
+    """Cargar usuario para Flask-Login (identidad cacheada, ver user_identity.py)"""
     try:
-        connection = get_db_connection()
-        if not connection:
-            return None
-        
-        cursor = connection.cursor()
-        cursor.execute("SELECT id, email, username, role FROM users WHERE id = %s", (user_id,))
-        user_data = cursor.fetchone()
-        cursor.close()
-        connection.close()
-        
+        user_data = get_user_identity(user_id)
         if user_data:
-            return User(user_data['id'], user_data['email'], user_data['username'], user_data.get('role', 'user'))
+            return User(user_data['id'], user_data['email'], user_data['username'], user_data['role'])
         return None
     except Exception as e:
         print(f"Error cargando usuario: {e}")
@@ -270,21 +288,20 @@ def generate_pdf_with_reportlab(html_content, title):
         return None
 
 def get_db_connection():
-    """Obtener conexión a la base de datos PostgreSQL con manejo de errores mejorado"""
+    """Obtener conexión a la base de datos PostgreSQL con manejo de errores mejorado
+    
+    Dentro de un request se presta la conexión de la unidad de trabajo del
+    request (ver request_db.py); fuera de él proviene del pool compartido del
+    proceso (ver db_pool.py). En ambos casos connection.close() no cierra la
+    conexión física.
+    """
     try:
         # Usar opciones adicionales para manejar problemas de codificación
         os.environ['PGCLIENTENCODING'] = 'UTF8'
         
-        connection = psycopg2.connect(
-            host=DB_CONFIG['host'],
-            database=DB_CONFIG['database'],
-            user=DB_CONFIG['user'],
-            password=DB_CONFIG['password'],
-            port=DB_CONFIG['port'],
-            cursor_factory=RealDictCursor,
-            client_encoding='UTF8',
-            options="-c client_encoding=UTF8"
-        )
+        connection = get_request_connection(cursor_factory=RealDictCursor)
+        if connection is None:
+            connection = get_pooled_connection(cursor_factory=RealDictCursor)
         
         return connection
     except psycopg2.Error as err:
@@ -860,8 +877,15 @@ def init_database():
         return False
 
 def save_image_to_database(image_file):
-    """Guardar imagen en la base de datos y retornar URL"""
+    """Guardar imagen en el almacenamiento de imágenes y retornar URL
+    
+    La imagen se valida, se limpia de metadatos y se acota en tamaño antes de
+    guardarse (ver image_ingest.py); los bytes se guardan una sola vez por
+    contenido (ver image_store.py) y las variantes WebP se generan en segundo
+    plano después del commit.
+    """
     try:
+        import io
         import uuid
         import os
         
@@ -873,11 +897,13 @@ def save_image_to_database(image_file):
         
         app.logger.info(f"Nombre único generado: {unique_filename}")
         
-        # Leer datos del archivo
-        image_file.seek(0)
-        image_data = image_file.read()
+        try:
+            prepared = prepare_image(image_file.stream)
+        except ImageValidationError as validation_error:
+            app.logger.warning(f"Imagen rechazada: {validation_error}")
+            return None
         
-        app.logger.info(f"Datos leídos: {len(image_data)} bytes")
+        app.logger.info(f"Imagen preparada: {prepared.width}x{prepared.height}, {len(prepared.data)} bytes")
         
         connection = get_db_connection()
         if not connection:
@@ -885,45 +911,28 @@ def save_image_to_database(image_file):
             return None
             
         try:
-            cursor = connection.cursor()
-            
-            app.logger.info("Ejecutando INSERT en uploaded_images")
-            
-            cursor.execute("""
-                INSERT INTO uploaded_images (filename, original_filename, content_type, file_size, image_data, uploaded_by)
-                VALUES (%s, %s, %s, %s, %s, %s)
-                RETURNING id
-            """, (
+            image_id = store_image(
+                connection,
+                io.BytesIO(prepared.data),
                 unique_filename,
                 image_file.filename,
-                image_file.content_type,
-                len(image_data),
-                image_data,
+                prepared.content_type,
                 session.get('user_id')
-            ))
-            
-            result = cursor.fetchone()
-            if result:
-                # Manejar tanto tuplas como diccionarios
-                if isinstance(result, dict):
-                    image_id = result['id']
-                else:
-                    image_id = result[0]
-                app.logger.info(f"Imagen guardada con ID: {image_id}")
-            else:
-                app.logger.error("No se obtuvo ID de la imagen insertada")
-                return None
+            )
+            app.logger.info(f"Imagen guardada con ID: {image_id}")
                 
             connection.commit()
-            cursor.close()
             connection.close()
             
+            # Las variantes se generan cuando el request confirme la fila de la imagen
+            schedule_variants(image_id, prepared)
+            
             # Retornar URL para acceder a la imagen
             return f"/image/{image_id}"
             
         except Exception as db_error:
             error_msg = str(db_error)
-            app.logger.error(f"Error en base de datos: {error_msg}")
+            app.logger.error(f"Error guardando imagen: {error_msg}")
             app.logger.error(f"Tipo de error: {type(db_error).__name__}")
             if connection:
                 try:
@@ -941,44 +950,35 @@ def save_image_to_database(image_file):
 
 @app.route('/image/<int:image_id>')
 def serve_image(image_id):
-    """Servir imagen desde la base de datos"""
+    """Servir imagen desde el almacenamiento con ETag, 304 y rangos de bytes"""
     try:
         connection = get_db_connection()
         if not connection:
             abort(404)
-            
-        cursor = connection.cursor()
-        cursor.execute("""
-            SELECT image_data, content_type, filename
-            FROM uploaded_images
-            WHERE id = %s
-        """, (image_id,))
-        
-        result = cursor.fetchone()
-        cursor.close()
-        connection.close()
         
-        if not result:
-            abort(404)
+        try:
+            meta = get_image_meta(connection, image_id)
+            if not meta:
+                abort(404)
             
-        # Manejar tanto tuplas como diccionarios
-        if isinstance(result, dict):
-            image_data = result['image_data']
-            content_type = result['content_type']
-            filename = result['filename']
-        else:
-            image_data, content_type, filename = result
-        
-        from flask import Response
-        return Response(
-            image_data,
-            mimetype=content_type,
-            headers={
-                'Content-Disposition': f'inline; filename="{filename}"',
-                'Cache-Control': 'public, max-age=31536000'  # Cache por 1 año
-            }
-        )
+            if meta.get('sha256'):
+                # ?v=thumb|medium|webp|original; sin parámetro, WebP si el cliente lo acepta
+                selected, negotiated = select_image_variant(meta, request.args.get('v'), request.accept_mimetypes)
+                response = image_response(selected)
+                if negotiated:
+                    response.vary.add('Accept')
+                return response
+            
+            # Fila anterior a la migración 0009: los bytes siguen en la tabla
+            response = legacy_image_response(connection, meta)
+            if response is None:
+                abort(404)
+            return response
+        finally:
+            connection.close()
         
+    except HTTPException:
+        raise
     except Exception as e:
         app.logger.error(f"Error sirviendo imagen: {e}")
         abort(404)
@@ -1332,6 +1332,7 @@ def reset_password(token):
                         (password_hash, user['id'])
                     )
                     connection.commit()
+                    invalidate_user_identity(user['id'])
                     
                     add_console_log('INFO', f'Contraseña restablecida exitosamente para: {user["username"]}', 'AUTH')
                     flash('Tu contraseña ha sido restablecida exitosamente. Ya puedes iniciar sesión.', 'success')
@@ -1469,66 +1470,18 @@ def dashboard():
     user_usage = None
     
     if connection:
-        cursor = connection.cursor()
-        
-        # Contar CVs analizados
-        cursor.execute(
-            "SELECT COUNT(*) FROM resumes WHERE user_id = %s",
-            (session['user_id'],)
-        )
-        result = cursor.fetchone()
-        stats['cvs_analyzed'] = result['count'] if result else 0
-        
-        # Contar empleos encontrados (esto es un placeholder, ajustar según la lógica de negocio)
-        cursor.execute(
-            "SELECT COUNT(*) FROM jobs"
-        )
-        result = cursor.fetchone()
-        stats['jobs_found'] = result['count'] if result else 0
-        
-        # Obtener contenido del sitio
-        cursor.execute(
-            "SELECT section, content_key, content_value FROM site_content"
-        )
-        content_rows = cursor.fetchall()
-        for row in content_rows:
-            section = row['section']
-            if section not in site_content:
-                site_content[section] = {}
-            site_content[section][row['content_key']] = row['content_value']
+        # Resumen cacheado por usuario; el total de empleos se recuenta periódicamente
+        summary = get_dashboard_summary(connection, session['user_id'])
+        stats['cvs_analyzed'] = summary['cvs_analyzed']
+        stats['jobs_found'] = summary['jobs_found']
         
-        cursor.close()
         connection.close()
     
-    # Obtener consejos del día desde la tabla daily_tips
+    # Contenido del sitio y consejos del día desde el cache del worker (ver site_content_cache.py)
     tips_data = []
     try:
-        connection = get_db_connection()
-        if connection:
-            cursor = connection.cursor()
-            
-            # Obtener todos los consejos del día desde la base de datos
-            cursor.execute("""
-                SELECT id, title, description, icon, color, is_active 
-                FROM daily_tips 
-                WHERE is_active = true
-                ORDER BY id
-            """)
-            
-            daily_tips_results = cursor.fetchall()
-            
-            # Convertir a formato compatible con el template
-            for tip in daily_tips_results:
-                tips_data.append({
-                    'id': tip['id'],
-                    'title': tip['title'],
-                    'description': tip['description'],
-                    'icon': tip['icon'],
-                    'icon_color': tip['color']
-                })
-            
-            cursor.close()
-            connection.close()
+        site_content = get_site_content()
+        tips_data = get_daily_tips()
     except Exception as e:
         print(f"Error cargando consejos del día desde BD: {e}")
         # Valores por defecto si hay error
@@ -1697,8 +1650,8 @@ def analyze_cv():
                         flash('Error interno: No se pudo procesar el CV', 'error')
                         return redirect(request.url)
                     
-                    # Incrementar contador de uso
-                    increment_usage(session.get('user_id'), 'cv_analysis')
+                    # El cupo de análisis se reserva y consume en perform_analysis,
+                    # solo cuando la IA responde correctamente
                     
                     # LOGGING ANTES DE REDIRECCIÓN
                     add_console_log('INFO', f'Redirigiendo a selección de IA - {filename} por {username}', 'CV')
@@ -1742,42 +1695,24 @@ def analyze_cv():
         }
     }
     
-    # Intentar cargar desde base de datos para sobrescribir valores por defecto
+    # Sobrescribir valores por defecto con el contenido editado (cache del worker, ver site_content_cache.py)
     try:
-        connection = get_db_connection()
-        if connection:
-            cursor = connection.cursor()
-            
-            # Obtener todos los consejos de análisis desde la base de datos
-            cursor.execute("""
-                SELECT content_key, content_value 
-                FROM site_content 
-                WHERE section = 'analysis_tips'
-            """)
+        analysis_tips = get_site_content().get('analysis_tips', {})
+        
+        if analysis_tips:
+            for tip_type in ['tip_format', 'tip_keywords', 'tip_achievements', 'tip_errors']:
+                if f'{tip_type}_title' in analysis_tips:
+                    tips_data[tip_type]['title'] = analysis_tips[f'{tip_type}_title']
+                if f'{tip_type}_description' in analysis_tips:
+                    tips_data[tip_type]['description'] = analysis_tips[f'{tip_type}_description']
+                if f'{tip_type}_icon' in analysis_tips:
+                    tips_data[tip_type]['icon'] = analysis_tips[f'{tip_type}_icon']
+                if f'{tip_type}_icon_color' in analysis_tips:
+                    tips_data[tip_type]['icon_color'] = analysis_tips[f'{tip_type}_icon_color']
             
-            results = cursor.fetchall()
-            analysis_tips = {}
-            for row in results:
-                analysis_tips[row['content_key']] = row['content_value']
-            
-            # Sobrescribir valores por defecto con los de la base de datos si existen
-            if analysis_tips:
-                for tip_type in ['tip_format', 'tip_keywords', 'tip_achievements', 'tip_errors']:
-                    if f'{tip_type}_title' in analysis_tips:
-                        tips_data[tip_type]['title'] = analysis_tips[f'{tip_type}_title']
-                    if f'{tip_type}_description' in analysis_tips:
-                        tips_data[tip_type]['description'] = analysis_tips[f'{tip_type}_description']
-                    if f'{tip_type}_icon' in analysis_tips:
-                        tips_data[tip_type]['icon'] = analysis_tips[f'{tip_type}_icon']
-                    if f'{tip_type}_icon_color' in analysis_tips:
-                        tips_data[tip_type]['icon_color'] = analysis_tips[f'{tip_type}_icon_color']
-                
-                print(f"Consejos cargados desde BD: {len(analysis_tips)} elementos")
-            else:
-                print("No hay consejos personalizados en BD, usando valores por defecto")
-            
-            cursor.close()
-            connection.close()
+            print(f"Consejos cargados desde BD: {len(analysis_tips)} elementos")
+        else:
+            print("No hay consejos personalizados en BD, usando valores por defecto")
     except Exception as e:
         print(f"Error cargando desde BD, usando valores por defecto: {e}")
     
@@ -1917,12 +1852,32 @@ def perform_analysis(analysis_type):
         flash('Tipo de análisis no válido', 'error')
         return redirect(url_for('select_analysis_type', ai_provider=ai_provider))
     
+    # Reservar un cupo de análisis mientras dura la llamada a la IA
+    reservation = reserve_usage(session['user_id'], 'cv_analysis')
+    if reservation is None:
+        _, message = check_user_limits(session['user_id'], 'cv_analysis')
+        flash(f'Restricción de plan: {message}', 'error')
+        return redirect(url_for('dashboard'))
+    
+    # Confirmar la reserva y no retener la conexión durante la llamada a la IA
+    end_request_unit()
+    
     try:
         add_console_log('INFO', f'Iniciando análisis {analysis_type} con {ai_provider} para: {filename}', 'CV')
         
         # Realizar análisis según el proveedor y tipo seleccionado
         analysis = perform_cv_analysis(cv_content, ai_provider, analysis_type)
         
+        # Los análisis de error no consumen cupo
+        if analysis.get('error'):
+            reservation.release()
+        else:
+            try:
+                reservation.commit()
+            except Exception as e:
+                # El análisis ya está hecho: se guarda igual y la reserva vence sola
+                add_console_log('WARNING', f'No se pudo consumir el cupo del análisis: {str(e)}', 'CV')
+        
         # Guardar en la base de datos
         save_cv_analysis(session['user_id'], filename, cv_content, analysis)
         add_console_log('INFO', f'Análisis CV completado exitosamente: {filename} por {username}', 'CV')
@@ -1938,6 +1893,7 @@ def perform_analysis(analysis_type):
         return render_template('cv_analysis_result.html', analysis=analysis, analysis_type=analysis_type, ai_provider=ai_provider)
         
     except Exception as e:
+        reservation.release()
         add_console_log('ERROR', f'Error en análisis: {str(e)}', 'CV')
         flash(f'Error durante el análisis: {str(e)}', 'error')
         return redirect(url_for('select_analysis_type', ai_provider=ai_provider))
@@ -2127,16 +2083,28 @@ def _extract_from_word_robust(filepath, file_extension):
     
     return text
 
+# Modelo usado por cada proveedor en los análisis de CV (parte de la clave del cache de análisis)
+ANALYSIS_MODELS = {
+    'openai': 'gpt-3.5-turbo',
+    'anthropic': 'claude-3-5-sonnet-20241022',
+    'gemini': 'gemini-1.5-flash'
+}
+
 def perform_cv_analysis(cv_text, ai_provider, analysis_type):
-    """Realizar análisis de CV según el proveedor de IA y tipo de análisis seleccionado"""
-    if ai_provider == 'openai':
-        return analyze_cv_with_openai(cv_text, analysis_type)
-    elif ai_provider == 'anthropic':
-        return analyze_cv_with_anthropic(cv_text, analysis_type)
-    elif ai_provider == 'gemini':
-        return analyze_cv_with_gemini(cv_text, analysis_type)
-    else:
+    """Realizar análisis de CV según el proveedor de IA y tipo de análisis seleccionado.
+
+    El resultado se reutiliza si el mismo CV ya tuvo este análisis con el mismo
+    proveedor y modelo (ver analysis_cache.py).
+    """
+    analyzers = {
+        'openai': analyze_cv_with_openai,
+        'anthropic': analyze_cv_with_anthropic,
+        'gemini': analyze_cv_with_gemini
+    }
+    if ai_provider not in analyzers:
         raise ValueError(f"Proveedor de IA no soportado: {ai_provider}")
+    return get_or_analyze(cv_text, analysis_type, ai_provider, ANALYSIS_MODELS[ai_provider],
+                          lambda: analyzers[ai_provider](cv_text, analysis_type))
 
 def get_analysis_prompt(analysis_type, cv_text):
     """Obtener el prompt específico según el tipo de análisis"""
@@ -2698,7 +2666,7 @@ def analyze_cv_with_openai(cv_text, analysis_type):
     
     try:
         response = OPENAI_CLIENT.chat.completions.create(
-            model="gpt-3.5-turbo",  # Usar gpt-3.5-turbo que es más estable
+            model=ANALYSIS_MODELS['openai'],  # Usar gpt-3.5-turbo que es más estable
             messages=[
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": prompt}
@@ -2740,7 +2708,7 @@ def analyze_cv_with_anthropic(cv_text, analysis_type):
         Responde SIEMPRE en formato JSON válido con la estructura especificada."""
         
         response = client.messages.create(
-            model="claude-3-5-sonnet-20241022",  # Usar modelo disponible
+            model=ANALYSIS_MODELS['anthropic'],  # Usar modelo disponible
             max_tokens=2000,
             temperature=0.7,
             system=system_prompt,
@@ -2795,7 +2763,7 @@ def analyze_cv_with_gemini(cv_text, analysis_type):
         
         # Configurar Gemini
         genai.configure(api_key=api_key)
-        model = genai.GenerativeModel('gemini-1.5-flash')  # Usar modelo disponible
+        model = genai.GenerativeModel(ANALYSIS_MODELS['gemini'])  # Usar modelo disponible
         
         prompt = get_analysis_prompt(analysis_type, cv_text)
         
@@ -2900,11 +2868,29 @@ def save_cv_analysis(user_id, filename, content, analysis):
         ))
         
         connection.commit()
+        invalidate_dashboard_summary(user_id)
         cursor.close()
         connection.close()
         
         print(f"Análisis guardado - S3: {s3_key}, DB: resume_id {resume_id}")
 
+# Consultas de cada vista de análisis y de CV, preparadas una vez por conexión
+LATEST_ANALYSIS_STATEMENT = prepared('latest_cv_analysis', """
+    SELECT f.s3_key, f.analysis_type, f.ai_provider, f.created_at
+    FROM feedback f
+    INNER JOIN resumes r ON f.resume_id = r.id
+    WHERE r.user_id = %s AND f.s3_key IS NOT NULL
+    ORDER BY f.created_at DESC
+    LIMIT 1
+""", ('integer',))
+
+USER_CV_STATEMENT = prepared('user_cv_by_id', """
+    SELECT cv_name, personal_info, professional_summary, education, experience, skills, languages,
+           certificates, format_options, ai_methodologies
+    FROM user_cvs
+    WHERE id = %s AND user_id = %s AND is_active = TRUE
+""", ('integer', 'integer'))
+
 def get_latest_cv_analysis(user_id):
     """Obtener el análisis de CV más reciente del usuario desde S3"""
     from s3_utils import get_analysis_from_s3
@@ -2912,14 +2898,7 @@ def get_latest_cv_analysis(user_id):
     connection = get_db_connection()
     if connection:
         cursor = connection.cursor()
-        cursor.execute("""
-            SELECT f.s3_key, f.analysis_type, f.ai_provider, f.created_at
-            FROM feedback f
-            INNER JOIN resumes r ON f.resume_id = r.id
-            WHERE r.user_id = %s AND f.s3_key IS NOT NULL
-            ORDER BY f.created_at DESC
-            LIMIT 1
-        """, (user_id,))
+        LATEST_ANALYSIS_STATEMENT.execute(cursor, (user_id,))
         
         result = cursor.fetchone()
         cursor.close()
@@ -3077,135 +3056,151 @@ def remove_duplicate_jobs(jobs):
 def calculate_ai_job_compatibility(job, cv_analysis):
     """Calcular compatibilidad entre un trabajo y el CV usando IA con ponderación por área de experiencia"""
     try:
-        # Preparar información del trabajo
-        job_info = {
-            'title': job.get('title', ''),
-            'description': job.get('description', ''),
-            'company': job.get('company', ''),
-            'location': job.get('location', '')
-        }
-        
-        # Preparar información del CV
-        cv_info = {
-            'strengths': cv_analysis.get('strengths', []),
-            'keywords': cv_analysis.get('keywords', []),
-            'score': cv_analysis.get('score', 0),
-            'experience_areas': cv_analysis.get('experience_areas', []),
-            'skill_level': cv_analysis.get('skill_level', 'intermedio')
-        }
-        
-        prompt = f"""
-        Analiza la compatibilidad entre este trabajo y el perfil del candidato, aplicando ponderación según área de experiencia.
-        
-        TRABAJO:
-        Título: {job_info['title']}
-        Empresa: {job_info['company']}
-        Descripción: {job_info['description'][:500]}...
-        
-        PERFIL DEL CANDIDATO:
-        Fortalezas principales: {cv_info['strengths']}
-        Palabras clave del CV: {cv_info['keywords']}
-        Áreas de experiencia: {cv_info['experience_areas']}
-        Nivel de habilidad: {cv_info['skill_level']}
-        Puntuación ATS del CV: {cv_info['score']}/100
-        
-        INSTRUCCIONES DE PONDERACIÓN:
-        - Si el trabajo está en un área donde el candidato NO tiene experiencia: reducir compatibilidad en 20-40%
-        - Si el trabajo requiere habilidades que el candidato no domina: reducir compatibilidad en 15-30%
-        - Si el nivel del puesto es muy superior a la experiencia del candidato: reducir compatibilidad en 10-25%
-        - Si hay coincidencia perfecta de área y habilidades: mantener o aumentar compatibilidad
-        
-        Calcula un porcentaje de compatibilidad del 0 al 100 considerando:
-        1. Coincidencia de área de experiencia (peso: 35%)
-        2. Coincidencia de habilidades técnicas (peso: 30%)
-        3. Nivel del puesto vs experiencia (peso: 20%)
-        4. Palabras clave coincidentes (peso: 15%)
-        
-        IMPORTANTE: No todos los trabajos deben tener alta compatibilidad. Sé realista con las puntuaciones.
-        Responde SOLO con el número del porcentaje (ejemplo: 65)
-        """
-        
-        response = OPENAI_CLIENT.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "Eres un experto en recursos humanos que evalúa la compatibilidad entre candidatos y ofertas de trabajo. Eres crítico y realista con las puntuaciones, no das puntuaciones altas a menos que haya una excelente coincidencia."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=50,
-            temperature=0.2
-        )
-        
-        compatibility_text = response.choices[0].message.content.strip()
-        
-        # Extraer el número del texto
-        import re
-        numbers = re.findall(r'\d+', compatibility_text)
-        if numbers:
-            compatibility = min(int(numbers[0]), 100)  # Limitar a 100
-            return max(compatibility, 0)  # Asegurar que no sea negativo
-        
-        return 50  # Valor por defecto si no se puede extraer
-        
+        compatibility = score_job_with_ai(job, cv_analysis)
+        return 50 if compatibility is None else compatibility  # Valor por defecto si no se puede extraer
     except Exception as e:
         print(f"Error calculando compatibilidad IA: {e}")
         # Fallback: usar método básico mejorado
         return calculate_basic_compatibility(job, cv_analysis)
 
+JOB_COMPATIBILITY_SYSTEM_PROMPT = "Eres un experto en recursos humanos que evalúa la compatibilidad entre candidatos y ofertas de trabajo. Eres crítico y realista con las puntuaciones, no das puntuaciones altas a menos que haya una excelente coincidencia."
+
+def build_candidate_profile(cv_analysis):
+    """Bloque del prompt con el perfil del candidato (fortalezas, palabras clave y áreas)"""
+    return f"""PERFIL DEL CANDIDATO:
+    Fortalezas principales: {cv_analysis.get('strengths', [])}
+    Palabras clave del CV: {cv_analysis.get('keywords', [])}
+    Áreas de experiencia: {cv_analysis.get('experience_areas', [])}
+    Nivel de habilidad: {cv_analysis.get('skill_level', 'intermedio')}
+    Puntuación ATS del CV: {cv_analysis.get('score', 0)}/100"""
+
+JOB_COMPATIBILITY_INSTRUCTIONS = """INSTRUCCIONES DE PONDERACIÓN:
+    - Si el trabajo está en un área donde el candidato NO tiene experiencia: reducir compatibilidad en 20-40%
+    - Si el trabajo requiere habilidades que el candidato no domina: reducir compatibilidad en 15-30%
+    - Si el nivel del puesto es muy superior a la experiencia del candidato: reducir compatibilidad en 10-25%
+    - Si hay coincidencia perfecta de área y habilidades: mantener o aumentar compatibilidad
+    
+    Calcula un porcentaje de compatibilidad del 0 al 100 considerando:
+    1. Coincidencia de área de experiencia (peso: 35%)
+    2. Coincidencia de habilidades técnicas (peso: 30%)
+    3. Nivel del puesto vs experiencia (peso: 20%)
+    4. Palabras clave coincidentes (peso: 15%)
+    
+    IMPORTANTE: No todos los trabajos deben tener alta compatibilidad. Sé realista con las puntuaciones."""
+
+def build_job_compatibility_prompt(job, cv_analysis):
+    """Prompt de compatibilidad de un solo empleo"""
+    return f"""
+    Analiza la compatibilidad entre este trabajo y el perfil del candidato, aplicando ponderación según área de experiencia.
+    
+    TRABAJO:
+    Título: {job.get('title', '')}
+    Empresa: {job.get('company', '')}
+    Descripción: {job.get('description', '')[:500]}...
+    
+    {build_candidate_profile(cv_analysis)}
+    
+    {JOB_COMPATIBILITY_INSTRUCTIONS}
+    Responde SOLO con el número del porcentaje (ejemplo: 65)
+    """
+
+def score_job_with_ai(job, cv_analysis):
+    """Porcentaje de compatibilidad calculado por la IA; None si la respuesta no trae un número.
+
+    Los errores de la llamada se propagan (ver job_scoring.score_jobs).
+    """
+    if OPENAI_CLIENT is None:
+        raise RuntimeError("OpenAI API Key no configurada")
+    
+    response = OPENAI_CLIENT.chat.completions.create(
+        model="gpt-3.5-turbo",
+        messages=[
+            {"role": "system", "content": JOB_COMPATIBILITY_SYSTEM_PROMPT},
+            {"role": "user", "content": build_job_compatibility_prompt(job, cv_analysis)}
+        ],
+        max_tokens=50,
+        temperature=0.2,
+        timeout=JOB_SCORING_CALL_TIMEOUT
+    )
+    
+    compatibility_text = response.choices[0].message.content.strip()
+    
+    # Extraer el número del texto
+    import re
+    numbers = re.findall(r'\d+', compatibility_text)
+    if numbers:
+        compatibility = min(int(numbers[0]), 100)  # Limitar a 100
+        return max(compatibility, 0)  # Asegurar que no sea negativo
+    
+    return None
+
+def score_job_batch_with_ai(jobs_by_id, cv_analysis):
+    """Puntuar varios empleos en una sola llamada: el perfil del candidato se envía una vez.
+
+    ``jobs_by_id`` es ``{id: empleo}``. Retorna ``(texto_de_la_respuesta, uso)`` con
+    los tokens de la llamada y la estimación de tokens de puntuar los mismos
+    empleos uno por uno (ver job_scoring.score_jobs).
+    """
+    if OPENAI_CLIENT is None:
+        raise RuntimeError("OpenAI API Key no configurada")
+    
+    job_lines = "\n".join(
+        f"""    [{job_id}] Título: {job.get('title', '')} | Empresa: {job.get('company', '')} | Descripción: {' '.join(job.get('description', '')[:500].split())}"""
+        for job_id, job in jobs_by_id.items()
+    )
+    prompt = f"""
+    Analiza la compatibilidad entre cada uno de estos trabajos y el perfil del candidato, aplicando ponderación según área de experiencia.
+    
+    TRABAJOS (id entre corchetes):
+{job_lines}
+    
+    {build_candidate_profile(cv_analysis)}
+    
+    {JOB_COMPATIBILITY_INSTRUCTIONS}
+    Responde SOLO con un arreglo JSON con un elemento por trabajo, sin texto adicional:
+    [{{"id": "1", "score": 65}}, ...]
+    """
+    
+    response = OPENAI_CLIENT.chat.completions.create(
+        model="gpt-3.5-turbo",
+        messages=[
+            {"role": "system", "content": JOB_COMPATIBILITY_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ],
+        max_tokens=20 + 15 * len(jobs_by_id),
+        temperature=0.2,
+        timeout=JOB_SCORING_CALL_TIMEOUT
+    )
+    
+    content = response.choices[0].message.content
+    # El ahorro se compara entre estimaciones (prompt + respuesta) de ambos modos
+    tokens_estimate = estimate_tokens(JOB_COMPATIBILITY_SYSTEM_PROMPT + prompt) + estimate_tokens(content or '')
+    usage = getattr(response, 'usage', None)
+    tokens = getattr(usage, 'total_tokens', None) or tokens_estimate
+    per_job_tokens = sum(
+        estimate_tokens(JOB_COMPATIBILITY_SYSTEM_PROMPT + build_job_compatibility_prompt(job, cv_analysis)) + 2
+        for job in jobs_by_id.values()
+    )
+    return content, {'tokens': tokens, 'tokens_estimate': tokens_estimate, 'per_job_tokens': per_job_tokens}
+
 def calculate_basic_compatibility(job, cv_analysis):
     """Método básico de compatibilidad sin IA como fallback con ponderación mejorada"""
     try:
-        compatibility_score = 0
-        
-        # Texto del trabajo en minúsculas
-        job_text = f"{job.get('title', '')} {job.get('description', '')}".lower()
-        
-        # Verificar coincidencias con fortalezas (peso mayor)
-        strengths = cv_analysis.get('strengths', [])
-        strength_matches = 0
-        for strength in strengths:
-            if isinstance(strength, str) and strength.lower() in job_text:
-                strength_matches += 1
-                compatibility_score += 12
-        
-        # Verificar coincidencias con palabras clave
-        keywords = cv_analysis.get('keywords', [])
-        keyword_matches = 0
-        for keyword in keywords:
-            if isinstance(keyword, str) and keyword.lower() in job_text:
-                keyword_matches += 1
-                compatibility_score += 8
-        
-        # Verificar áreas de experiencia
-        experience_areas = cv_analysis.get('experience_areas', [])
-        area_match = False
-        for area in experience_areas:
-            if isinstance(area, str) and area.lower() in job_text:
-                area_match = True
-                compatibility_score += 20
-                break
-        
-        # Puntuación base del CV (reducida)
-        base_score = cv_analysis.get('score', 50)
-        compatibility_score += base_score * 0.2
-        
-        # Penalización si no hay coincidencias importantes
-        if strength_matches == 0:
-            compatibility_score *= 0.7  # Reducir 30%
-        
-        if not area_match and len(experience_areas) > 0:
-            compatibility_score *= 0.8  # Reducir 20% si no coincide área
-        
-        # Asegurar que no todos los trabajos tengan alta compatibilidad
-        if compatibility_score > 85:
-            compatibility_score = 85  # Máximo realista para método básico
-        
-        # Limitar entre 15 y 85 para ser más realista
-        return max(15, min(int(compatibility_score), 85))
+        # Fortalezas, palabras clave y áreas del CV sin acentos y con límites de palabra (ver compatibility_matcher.py)
+        return get_compatibility_matcher(cv_analysis).score(job)
         
     except Exception as e:
         print(f"Error en compatibilidad básica: {e}")
         return 45  # Valor más realista por defecto
 
+def calculate_basic_compatibility_batch(jobs, cv_analysis):
+    """Compatibilidad básica de un lote de empleos (términos del CV preparados una vez)"""
+    try:
+        return get_compatibility_matcher(cv_analysis).scores(jobs)
+    except Exception as e:
+        print(f"Error en compatibilidad básica: {e}")
+        return [45] * len(jobs)
+
 @app.route('/cv_builder')
 def cv_builder():
     """Alias para create_cv - Constructor de CV"""
@@ -4132,6 +4127,7 @@ def my_cvs():
     return render_template('my_cvs.html')
 
 @app.route('/get_user_cvs', methods=['GET'])
+@read_only
 def get_user_cvs():
     """Obtener lista de CVs del usuario"""
     if not session.get('user_id'):
@@ -4347,10 +4343,7 @@ def preview_cv(cv_id):
         cursor = connection.cursor()
         
         # Obtener los datos del CV
-        cursor.execute(
-            "SELECT cv_name, personal_info, professional_summary, education, experience, skills, languages, certificates, format_options, ai_methodologies FROM user_cvs WHERE id = %s AND user_id = %s AND is_active = TRUE",
-            (cv_id, session['user_id'])
-        )
+        USER_CV_STATEMENT.execute(cursor, (cv_id, session['user_id']))
         result = cursor.fetchone()
         
         if not result:
@@ -4384,6 +4377,8 @@ def preview_cv(cv_id):
         ai_methodologies = cv_data.get('ai_methodologies', {})
         target_language = ai_methodologies.get('target_language', 'es')
         
+        # No retener la conexión mientras se espera a la IA
+        end_request_unit()
         # Aplicar mejoras de IA antes de generar HTML (igual que en export_cv)
         improved_cv_data = improve_cv_with_ai(cv_data, target_language)
         
@@ -4440,6 +4435,8 @@ def save_cv():
     print(f"[DEBUG] Idioma objetivo: {target_language}")
     print(f"[DEBUG] Opciones de formato: {data.get('format_options', {})}")
     
+    # No retener la conexión mientras se espera a la IA
+    end_request_unit()
     improved_data = improve_cv_with_ai(data, target_language)
     
     print(f"[DEBUG] Datos mejorados después de IA - resumen: {improved_data.get('professional_summary', 'VACIO')[:50]}...")
@@ -4547,6 +4544,7 @@ def save_cv():
             new_cv_id = cursor.fetchone()['id']
         
         connection.commit()
+        invalidate_dashboard_summary(session['user_id'])
         cursor.close()
         connection.close()
         
@@ -4586,10 +4584,7 @@ def export_cv(cv_id):
         cursor = connection.cursor()
         
         # Obtener los datos estructurados del CV directamente desde user_cvs
-        cursor.execute(
-            "SELECT cv_name, personal_info, professional_summary, education, experience, skills, languages, certificates, format_options, ai_methodologies FROM user_cvs WHERE id = %s AND user_id = %s AND is_active = TRUE",
-            (cv_id, session['user_id'])
-        )
+        USER_CV_STATEMENT.execute(cursor, (cv_id, session['user_id']))
         result = cursor.fetchone()
         
         if not result:
@@ -4629,6 +4624,8 @@ def export_cv(cv_id):
         ai_methodologies = cv_data.get('ai_methodologies', {})
         target_language = ai_methodologies.get('target_language', 'es')
         
+        # No retener la conexión mientras se espera a la IA
+        end_request_unit()
         # Aplicar mejoras de IA antes de generar HTML (igual que en save_cv)
         improved_cv_data = improve_cv_with_ai(cv_data, target_language)
         
@@ -4872,11 +4869,13 @@ def search_jobs():
     # Obtener análisis de CV para calcular compatibilidad
     cv_analysis = get_latest_cv_analysis(session['user_id'])
     
-    # Calcular compatibilidad con IA si hay análisis de CV
+    # Calcular compatibilidad con IA si hay análisis de CV (en paralelo y con plazo, ver job_scoring.py)
+    scoring = None
     if cv_analysis and unique_jobs:
-        for job in unique_jobs:
-            compatibility = calculate_ai_job_compatibility(job, cv_analysis)
-            job['compatibility_score'] = compatibility
+        # No retener la conexión mientras se espera a la IA
+        end_request_unit()
+        scoring = score_jobs(unique_jobs, cv_analysis, score_job_with_ai, calculate_basic_compatibility,
+                             batch_scorer=score_job_batch_with_ai)
         
         # Ordenar por compatibilidad (mayor a menor)
         unique_jobs.sort(key=lambda x: x.get('compatibility_score', 0), reverse=True)
@@ -4887,7 +4886,8 @@ def search_jobs():
     return jsonify({
         'jobs': unique_jobs,
         'total_found': len(unique_jobs),
-        'has_ai_scoring': bool(cv_analysis)
+        'has_ai_scoring': bool(scoring and scoring['ai']),
+        'scoring': scoring
     })
 
 @app.route('/ai_job_search', methods=['POST'])
@@ -4905,6 +4905,9 @@ def ai_job_search():
                 'error': 'No se encontró un análisis de CV. Por favor, sube y analiza tu CV primero.'
             }), 400
         
+        # No retener la conexión mientras se espera a la IA
+        end_request_unit()
+        
         # Generar términos de búsqueda inteligentes basados en el CV
         search_terms = generate_smart_search_terms(cv_analysis)
         
@@ -4918,12 +4921,17 @@ def ai_job_search():
         # Eliminar duplicados
         unique_jobs = remove_duplicate_jobs(all_jobs)
         
-        # Calcular compatibilidad con IA para cada trabajo
-        jobs_with_compatibility = []
-        for job in unique_jobs:
-            compatibility = calculate_ai_job_compatibility(job, cv_analysis)
-            job['compatibility_score'] = compatibility
-            jobs_with_compatibility.append(job)
+        # Solo los mejores por puntaje léxico contra el CV pasan a la IA (ver job_ranking.py)
+        ai_candidates, other_jobs = prerank_jobs(unique_jobs, cv_analysis)
+        
+        # Calcular compatibilidad con IA para cada candidato (en paralelo y con plazo, ver job_scoring.py)
+        scoring = score_jobs(ai_candidates, cv_analysis, score_job_with_ai, calculate_basic_compatibility,
+                             batch_scorer=score_job_batch_with_ai)
+        for job, score in zip(other_jobs, calculate_basic_compatibility_batch(other_jobs, cv_analysis)):
+            job['compatibility_score'] = score
+            job['score_source'] = SCORE_SOURCE_HEURISTIC
+        scoring['prefiltered'] = len(other_jobs)
+        jobs_with_compatibility = ai_candidates + other_jobs
         
         # Ordenar por compatibilidad (mayor a menor)
         jobs_with_compatibility.sort(key=lambda x: x['compatibility_score'], reverse=True)
@@ -4938,7 +4946,8 @@ def ai_job_search():
         return jsonify({
             'jobs': top_jobs,
             'total_found': len(unique_jobs),
-            'search_terms_used': search_terms[:3]
+            'search_terms_used': search_terms[:3],
+            'scoring': scoring
         })
         
     except Exception as e:
@@ -4946,6 +4955,7 @@ def ai_job_search():
         return jsonify({'error': f'Error interno del servidor: {str(e)}'}), 500
 
 @app.route('/my_analyses')
+@read_only
 def my_analyses():
     """Ver análisis previos del usuario organizados por tipo y proveedor de IA"""
     if 'user_id' not in session:
@@ -5505,31 +5515,15 @@ def scrape_indeed(query, location):
     return jobs
 
 def save_jobs_to_db(jobs):
-    """Guardar empleos en la base de datos"""
+    """Guardar empleos en la base de datos (un INSERT por lote, sin duplicados)"""
     connection = get_db_connection()
     if connection:
-        cursor = connection.cursor()
-        
-        for job in jobs:
-            try:
-                # Verificar si el empleo ya existe
-                cursor.execute(
-                    "SELECT id FROM jobs WHERE title = %s AND company = %s AND url = %s",
-                    (job['title'], job['company'], job['url'])
-                )
-                
-                if not cursor.fetchone():
-                    cursor.execute(
-                        "INSERT INTO jobs (title, company, location, description, url, source) VALUES (%s, %s, %s, %s, %s, %s)",
-                        (job['title'], job['company'], job['location'], job['description'], job['url'], job['source'])
-                    )
-            except Exception as e:
-                print(f"Error guardando empleo: {e}")
-                continue
-        
-        connection.commit()
-        cursor.close()
+        job_ids = save_jobs(connection, jobs)
+        if job_ids:
+            invalidate_jobs_total()
         connection.close()
+        return job_ids
+    return []
 
 @app.route('/profile')
 def profile():
@@ -5550,19 +5544,10 @@ def profile():
         )
         user = cursor.fetchone()
         
-        # Obtener estadísticas de análisis
-        cursor.execute(
-            "SELECT COUNT(*) FROM resumes WHERE user_id = %s",
-            (session['user_id'],)
-        )
-        analyses_count = cursor.fetchone()['count']
-        
-        cursor.execute(
-            "SELECT created_at FROM resumes WHERE user_id = %s ORDER BY created_at DESC LIMIT 1",
-            (session['user_id'],)
-        )
-        result = cursor.fetchone()
-        last_analysis = result['created_at'] if result else None
+        # Obtener estadísticas de análisis (mismo resumen cacheado del dashboard)
+        summary = get_user_summary(connection, session['user_id'])
+        analyses_count = summary['cvs_analyzed']
+        last_analysis = summary['last_analysis']
         
         cursor.close()
         connection.close()
@@ -6022,31 +6007,15 @@ def scrape_indeed(query, location):
     return jobs
 
 def save_jobs_to_db(jobs):
-    """Guardar empleos en la base de datos"""
+    """Guardar empleos en la base de datos (un INSERT por lote, sin duplicados)"""
     connection = get_db_connection()
     if connection:
-        cursor = connection.cursor()
-        
-        for job in jobs:
-            try:
-                # Verificar si el empleo ya existe
-                cursor.execute(
-                    "SELECT id FROM jobs WHERE title = %s AND company = %s AND url = %s",
-                    (job['title'], job['company'], job['url'])
-                )
-                
-                if not cursor.fetchone():
-                    cursor.execute(
-                        "INSERT INTO jobs (title, company, location, description, url, source) VALUES (%s, %s, %s, %s, %s, %s)",
-                        (job['title'], job['company'], job['location'], job['description'], job['url'], job['source'])
-                    )
-            except Exception as e:
-                print(f"Error guardando empleo: {e}")
-                continue
-        
-        connection.commit()
-        cursor.close()
+        job_ids = save_jobs(connection, jobs)
+        if job_ids:
+            invalidate_jobs_total()
         connection.close()
+        return job_ids
+    return []
 
 @app.route('/delete_analysis/<int:analysis_id>', methods=['DELETE'])
 def delete_analysis(analysis_id):
@@ -6107,6 +6076,7 @@ def delete_account():
         cursor.execute("DELETE FROM users WHERE id = %s", (user_id,))
         
         connection.commit()
+        invalidate_user_identity(user_id)
         cursor.close()
         connection.close()
         
@@ -6182,6 +6152,7 @@ def change_password():
             return jsonify({'success': False, 'message': 'No se pudo actualizar la contraseña. Usuario no encontrado.'}), 400
         
         connection.commit()
+        invalidate_user_identity(session['user_id'])
         cursor.close()
         connection.close()
         
@@ -6230,65 +6201,18 @@ def admin_console():
 
 @app.route('/admin/stats')
 @admin_required
+@read_only
 def admin_stats():
     """Estadísticas de usuarios"""
     username = session.get('username', 'unknown')
     add_console_log('INFO', f'Admin accedió a estadísticas: {username}', 'ADMIN')
     
-    connection = get_db_connection()
-    if not connection:
-        flash('Error de conexión a la base de datos', 'error')
-        return redirect(url_for('admin_dashboard'))
-    
     try:
-        cursor = connection.cursor()
-        
-        # Usuarios en tiempo real (últimos 5 minutos)
-        cursor.execute("""
-            SELECT COUNT(*) as active_users 
-            FROM users 
-            WHERE last_login >= NOW() - INTERVAL '5 minutes'
-        """)
-        active_users = cursor.fetchone()['active_users']
-        
-        # Usuarios conectados hoy
-        cursor.execute("""
-            SELECT COUNT(*) as daily_users 
-            FROM users 
-            WHERE DATE(last_login) = CURRENT_DATE
-        """)
-        daily_users = cursor.fetchone()['daily_users']
-        
-        # Usuarios conectados esta semana
-        cursor.execute("""
-            SELECT COUNT(*) as weekly_users 
-            FROM users 
-            WHERE last_login >= DATE_TRUNC('week', NOW())
-        """)
-        weekly_users = cursor.fetchone()['weekly_users']
-        
-        # Usuarios conectados este mes
-        cursor.execute("""
-            SELECT COUNT(*) as monthly_users 
-            FROM users 
-            WHERE last_login >= DATE_TRUNC('month', NOW())
-        """)
-        monthly_users = cursor.fetchone()['monthly_users']
-        
-        # Total de usuarios registrados
-        cursor.execute("SELECT COUNT(*) as total_users FROM users")
-        total_users = cursor.fetchone()['total_users']
-        
-        cursor.close()
-        connection.close()
-        
-        stats = {
-            'active_users': active_users,
-            'daily_users': daily_users,
-            'weekly_users': weekly_users,
-            'monthly_users': monthly_users,
-            'total_users': total_users
-        }
+        # Una sola consulta (o el rollup de actividad), cacheada ADMIN_STATS_CACHE_TTL segundos
+        stats = get_user_stats()
+        if stats is None:
+            flash('Error de conexión a la base de datos', 'error')
+            return redirect(url_for('admin_dashboard'))
         
         return render_template('admin/stats.html', stats=stats)
         
@@ -6313,33 +6237,17 @@ def admin_search_users():
         flash('Por favor, introduce un término de búsqueda', 'warning')
         return redirect(url_for('admin_database'))
     
-    connection = get_db_connection()
-    if not connection:
-        flash('Error de conexión a la base de datos', 'error')
-        return redirect(url_for('admin_database'))
-    
     try:
-        cursor = connection.cursor()
-        
-        # Buscar en los datos de CV de usuarios
-        cursor.execute("""
-            SELECT u.id, u.username, u.email, u.created_at, u.last_login,
-                   cv.personal_info, cv.professional_summary, cv.education, 
-                   cv.experience, cv.skills
-            FROM users u
-            LEFT JOIN user_cv_data cv ON u.id = cv.user_id
-            WHERE cv.personal_info ILIKE %s 
-               OR cv.professional_summary ILIKE %s
-               OR cv.education ILIKE %s
-               OR cv.experience ILIKE %s
-               OR cv.skills ILIKE %s
-        """, (f'%{search_term}%', f'%{search_term}%', f'%{search_term}%', f'%{search_term}%', f'%{search_term}%'))
+        # Búsqueda de texto completo por relevancia, paginada por keyset
+        results = search_cvs(search_term, after=decode_cursor(request.form.get('after')))
+        if results is None:
+            flash('Error de conexión a la base de datos', 'error')
+            return redirect(url_for('admin_database'))
         
-        results = cursor.fetchall()
-        cursor.close()
-        connection.close()
+        next_cursor = encode_cursor(results[-1]) if len(results) == SEARCH_PAGE_SIZE else None
         
-        return render_template('admin/search_results.html', results=results, search_term=search_term)
+        return render_template('admin/search_results.html', results=results, search_term=search_term,
+                               next_cursor=next_cursor, page_start=bool(request.form.get('after')))
         
     except Exception as e:
         print(f"Error en búsqueda de usuarios: {e}")
@@ -6349,68 +6257,46 @@ def admin_search_users():
 @app.route('/admin/export_users', methods=['POST'])
 @admin_required
 def admin_export_users():
-    """Exportar usuarios a Excel"""
-    search_term = request.form.get('search_query', '')
-    
-    connection = get_db_connection()
-    if not connection:
-        flash('Error de conexión a la base de datos', 'error')
-        return redirect(url_for('admin_database'))
+    """Exportar usuarios a Excel (o CSV con format=csv)"""
+    search_term = request.form.get('search_query', '').strip()
+    export_format = 'csv' if request.form.get('format') == 'csv' else 'xlsx'
     
     try:
-        import pandas as pd
-        from io import BytesIO
-        
-        cursor = connection.cursor()
-        
         if search_term:
-            cursor.execute("""
-                SELECT u.id, u.username, u.email, u.created_at, u.last_login,
-                       cv.personal_info, cv.professional_summary, cv.education, 
-                       cv.experience, cv.skills
-                FROM users u
-                LEFT JOIN user_cv_data cv ON u.id = cv.user_id
-                WHERE cv.personal_info ILIKE %s 
-                   OR cv.professional_summary ILIKE %s
-                   OR cv.education ILIKE %s
-                   OR cv.experience ILIKE %s
-                   OR cv.skills ILIKE %s
-            """, (f'%{search_term}%', f'%{search_term}%', f'%{search_term}%', f'%{search_term}%', f'%{search_term}%'))
+            connection = get_db_connection()
+            if not connection:
+                flash('Error de conexión a la base de datos', 'error')
+                return redirect(url_for('admin_database'))
+            cursor = connection.cursor()
+            search_sql, params = build_search_sql(search_term, has_trigram_index(cursor))
+            cursor.close()
+            connection.close()
+            query = f"SELECT * FROM ({search_sql}) matches ORDER BY matches.rank DESC, matches.id DESC"
         else:
-            cursor.execute("""
-                SELECT u.id, u.username, u.email, u.created_at, u.last_login,
+            query = """
+                SELECT u.id AS user_id, u.username, u.email, u.created_at, u.last_login,
                        cv.personal_info, cv.professional_summary, cv.education, 
                        cv.experience, cv.skills
                 FROM users u
-                LEFT JOIN user_cv_data cv ON u.id = cv.user_id
-            """)
-        
-        results = cursor.fetchall()
-        cursor.close()
-        connection.close()
-        
-        # Crear DataFrame
-        df = pd.DataFrame(results, columns=['ID', 'Usuario', 'Email', 'Fecha Registro', 'Último Login', 
-                                          'Info Personal', 'Resumen Profesional', 'Educación', 'Experiencia', 'Habilidades'])
+                LEFT JOIN user_cvs cv ON u.id = cv.user_id AND cv.is_active = TRUE
+                ORDER BY u.id
+            """
+            params = None
         
-        # Crear archivo Excel en memoria
-        output = BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df.to_excel(writer, sheet_name='Usuarios', index=False)
+        columns = [('ID', 'user_id'), ('Usuario', 'username'), ('Email', 'email'),
+                   ('Fecha Registro', 'created_at'), ('Último Login', 'last_login'),
+                   ('Info Personal', 'personal_info'), ('Resumen Profesional', 'professional_summary'),
+                   ('Educación', 'education'), ('Experiencia', 'experience'), ('Habilidades', 'skills')]
         
-        output.seek(0)
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        safe_term = secure_filename(search_term) or 'busqueda'
+        filename = f"usuarios_{safe_term}_{timestamp}.{export_format}" if search_term else f"todos_usuarios_{timestamp}.{export_format}"
         
-        filename = f"usuarios_{search_term}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx" if search_term else f"todos_usuarios_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        
-        return send_file(
-            output,
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            as_attachment=True,
-            download_name=filename
-        )
+        # Lectura por bloques con cursor server-side: la memoria no depende de la cantidad de usuarios
+        return stream_query_export(query, params, columns, filename, export_format, sheet_name='Usuarios')
         
     except ImportError:
-        flash('pandas no está instalado. No se puede exportar a Excel.', 'error')
+        flash('openpyxl no está instalado. No se puede exportar a Excel.', 'error')
         return redirect(url_for('admin_database'))
     except Exception as e:
         print(f"Error exportando usuarios: {e}")
@@ -6419,10 +6305,13 @@ def admin_export_users():
 
 @app.route('/admin/users')
 @admin_required
+@read_only
 def admin_users():
     """Gestión de usuarios"""
     search = request.args.get('search', '')
-    page = int(request.args.get('page', 1))
+    after = request.args.get('after')
+    before = request.args.get('before')
+    exact_count = request.args.get('count') == 'exact'
     per_page = 20
     
     connection = get_db_connection()
@@ -6431,44 +6320,31 @@ def admin_users():
         return redirect(url_for('admin_dashboard'))
     
     try:
-        cursor = connection.cursor()
-        
         # Construir consulta con búsqueda
         base_query = """
             SELECT id, username, email, role, is_banned, ban_until, ban_reason, 
                    last_login, created_at, email_verified
             FROM users
         """
+        params = []
         
         if search:
             base_query += " WHERE username ILIKE %s OR email ILIKE %s"
             search_param = f"%{search}%"
-            cursor.execute(base_query + " ORDER BY created_at DESC LIMIT %s OFFSET %s", 
-                         (search_param, search_param, per_page, (page-1)*per_page))
-        else:
-            cursor.execute(base_query + " ORDER BY created_at DESC LIMIT %s OFFSET %s", 
-                         (per_page, (page-1)*per_page))
-        
-        users = cursor.fetchall()
-        
-        # Contar total para paginación
-        if search:
-            cursor.execute("SELECT COUNT(*) FROM users WHERE username ILIKE %s OR email ILIKE %s", 
-                         (search_param, search_param))
-        else:
-            cursor.execute("SELECT COUNT(*) FROM users")
+            params = [search_param, search_param]
         
-        total_users = cursor.fetchone()['count']
-        total_pages = (total_users + per_page - 1) // per_page
+        # Página por keyset (created_at, id) y total estimado en lugar de COUNT(*) por página
+        page = fetch_keyset_page(connection, base_query, params, after, before, per_page)
+        page.total, page.total_is_estimate = count_listing(
+            connection, base_query, params, table=None if search else 'users', exact=exact_count
+        )
         
-        cursor.close()
         connection.close()
         
         return render_template('admin/users.html', 
-                             users=users, 
+                             users=page.items, 
                              search=search, 
-                             page=page, 
-                             total_pages=total_pages)
+                             page=page)
         
     except Exception as e:
         print(f"Error obteniendo usuarios: {e}")
@@ -6511,6 +6387,7 @@ def admin_ban_user():
             """, (ban_until, ban_reason, user_id))
         
         connection.commit()
+        invalidate_user_identity(user_id)
         cursor.close()
         connection.close()
         
@@ -6544,6 +6421,7 @@ def admin_unban_user():
         """, (user_id,))
         
         connection.commit()
+        invalidate_user_identity(user_id)
         cursor.close()
         connection.close()
         
@@ -6578,6 +6456,7 @@ def admin_delete_user():
         cursor.execute("DELETE FROM users WHERE id = %s", (user_id,))
         
         connection.commit()
+        invalidate_user_identity(user_id)
         cursor.close()
         connection.close()
         
@@ -6681,6 +6560,8 @@ def admin_update_subscription():
         connection.commit()
         cursor.close()
         connection.close()
+        invalidate_entitlements(user_id)
+        invalidate_user_identity(user_id)
         
         return jsonify({
             'success': True, 
@@ -6833,6 +6714,11 @@ def admin_console_logs():
         except Exception as db_error:
             add_console_log('ERROR', f'Error de base de datos: {str(db_error)}', 'DATABASE')
         
+        # Saturación del pool de conexiones de este worker
+        pool_stats = get_pool_stats()
+        if pool_stats.get('saturation', 0) >= 80:
+            add_console_log('WARNING', f'Pool de conexiones saturado: {pool_stats["in_use"]}/{pool_stats.get("max_size")} en uso', 'DATABASE')
+        
         # Logs de advertencias del sistema
         try:
             if 'memory' in locals() and memory.percent > 80:
@@ -6861,6 +6747,26 @@ def admin_console_logs():
              'logs': []
          })
 
+@app.route('/admin/db_pool_stats')
+@admin_required
+def admin_db_pool_stats():
+    """API con métricas del pool de conexiones y consultas por request del worker"""
+    return jsonify({
+        'success': True,
+        'pool': get_pool_stats(),
+        'requests': get_request_db_stats(),
+        'entitlements': get_entitlement_cache_stats(),
+        'site_content': get_site_content_stats(),
+        'blog_feed': get_blog_feed_cache_stats(),
+        'dashboard_summary': get_dashboard_summary_stats(),
+        'user_identity': get_user_identity_cache_stats(),
+        'prepared_statements': get_prepared_statement_stats(),
+        'replica': get_replica_stats(),
+        'analysis_cache': get_analysis_cache_stats(),
+        'job_scoring': get_job_scoring_stats(),
+        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    })
+
 @app.route('/admin/check_s3')
 def check_s3_connection():
     """Check S3 connection and create bucket if needed"""
@@ -6996,6 +6902,7 @@ def admin_update_content():
         connection.commit()
         cursor.close()
         connection.close()
+        bump_content_version()
         
         add_console_log('INFO', f'Admin {username} actualizó contenido: {section}.{content_key}', 'CONTENT')
         return jsonify({'success': True, 'message': 'Contenido actualizado correctamente'})
@@ -7211,6 +7118,7 @@ def update_content_inline():
         connection.commit()
         cursor.close()
         connection.close()
+        bump_content_version()
         
         add_console_log('INFO', f'Cuadro actualizado por edición directa - {username}: {section}', 'ADMIN')
         
@@ -7254,6 +7162,7 @@ def admin_add_tip():
         connection.commit()
         cursor.close()
         connection.close()
+        bump_content_version()
         
         add_console_log('INFO', f'Admin {username} agregó nuevo consejo: {title}', 'CONTENT')
         return jsonify({'success': True, 'message': 'Consejo agregado correctamente'})
@@ -7296,6 +7205,7 @@ def admin_update_tip():
         connection.commit()
         cursor.close()
         connection.close()
+        bump_content_version()
         
         add_console_log('INFO', f'Admin {username} actualizó consejo ID {tip_id}', 'CONTENT')
         return jsonify({'success': True, 'message': 'Consejo actualizado correctamente'})
@@ -7350,6 +7260,7 @@ def admin_update_daily_tip():
         connection.commit()
         cursor.close()
         connection.close()
+        bump_content_version()
         
         add_console_log('INFO', f'Admin {username} actualizó consejo del día ID {tip_id}', 'CONTENT')
         return jsonify({'success': True, 'message': 'Consejo actualizado correctamente'})
@@ -7413,6 +7324,7 @@ def admin_update_tip_inline():
         connection.commit()
         cursor.close()
         connection.close()
+        bump_content_version()
         
         add_console_log('INFO', f'Admin {username} actualizó consejo ID {real_tip_id} campo {field}', 'CONTENT')
         return jsonify({'success': True, 'message': 'Consejo actualizado correctamente'})
@@ -7451,6 +7363,7 @@ def admin_delete_tip():
         connection.commit()
         cursor.close()
         connection.close()
+        bump_content_version()
         
         add_console_log('INFO', f'Admin {username} eliminó consejo ID {tip_id}', 'CONTENT')
         return jsonify({'success': True, 'message': 'Consejo eliminado correctamente'})
@@ -7462,6 +7375,7 @@ def admin_delete_tip():
 # ==================== RUTAS DEL BLOG DE TIPS Y SUGERENCIAS ====================
 
 @app.route('/tips-sugerencias')
+@read_only
 def blog_tips():
     """Mostrar blog de tips y sugerencias para usuarios"""
     if 'user_id' not in session:
@@ -7473,47 +7387,13 @@ def blog_tips():
         return redirect(url_for('dashboard'))
     
     try:
-        cursor = connection.cursor(cursor_factory=RealDictCursor)
-        
-        # Obtener posts publicados con información del autor y conteo de reacciones
-        cursor.execute("""
-            SELECT bp.*, u.username as author_name,
-                   COUNT(br.id) as total_reactions
-            FROM blog_posts bp
-            LEFT JOIN users u ON bp.author_id = u.id
-            LEFT JOIN blog_reactions br ON bp.id = br.post_id
-            WHERE bp.is_published = TRUE
-            GROUP BY bp.id, u.username
-            ORDER BY bp.created_at DESC
-        """)
-        posts = cursor.fetchall()
-        
-        # Obtener reacciones del usuario actual para cada post
-        user_reactions = {}
-        if posts:
-            post_ids = [post['id'] for post in posts]
-            cursor.execute("""
-                SELECT post_id, emoji
-                FROM blog_reactions
-                WHERE user_id = %s AND post_id = ANY(%s)
-            """, (session['user_id'], post_ids))
-            user_reactions = {row['post_id']: row['emoji'] for row in cursor.fetchall()}
-        
-        # Obtener conteo de reacciones por emoji para cada post
-        reactions_count = {}
-        if posts:
-            cursor.execute("""
-                SELECT post_id, emoji, COUNT(*) as count
-                FROM blog_reactions
-                WHERE post_id = ANY(%s)
-                GROUP BY post_id, emoji
-            """, (post_ids,))
-            for row in cursor.fetchall():
-                if row['post_id'] not in reactions_count:
-                    reactions_count[row['post_id']] = {}
-                reactions_count[row['post_id']][row['emoji']] = row['count']
+        # Posts publicados y conteos de reacciones desde el cache (ver blog_feed.py);
+        # solo las reacciones del usuario se consultan en cada vista
+        feed = get_blog_feed(connection)
+        posts = feed['posts']
+        reactions_count = feed['reactions_count']
+        user_reactions = get_user_reactions(connection, session['user_id']) if posts else {}
         
-        cursor.close()
         connection.close()
         
         return render_template('blog_tips.html', 
@@ -7544,47 +7424,9 @@ def blog_react():
         return jsonify({'success': False, 'message': 'Error de conexión'})
     
     try:
-        cursor = connection.cursor()
-        
-        # Verificar si ya existe la reacción
-        cursor.execute("""
-            SELECT id FROM blog_reactions 
-            WHERE post_id = %s AND user_id = %s AND emoji = %s
-        """, (post_id, session['user_id'], emoji))
-        
-        existing = cursor.fetchone()
-        
-        if existing:
-            # Quitar reacción
-            cursor.execute("""
-                DELETE FROM blog_reactions 
-                WHERE post_id = %s AND user_id = %s AND emoji = %s
-            """, (post_id, session['user_id'], emoji))
-            action = 'removed'
-        else:
-            # Agregar reacción (primero quitar cualquier otra reacción del usuario en este post)
-            cursor.execute("""
-                DELETE FROM blog_reactions 
-                WHERE post_id = %s AND user_id = %s
-            """, (post_id, session['user_id']))
-            
-            cursor.execute("""
-                INSERT INTO blog_reactions (post_id, user_id, emoji)
-                VALUES (%s, %s, %s)
-            """, (post_id, session['user_id'], emoji))
-            action = 'added'
-        
-        # Obtener nuevo conteo de reacciones
-        cursor.execute("""
-            SELECT emoji, COUNT(*) as count
-            FROM blog_reactions
-            WHERE post_id = %s
-            GROUP BY emoji
-        """, (post_id,))
-        reactions = {row[0]: row[1] for row in cursor.fetchall()}
+        action, reactions = toggle_reaction(connection, post_id, session['user_id'], emoji)
         
         connection.commit()
-        cursor.close()
         connection.close()
         
         return jsonify({
@@ -7595,6 +7437,7 @@ def blog_react():
         
     except Exception as e:
         app.logger.error(f"Error procesando reacción: {e}")
+        connection.rollback()
         return jsonify({'success': False, 'message': 'Error procesando reacción'})
 
 # ==================== RUTAS DE ADMINISTRACIÓN DEL BLOG ====================
@@ -7603,27 +7446,38 @@ def blog_react():
 @admin_required
 def admin_blog():
     """Panel de administración del blog"""
+    after = request.args.get('after')
+    before = request.args.get('before')
+    
     connection = get_db_connection()
     if not connection:
         flash('Error de conexión a la base de datos', 'error')
         return redirect(url_for('admin_dashboard'))
     
     try:
-        cursor = connection.cursor(cursor_factory=RealDictCursor)
-        
-        # Obtener todos los posts con información del autor
-        cursor.execute("""
+        # Página de posts con información del autor
+        posts_query = """
             SELECT bp.*, u.username as author_name
             FROM blog_posts bp
             LEFT JOIN users u ON bp.author_id = u.id
-            ORDER BY bp.created_at DESC
-        """)
-        posts = cursor.fetchall()
+        """
+        page = fetch_keyset_page(connection, posts_query, None, after, before)
         
+        # Totales de las tarjetas en una sola pasada (no dependen de la página)
+        cursor = connection.cursor(cursor_factory=RealDictCursor)
+        cursor.execute("""
+            SELECT COUNT(*) AS total,
+                   COUNT(*) FILTER (WHERE is_published) AS published,
+                   COUNT(*) FILTER (WHERE is_published IS NOT TRUE) AS drafts,
+                   COUNT(*) FILTER (WHERE image_url IS NOT NULL AND image_url <> '') AS with_image
+            FROM blog_posts
+        """)
+        blog_stats = cursor.fetchone()
         cursor.close()
+        
         connection.close()
         
-        return render_template('admin/blog.html', posts=posts)
+        return render_template('admin/blog.html', posts=page.items, page=page, blog_stats=blog_stats)
         
     except Exception as e:
         app.logger.error(f"Error cargando admin blog: {e}")
@@ -7692,6 +7546,7 @@ def admin_blog_create():
             """, (title, content, final_image_url, session['user_id'], is_published))
             
             connection.commit()
+            invalidate_blog_feed()
             cursor.close()
             connection.close()
             
@@ -7735,6 +7590,7 @@ def admin_blog_edit(post_id):
             """, (title, content, image_url, is_published, post_id))
             
             connection.commit()
+            invalidate_blog_feed()
             cursor.close()
             connection.close()
             
@@ -7785,7 +7641,7 @@ def admin_blog_delete(post_id):
         if image_url and image_url.startswith('/image/'):
             try:
                 image_id = int(image_url.split('/')[-1])
-                cursor.execute("DELETE FROM uploaded_images WHERE id = %s", (image_id,))
+                delete_image(connection, image_id)
             except (ValueError, IndexError):
                 # Si no se puede extraer el ID, continuar sin eliminar la imagen
                 pass
@@ -7794,6 +7650,7 @@ def admin_blog_delete(post_id):
         cursor.execute("DELETE FROM blog_posts WHERE id = %s", (post_id,))
         
         connection.commit()
+        invalidate_blog_feed()
         cursor.close()
         connection.close()
         
@@ -7871,6 +7728,8 @@ def generate_cover_letter():
         if not cv_text:
             return jsonify({'success': False, 'message': 'No se pudo extraer texto del CV'})
         
+        # No retener la conexión mientras se espera a la IA
+        end_request_unit()
         # Generar carta de presentación con IA
         print(f"DEBUG: Generating cover letter for {job_title} at {company_name}")  # Debug
         cover_letter = generate_cover_letter_with_ai(
@@ -8180,8 +8039,19 @@ def compare_cv_job():
                     pass
                 
                 if cv_text:
+                    # Reservar un cupo de análisis mientras dura la llamada a la IA
+                    reservation = reserve_usage(user_id, 'cv_analysis')
+                    if reservation is None:
+                        _, message = check_user_limits(user_id, 'cv_analysis')
+                        flash(f'Restricción de plan: {message}', 'error')
+                        return redirect(url_for('dashboard'))
+                    
+                    # No retener la conexión mientras se espera a la IA
+                    end_request_unit()
+                    
                     # Realizar comparación con IA
                     comparison_result = compare_cv_with_job_ai(cv_text, job_description)
+                    comparison_failed = not comparison_result
                     
                     # Asegurar que siempre tengamos un resultado válido
                     if not comparison_result:
@@ -8217,6 +8087,7 @@ def compare_cv_job():
                         print(f"INFO: Resultado validado - Match: {comparison_result['match_percentage']}%")
                         
                     except Exception as e:
+                        comparison_failed = True
                         print(f"ERROR validando resultado: {e}")
                         add_console_log('ERROR', f'Error validando resultado para usuario {username}: {str(e)}', 'CV_COMPARE')
                         comparison_result = {
@@ -8227,8 +8098,15 @@ def compare_cv_job():
                             'summary': 'Ocurrió un error durante la validación del análisis. Por favor, intenta nuevamente.'
                         }
                     
-                    # Incrementar contador de uso
-                    increment_usage(session.get('user_id'), 'cv_analysis')
+                    # Solo una comparación válida consume el cupo reservado
+                    if comparison_failed:
+                        reservation.release()
+                    else:
+                        try:
+                            reservation.commit()
+                        except Exception as e:
+                            # La comparación ya está hecha: se muestra igual y la reserva vence sola
+                            add_console_log('WARNING', f'No se pudo consumir el cupo de la comparación: {str(e)}', 'CV_COMPARE')
                     
                     # Guardar resultado en base de datos
                     try:
@@ -8412,4 +8290,6 @@ def internal_server_error(error):
 
 if __name__ == '__main__':
     init_database()
+    from migrations import run_migrations
+    run_migrations()
     app.run(debug=True)
\ No newline at end of file
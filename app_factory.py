@@ -237,6 +237,10 @@ def register_metrics_endpoints(app: Flask):
             performance_metrics = app.app_monitor.get_performance_metrics()
             metrics_data['performance'] = performance_metrics
         
+        # Agregar métricas del pool de conexiones
+        from db_pool import get_pool_stats
+        metrics_data['db_pool'] = get_pool_stats()
+        
         # Agregar estadísticas de cache
         if hasattr(app, 'cache_service'):
             cache_stats = app.cache_service.get_cache_stats()
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""Benchmark de /tips-sugerencias: feed y reacciones
+
+Compara las consultas anteriores de la página (GROUP BY sobre ``blog_reactions``
+en cada vista) y del click (SELECT, DELETE, INSERT y recuento del post) con
+load_blog_feed(), el feed cacheado y toggle_reaction(). Los datos se insertan en
+una transacción que se revierte al terminar. Requiere la migración 0012.
+
+Uso:
+    python benchmark_blog_feed.py [--posts 10000] [--reactions 1000000] [--repeat 5]
+"""
+
+import sys
+import time
+import argparse
+import statistics
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+from db_pool import PoolConfig
+from blog_feed import (load_blog_feed, get_blog_feed, get_user_reactions, toggle_reaction,
+                       rebuild_reaction_counts, _blog_feed_cache)
+
+EMOJIS = ['👍', '❤️', '😊', '🎉', '💡']
+
+LEGACY_POSTS_SQL = """
+    SELECT bp.*, u.username as author_name,
+           COUNT(br.id) as total_reactions
+    FROM blog_posts bp
+    LEFT JOIN users u ON bp.author_id = u.id
+    LEFT JOIN blog_reactions br ON bp.id = br.post_id
+    WHERE bp.is_published = TRUE
+    GROUP BY bp.id, u.username
+    ORDER BY bp.created_at DESC
+"""
+
+
+def seed_blog(cursor, post_count, reaction_count):
+    # Cada post recibe reacciones de usuarios distintos
+    per_post = max(reaction_count // post_count, 1)
+    cursor.execute("""
+        INSERT INTO users (username, email, password_hash)
+        SELECT 'bench_blog_' || g, 'bench_blog_' || g || '@example.com', 'x'
+        FROM generate_series(1, %s) g
+        RETURNING id
+    """, (per_post,))
+    user_ids = [row['id'] for row in cursor.fetchall()]
+    cursor.execute("""
+        INSERT INTO blog_posts (title, content, author_id, is_published, created_at)
+        SELECT 'Tip ' || g, repeat('Consejo para tu CV. ', 40), %s, g %% 20 <> 0,
+               NOW() - g * INTERVAL '1 hour'
+        FROM generate_series(1, %s) g
+        RETURNING id
+    """, (user_ids[0], post_count))
+    post_ids = [row['id'] for row in cursor.fetchall()]
+
+    # Carga masiva sin el trigger por fila; los conteos se recalculan al final
+    cursor.execute("ALTER TABLE blog_reactions DISABLE TRIGGER blog_reactions_counts")
+    cursor.execute("""
+        INSERT INTO blog_reactions (post_id, user_id, emoji)
+        SELECT p, (%(user_ids)s::int[])[1 + g / %(posts)s],
+               (%(emojis)s::text[])[1 + (g * 7 + g / %(posts)s) %% 5]
+        FROM generate_series(0, %(reactions)s - 1) g,
+             LATERAL (SELECT (%(post_ids)s::int[])[1 + g %% %(posts)s] AS p) post
+    """, {'user_ids': user_ids, 'post_ids': post_ids, 'emojis': EMOJIS,
+          'posts': post_count, 'reactions': min(reaction_count, per_post * post_count)})
+    cursor.execute("ALTER TABLE blog_reactions ENABLE TRIGGER blog_reactions_counts")
+    rebuild_reaction_counts(cursor.connection)
+    cursor.execute("ANALYZE blog_posts")
+    cursor.execute("ANALYZE blog_reactions")
+    cursor.execute("ANALYZE blog_reaction_counts")
+    return user_ids, post_ids
+
+
+def legacy_feed(cursor, user_id):
+    """Consultas anteriores de la página"""
+    cursor.execute(LEGACY_POSTS_SQL)
+    posts = cursor.fetchall()
+    post_ids = [post['id'] for post in posts]
+    cursor.execute("""
+        SELECT post_id, emoji
+        FROM blog_reactions
+        WHERE user_id = %s AND post_id = ANY(%s)
+    """, (user_id, post_ids))
+    cursor.fetchall()
+    cursor.execute("""
+        SELECT post_id, emoji, COUNT(*) as count
+        FROM blog_reactions
+        WHERE post_id = ANY(%s)
+        GROUP BY post_id, emoji
+    """, (post_ids,))
+    cursor.fetchall()
+    return posts
+
+
+def legacy_react(cursor, post_id, user_id, emoji):
+    """Secuencia anterior del click"""
+    cursor.execute("""
+        SELECT id FROM blog_reactions
+        WHERE post_id = %s AND user_id = %s AND emoji = %s
+    """, (post_id, user_id, emoji))
+    if cursor.fetchone():
+        cursor.execute("""
+            DELETE FROM blog_reactions
+            WHERE post_id = %s AND user_id = %s AND emoji = %s
+        """, (post_id, user_id, emoji))
+    else:
+        cursor.execute("DELETE FROM blog_reactions WHERE post_id = %s AND user_id = %s", (post_id, user_id))
+        cursor.execute("INSERT INTO blog_reactions (post_id, user_id, emoji) VALUES (%s, %s, %s)",
+                       (post_id, user_id, emoji))
+    cursor.execute("""
+        SELECT emoji, COUNT(*) as count
+        FROM blog_reactions
+        WHERE post_id = %s
+        GROUP BY emoji
+    """, (post_id,))
+    return cursor.fetchall()
+
+
+def timed(function, repeat):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), max(samples), result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark del feed y las reacciones del blog')
+    parser.add_argument('--posts', type=int, default=10000)
+    parser.add_argument('--reactions', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    try:
+        connection = psycopg2.connect(cursor_factory=RealDictCursor, **PoolConfig().dsn)
+    except psycopg2.Error as e:
+        print(f"❌ No se pudo conectar a PostgreSQL: {e}")
+        return 1
+
+    try:
+        cursor = connection.cursor()
+        print(f"Insertando {args.posts:,} posts y {args.reactions:,} reacciones sintéticas...")
+        start = time.perf_counter()
+        user_ids, post_ids = seed_blog(cursor, args.posts, args.reactions)
+        print(f"  listo en {time.perf_counter() - start:.1f} s")
+        user_id, post_id = user_ids[-1], post_ids[0]
+
+        _blog_feed_cache.delete('published')
+        rows = [
+            ('página: consultas anteriores', timed(lambda: legacy_feed(cursor, user_id), args.repeat)),
+            ('página: contadores', timed(lambda: (load_blog_feed(connection),
+                                                  get_user_reactions(connection, user_id)), args.repeat)),
+            ('página: feed cacheado', timed(lambda: (get_blog_feed(connection),
+                                                     get_user_reactions(connection, user_id)), args.repeat)),
+        ]
+        # Cada repetición alterna entre agregar y quitar la reacción
+        clicks = iter(range(args.repeat * 2))
+        rows.append(('click: secuencia anterior',
+                     timed(lambda: legacy_react(cursor, post_id, user_id, EMOJIS[next(clicks) % 2]), args.repeat)))
+        rows.append(('click: toggle_reaction',
+                     timed(lambda: toggle_reaction(connection, post_id, user_id, EMOJIS[next(clicks) % 2]),
+                           args.repeat)))
+
+        print(f"\n{'operación':<32} {'mediana (ms)':>14} {'máx (ms)':>10}")
+        for label, (median_ms, max_ms, _) in rows:
+            print(f"{label:<32} {median_ms:>14.2f} {max_ms:>10.2f}")
+    finally:
+        _blog_feed_cache.delete('published')
+        connection.rollback()
+        connection.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""Benchmark de la compatibilidad básica por lotes (compatibility_matcher.py)
+
+Compara la versión anterior de ``calculate_basic_compatibility`` (un ``in``
+por término y empleo, sin acentos ni límites de palabra) con
+``CompatibilityMatcher.scores`` sobre dos conjuntos de empleos sintéticos:
+``denso`` (los del benchmark de job_ranking, con casi todos los términos del CV
+en cada descripción) y ``disperso`` (descripciones más largas con vocabulario
+amplio y pocos términos del CV). También informa cuántos puntajes coinciden:
+la versión nueva ignora acentos y exige límites de palabra, así que no son
+idénticos (``java`` ya no coincide dentro de ``javascript``). Una razón menor
+a 1x en cualquiera de los dos es una regresión frente a la versión anterior.
+
+Uso:
+    python benchmark_compatibility_matcher.py [--jobs 10000] [--repeat 5]
+"""
+
+import sys
+import time
+import random
+import string
+import argparse
+import statistics
+
+from compatibility_matcher import CompatibilityMatcher, _CATEGORIES, _category_values
+from benchmark_job_ranking import make_jobs
+
+CV_ANALYSIS = {
+    'keywords': ['Python', 'Django', 'PostgreSQL', 'Docker', 'AWS', 'APIs REST', 'SQL', 'Git',
+                 'Kubernetes', 'Java', 'React', 'TypeScript', 'ETL', 'Excel', 'Scrum'],
+    'experience_areas': ['Desarrollo web', 'Ingeniería de datos', 'Cloud'],
+    'strengths': ['Liderazgo', 'Comunicación', 'Gestión de proyectos', 'Análisis de datos',
+                  'Machine learning', 'Atención de clientes'],
+    'score': 75
+}
+
+
+def legacy_basic_compatibility(job, cv_analysis):
+    """``calculate_basic_compatibility`` antes del matcher (sin el try/except)"""
+    compatibility_score = 0
+    job_text = f"{job.get('title', '')} {job.get('description', '')}".lower()
+    strengths = cv_analysis.get('strengths', [])
+    strength_matches = 0
+    for strength in strengths:
+        if isinstance(strength, str) and strength.lower() in job_text:
+            strength_matches += 1
+            compatibility_score += 12
+    for keyword in cv_analysis.get('keywords', []):
+        if isinstance(keyword, str) and keyword.lower() in job_text:
+            compatibility_score += 8
+    experience_areas = cv_analysis.get('experience_areas', [])
+    area_match = False
+    for area in experience_areas:
+        if isinstance(area, str) and area.lower() in job_text:
+            area_match = True
+            compatibility_score += 20
+            break
+    compatibility_score += cv_analysis.get('score', 50) * 0.2
+    if strength_matches == 0:
+        compatibility_score *= 0.7
+    if not area_match and len(experience_areas) > 0:
+        compatibility_score *= 0.8
+    return max(15, min(int(compatibility_score), 85))
+
+
+def make_sparse_jobs(count, seed=7):
+    rng = random.Random(seed)
+    vocabulary = [''.join(rng.choices(string.ascii_lowercase + 'áéíóúñ', k=rng.randint(3, 11)))
+                  for _ in range(4000)]
+    terms = [term for category in _CATEGORIES for term in CV_ANALYSIS[category]] + ['JavaScript', 'PostgreSQL']
+    jobs = []
+    for i in range(count):
+        words = rng.choices(vocabulary, k=rng.randint(120, 350))
+        for term in rng.sample(terms, rng.randint(0, 5)):
+            words.insert(rng.randrange(len(words)), term + rng.choice(['', ',', '.']))
+        jobs.append({'title': ' '.join(rng.choices(vocabulary, k=3)), 'description': ' '.join(words)})
+    return jobs
+
+
+def timed(function, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        samples.append((time.perf_counter() - start) * 1000)
+    return result, statistics.median(samples)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark de la compatibilidad básica por lotes')
+    parser.add_argument('--jobs', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    terms = sum(len(CV_ANALYSIS[category]) for category in _CATEGORIES)
+    print(f"{args.jobs:,} empleos, {terms} términos del CV, mediana de {args.repeat} repeticiones\n")
+    matcher_values = [_category_values(CV_ANALYSIS, category) for category in _CATEGORIES]
+    matcher, compile_ms = timed(lambda: CompatibilityMatcher(*matcher_values, CV_ANALYSIS['score']), args.repeat)
+    print(f"Preparar el matcher: {compile_ms:.2f} ms\n")
+
+    print(f"{'empleos':<10} {'anterior (ms)':>14} {'matcher (ms)':>13} {'µs/empleo':>10} {'razón':>6} {'iguales':>8}")
+    for name, jobs in (('denso', make_jobs(args.jobs)), ('disperso', make_sparse_jobs(args.jobs))):
+        legacy, legacy_ms = timed(lambda: [legacy_basic_compatibility(job, CV_ANALYSIS) for job in jobs],
+                                  args.repeat)
+        batch, batch_ms = timed(lambda: matcher.scores(jobs), args.repeat)
+        same = sum(old == new for old, new in zip(legacy, batch)) / len(jobs)
+        print(f"{name:<10} {legacy_ms:>14.1f} {batch_ms:>13.1f} {batch_ms * 1000 / len(jobs):>10.2f} "
+              f"{legacy_ms / batch_ms:>5.2f}x {same:>8.1%}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""Benchmark de la búsqueda de CVs del panel de administración
+
+Compara la consulta anterior (cinco ``ILIKE '%término%'`` unidos con OR) con
+search_cvs() sobre CVs sintéticos. Los datos se insertan en una transacción que
+se revierte al terminar. Requiere las migraciones 0005 y 0006.
+
+Uso:
+    python benchmark_cv_search.py [--cvs 100000] [--repeat 5]
+"""
+
+import sys
+import time
+import argparse
+import statistics
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+from db_pool import PoolConfig
+from cv_search import search_cvs, has_trigram_index
+
+LEGACY_SEARCH_SQL = """
+    SELECT u.id, u.username, u.email, u.created_at, u.last_login,
+           cv.personal_info, cv.professional_summary, cv.education,
+           cv.experience, cv.skills
+    FROM users u
+    LEFT JOIN user_cvs cv ON u.id = cv.user_id
+    WHERE cv.personal_info ILIKE %s
+       OR cv.professional_summary ILIKE %s
+       OR cv.education ILIKE %s
+       OR cv.experience ILIKE %s
+       OR cv.skills ILIKE %s
+"""
+
+SEARCH_TERMS = ['desarrollador', 'python', 'enfermera', 'kubernetes', 'contador auditor']
+
+TITLES = ['Desarrollador Python', 'Diseñadora gráfica', 'Contador auditor', 'Enfermera clínica',
+          'Data engineer', 'Ingeniero comercial', 'Profesora de inglés', 'Analista de marketing']
+SKILLS = ['python sql django', 'photoshop figma illustrator', 'excel sap contabilidad',
+          'cuidados urgencias', 'spark airflow dbt', 'ventas negociación crm',
+          'docencia planificación', 'seo google ads analytics']
+
+
+def seed_cvs(cursor, cv_count):
+    users = max(cv_count // 4, 1)
+    cursor.execute("""
+        INSERT INTO users (username, email, password_hash)
+        SELECT 'bench_cv_' || g, 'bench_cv_' || g || '@example.com', 'x'
+        FROM generate_series(1, %s) g
+        RETURNING id
+    """, (users,))
+    user_ids = [row['id'] for row in cursor.fetchall()]
+    cursor.execute("""
+        INSERT INTO user_cvs (user_id, cv_name, personal_info, professional_summary, education, experience, skills)
+        SELECT u, 'CV ' || k,
+               '{"name": "Usuario ' || u || '", "title": "' || (%(titles)s::text[])[1 + (u + k) %% 8] || '"}',
+               (%(titles)s::text[])[1 + (u + k) %% 8] || ' con ' || (u %% 15) || ' años de experiencia en proyectos de '
+                   || (%(skills)s::text[])[1 + (u * k) %% 8],
+               '[{"degree": "Título profesional", "institution": "Universidad ' || (u %% 40) || '"}]',
+               '[{"position": "' || (%(titles)s::text[])[1 + (u + k) %% 8] || '", "company": "Empresa ' || (u %% 900)
+                   || '", "description": "Responsable de ' || (%(skills)s::text[])[1 + (u + k) %% 8] || '"}]',
+               (%(skills)s::text[])[1 + (u + k) %% 8] || CASE WHEN u %% 400 = 0 THEN ' kubernetes' ELSE '' END
+        FROM unnest(%(user_ids)s::int[]) u, generate_series(1, 4) k
+    """, {'titles': TITLES, 'skills': SKILLS, 'user_ids': user_ids})
+    cursor.execute("""
+        SELECT gin_clean_pending_list(i.indexrelid)
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        JOIN pg_am am ON am.oid = c.relam
+        WHERE am.amname = 'gin' AND i.indrelid = 'user_cvs'::regclass
+    """)
+    cursor.execute("ANALYZE users")
+    cursor.execute("ANALYZE user_cvs")
+
+
+def timed(function, repeat):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), max(samples), result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark de búsqueda de CVs')
+    parser.add_argument('--cvs', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    try:
+        connection = psycopg2.connect(cursor_factory=RealDictCursor, **PoolConfig().dsn)
+    except psycopg2.Error as e:
+        print(f"❌ No se pudo conectar a PostgreSQL: {e}")
+        return 1
+
+    try:
+        cursor = connection.cursor()
+        print(f"Insertando {args.cvs:,} CVs sintéticos...")
+        start = time.perf_counter()
+        seed_cvs(cursor, args.cvs)
+        print(f"  listo en {time.perf_counter() - start:.1f} s (pg_trgm: {'sí' if has_trigram_index(cursor) else 'no'})")
+
+        print(f"\n{'término':<20} {'ILIKE (ms)':>12} {'filas':>8} {'FTS (ms)':>10} {'página':>8} {'mejora':>8}")
+        for term in SEARCH_TERMS:
+            def legacy():
+                pattern = f'%{term}%'
+                cursor.execute(LEGACY_SEARCH_SQL, (pattern,) * 5)
+                return cursor.fetchall()
+
+            legacy_ms, _, legacy_rows = timed(legacy, args.repeat)
+            search_ms, _, page = timed(lambda: search_cvs(term, connection=connection), args.repeat)
+            print(f"{term:<20} {legacy_ms:>12.1f} {len(legacy_rows):>8} {search_ms:>10.1f} "
+                  f"{len(page or []):>8} {legacy_ms / search_ms if search_ms else 0:>7.1f}x")
+    finally:
+        connection.rollback()
+        connection.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""Benchmark del pre-ranking léxico de empleos (job_ranking.py)
+
+Genera empleos sintéticos en español e inglés y mide, para 1.000, 10.000 y
+100.000 empleos, el tiempo de tokenizar y construir el índice BM25 y el de
+puntuar la consulta de un análisis de CV y elegir los ``--top-k`` mejores.
+No usa la base de datos ni la IA.
+
+Uso:
+    python benchmark_job_ranking.py [--sizes 1000 10000 100000] [--top-k 30]
+"""
+
+import sys
+import time
+import random
+import argparse
+import statistics
+
+from job_ranking import BM25Index, build_query, job_text, prerank_jobs, stem, _term
+
+TITLES = ['Desarrollador Python', 'Ingeniera de datos', 'Analista contable', 'Backend Developer',
+          'Vendedor de seguros', 'Diseñador UX', 'DevOps Engineer', 'Ejecutivo comercial',
+          'Data Scientist', 'Programador Java', 'Administrativo', 'Frontend Developer React']
+WORDS = ('experiencia desarrollo aplicaciones web django postgresql docker kubernetes aws equipo '
+         'clientes ventas metas reportes excel contabilidad análisis datos python java spring react '
+         'typescript liderazgo comunicación inglés remoto híbrido turnos atención gestión proyectos '
+         'microservices api rest testing agile scrum cloud machine learning sql etl pipelines').split()
+
+CV_ANALYSIS = {
+    'keywords': ['Python', 'Django', 'PostgreSQL', 'Docker', 'AWS', 'APIs REST', 'SQL', 'Git'],
+    'experience_areas': ['Desarrollo web', 'Ingeniería de datos'],
+    'strengths': ['Diseño de APIs REST escalables', 'Liderazgo de equipos técnicos',
+                  'Optimización de consultas SQL en PostgreSQL']
+}
+
+
+def make_jobs(count, seed=7):
+    rng = random.Random(seed)
+    return [{
+        'title': f'{rng.choice(TITLES)} {i % 97}',
+        'company': f'Empresa {i % 500}',
+        'description': ' '.join(rng.choices(WORDS, k=rng.randint(40, 120)))
+    } for i in range(count)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark del pre-ranking BM25 de empleos')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--top-k', type=int, default=30)
+    parser.add_argument('--queries', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    query = build_query(CV_ANALYSIS)
+    print(f"Consulta: {len(query)} términos, top-k {args.top_k}\n")
+    print(f"{'empleos':>8} {'índice (ms)':>12} {'consulta (ms)':>14} {'prerank total (ms)':>19}")
+    for size in args.sizes:
+        jobs = make_jobs(size)
+        _term.cache_clear()
+        stem.cache_clear()
+
+        start = time.perf_counter()
+        index = BM25Index(job_text(job) for job in jobs)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        samples = []
+        for _ in range(args.queries):
+            start = time.perf_counter()
+            index.top(query, args.top_k)
+            samples.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        candidates, _ = prerank_jobs(jobs, CV_ANALYSIS, args.top_k)
+        total_ms = (time.perf_counter() - start) * 1000
+        print(f"{size:>8,} {build_ms:>12.1f} {statistics.median(samples):>14.3f} {total_ms:>19.1f}")
+    print(f"\nMejor candidato: {candidates[0]['title']}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""Benchmark de guardado de empleos: fila por fila vs INSERT en lote
+
+Compara el guardado anterior (SELECT + INSERT por empleo) con bulk_save_jobs()
+para 10, 100 y 10.000 empleos. Cada medición corre en una transacción que se
+revierte, así que no deja datos en la base.
+
+Uso:
+    python benchmark_job_store.py [--sizes 10 100 10000]
+"""
+
+import sys
+import time
+import argparse
+
+import psycopg2
+
+from db_pool import PoolConfig
+from job_store import bulk_save_jobs, job_content_hash
+
+
+def make_jobs(count, prefix='bench'):
+    return [{
+        'title': f'Desarrollador Python {prefix} {i}',
+        'company': f'Empresa {i % 250}',
+        'location': 'Santiago, Chile',
+        'description': 'Descripción del empleo ' * 20,
+        'url': f'https://example.com/{prefix}/jobs/{i}',
+        'source': 'benchmark'
+    } for i in range(count)]
+
+
+def save_row_by_row(connection, jobs):
+    """Guardado anterior: un SELECT y un INSERT por empleo"""
+    cursor = connection.cursor()
+    for job in jobs:
+        cursor.execute(
+            "SELECT id FROM jobs WHERE title = %s AND company = %s AND url = %s",
+            (job['title'], job['company'], job['url'])
+        )
+        if not cursor.fetchone():
+            cursor.execute(
+                "INSERT INTO jobs (title, company, location, description, url, source, content_hash) VALUES (%s, %s, %s, %s, %s, %s, %s)",
+                (job['title'], job['company'], job['location'], job['description'], job['url'], job['source'],
+                 job_content_hash(job))
+            )
+    cursor.close()
+
+
+def measure(connection, label, function, jobs):
+    start = time.perf_counter()
+    function(connection, jobs)
+    elapsed = time.perf_counter() - start
+    connection.rollback()
+    rate = len(jobs) / elapsed if elapsed else float('inf')
+    print(f"  {label:<28} {elapsed * 1000:>10.1f} ms {rate:>12,.0f} filas/s")
+    return rate
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark de guardado de empleos')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 10000])
+    args = parser.parse_args(argv)
+
+    try:
+        connection = psycopg2.connect(**PoolConfig().dsn)
+    except psycopg2.Error as e:
+        print(f"❌ No se pudo conectar a PostgreSQL: {e}")
+        return 1
+
+    try:
+        for size in args.sizes:
+            jobs = make_jobs(size)
+            print(f"\n{size} empleos:")
+            legacy = measure(connection, 'fila por fila', save_row_by_row, jobs)
+            bulk = measure(connection, 'lote (nuevos)', bulk_save_jobs, jobs)
+
+            # Segunda pasada con todos los empleos ya guardados (solo conflictos)
+            bulk_save_jobs(connection, jobs)
+            start = time.perf_counter()
+            bulk_save_jobs(connection, jobs)
+            elapsed = time.perf_counter() - start
+            connection.rollback()
+            print(f"  {'lote (ya existentes)':<28} {elapsed * 1000:>10.1f} ms "
+                  f"{size / elapsed if elapsed else float('inf'):>12,.0f} filas/s")
+            print(f"  Mejora: {bulk / legacy:.1f}x")
+    finally:
+        connection.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
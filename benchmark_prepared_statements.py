@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""Micro-benchmark de las sentencias preparadas (prepared_statements.py)
+
+Ejecuta cada sentencia registrada con el SQL original (PostgreSQL la analiza y
+planifica en cada llamada) y luego por nombre con ``EXECUTE``, sobre la misma
+conexión y con los mismos parámetros, y muestra la latencia por consulta. Las
+sentencias de contadores se ejecutan con límite 0, así que no escriben; todo
+corre en una transacción que se revierte. Se registran las sentencias de los
+módulos de datos; las de las rutas de app.py quedan fuera, porque importar app
+crea la aplicación Flask e inicializa la base de datos.
+
+Uso:
+    python benchmark_prepared_statements.py [--iterations 2000]
+"""
+
+import sys
+import time
+import argparse
+import statistics
+from datetime import datetime
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+from db_pool import PoolConfig
+from prepared_statements import STATEMENTS
+# Módulos que registran sentencias al importarse
+import blog_feed  # noqa: F401
+import dashboard_summary  # noqa: F401
+import entitlements  # noqa: F401
+import subscription_system  # noqa: F401
+import user_identity  # noqa: F401
+
+
+def sample_params(cursor):
+    cursor.execute("""
+        SELECT u.id AS user_id
+        FROM users u
+        ORDER BY (SELECT COUNT(*) FROM resumes r WHERE r.user_id = u.id) DESC
+        LIMIT 1
+    """)
+    user_id = (cursor.fetchone() or {'user_id': 1})['user_id']
+    usage = {'user_id': user_id, 'subscription_id': None, 'resource_type': 'cv_analysis',
+             'period': datetime.now(), 'limit': 0}
+    return {
+        'user_identity': (user_id,),
+        'entitlements': (user_id,),
+        'dashboard_user_summary': (user_id,),
+        'blog_user_reactions': (user_id,),
+        'increment_usage': usage,
+        'reserve_usage': dict(usage, ttl=300),
+        'commit_usage_reservation': {'usage_id': -1},
+        'release_usage_reservation': {'usage_id': -1},
+    }
+
+
+def per_query_us(function, iterations):
+    samples = []
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            function()
+        samples.append((time.perf_counter() - start) / iterations * 1e6)
+    return statistics.median(samples)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Micro-benchmark de sentencias preparadas')
+    parser.add_argument('--iterations', type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    try:
+        connection = psycopg2.connect(cursor_factory=RealDictCursor, **PoolConfig().dsn)
+    except psycopg2.Error as e:
+        print(f"❌ No se pudo conectar a PostgreSQL: {e}")
+        return 1
+
+    try:
+        cursor = connection.cursor()
+        params = sample_params(cursor)
+        print(f"\n{'sentencia':<28} {'SQL (µs)':>10} {'EXECUTE (µs)':>14} {'mejora':>8}")
+        for name, statement in sorted(STATEMENTS.items()):
+            if name not in params:
+                continue
+            values = params[name]
+
+            def plain():
+                cursor.execute(statement.sql, values)
+                if cursor.description:
+                    cursor.fetchall()
+
+            def prepared():
+                statement.execute(cursor, values)
+                if cursor.description:
+                    cursor.fetchall()
+
+            plain_us = per_query_us(plain, args.iterations)
+            prepared()  # PREPARE fuera de la medición
+            prepared_us = per_query_us(prepared, args.iterations)
+            print(f"{name:<28} {plain_us:>10.1f} {prepared_us:>14.1f} {plain_us / prepared_us:>7.2f}x")
+    finally:
+        connection.rollback()
+        connection.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,176 @@
+"""Feed del blog de tips (``/tips-sugerencias``) y reacciones a los posts
+
+Los conteos por post y emoji viven en ``blog_reaction_counts``, que el trigger
+de ``blog_reactions`` (migración 0012) mantiene en la misma transacción de cada
+reacción: ni la página ni el click recuentan ``blog_reactions``.
+
+La lista de posts publicados, con sus conteos, se cachea
+``BLOG_FEED_CACHE_TTL`` segundos y las rutas de administración del blog la
+invalidan al confirmar sus cambios. Lo único que se consulta en cada vista son
+las reacciones del usuario; los conteos de la página pueden atrasarse hasta el
+TTL, pero cada click responde con los conteos actuales del post.
+"""
+
+import os
+import logging
+from datetime import datetime
+from typing import Dict, Any, Tuple
+
+from psycopg2.extras import RealDictCursor
+
+from cache_service import TwoTierCache
+from prepared_statements import prepared
+from request_db import call_after_commit, get_cache_fill_connection
+
+logger = logging.getLogger(__name__)
+
+BLOG_FEED_CACHE_TTL = int(os.getenv('BLOG_FEED_CACHE_TTL', 60))
+
+PUBLISHED_POSTS_SQL = """
+    SELECT bp.id, bp.title, bp.content, bp.image_url, bp.created_at,
+           u.username as author_name
+    FROM blog_posts bp
+    LEFT JOIN users u ON bp.author_id = u.id
+    WHERE bp.is_published = TRUE
+    ORDER BY bp.created_at DESC
+"""
+
+PUBLISHED_REACTION_COUNTS_SQL = """
+    SELECT c.post_id, c.emoji, c.count
+    FROM blog_reaction_counts c
+    JOIN blog_posts bp ON bp.id = c.post_id
+    WHERE bp.is_published = TRUE
+"""
+
+
+def load_blog_feed(connection) -> Dict[str, Any]:
+    """Posts publicados (más recientes primero) y sus conteos por emoji"""
+    cursor = connection.cursor(cursor_factory=RealDictCursor)
+    try:
+        cursor.execute(PUBLISHED_POSTS_SQL)
+        posts = [dict(post) for post in cursor.fetchall()]
+        cursor.execute(PUBLISHED_REACTION_COUNTS_SQL)
+        reactions_count: Dict[int, Dict[str, int]] = {}
+        for row in cursor.fetchall():
+            reactions_count.setdefault(row['post_id'], {})[row['emoji']] = row['count']
+    finally:
+        cursor.close()
+    return {'posts': posts, 'reactions_count': reactions_count}
+
+
+def _dump_feed(feed: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        'posts': [dict(post, created_at=post['created_at'].isoformat() if post['created_at'] else None)
+                  for post in feed['posts']],
+        'reactions_count': feed['reactions_count'],
+    }
+
+
+def _load_feed(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Reconstruir fechas y claves numéricas (JSON solo admite claves de texto)"""
+    return {
+        'posts': [dict(post, created_at=datetime.fromisoformat(post['created_at']) if post['created_at'] else None)
+                  for post in data['posts']],
+        'reactions_count': {int(post_id): counts for post_id, counts in data['reactions_count'].items()},
+    }
+
+
+USER_REACTIONS_STATEMENT = prepared(
+    'blog_user_reactions', "SELECT post_id, emoji FROM blog_reactions WHERE user_id = %s", ('integer',))
+
+_blog_feed_cache = TwoTierCache(
+    'blog_feed',
+    local_ttl=min(BLOG_FEED_CACHE_TTL, 10),
+    redis_ttl=max(BLOG_FEED_CACHE_TTL, 1),
+    max_entries=1,
+    dump=_dump_feed,
+    load=_load_feed
+)
+
+
+def get_blog_feed(connection) -> Dict[str, Any]:
+    """Feed publicado desde el cache o la base de datos"""
+    if BLOG_FEED_CACHE_TTL <= 0:
+        return load_blog_feed(connection)
+    return _blog_feed_cache.get_or_load('published', _load_blog_feed_for_cache)
+
+
+def _load_blog_feed_for_cache() -> Dict[str, Any]:
+    # En los requests @read_only no se cachea lo leído de la réplica
+    connection = get_cache_fill_connection()
+    try:
+        return load_blog_feed(connection)
+    finally:
+        connection.close()
+
+
+def invalidate_blog_feed() -> None:
+    """Descartar el feed cuando se confirme el cambio de un post"""
+    call_after_commit(lambda: _blog_feed_cache.delete('published'))
+
+
+def get_user_reactions(connection, user_id: int) -> Dict[int, str]:
+    """Reacción del usuario en cada post (índice por user_id de la migración 0001)"""
+    cursor = connection.cursor(cursor_factory=RealDictCursor)
+    try:
+        USER_REACTIONS_STATEMENT.execute(cursor, (user_id,))
+        return {row['post_id']: row['emoji'] for row in cursor.fetchall()}
+    finally:
+        cursor.close()
+
+
+def toggle_reaction(connection, post_id: int, user_id: int, emoji: str) -> Tuple[str, Dict[str, int]]:
+    """Quitar la reacción si era la misma o reemplazarla por ``emoji``. No hace commit.
+
+    Retorna ``('added' | 'removed', conteos del post por emoji)``.
+    """
+    cursor = connection.cursor(cursor_factory=RealDictCursor)
+    try:
+        # Un usuario tiene una sola reacción por post: se quita la que hubiera
+        cursor.execute("""
+            DELETE FROM blog_reactions
+            WHERE post_id = %s AND user_id = %s
+            RETURNING emoji
+        """, (post_id, user_id))
+        removed = [row['emoji'] for row in cursor.fetchall()]
+
+        if emoji in removed:
+            action = 'removed'
+        else:
+            cursor.execute("""
+                INSERT INTO blog_reactions (post_id, user_id, emoji)
+                VALUES (%s, %s, %s)
+                ON CONFLICT (post_id, user_id, emoji) DO NOTHING
+            """, (post_id, user_id, emoji))
+            action = 'added'
+
+        cursor.execute("SELECT emoji, count FROM blog_reaction_counts WHERE post_id = %s", (post_id,))
+        reactions = {row['emoji']: row['count'] for row in cursor.fetchall()}
+    finally:
+        cursor.close()
+    return action, reactions
+
+
+def rebuild_reaction_counts(connection) -> int:
+    """Recalcular ``blog_reaction_counts`` desde ``blog_reactions``. No hace commit.
+
+    Bloquea las reacciones nuevas (no las lecturas) hasta el commit.
+    """
+    cursor = connection.cursor()
+    try:
+        cursor.execute("LOCK TABLE blog_reactions IN SHARE MODE")
+        cursor.execute("DELETE FROM blog_reaction_counts")
+        cursor.execute("""
+            INSERT INTO blog_reaction_counts (post_id, emoji, count)
+            SELECT post_id, emoji, COUNT(*)
+            FROM blog_reactions
+            WHERE post_id IS NOT NULL
+            GROUP BY post_id, emoji
+        """)
+        return cursor.rowcount
+    finally:
+        cursor.close()
+
+
+def get_blog_feed_cache_stats() -> Dict[str, Any]:
+    return _blog_feed_cache.get_stats()
@@ -1,10 +1,14 @@
 """Servicio de Cache con Redis para ARMind"""
 
+import os
+import time
 import redis
 import json
 import hashlib
+import threading
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Callable
 import logging
 from functools import wraps
 
@@ -15,7 +19,12 @@ class CacheService:
     
     def __init__(self, redis_url: str = 'redis://localhost:6379/0'):
         try:
-            self.redis_client = redis.from_url(redis_url, decode_responses=True)
+            self.redis_client = redis.from_url(
+                redis_url,
+                decode_responses=True,
+                socket_connect_timeout=2,
+                socket_timeout=2
+            )
             # Test connection
             self.redis_client.ping()
             self.available = True
@@ -161,6 +170,124 @@ class CacheService:
         return (hits / total * 100) if total > 0 else 0.0
 
 
+class LocalTTLCache:
+    """Cache LRU en memoria del proceso con expiración por entrada"""
+    
+    def __init__(self, max_entries: int = 1024, ttl: float = 30):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: str) -> Optional[Any]:
+        """Obtener valor si existe y no ha expirado"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+    
+    def set(self, key: str, value: Any, ttl: float = None) -> None:
+        """Guardar valor desalojando el menos usado si se excede el límite"""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+    
+    def delete(self, key: str) -> None:
+        """Eliminar valor"""
+        with self._lock:
+            self._data.pop(key, None)
+    
+    def clear(self) -> None:
+        """Vaciar el cache"""
+        with self._lock:
+            self._data.clear()
+    
+    def __len__(self):
+        return len(self._data)
+
+
+class TwoTierCache:
+    """Cache de dos niveles: LRU en memoria del worker y Redis compartido.
+    
+    Los valores se guardan en Redis como JSON, por lo que ``dump``/``load``
+    permiten convertir objetos con fechas u otros tipos no serializables.
+    """
+    
+    def __init__(self, namespace: str, local_ttl: float = 30, redis_ttl: int = 300,
+                 max_entries: int = 1024, dump: Callable = None, load: Callable = None):
+        self.namespace = namespace
+        self.redis_ttl = redis_ttl
+        self.local = LocalTTLCache(max_entries=max_entries, ttl=local_ttl)
+        self.dump = dump or (lambda value: value)
+        self.load = load or (lambda value: value)
+        self.stats = {'local_hits': 0, 'redis_hits': 0, 'misses': 0}
+    
+    def _key(self, key) -> str:
+        return f"{self.namespace}:{key}"
+    
+    def get(self, key) -> Optional[Any]:
+        """Buscar primero en memoria y luego en Redis"""
+        full_key = self._key(key)
+        value = self.local.get(full_key)
+        if value is not None:
+            self.stats['local_hits'] += 1
+            return value
+        
+        cache = get_cache_service()
+        if cache.available:
+            cached = cache.get(full_key)
+            if cached is not None:
+                value = self.load(cached)
+                self.local.set(full_key, value)
+                self.stats['redis_hits'] += 1
+                return value
+        
+        self.stats['misses'] += 1
+        return None
+    
+    def set(self, key, value) -> None:
+        """Guardar en ambos niveles"""
+        full_key = self._key(key)
+        self.local.set(full_key, value)
+        cache = get_cache_service()
+        if cache.available:
+            cache.set(full_key, self.dump(value), self.redis_ttl)
+    
+    def get_or_load(self, key, loader: Callable[[], Any]) -> Any:
+        """Obtener del cache o calcular con ``loader`` y guardar el resultado"""
+        value = self.get(key)
+        if value is None:
+            value = loader()
+            if value is not None:
+                self.set(key, value)
+        return value
+    
+    def delete(self, key) -> None:
+        """Invalidar en ambos niveles"""
+        full_key = self._key(key)
+        self.local.delete(full_key)
+        cache = get_cache_service()
+        if cache.available:
+            cache.delete(full_key)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Obtener aciertos y fallos del cache"""
+        stats = dict(self.stats)
+        lookups = sum(stats.values())
+        stats['hit_rate'] = round((stats['local_hits'] + stats['redis_hits']) / lookups * 100, 2) if lookups else 0.0
+        stats['local_entries'] = len(self.local)
+        return stats
+
+
 def cache_result(prefix: str, ttl: int = 3600, key_func=None):
     """Decorador para cachear resultados de funciones"""
     def decorator(func):
@@ -198,6 +325,8 @@ def cache_result(prefix: str, ttl: int = 3600, key_func=None):
 # Instancia global del servicio de cache
 cache_service = None
 
+_cache_service_lock = threading.Lock()
+
 def init_cache(app):
     """Inicializar servicio de cache con la aplicación Flask"""
     global cache_service
@@ -206,4 +335,14 @@ def init_cache(app):
     cache_service = CacheService(redis_url)
     app.cache_service = cache_service
     
+    return cache_service
+
+def get_cache_service() -> CacheService:
+    """Obtener la instancia global, creándola desde REDIS_URL si aún no existe"""
+    global cache_service
+    
+    if cache_service is None:
+        with _cache_service_lock:
+            if cache_service is None:
+                cache_service = CacheService(os.getenv('REDIS_URL', 'redis://localhost:6379/0'))
     return cache_service
\ No newline at end of file
@@ -0,0 +1,217 @@
+"""Coincidencias de los términos del CV en lotes de empleos (compatibilidad básica)
+
+``calculate_basic_compatibility`` cuenta cuántas fortalezas, palabras clave y
+áreas de experiencia del análisis del CV aparecen en el título y la descripción
+de cada empleo. ``CompatibilityMatcher`` prepara esos términos una vez por
+análisis (sin acentos y en minúsculas) y los busca en un lote de empleos
+exigiendo límites de palabra (``java`` ya no coincide dentro de
+``javascript``), devolviendo una matriz de coincidencias empleo × término
+(NumPy) de la que se calculan todos los puntajes.
+
+Cada texto se normaliza con ``bytes.translate`` sobre su codificación latin-1
+(un byte por carácter, más barato que el ``lower()`` de la versión anterior) y
+los caracteres que no son de palabra quedan como espacios, así que un término
+``python`` aparece con límites de palabra si y solo si ``" python "`` está en
+el texto rodeado de espacios: el mismo ``in`` por término que hacía la versión
+anterior, sin trabajo extra por coincidencia. Los términos con signos (``c++``,
+``node.js``) se buscan en el texto sin esa sustitución revisando el carácter
+anterior y el siguiente de cada aparición. Los textos fuera de latin-1 (viñetas,
+emojis) se normalizan con una tabla NumPy por unidad UTF-16.
+"""
+
+import unicodedata
+from functools import lru_cache
+from typing import Dict, Any, List, Tuple
+
+import numpy as np
+
+# Puntos por cada fortaleza y palabra clave encontrada y por coincidir un área
+STRENGTH_POINTS = 12
+KEYWORD_POINTS = 8
+AREA_POINTS = 20
+
+_CATEGORIES = ('strengths', 'keywords', 'experience_areas')
+
+# Rangos con mayúsculas o acentos que se normalizan fuera de latin-1: latín
+# extendido, griego y cirílico. El resto del texto queda igual.
+_FOLD_RANGES = ((0x100, 0x250), (0x370, 0x530), (0x1E00, 0x1F00))
+
+
+def _fold_char(char: str) -> str:
+    """Misma letra en minúscula y sin acentos, si sigue siendo un solo carácter"""
+    lower = char.lower()
+    base = ''.join(part for part in unicodedata.normalize('NFKD', lower) if not unicodedata.combining(part))
+    for folded in (base, lower):
+        if len(folded) == 1:
+            return folded
+    return char
+
+
+def _is_word_char(char: str) -> bool:
+    return char.isalnum() or char == '_'
+
+
+def _latin1_table(word_only: bool) -> bytes:
+    table = bytearray(range(256))
+    for code in range(256):
+        folded = _fold_char(chr(code))
+        if ord(folded) < 256:
+            table[code] = ord(folded)
+        if word_only and not _is_word_char(chr(table[code])):
+            table[code] = ord(' ')
+    return bytes(table)
+
+
+_LATIN1_FOLD = _latin1_table(word_only=False)
+_LATIN1_WORDS = _latin1_table(word_only=True)
+
+
+@lru_cache(maxsize=1)
+def _fold_table() -> np.ndarray:
+    """Unidad UTF-16 → misma letra en minúscula y sin acentos (solo para textos fuera de latin-1)"""
+    table = np.arange(0x10000, dtype=np.uint16)
+    table[:256] = np.frombuffer(_LATIN1_FOLD, dtype=np.uint8)
+    for start, stop in _FOLD_RANGES:
+        for code in range(start, stop):
+            folded = _fold_char(chr(code))
+            if ord(folded) <= 0xFFFF:
+                table[code] = ord(folded)
+    return table
+
+
+def _fold_codes(text: str) -> np.ndarray:
+    return _fold_table()[np.frombuffer(text.encode('utf-16-le', 'surrogatepass'), dtype=np.uint16)]
+
+
+def _decode_codes(codes: np.ndarray) -> str:
+    return codes.tobytes().decode('utf-16-le', 'surrogatepass')
+
+
+def fold_text(text: str) -> str:
+    """Minúsculas y sin acentos (``Programación`` → ``programacion``); la ñ queda como n"""
+    try:
+        return text.encode('latin-1').translate(_LATIN1_FOLD).decode('latin-1')
+    except UnicodeEncodeError:
+        return _decode_codes(_fold_codes(text))
+
+
+def word_text(text: str) -> str:
+    """``fold_text`` con los caracteres que no son de palabra como espacios"""
+    try:
+        return text.encode('latin-1').translate(_LATIN1_WORDS).decode('latin-1')
+    except UnicodeEncodeError:
+        codes = _fold_codes(text)
+        word = np.frombuffer(_LATIN1_WORDS, dtype=np.uint8)[np.minimum(codes, 0xFF)] != ord(' ')
+        # Fuera de latin-1 se revisa una vez cada carácter distinto del texto
+        # (las mitades de un emoji no son de palabra)
+        wide = codes > 0xFF
+        distinct, inverse = np.unique(codes[wide], return_inverse=True)
+        word[wide] = np.array([not 0xD800 <= code <= 0xDFFF and _is_word_char(chr(code))
+                               for code in distinct.tolist()], dtype=bool)[inverse]
+        return _decode_codes(np.where(word, codes, ord(' ')).astype(np.uint16))
+
+
+def _job_text(job: Dict[str, Any]) -> str:
+    # Rodeado de espacios: un término al principio o al final también tiene sus límites
+    return f" {job.get('title', '')} {job.get('description', '')} "
+
+
+def _category_values(cv_analysis: Dict[str, Any], category: str) -> Tuple[str, ...]:
+    values = cv_analysis.get(category) or []
+    return tuple(value for value in values if isinstance(value, str))
+
+
+class CompatibilityMatcher:
+    """Términos de un análisis de CV preparados para buscarlos en lotes de empleos"""
+
+    def __init__(self, strengths=(), keywords=(), experience_areas=(), base_score=50):
+        self.base_score = base_score
+        self.terms: List[str] = []
+        term_index: Dict[str, int] = {}
+        # Columnas de cada entrada del análisis (una entrada repetida cuenta dos veces)
+        self.columns: Dict[str, np.ndarray] = {}
+        for category, values in zip(_CATEGORIES, (strengths, keywords, experience_areas)):
+            columns = []
+            for value in values:
+                term = ' '.join(fold_text(value).split())
+                if not term:
+                    continue
+                if term not in term_index:
+                    term_index[term] = len(self.terms)
+                    self.terms.append(term)
+                columns.append(term_index[term])
+            self.columns[category] = np.asarray(columns, dtype=np.int64)
+
+        # Términos de solo letras, dígitos y espacios: ``" término "`` en word_text();
+        # los demás (con signos) se buscan en fold_text() revisando los límites
+        self._word_terms: List[Tuple[int, str]] = []
+        self._symbol_terms: List[Tuple[int, str, int]] = []
+        for column, term in enumerate(self.terms):
+            if word_text(term) == term:
+                self._word_terms.append((column, f' {term} '))
+            else:
+                self._symbol_terms.append((column, term, len(term)))
+
+    def _symbol_matches(self, text: str) -> List[int]:
+        matches = []
+        for column, term, length in self._symbol_terms:
+            position = text.find(term)
+            while position >= 0:
+                end = position + length
+                if not (_is_word_char(text[position - 1]) or _is_word_char(text[end])):
+                    matches.append(column)
+                    break
+                position = text.find(term, position + 1)
+        return matches
+
+    def hit_matrix(self, jobs: List[Dict[str, Any]]) -> np.ndarray:
+        """Matriz booleana ``(empleos, términos)``: qué términos aparecen en cada empleo"""
+        hits = np.zeros((len(jobs), len(self.terms)), dtype=bool)
+        if not self.terms or not jobs:
+            return hits
+
+        # Posiciones en la matriz aplanada (fila * términos + columna)
+        flat: List[int] = []
+        word_terms, symbol_terms = self._word_terms, self._symbol_terms
+        for offset, job in zip(range(0, hits.size, len(self.terms)), jobs):
+            text = _job_text(job)
+            words = word_text(text)
+            flat.extend([offset + column for column, term in word_terms if term in words])
+            if symbol_terms:
+                flat.extend([offset + column for column in self._symbol_matches(fold_text(text))])
+        hits.flat[flat] = True
+        return hits
+
+    def hits(self, job: Dict[str, Any]) -> np.ndarray:
+        """Vector de coincidencias por término de un empleo"""
+        return self.hit_matrix([job])[0]
+
+    def scores(self, jobs: List[Dict[str, Any]]) -> List[int]:
+        """Compatibilidad básica (15-85) de cada empleo del lote"""
+        hits = self.hit_matrix(jobs)
+        strength_matches = hits[:, self.columns['strengths']].sum(axis=1)
+        keyword_matches = hits[:, self.columns['keywords']].sum(axis=1)
+        area_match = hits[:, self.columns['experience_areas']].any(axis=1)
+
+        score = (strength_matches * STRENGTH_POINTS + keyword_matches * KEYWORD_POINTS
+                 + area_match * AREA_POINTS + self.base_score * 0.2)
+        # Penalización si no hay coincidencias importantes
+        score = np.where(strength_matches == 0, score * 0.7, score)
+        if len(self.columns['experience_areas']):
+            score = np.where(area_match, score, score * 0.8)
+        # Limitar entre 15 y 85 (máximo realista para el método básico)
+        return np.clip(score.astype(np.int64), 15, 85).tolist()
+
+    def score(self, job: Dict[str, Any]) -> int:
+        return self.scores([job])[0]
+
+
+@lru_cache(maxsize=256)
+def _cached_matcher(strengths, keywords, experience_areas, base_score) -> CompatibilityMatcher:
+    return CompatibilityMatcher(strengths, keywords, experience_areas, base_score)
+
+
+def get_compatibility_matcher(cv_analysis: Dict[str, Any]) -> CompatibilityMatcher:
+    """Matcher del análisis (preparado una vez por combinación de términos)"""
+    return _cached_matcher(*(_category_values(cv_analysis, category) for category in _CATEGORIES),
+                           cv_analysis.get('score', 50))
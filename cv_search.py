@@ -0,0 +1,207 @@
+"""Búsqueda de CVs para el panel de administración
+
+Los CVs (``user_cvs``) tienen una columna ``search_vector`` generada con las
+configuraciones de texto en español e inglés e indexada con GIN (migración 0005).
+Si la extensión ``pg_trgm`` está instalada, un índice de trigramas sobre el texto
+del CV permite además encontrar fragmentos de palabras (``ILIKE '%term%'``) sin
+recorrer la tabla (migración 0006).
+
+Los resultados se ordenan por relevancia, incluyen un fragmento resaltado y se
+paginan por keyset: la página siguiente se pide con la ``(rank, id)`` de la última
+fila en lugar de un OFFSET.
+"""
+
+import re
+import logging
+from typing import List, Dict, Any, Optional, Tuple
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+from markupsafe import Markup, escape
+
+from subscription_system import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+SEARCH_PAGE_SIZE = 50
+
+# Texto del CV usado por el índice de trigramas y por ILIKE; debe coincidir
+# exactamente con la expresión indexada para que el planificador use el índice
+CV_SEARCH_TEXT_SQL = (
+    "(coalesce({alias}personal_info, '') || ' ' || coalesce({alias}professional_summary, '') || ' ' || "
+    "coalesce({alias}education, '') || ' ' || coalesce({alias}experience, '') || ' ' || "
+    "coalesce({alias}skills, ''))"
+)
+
+# Documento de búsqueda: datos personales y resumen pesan más que experiencia/habilidades
+CV_SEARCH_VECTOR_SQL = """
+    setweight(to_tsvector('spanish'::regconfig, coalesce(personal_info, '') || ' ' || coalesce(professional_summary, '')), 'A') ||
+    setweight(to_tsvector('english'::regconfig, coalesce(personal_info, '') || ' ' || coalesce(professional_summary, '')), 'A') ||
+    setweight(to_tsvector('spanish'::regconfig, coalesce(experience, '') || ' ' || coalesce(skills, '')), 'B') ||
+    setweight(to_tsvector('english'::regconfig, coalesce(experience, '') || ' ' || coalesce(skills, '')), 'B') ||
+    setweight(to_tsvector('spanish'::regconfig, coalesce(education, '')), 'C') ||
+    setweight(to_tsvector('english'::regconfig, coalesce(education, '')), 'C')
+"""
+
+# Marcadores que ts_headline pone alrededor de las coincidencias; se convierten en
+# <mark> después de escapar el HTML del CV
+_HIGHLIGHT_START = '\x02'
+_HIGHLIGHT_STOP = '\x03'
+_HEADLINE_OPTIONS = (f"StartSel={_HIGHLIGHT_START}, StopSel={_HIGHLIGHT_STOP}, "
+                     "MaxFragments=2, MaxWords=20, MinWords=6, FragmentDelimiter=\" … \"")
+
+_WORD = re.compile(r'\w+', re.UNICODE)
+
+_trigram_available = None
+
+
+def build_tsquery(term: str) -> Optional[str]:
+    """Convertir el texto del buscador en una tsquery de prefijos (``desarroll:* & python:*``).
+
+    Solo se usan caracteres de palabra, así que el texto del usuario no puede
+    inyectar operadores de tsquery.
+    """
+    words = _WORD.findall(term.lower())
+    if not words:
+        return None
+    return ' & '.join(f"{word}:*" for word in words)
+
+
+def _like_pattern(term: str) -> str:
+    escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f"%{escaped}%"
+
+
+def has_trigram_index(cursor) -> bool:
+    """Indica si pg_trgm está instalada (se consulta una vez por proceso)"""
+    global _trigram_available
+    if _trigram_available is None:
+        cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        _trigram_available = cursor.fetchone() is not None
+    return _trigram_available
+
+
+def build_search_sql(term: str, use_trigram: bool) -> Tuple[str, Dict[str, Any]]:
+    """SELECT de los CVs que coinciden con ``term`` con su relevancia en ``rank``"""
+    params = {'tsquery': build_tsquery(term) or '', 'term': term, 'pattern': _like_pattern(term)}
+    search_text = CV_SEARCH_TEXT_SQL.format(alias='cv.')
+    match = "cv.search_vector @@ q.query"
+    rank = "ts_rank_cd(cv.search_vector, q.query)"
+    if use_trigram and len(term) >= 3:
+        # Fragmentos de palabra y errores de tipeo vía el índice de trigramas
+        match = f"({match} OR {search_text} ILIKE %(pattern)s)"
+        rank = f"({rank} + word_similarity(%(term)s, {search_text}))"
+
+    sql = f"""
+        SELECT cv.id, cv.user_id, cv.cv_name, u.username, u.email, u.created_at, u.last_login,
+               cv.personal_info, cv.professional_summary, cv.education, cv.experience, cv.skills,
+               {rank}::real AS rank, q.query
+        FROM user_cvs cv
+        JOIN users u ON u.id = cv.user_id
+        CROSS JOIN (
+            SELECT to_tsquery('spanish', %(tsquery)s) || to_tsquery('english', %(tsquery)s) AS query
+        ) q
+        WHERE cv.is_active = TRUE AND {match}
+    """
+    return sql, params
+
+
+def search_cvs(term: str, after: Optional[Tuple[float, int]] = None,
+               limit: Optional[int] = SEARCH_PAGE_SIZE, connection=None) -> Optional[List[Dict[str, Any]]]:
+    """Buscar CVs por relevancia.
+
+    ``after`` es la ``(rank, id)`` de la última fila de la página anterior. Con
+    ``limit=None`` retorna todas las coincidencias (exportación) sin fragmentos.
+    Retorna None si no hay conexión o la consulta falla.
+    """
+    term = (term or '').strip()
+    if not term:
+        return []
+
+    own_connection = connection is None
+    if own_connection:
+        connection = get_db_connection()
+        if not connection:
+            return None
+
+    try:
+        cursor = connection.cursor(cursor_factory=RealDictCursor)
+        search_sql, params = build_search_sql(term, has_trigram_index(cursor))
+        if not params['tsquery'] and '%(pattern)s' not in search_sql:
+            cursor.close()
+            if own_connection:
+                connection.close()
+            return []
+
+        keyset = ""
+        if after is not None:
+            keyset = "WHERE (matches.rank, matches.id) < (%(after_rank)s::real, %(after_id)s)"
+            params.update(after_rank=after[0], after_id=after[1])
+        page = ""
+        if limit is not None:
+            page = "LIMIT %(limit)s"
+            params['limit'] = limit
+
+        if limit is None:
+            headline = "NULL::text"
+        else:
+            # ts_headline es costoso: solo se calcula para las filas de la página
+            headline = (
+                "ts_headline('spanish', coalesce(page.professional_summary, '') || ' ' || "
+                "coalesce(page.experience, '') || ' ' || coalesce(page.skills, ''), page.query, "
+                "%(headline_options)s)"
+            )
+            params['headline_options'] = _HEADLINE_OPTIONS
+
+        cursor.execute(f"""
+            SELECT page.*, {headline} AS snippet
+            FROM (
+                SELECT * FROM ({search_sql}) matches
+                {keyset}
+                ORDER BY matches.rank DESC, matches.id DESC
+                {page}
+            ) page
+            ORDER BY page.rank DESC, page.id DESC
+        """, params)
+        rows = cursor.fetchall()
+        cursor.close()
+        if own_connection:
+            connection.close()
+    except psycopg2.Error as e:
+        logger.error(f"Error en búsqueda de CVs: {e}")
+        connection.rollback()
+        if own_connection:
+            connection.close()
+        return None
+
+    results = []
+    for row in rows:
+        result = dict(row)
+        result.pop('query', None)
+        result['snippet'] = highlight_snippet(result.get('snippet'))
+        results.append(result)
+    return results
+
+
+def highlight_snippet(snippet: Optional[str]) -> Optional[Markup]:
+    """Escapar el fragmento y convertir los marcadores de ts_headline en <mark>"""
+    if not snippet:
+        return None
+    escaped = str(escape(snippet))
+    return Markup(escaped.replace(_HIGHLIGHT_START, '<mark>').replace(_HIGHLIGHT_STOP, '</mark>'))
+
+
+def encode_cursor(row: Dict[str, Any]) -> str:
+    """Token de la página siguiente a partir de la última fila"""
+    return f"{row['rank']!r}:{row['id']}"
+
+
+def decode_cursor(token: Optional[str]) -> Optional[Tuple[float, int]]:
+    """Interpretar el token de página; None si falta o es inválido"""
+    if not token:
+        return None
+    try:
+        rank, row_id = token.split(':', 1)
+        return float(rank), int(row_id)
+    except ValueError:
+        return None
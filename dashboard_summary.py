@@ -0,0 +1,114 @@
+"""Resumen cacheado del dashboard de cada usuario (CVs analizados y empleos)
+
+Los números del usuario (CVs analizados y fecha del último) salen de una sola
+consulta sobre ``idx_resumes_user_created`` y se cachean
+``DASHBOARD_SUMMARY_CACHE_TTL`` segundos; guardar un análisis o un CV descarta
+el resumen del usuario al confirmarse.
+
+El total de empleos es global: se cuenta como mucho una vez cada
+``JOBS_COUNT_REFRESH_INTERVAL`` segundos (o después de guardar empleos) y se
+comparte entre usuarios, en lugar de recorrer ``jobs`` en cada carga.
+"""
+
+import os
+import logging
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+from psycopg2.extras import RealDictCursor
+
+from cache_service import TwoTierCache
+from prepared_statements import prepared
+from request_db import call_after_commit
+
+logger = logging.getLogger(__name__)
+
+DASHBOARD_SUMMARY_CACHE_TTL = int(os.getenv('DASHBOARD_SUMMARY_CACHE_TTL', 300))
+JOBS_COUNT_REFRESH_INTERVAL = int(os.getenv('JOBS_COUNT_REFRESH_INTERVAL', 300))
+
+USER_SUMMARY_SQL = """
+    SELECT COUNT(*) AS cvs_analyzed, MAX(created_at) AS last_analysis
+    FROM resumes
+    WHERE user_id = %s
+"""
+USER_SUMMARY_STATEMENT = prepared('dashboard_user_summary', USER_SUMMARY_SQL, ('integer',))
+
+
+def _dump_summary(summary: Dict[str, Any]) -> Dict[str, Any]:
+    last_analysis = summary['last_analysis']
+    return dict(summary, last_analysis=last_analysis.isoformat() if last_analysis else None)
+
+
+def _load_summary(data: Dict[str, Any]) -> Dict[str, Any]:
+    last_analysis = data['last_analysis']
+    return dict(data, last_analysis=datetime.fromisoformat(last_analysis) if last_analysis else None)
+
+
+_user_summary_cache = TwoTierCache(
+    'dashboard_summary',
+    local_ttl=min(DASHBOARD_SUMMARY_CACHE_TTL, 30),
+    redis_ttl=max(DASHBOARD_SUMMARY_CACHE_TTL, 1),
+    max_entries=4096,
+    dump=_dump_summary,
+    load=_load_summary
+)
+
+_jobs_total_cache = TwoTierCache(
+    'jobs_total',
+    local_ttl=min(JOBS_COUNT_REFRESH_INTERVAL, 60),
+    redis_ttl=max(JOBS_COUNT_REFRESH_INTERVAL, 1),
+    max_entries=1
+)
+
+
+def load_user_summary(connection, user_id: int) -> Dict[str, Any]:
+    """CVs analizados por el usuario y fecha del último"""
+    cursor = connection.cursor(cursor_factory=RealDictCursor)
+    try:
+        USER_SUMMARY_STATEMENT.execute(cursor, (user_id,))
+        row = cursor.fetchone()
+    finally:
+        cursor.close()
+    return {'cvs_analyzed': int(row['cvs_analyzed']), 'last_analysis': row['last_analysis']}
+
+
+def count_jobs(connection) -> int:
+    cursor = connection.cursor(cursor_factory=RealDictCursor)
+    try:
+        cursor.execute("SELECT COUNT(*) AS total FROM jobs")
+        return int(cursor.fetchone()['total'])
+    finally:
+        cursor.close()
+
+
+def get_jobs_total(connection) -> int:
+    """Total de empleos guardados, recontado como mucho cada ``JOBS_COUNT_REFRESH_INTERVAL``"""
+    if JOBS_COUNT_REFRESH_INTERVAL <= 0:
+        return count_jobs(connection)
+    return _jobs_total_cache.get_or_load('total', lambda: count_jobs(connection))
+
+
+def get_user_summary(connection, user_id: int) -> Dict[str, Any]:
+    if DASHBOARD_SUMMARY_CACHE_TTL <= 0:
+        return load_user_summary(connection, user_id)
+    return _user_summary_cache.get_or_load(str(user_id), lambda: load_user_summary(connection, user_id))
+
+
+def get_dashboard_summary(connection, user_id: int) -> Dict[str, Any]:
+    """``{'cvs_analyzed', 'last_analysis', 'jobs_found'}`` del usuario"""
+    return dict(get_user_summary(connection, user_id), jobs_found=get_jobs_total(connection))
+
+
+def invalidate_dashboard_summary(user_id: Optional[int]) -> None:
+    """Descartar el resumen del usuario cuando se confirme un análisis o CV nuevo"""
+    if user_id is not None:
+        call_after_commit(lambda: _user_summary_cache.delete(str(user_id)))
+
+
+def invalidate_jobs_total() -> None:
+    """Recontar los empleos en la próxima carga, después de confirmar un guardado"""
+    call_after_commit(lambda: _jobs_total_cache.delete('total'))
+
+
+def get_dashboard_summary_stats() -> Dict[str, Any]:
+    return {'users': _user_summary_cache.get_stats(), 'jobs_total': _jobs_total_cache.get_stats()}
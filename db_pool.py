@@ -0,0 +1,467 @@
+"""Pool de conexiones PostgreSQL compartido por proceso para ARMind"""
+
+import os
+import time
+import threading
+import logging
+from collections import deque
+from typing import Optional, Dict, Any
+
+import psycopg2
+import psycopg2.extensions
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(psycopg2.OperationalError):
+    """No hubo conexión libre dentro del tiempo de espera configurado.
+
+    Hereda de ``psycopg2.OperationalError`` para que los ``except psycopg2.Error``
+    existentes en las rutas la traten como cualquier otro fallo de conexión.
+    """
+
+
+# Réplica de solo lectura (opcional): sin DB_REPLICA_HOST todo va al primario
+DB_REPLICA_MAX_LAG = float(os.getenv('DB_REPLICA_MAX_LAG', 5))
+DB_REPLICA_LAG_CHECK_INTERVAL = float(os.getenv('DB_REPLICA_LAG_CHECK_INTERVAL', 2))
+
+# Segundos de atraso de la réplica; 0 si ya aplicó todo lo recibido del primario
+REPLICA_LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+
+def replica_configured() -> bool:
+    return bool(os.getenv('DB_REPLICA_HOST'))
+
+
+class PoolConfig:
+    """Parámetros del pool leídos desde variables de entorno.
+
+    Con ``replica=True`` se conecta a ``DB_REPLICA_HOST``; el resto de
+    ``DB_REPLICA_*`` toma por defecto el valor del primario.
+    """
+
+    def __init__(self, replica: bool = False):
+        def setting(name, default):
+            value = os.getenv(f'DB_{name}', default)
+            return os.getenv(f'DB_REPLICA_{name}', value) if replica else value
+
+        self.replica = replica
+        self.dsn = {
+            'host': setting('HOST', 'localhost'),
+            'database': setting('NAME', 'armind_db'),
+            'user': setting('USER', 'postgres'),
+            'password': setting('PASSWORD', ''),
+            'port': int(setting('PORT', 5432)),
+            'client_encoding': 'UTF8',
+            'options': '-c client_encoding=UTF8'
+        }
+        self.min_size = int(os.getenv('DB_POOL_MIN_SIZE', 1))
+        self.max_size = max(int(os.getenv('DB_POOL_MAX_SIZE', 10)), 1)
+        self.checkout_timeout = float(os.getenv('DB_POOL_TIMEOUT', 5))
+        self.max_age = float(os.getenv('DB_POOL_MAX_AGE', 1800))
+        # Segundos de inactividad tras los cuales se valida la conexión con SELECT 1
+        # antes de entregarla (0 = validar en cada checkout)
+        self.health_check_after = float(os.getenv('DB_POOL_HEALTH_CHECK_AFTER', 10))
+
+
+class _PoolEntry:
+    """Conexión física junto con sus marcas de tiempo"""
+
+    __slots__ = ('connection', 'created_at', 'last_used')
+
+    def __init__(self, connection):
+        now = time.monotonic()
+        self.connection = connection
+        self.created_at = now
+        self.last_used = now
+
+
+class PooledConnection:
+    """Proxy de una conexión del pool.
+
+    Se comporta como una conexión psycopg2 normal, pero ``close()`` la devuelve
+    al pool en lugar de cerrarla, de modo que el código existente que hace
+    ``connection.close()`` al final de cada ruta sigue funcionando sin cambios.
+    """
+
+    def __init__(self, pool, entry):
+        object.__setattr__(self, '_pool', pool)
+        object.__setattr__(self, '_entry', entry)
+
+    @property
+    def closed(self):
+        entry = self._entry
+        return 1 if entry is None else entry.connection.closed
+
+    def close(self):
+        """Devolver la conexión al pool"""
+        entry = self._entry
+        if entry is not None:
+            object.__setattr__(self, '_entry', None)
+            self._pool.release(entry)
+
+    def detach(self):
+        """Obtener la conexión física y sacarla definitivamente del pool"""
+        entry = self._entry
+        object.__setattr__(self, '_entry', None)
+        self._pool.forget(entry)
+        return entry.connection
+
+    def _raw(self):
+        entry = self._entry
+        if entry is None:
+            raise psycopg2.InterfaceError('connection already returned to pool')
+        return entry.connection
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self._raw(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._raw(), name, value)
+
+    def __enter__(self):
+        self._raw().__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return self._raw().__exit__(exc_type, exc_value, traceback)
+
+    def __del__(self):
+        # Red de seguridad para rutas que no cierran la conexión en caso de error
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """Pool de conexiones thread-safe con límites, expiración y métricas"""
+
+    def __init__(self, config: Optional[PoolConfig] = None):
+        self.config = config or PoolConfig()
+        self.pid = os.getpid()
+        self._idle = deque()
+        self._in_use = 0
+        self._total = 0
+        self._cond = threading.Condition()
+        self._stats = {
+            'checkouts': 0,
+            'waits': 0,
+            'timeouts': 0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0,
+            'connections_created': 0,
+            'connections_recycled': 0,
+            'health_check_failures': 0
+        }
+
+        for _ in range(min(self.config.min_size, self.config.max_size)):
+            try:
+                self._idle.append(self._connect())
+                self._total += 1
+            except psycopg2.Error as e:
+                logger.warning(f"⚠️ No se pudo precalentar el pool de conexiones: {e}")
+                break
+
+    def _connect(self) -> _PoolEntry:
+        connection = psycopg2.connect(**self.config.dsn)
+        self._stats['connections_created'] += 1
+        return _PoolEntry(connection)
+
+    def _is_expired(self, entry: _PoolEntry, now: float) -> bool:
+        return self.config.max_age > 0 and now - entry.created_at > self.config.max_age
+
+    def _is_healthy(self, entry: _PoolEntry, now: float) -> bool:
+        connection = entry.connection
+        if connection.closed:
+            return False
+        if now - entry.last_used < self.config.health_check_after:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            connection.rollback()
+            return True
+        except psycopg2.Error:
+            self._stats['health_check_failures'] += 1
+            return False
+
+    def _discard(self, entry: _PoolEntry):
+        try:
+            entry.connection.close()
+        except Exception:
+            pass
+
+    def getconn(self, cursor_factory=None, timeout: Optional[float] = None) -> PooledConnection:
+        """Obtener una conexión del pool, esperando como máximo ``timeout`` segundos"""
+        timeout = self.config.checkout_timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+        waited = False
+
+        while True:
+            entry = None
+            with self._cond:
+                while not self._idle and self._total >= self.config.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats['timeouts'] += 1
+                        raise PoolTimeout(
+                            f"Pool de conexiones agotado ({self.config.max_size} en uso) "
+                            f"tras {timeout:.1f}s de espera"
+                        )
+                    waited = True
+                    self._cond.wait(remaining)
+
+                if self._idle:
+                    entry = self._idle.pop()
+                else:
+                    # Reservar el cupo antes de conectar fuera del lock
+                    self._total += 1
+                self._in_use += 1
+
+            now = time.monotonic()
+            if entry is None:
+                try:
+                    entry = self._connect()
+                except Exception:
+                    with self._cond:
+                        self._total -= 1
+                        self._in_use -= 1
+                        self._cond.notify()
+                    raise
+            else:
+                expired = self._is_expired(entry, now)
+                if not expired and self._is_healthy(entry, now):
+                    break
+                if expired:
+                    self._stats['connections_recycled'] += 1
+                self._discard(entry)
+                with self._cond:
+                    self._total -= 1
+                    self._in_use -= 1
+                    self._cond.notify()
+                continue
+
+            break
+
+        wait_time = time.monotonic() - started
+        with self._cond:
+            self._stats['checkouts'] += 1
+            if waited:
+                self._stats['waits'] += 1
+            self._stats['wait_time_total'] += wait_time
+            self._stats['wait_time_max'] = max(self._stats['wait_time_max'], wait_time)
+
+        entry.connection.cursor_factory = cursor_factory
+        return PooledConnection(self, entry)
+
+    def release(self, entry: _PoolEntry):
+        """Devolver una conexión al pool, descartándola si quedó inutilizable"""
+        connection = entry.connection
+        reusable = not connection.closed
+        if reusable:
+            try:
+                status = connection.get_transaction_status()
+                if status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    connection.rollback()
+                if connection.autocommit:
+                    connection.autocommit = False
+            except psycopg2.Error:
+                reusable = False
+
+        now = time.monotonic()
+        if reusable and self._is_expired(entry, now):
+            self._stats['connections_recycled'] += 1
+            reusable = False
+
+        with self._cond:
+            self._in_use -= 1
+            if reusable and os.getpid() == self.pid:
+                entry.last_used = now
+                self._idle.append(entry)
+            else:
+                self._total -= 1
+            self._cond.notify()
+
+        if not reusable:
+            self._discard(entry)
+
+    def forget(self, entry: _PoolEntry):
+        """Liberar el cupo de una conexión que el llamador se quedó"""
+        with self._cond:
+            self._in_use -= 1
+            self._total -= 1
+            self._cond.notify()
+
+    def closeall(self):
+        """Cerrar todas las conexiones inactivas del pool"""
+        with self._cond:
+            while self._idle:
+                self._discard(self._idle.pop())
+                self._total -= 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Obtener métricas de saturación y tiempos de espera del pool"""
+        with self._cond:
+            stats = dict(self._stats)
+            checkouts = stats['checkouts']
+            stats.update({
+                'pid': self.pid,
+                'max_size': self.config.max_size,
+                'size': self._total,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'saturation': round(self._in_use / self.config.max_size * 100, 2),
+                'wait_time_avg_ms': round(stats['wait_time_total'] / checkouts * 1000, 3) if checkouts else 0.0,
+                'wait_time_max_ms': round(stats['wait_time_max'] * 1000, 3)
+            })
+            del stats['wait_time_total']
+            del stats['wait_time_max']
+            return stats
+
+
+# Pool global del proceso (uno por worker de gunicorn)
+_pool = None
+_replica_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """Obtener el pool del proceso actual, recreándolo después de un fork"""
+    global _pool
+    pool = _pool
+    if pool is not None and pool.pid == os.getpid():
+        return pool
+
+    with _pool_lock:
+        if _pool is None or _pool.pid != os.getpid():
+            # Las conexiones heredadas del proceso padre no se pueden compartir
+            _pool = ConnectionPool()
+            logger.info(f"✅ Pool de conexiones creado (pid {_pool.pid}, máx {_pool.config.max_size})")
+        return _pool
+
+
+def get_pooled_connection(cursor_factory=None, timeout: Optional[float] = None) -> PooledConnection:
+    """Obtener una conexión del pool del proceso"""
+    return get_pool().getconn(cursor_factory=cursor_factory, timeout=timeout)
+
+
+def get_replica_pool() -> ConnectionPool:
+    """Pool de la réplica del proceso actual (recreado después de un fork)"""
+    global _replica_pool
+    pool = _replica_pool
+    if pool is not None and pool.pid == os.getpid():
+        return pool
+
+    with _pool_lock:
+        if _replica_pool is None or _replica_pool.pid != os.getpid():
+            _replica_pool = ConnectionPool(PoolConfig(replica=True))
+            logger.info(f"✅ Pool de la réplica creado (pid {_replica_pool.pid}, máx {_replica_pool.config.max_size})")
+        return _replica_pool
+
+
+class ReplicaMonitor:
+    """Atraso de la réplica medido como mucho cada ``check_interval`` segundos.
+
+    Si la réplica falla o se atrasa más de ``max_lag`` se deja de usar hasta la
+    siguiente medición, y las lecturas vuelven al primario.
+    """
+
+    def __init__(self, max_lag: float = None, check_interval: float = None):
+        self.max_lag = DB_REPLICA_MAX_LAG if max_lag is None else max_lag
+        self.check_interval = DB_REPLICA_LAG_CHECK_INTERVAL if check_interval is None else check_interval
+        self.lag: Optional[float] = None
+        self.usable = False
+        self.checked_at: Optional[float] = None
+        self._lock = threading.RLock()
+        self.stats = {'lag_checks': 0, 'fallbacks': 0, 'errors': 0}
+
+    def _is_fresh(self, now: float) -> bool:
+        return self.checked_at is not None and now - self.checked_at < self.check_interval
+
+    def skip(self) -> bool:
+        """True si la última medición reciente descartó la réplica"""
+        if self._is_fresh(time.monotonic()) and not self.usable:
+            self.stats['fallbacks'] += 1
+            return True
+        return False
+
+    def check(self, connection) -> bool:
+        """Medir el atraso con ``connection`` si la medición anterior venció"""
+        with self._lock:
+            now = time.monotonic()
+            if not self._is_fresh(now):
+                try:
+                    with connection.cursor(cursor_factory=psycopg2.extensions.cursor) as cursor:
+                        cursor.execute(REPLICA_LAG_SQL)
+                        self.lag = float(cursor.fetchone()[0])
+                    connection.rollback()
+                    self.usable = self.lag <= self.max_lag
+                    if not self.usable:
+                        logger.warning(f"⚠️ Réplica atrasada {self.lag:.1f}s: lecturas al primario")
+                except psycopg2.Error as e:
+                    self.mark_failed(e)
+                    return False
+                self.stats['lag_checks'] += 1
+                self.checked_at = now
+            if not self.usable:
+                self.stats['fallbacks'] += 1
+            return self.usable
+
+    def mark_failed(self, error) -> None:
+        logger.warning(f"⚠️ Réplica no disponible, lecturas al primario: {error}")
+        with self._lock:
+            self.usable = False
+            self.checked_at = time.monotonic()
+            self.stats['errors'] += 1
+            self.stats['fallbacks'] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(self.stats, lag_seconds=self.lag, usable=self.usable, max_lag=self.max_lag)
+
+
+_replica_monitor = ReplicaMonitor()
+
+
+def get_replica_connection(cursor_factory=None, timeout: Optional[float] = None) -> Optional[PooledConnection]:
+    """Conexión de la réplica si está configurada y al día; None para usar el primario"""
+    if not replica_configured() or _replica_monitor.skip():
+        return None
+    try:
+        connection = get_replica_pool().getconn(cursor_factory=cursor_factory, timeout=timeout)
+    except psycopg2.Error as e:
+        _replica_monitor.mark_failed(e)
+        return None
+    if not _replica_monitor.check(connection):
+        connection.close()
+        return None
+    return connection
+
+
+def get_pool_stats() -> Dict[str, Any]:
+    """Obtener métricas del pool del proceso"""
+    if _pool is None or _pool.pid != os.getpid():
+        return {'pid': os.getpid(), 'size': 0, 'in_use': 0, 'idle': 0, 'saturation': 0.0}
+    return _pool.get_stats()
+
+
+def get_replica_stats() -> Dict[str, Any]:
+    """Métricas del pool de la réplica y de su atraso"""
+    if not replica_configured():
+        return {'configured': False}
+    stats = {'configured': True, 'monitor': _replica_monitor.get_stats()}
+    if _replica_pool is not None and _replica_pool.pid == os.getpid():
+        stats['pool'] = _replica_pool.get_stats()
+    return stats
@@ -0,0 +1,216 @@
+"""Snapshot cacheado de derechos de uso (rol, plan, límites y consumo) por usuario"""
+
+import os
+import logging
+from dataclasses import dataclass, field, asdict
+from datetime import datetime
+from decimal import Decimal
+from typing import Optional, Dict, Any, Tuple
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+from cache_service import TwoTierCache
+from prepared_statements import prepared
+from request_db import call_after_commit, get_cache_fill_connection
+from subscription_system import SUBSCRIPTION_PLANS
+
+logger = logging.getLogger(__name__)
+
+# Campos de la suscripción que las plantillas usan como datetime
+_SUBSCRIPTION_DATE_FIELDS = ('start_date', 'end_date', 'created_at', 'updated_at',
+                             'expires_at', 'subscription_end_date')
+
+# Rol, suscripción activa y último contador de cada recurso del período en una sola consulta
+ENTITLEMENT_QUERY = """
+    SELECT u.id AS user_id, u.role,
+           u.current_plan, u.subscription_status, u.subscription_end_date,
+           s.id, s.plan_type, s.status, s.start_date, s.end_date,
+           s.payment_method, s.transaction_id, s.amount, s.currency,
+           s.created_at, s.updated_at,
+           COALESCE((
+               SELECT json_object_agg(latest.resource_type, latest.used_count)
+               FROM (
+                   SELECT DISTINCT ON (ut.resource_type) ut.resource_type, ut.used_count
+                   FROM usage_tracking ut
+                   WHERE ut.user_id = u.id AND ut.reset_date >= s.start_date
+                   ORDER BY ut.resource_type, ut.created_at DESC
+               ) latest
+           ), '{}'::json) AS usage
+    FROM users u
+    LEFT JOIN LATERAL (
+        SELECT * FROM subscriptions
+        WHERE user_id = u.id AND status = 'active'
+        ORDER BY start_date DESC
+        LIMIT 1
+    ) s ON TRUE
+    WHERE u.id = %s
+"""
+ENTITLEMENT_STATEMENT = prepared('entitlements', ENTITLEMENT_QUERY, ('integer',))
+
+
+@dataclass
+class EntitlementSnapshot:
+    """Derechos de uso de un usuario en un instante dado"""
+    user_id: int
+    role: str = 'user'
+    plan_type: Optional[str] = None
+    limits: Dict[str, int] = field(default_factory=dict)
+    period_start: Optional[datetime] = None
+    usage: Dict[str, int] = field(default_factory=dict)
+    subscription: Optional[Dict[str, Any]] = None
+    computed_at: datetime = field(default_factory=datetime.now)
+
+    @property
+    def is_admin(self) -> bool:
+        return self.role == 'admin'
+
+    def get_usage(self, resource_type: str) -> int:
+        """Uso actual del recurso en el período (0 para administradores o sin suscripción)"""
+        if self.is_admin or not self.subscription:
+            return 0
+        return int(self.usage.get(resource_type, 0))
+
+    def check(self, action_type: str) -> Tuple[bool, str]:
+        """Misma semántica que check_user_limits, sin consultar la base de datos"""
+        if self.is_admin:
+            return True, "Acceso administrativo completo"
+        if not self.subscription:
+            return False, "No tienes una suscripción activa"
+        if self.plan_type not in SUBSCRIPTION_PLANS:
+            return False, "Plan de suscripción no válido"
+        if action_type in self.limits and self.get_usage(action_type) >= self.limits[action_type]:
+            return False, f"Has alcanzado el límite de {self.limits[action_type]} para {action_type}"
+        return True, "Acción permitida"
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serializar a JSON para Redis"""
+        data = asdict(self)
+        data['period_start'] = _encode_value(self.period_start)
+        data['computed_at'] = _encode_value(self.computed_at)
+        if self.subscription:
+            data['subscription'] = {key: _encode_value(value) for key, value in self.subscription.items()}
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'EntitlementSnapshot':
+        """Reconstruir desde el JSON guardado en Redis"""
+        subscription = data.get('subscription')
+        if subscription:
+            subscription = dict(subscription)
+            for key in _SUBSCRIPTION_DATE_FIELDS:
+                subscription[key] = _parse_datetime(subscription.get(key))
+        return cls(
+            user_id=data['user_id'],
+            role=data.get('role') or 'user',
+            plan_type=data.get('plan_type'),
+            limits=data.get('limits') or {},
+            period_start=_parse_datetime(data.get('period_start')),
+            usage=data.get('usage') or {},
+            subscription=subscription,
+            computed_at=_parse_datetime(data.get('computed_at')) or datetime.now()
+        )
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+def _parse_datetime(value):
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            return value
+    return value
+
+
+_entitlement_cache = TwoTierCache(
+    'entitlements',
+    local_ttl=float(os.getenv('ENTITLEMENT_LOCAL_TTL', 5)),
+    redis_ttl=int(os.getenv('ENTITLEMENT_CACHE_TTL', 60)),
+    max_entries=int(os.getenv('ENTITLEMENT_CACHE_SIZE', 4096)),
+    dump=lambda snapshot: snapshot.to_dict(),
+    load=EntitlementSnapshot.from_dict
+)
+
+
+def load_entitlements(user_id) -> Optional[EntitlementSnapshot]:
+    """Calcular el snapshot del usuario con una sola consulta (en el primario, se cachea)"""
+    try:
+        connection = get_cache_fill_connection(cursor_factory=RealDictCursor)
+    except psycopg2.Error as e:
+        print(f"Error de conexión a la base de datos: {e}")
+        return None
+
+    try:
+        cursor = connection.cursor(cursor_factory=RealDictCursor)
+        ENTITLEMENT_STATEMENT.execute(cursor, (int(user_id),))
+        row = cursor.fetchone()
+        cursor.close()
+        connection.close()
+    except Exception as e:
+        print(f"Error al calcular derechos de uso del usuario: {e}")
+        connection.rollback()
+        connection.close()
+        return None
+
+    if not row:
+        return None
+
+    role = row['role'] or 'user'
+    snapshot = EntitlementSnapshot(user_id=row['user_id'], role=role)
+    if role == 'admin' or row['id'] is None:
+        # Los administradores no necesitan suscripción, tienen acceso completo
+        return snapshot
+
+    plan_type = row['plan_type'] or row['current_plan']
+    snapshot.plan_type = plan_type
+    snapshot.limits = dict(SUBSCRIPTION_PLANS.get(plan_type, {}).get('limits', {}))
+    snapshot.period_start = row['start_date']
+    snapshot.usage = {key: int(value) for key, value in (row['usage'] or {}).items()}
+    snapshot.subscription = {
+        'id': row['id'],
+        'user_id': row['user_id'],
+        'plan_type': row['plan_type'],
+        'status': row['status'],
+        'start_date': row['start_date'],
+        'end_date': row['end_date'],
+        'payment_method': row['payment_method'],
+        'transaction_id': row['transaction_id'],
+        'amount': row['amount'],
+        'currency': row['currency'],
+        'created_at': row['created_at'],
+        'updated_at': row['updated_at'],
+        'expires_at': row['end_date'],  # Alias para compatibilidad con templates
+        'current_plan': row['current_plan'],
+        'subscription_status': row['subscription_status'],
+        'subscription_end_date': row['subscription_end_date']
+    }
+    return snapshot
+
+
+def get_entitlements(user_id) -> Optional[EntitlementSnapshot]:
+    """Obtener el snapshot del usuario desde el cache o calcularlo"""
+    if user_id is None:
+        return None
+    return _entitlement_cache.get_or_load(str(user_id), lambda: load_entitlements(user_id))
+
+
+def invalidate_entitlements(user_id) -> None:
+    """Descartar el snapshot cuando se confirme el cambio de suscripción, rol o consumo.
+
+    Borrarlo antes del COMMIT real del request dejaría que otro worker releyera
+    la fila vieja y la volviera a cachear.
+    """
+    if user_id is not None:
+        call_after_commit(lambda: _entitlement_cache.delete(str(user_id)))
+
+
+def get_entitlement_cache_stats() -> Dict[str, Any]:
+    """Obtener aciertos y fallos del cache de derechos de uso"""
+    return _entitlement_cache.get_stats()
@@ -0,0 +1,262 @@
+"""Procesamiento de imágenes subidas (blog y contenido del panel)
+
+Al subir una imagen se decodifica una sola vez con Pillow: se valida el formato
+y el tamaño en píxeles, se aplica la orientación EXIF, se eliminan los
+metadatos (EXIF/XMP, p.ej. la ubicación de fotos de teléfono) y se limita el
+lado mayor a ``IMAGE_MAX_DIMENSION``. Ese resultado es la imagen original que
+se guarda y se sirve en ``/image/<id>``.
+
+Las variantes WebP (miniatura, mediana y el original completo) se generan en
+un pool de hilos a partir de la imagen ya decodificada, una vez que el request
+confirma la subida, de modo que la subida responde sin esperarlas; mientras
+tanto se sirve el original.
+
+Generar las variantes que falten (imágenes anteriores o subidas interrumpidas):
+    python image_ingest.py variants [--limit N]
+"""
+
+import os
+import io
+import sys
+import logging
+import argparse
+import threading
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from db_pool import get_pooled_connection
+from image_store import add_image_variant, get_image_storage, invalidate_image_meta
+from request_db import call_after_commit
+
+logger = logging.getLogger(__name__)
+
+IMAGE_MAX_DIMENSION = int(os.getenv('IMAGE_MAX_DIMENSION', 2560))
+IMAGE_MAX_PIXELS = int(os.getenv('IMAGE_MAX_PIXELS', 40_000_000))
+IMAGE_WEBP_QUALITY = int(os.getenv('IMAGE_WEBP_QUALITY', 80))
+IMAGE_INGEST_WORKERS = int(os.getenv('IMAGE_INGEST_WORKERS', 2))
+
+# Variante -> lado mayor máximo (None: mismas dimensiones que el original)
+IMAGE_VARIANTS = {
+    'thumb': 320,
+    'medium': 1024,
+    'webp': None,
+}
+
+ALLOWED_FORMATS = {
+    'JPEG': 'image/jpeg',
+    'PNG': 'image/png',
+    'GIF': 'image/gif',
+    'WEBP': 'image/webp',
+}
+
+
+class ImageValidationError(ValueError):
+    """El archivo subido no es una imagen aceptada"""
+
+
+@dataclass
+class PreparedImage:
+    """Imagen validada y lista para guardar.
+
+    ``image`` es la imagen decodificada para generar variantes; es None en las
+    animaciones, que se guardan tal como llegaron y no tienen variantes.
+    """
+    data: bytes
+    content_type: str
+    width: int
+    height: int
+    image: Optional[Image.Image] = None
+
+
+def _open_image(fileobj) -> Image.Image:
+    fileobj.seek(0)
+    try:
+        with warnings.catch_warnings():
+            # Una imagen de millones de píxeles en pocos KB es un ataque de descompresión
+            warnings.simplefilter('error', Image.DecompressionBombWarning)
+            image = Image.open(fileobj)
+            if image.format not in ALLOWED_FORMATS:
+                raise ImageValidationError(f"Formato de imagen no permitido: {image.format}")
+            if image.width * image.height > IMAGE_MAX_PIXELS:
+                raise ImageValidationError(f"La imagen es demasiado grande: {image.width}x{image.height}")
+            image.load()
+            return image
+    except ImageValidationError:
+        raise
+    except (UnidentifiedImageError, Image.DecompressionBombError, Image.DecompressionBombWarning,
+            OSError, SyntaxError, ValueError) as e:
+        raise ImageValidationError(f"El archivo no es una imagen válida: {e}")
+
+
+def _encode(image: Image.Image, image_format: str, icc_profile: Optional[bytes]) -> bytes:
+    """Codificar sin EXIF ni XMP (se conserva el perfil de color)"""
+    options = {'icc_profile': icc_profile} if icc_profile else {}
+    if image_format == 'JPEG':
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        options.update(quality=85, optimize=True, progressive=True)
+    elif image_format == 'WEBP':
+        image = _webp_mode(image)
+        options.update(quality=IMAGE_WEBP_QUALITY, method=4)
+    elif image_format == 'PNG':
+        options.update(optimize=False)
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format, **options)
+    return buffer.getvalue()
+
+
+def _webp_mode(image: Image.Image) -> Image.Image:
+    if image.mode in ('RGB', 'RGBA'):
+        return image
+    has_alpha = image.mode in ('LA', 'PA') or 'transparency' in image.info
+    return image.convert('RGBA' if has_alpha else 'RGB')
+
+
+def prepare_image(fileobj) -> PreparedImage:
+    """Validar, orientar, limpiar metadatos y acotar el tamaño de una subida"""
+    image = _open_image(fileobj)
+    image_format = image.format
+    content_type = ALLOWED_FORMATS[image_format]
+
+    if getattr(image, 'is_animated', False):
+        # Re-codificar todos los cuadros no vale la pena: se guarda como llegó
+        fileobj.seek(0)
+        return PreparedImage(fileobj.read(), content_type, image.width, image.height)
+
+    icc_profile = image.info.get('icc_profile')
+    image = ImageOps.exif_transpose(image)
+    if max(image.size) > IMAGE_MAX_DIMENSION:
+        image.thumbnail((IMAGE_MAX_DIMENSION, IMAGE_MAX_DIMENSION), Image.LANCZOS)
+    image.info = {key: value for key, value in image.info.items() if key == 'transparency'}
+    if icc_profile:
+        image.info['icc_profile'] = icc_profile
+
+    data = _encode(image, image_format, icc_profile)
+    return PreparedImage(data, content_type, image.width, image.height, image)
+
+
+def generate_variants(image: Image.Image) -> List[Tuple[str, bytes, int, int]]:
+    """Variantes WebP ``(nombre, bytes, ancho, alto)``.
+
+    Se omiten las que quedarían del mismo tamaño que la variante completa.
+    """
+    icc_profile = image.info.get('icc_profile')
+    variants = []
+    for name, max_side in IMAGE_VARIANTS.items():
+        if max_side is not None and max(image.size) <= max_side:
+            continue
+        variant = image
+        if max_side is not None:
+            variant = image.copy()
+            variant.thumbnail((max_side, max_side), Image.LANCZOS)
+        data = _encode(variant, 'WEBP', icc_profile)
+        variants.append((name, data, variant.width, variant.height))
+    return variants
+
+
+def store_variants(image_id: int, image: Image.Image) -> int:
+    """Generar y registrar las variantes de una imagen ya guardada"""
+    variants = generate_variants(image)
+    if not variants:
+        return 0
+    connection = get_pooled_connection()
+    try:
+        for name, data, width, height in variants:
+            add_image_variant(connection, image_id, name, io.BytesIO(data), 'image/webp', width, height)
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+    invalidate_image_meta(image_id)
+    return len(variants)
+
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Executor del proceso (los hilos no sobreviven al fork de gunicorn)"""
+    global _executor, _executor_pid
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers=IMAGE_INGEST_WORKERS, thread_name_prefix='image-ingest')
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def _store_variants_task(image_id: int, image: Image.Image) -> None:
+    try:
+        count = store_variants(image_id, image)
+        logger.info(f"Variantes generadas para la imagen {image_id}: {count}")
+    except Exception as e:
+        logger.error(f"Error generando variantes de la imagen {image_id}: {e}")
+
+
+def schedule_variants(image_id: int, prepared: PreparedImage) -> None:
+    """Generar las variantes en segundo plano cuando se confirme la subida.
+
+    El hilo guarda las variantes con otra conexión del pool, que no ve la fila
+    de ``uploaded_images`` hasta el COMMIT real del request (la FK fallaría); si
+    el request se revierte no se generan.
+    """
+    if prepared.image is None:
+        return
+    image = prepared.image
+    call_after_commit(lambda: _get_executor().submit(_store_variants_task, image_id, image))
+
+
+def backfill_variants(connection, limit: Optional[int] = None) -> int:
+    """Generar las variantes de las imágenes que no tienen ninguna"""
+    cursor = connection.cursor()
+    try:
+        cursor.execute("""
+            SELECT ui.id, ui.sha256, ui.storage_backend
+            FROM uploaded_images ui
+            WHERE ui.sha256 IS NOT NULL
+              AND NOT EXISTS (SELECT 1 FROM uploaded_image_variants v WHERE v.image_id = ui.id)
+            ORDER BY ui.id
+            LIMIT %s
+        """, (limit,))
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+    connection.rollback()
+
+    processed = 0
+    for image_id, digest, backend in rows:
+        try:
+            with get_image_storage(backend).open(digest) as stored:
+                prepared = prepare_image(io.BytesIO(stored.read()))
+            if prepared.image is not None:
+                store_variants(image_id, prepared.image)
+            processed += 1
+        except Exception as e:
+            print(f"⚠️ Imagen {image_id}: {e}")
+    return processed
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Variantes de imágenes subidas')
+    parser.add_argument('command', choices=['variants'])
+    parser.add_argument('--limit', type=int, help='cantidad máxima de imágenes a procesar')
+    args = parser.parse_args(argv)
+
+    connection = get_pooled_connection()
+    try:
+        processed = backfill_variants(connection, args.limit)
+    finally:
+        connection.close()
+    print(f"✅ Imágenes procesadas: {processed}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
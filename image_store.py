@@ -0,0 +1,503 @@
+"""Almacenamiento de imágenes direccionado por contenido
+
+Cada imagen se guarda una sola vez bajo su SHA-256, en el sistema de archivos
+local o en S3 (``IMAGE_STORAGE_BACKEND``). La tabla ``uploaded_images`` conserva
+solo los metadatos: una fila por subida con el hash, el backend y el tipo de
+contenido, así que dos subidas del mismo archivo comparten el objeto y
+``/image/<id>`` sigue funcionando igual. Las variantes redimensionadas
+(``uploaded_image_variants``, ver image_ingest.py) se guardan de la misma forma. El hash es además el ETag fuerte con el
+que se responden ``If-None-Match`` (304) y los pedidos por rangos (206).
+
+Las filas anteriores a la migración 0009 todavía tienen los bytes en
+``image_data``; la migración los mueve al almacenamiento y mientras tanto se
+siguen sirviendo desde la base.
+
+Los objetos se escriben antes que las filas y se borran después del COMMIT:
+si la transacción se revierte puede quedar un objeto huérfano (inofensivo, y
+una nueva subida del mismo contenido lo reutiliza), pero nunca una fila que
+apunte a un objeto que ya no existe.
+"""
+
+import os
+import hashlib
+import logging
+import tempfile
+from typing import Dict, Any, Optional, Tuple, BinaryIO
+
+from flask import Response, request
+from psycopg2.extras import RealDictCursor
+from werkzeug.wsgi import wrap_file
+
+from cache_service import TwoTierCache
+from db_pool import get_pooled_connection
+from request_db import call_after_commit
+
+logger = logging.getLogger(__name__)
+
+IMAGE_STORAGE_BACKEND = os.getenv('IMAGE_STORAGE_BACKEND', 'local')
+IMAGE_STORAGE_DIR = os.getenv('IMAGE_STORAGE_DIR', os.path.join(os.getenv('UPLOAD_FOLDER', 'uploads'), 'images'))
+IMAGE_S3_PREFIX = os.getenv('IMAGE_S3_PREFIX', 'images/')
+
+# Una URL /image/<id> nunca cambia de contenido
+IMAGE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+_CHUNK_SIZE = 64 * 1024
+
+
+class LocalImageStorage:
+    """Objetos en ``<raíz>/ab/cd/<sha256>``"""
+
+    name = 'local'
+
+    def __init__(self, root: str = None):
+        self.root = root or IMAGE_STORAGE_DIR
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def exists(self, digest: str) -> bool:
+        return os.path.exists(self._path(digest))
+
+    def put(self, digest: str, fileobj: BinaryIO, content_type: str = None) -> None:
+        """Guardar el objeto si no existe (escritura atómica con rename)"""
+        path = self._path(digest)
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as target:
+                fileobj.seek(0)
+                for chunk in iter(lambda: fileobj.read(_CHUNK_SIZE), b''):
+                    target.write(chunk)
+            os.replace(temp_path, path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def open(self, digest: str, start: int = 0, length: int = None) -> BinaryIO:
+        fileobj = open(self._path(digest), 'rb')
+        if start:
+            fileobj.seek(start)
+        return fileobj
+
+    def delete(self, digest: str) -> None:
+        try:
+            os.remove(self._path(digest))
+        except FileNotFoundError:
+            pass
+
+
+class S3ImageStorage:
+    """Objetos en ``s3://<bucket>/<prefijo><sha256>`` (credenciales de s3_utils)"""
+
+    name = 's3'
+
+    def __init__(self, bucket: str = None, prefix: str = None, client=None):
+        from s3_utils import S3_CONFIG
+        self.bucket = bucket or S3_CONFIG['bucket_name']
+        self.prefix = IMAGE_S3_PREFIX if prefix is None else prefix
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            from s3_utils import get_s3_client
+            self._client = get_s3_client()
+            if self._client is None:
+                raise RuntimeError("No se pudo crear el cliente S3 para imágenes")
+        return self._client
+
+    def _key(self, digest: str) -> str:
+        return f"{self.prefix}{digest}"
+
+    def exists(self, digest: str) -> bool:
+        from botocore.exceptions import ClientError
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._key(digest))
+            return True
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+
+    def put(self, digest: str, fileobj: BinaryIO, content_type: str = None) -> None:
+        if self.exists(digest):
+            return
+        fileobj.seek(0)
+        extra_args = {'ContentType': content_type} if content_type else None
+        self.client.upload_fileobj(fileobj, self.bucket, self._key(digest), ExtraArgs=extra_args)
+
+    def open(self, digest: str, start: int = 0, length: int = None) -> BinaryIO:
+        """Cuerpo del objeto; con ``length`` se pide a S3 solo ese rango"""
+        params = {'Bucket': self.bucket, 'Key': self._key(digest)}
+        if length is not None:
+            params['Range'] = f"bytes={start}-{start + length - 1}"
+        return self.client.get_object(**params)['Body']
+
+    def delete(self, digest: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(digest))
+
+
+_STORAGE_CLASSES = {
+    LocalImageStorage.name: LocalImageStorage,
+    S3ImageStorage.name: S3ImageStorage,
+}
+_storages: Dict[str, Any] = {}
+
+
+def get_image_storage(name: str = None):
+    """Backend de almacenamiento por nombre (por defecto IMAGE_STORAGE_BACKEND)"""
+    name = name or IMAGE_STORAGE_BACKEND
+    if name not in _storages:
+        if name not in _STORAGE_CLASSES:
+            raise ValueError(f"Backend de imágenes desconocido: {name}")
+        _storages[name] = _STORAGE_CLASSES[name]()
+    return _storages[name]
+
+
+def _digest_lock_key(digest: str) -> int:
+    return int(digest[:15], 16)
+
+
+def _lock_digest(cursor, digest: str) -> None:
+    """Serializar altas y bajas del mismo contenido hasta el fin de la transacción
+    (una baja no puede borrar el objeto que otra subida acaba de reutilizar)"""
+    cursor.execute("SELECT pg_advisory_xact_lock(%s)", (_digest_lock_key(digest),))
+
+
+def spool_upload(fileobj: BinaryIO) -> Tuple[str, BinaryIO, int]:
+    """Copiar la subida a un archivo temporal calculando su SHA-256.
+
+    Retorna ``(hash, archivo, tamaño)``; el archivo queda en la posición 0.
+    """
+    digest = hashlib.sha256()
+    spooled = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+    size = 0
+    fileobj.seek(0)
+    for chunk in iter(lambda: fileobj.read(_CHUNK_SIZE), b''):
+        digest.update(chunk)
+        spooled.write(chunk)
+        size += len(chunk)
+    spooled.seek(0)
+    return digest.hexdigest(), spooled, size
+
+
+def store_image(connection, fileobj: BinaryIO, filename: str, original_filename: str,
+                content_type: str, uploaded_by: Optional[int] = None) -> int:
+    """Guardar el contenido (si es nuevo) y registrar la subida. No hace commit.
+
+    Retorna el id de ``uploaded_images``. Si la transacción se revierte el objeto
+    queda huérfano en el almacenamiento; no se barre porque no lo apunta ninguna
+    fila y la próxima subida del mismo contenido lo reutiliza.
+    """
+    digest, spooled, size = spool_upload(fileobj)
+    storage = get_image_storage()
+    cursor = connection.cursor(cursor_factory=RealDictCursor)
+    try:
+        _lock_digest(cursor, digest)
+        with spooled:
+            storage.put(digest, spooled, content_type)
+        cursor.execute("""
+            INSERT INTO uploaded_images (filename, original_filename, content_type, file_size,
+                                         sha256, storage_backend, uploaded_by)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+            RETURNING id
+        """, (filename, original_filename, content_type, size, digest, storage.name, uploaded_by))
+        return cursor.fetchone()['id']
+    finally:
+        cursor.close()
+
+
+def _is_referenced(cursor, digest: str) -> bool:
+    cursor.execute("""
+        SELECT 1 FROM uploaded_images WHERE sha256 = %s
+        UNION ALL
+        SELECT 1 FROM uploaded_image_variants WHERE sha256 = %s
+        LIMIT 1
+    """, (digest, digest))
+    return cursor.fetchone() is not None
+
+
+def add_image_variant(connection, image_id: int, variant: str, fileobj: BinaryIO, content_type: str,
+                      width: int, height: int) -> str:
+    """Guardar una variante de la imagen (ver image_ingest.py). No hace commit.
+
+    Retorna el hash de la variante.
+    """
+    digest, spooled, size = spool_upload(fileobj)
+    storage = get_image_storage()
+    cursor = connection.cursor(cursor_factory=RealDictCursor)
+    try:
+        _lock_digest(cursor, digest)
+        with spooled:
+            storage.put(digest, spooled, content_type)
+        cursor.execute("""
+            INSERT INTO uploaded_image_variants (image_id, variant, sha256, storage_backend,
+                                                 content_type, file_size, width, height)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+            ON CONFLICT (image_id, variant) DO NOTHING
+        """, (image_id, variant, digest, storage.name, content_type, size, width, height))
+    finally:
+        cursor.close()
+    return digest
+
+
+def delete_image(connection, image_id: int) -> bool:
+    """Eliminar la subida con sus variantes. No hace commit.
+
+    Los objetos que quedan sin referencias se eliminan del almacenamiento
+    recién cuando se confirma la transacción (ver _delete_unreferenced_objects).
+    """
+    cursor = connection.cursor(cursor_factory=RealDictCursor)
+    try:
+        cursor.execute("""
+            SELECT sha256, storage_backend FROM uploaded_images WHERE id = %s AND sha256 IS NOT NULL
+            UNION
+            SELECT sha256, storage_backend FROM uploaded_image_variants WHERE image_id = %s
+        """, (image_id, image_id))
+        objects = {row['sha256']: row['storage_backend'] for row in cursor.fetchall()}
+        # Siempre en el mismo orden para no bloquearse con otra baja
+        for digest in sorted(objects):
+            _lock_digest(cursor, digest)
+        cursor.execute("DELETE FROM uploaded_images WHERE id = %s", (image_id,))
+        if not cursor.rowcount:
+            return False
+        unreferenced = {digest: backend for digest, backend in objects.items()
+                        if not _is_referenced(cursor, digest)}
+    finally:
+        cursor.close()
+    call_after_commit(lambda: invalidate_image_meta(image_id))
+    if unreferenced:
+        call_after_commit(lambda: _delete_unreferenced_objects(unreferenced))
+    return True
+
+
+def _delete_unreferenced_objects(objects: Dict[str, str]) -> None:
+    """Borrar del almacenamiento los objetos ``{hash: backend}`` de una baja confirmada.
+
+    Corre en otra transacción: vuelve a comprobar las referencias con el candado
+    del hash, porque otra subida pudo reutilizar el contenido entre el COMMIT y
+    este punto. Si el candado está tomado (o algo falla) el objeto se deja.
+    """
+    connection = get_pooled_connection()
+    try:
+        cursor = connection.cursor(cursor_factory=RealDictCursor)
+        for digest in sorted(objects):
+            cursor.execute("SELECT pg_try_advisory_xact_lock(%s) AS locked", (_digest_lock_key(digest),))
+            if cursor.fetchone()['locked'] and not _is_referenced(cursor, digest):
+                get_image_storage(objects[digest]).delete(digest)
+        cursor.close()
+        connection.commit()
+    except Exception as e:
+        connection.rollback()
+        logger.warning(f"No se pudieron eliminar objetos de imagen sin referencias: {e}")
+    finally:
+        connection.close()
+
+
+def _load_image_meta(connection, image_id: int) -> Optional[Dict[str, Any]]:
+    cursor = connection.cursor(cursor_factory=RealDictCursor)
+    try:
+        cursor.execute("""
+            SELECT id, filename, content_type, file_size, sha256, storage_backend
+            FROM uploaded_images
+            WHERE id = %s
+        """, (image_id,))
+        row = cursor.fetchone()
+        if not row:
+            return None
+        meta = dict(row)
+        meta['variants'] = {}
+        if meta['sha256']:
+            cursor.execute("""
+                SELECT variant, sha256, storage_backend, content_type, file_size, width, height
+                FROM uploaded_image_variants
+                WHERE image_id = %s
+            """, (image_id,))
+            meta['variants'] = {variant['variant']: dict(variant) for variant in cursor.fetchall()}
+        return meta
+    finally:
+        cursor.close()
+
+
+# Los metadatos de una subida solo cambian al agregarse variantes o al eliminarla;
+# el TTL local acota cuánto tarda un worker en ver variantes recién generadas
+_image_meta_cache = TwoTierCache('image_meta', local_ttl=60, redis_ttl=3600, max_entries=2048)
+
+
+def get_image_meta(connection, image_id: int) -> Optional[Dict[str, Any]]:
+    """Metadatos de la imagen (sin los bytes). Las filas sin migrar no se cachean."""
+    meta = _image_meta_cache.get(str(image_id))
+    if meta is None:
+        meta = _load_image_meta(connection, image_id)
+        if meta and meta.get('sha256'):
+            _image_meta_cache.set(str(image_id), meta)
+    return meta
+
+
+def invalidate_image_meta(image_id: int) -> None:
+    _image_meta_cache.delete(str(image_id))
+
+
+# Variantes de la más chica a la más grande; si falta la pedida se usa la siguiente
+VARIANT_ORDER = ('thumb', 'medium', 'webp')
+
+
+def _accepts_webp(accept_mimetypes) -> bool:
+    """Solo si el cliente lo anuncia explícitamente (*/* no alcanza)"""
+    return any(mimetype == 'image/webp' and quality > 0 for mimetype, quality in accept_mimetypes)
+
+
+def select_image_variant(meta: Dict[str, Any], requested: Optional[str],
+                         accept_mimetypes) -> Tuple[Dict[str, Any], bool]:
+    """Elegir qué objeto servir para ``/image/<id>``.
+
+    ``requested`` es el parámetro ``?v=`` (thumb, medium, webp u original). Sin él
+    se sirve la variante WebP a los clientes que la aceptan. Retorna
+    ``(metadatos del objeto, la elección depende de Accept)``.
+    """
+    variants = meta.get('variants') or {}
+    negotiated = requested not in VARIANT_ORDER and requested != 'original'
+    if requested == 'original':
+        candidates = ()
+    elif requested in VARIANT_ORDER:
+        candidates = VARIANT_ORDER[VARIANT_ORDER.index(requested):]
+    else:
+        candidates = ('webp',) if _accepts_webp(accept_mimetypes) else ()
+
+    for name in candidates:
+        variant = variants.get(name)
+        if not variant:
+            continue
+        # Una variante WebP nunca debe pesar más que el original completo
+        if name == 'webp' and variant['file_size'] >= meta['file_size']:
+            break
+        stem = os.path.splitext(meta['filename'])[0]
+        return dict(meta, **variant, filename=f"{stem}-{name}.webp"), negotiated
+    return meta, negotiated
+
+
+def _iter_range(fileobj: BinaryIO, length: int):
+    try:
+        remaining = length
+        while remaining > 0:
+            chunk = fileobj.read(min(_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        fileobj.close()
+
+
+def image_response(meta: Dict[str, Any], storage=None) -> Response:
+    """Respuesta para ``/image/<id>`` con ETag, 304 y rangos de bytes"""
+    etag = meta['sha256']
+    size = meta['file_size']
+    headers = {
+        'Content-Disposition': f'inline; filename="{meta["filename"]}"',
+        'Cache-Control': IMAGE_CACHE_CONTROL,
+        'Accept-Ranges': 'bytes',
+    }
+
+    if request.if_none_match.contains(etag):
+        response = Response(status=304, headers=headers)
+        response.set_etag(etag)
+        return response
+
+    # Con If-Range solo se respeta el rango si el ETag sigue siendo el mismo
+    if_range = request.if_range
+    byte_range = None
+    requested = request.range
+    if requested and (if_range.etag == etag or not (if_range.etag or if_range.date)):
+        byte_range = requested.range_for_length(size)
+        # Solo un rango de bytes fuera del archivo es 416; varios rangos u otras
+        # unidades no se soportan y se responde el archivo completo
+        if byte_range is None and requested.units == 'bytes' and len(requested.ranges) == 1:
+            headers['Content-Range'] = f"bytes */{size}"
+            return Response(status=416, headers=headers)
+
+    storage = storage or get_image_storage(meta.get('storage_backend'))
+    if byte_range is None:
+        # Archivo completo: el servidor WSGI puede usar sendfile
+        body = wrap_file(request.environ, storage.open(etag), buffer_size=_CHUNK_SIZE)
+        status, length = 200, size
+    else:
+        start, stop = byte_range
+        length = stop - start
+        body = _iter_range(storage.open(etag, start, length), length)
+        status = 206
+        headers['Content-Range'] = f"bytes {start}-{stop - 1}/{size}"
+
+    response = Response(body, status=status, mimetype=meta['content_type'], headers=headers,
+                        direct_passthrough=True)
+    response.content_length = length
+    response.set_etag(etag)
+    return response
+
+
+def legacy_image_response(connection, meta: Dict[str, Any]) -> Optional[Response]:
+    """Servir una fila que todavía guarda los bytes en ``image_data``"""
+    cursor = connection.cursor(cursor_factory=RealDictCursor)
+    try:
+        cursor.execute("SELECT image_data FROM uploaded_images WHERE id = %s", (meta['id'],))
+        row = cursor.fetchone()
+    finally:
+        cursor.close()
+    if not row or row['image_data'] is None:
+        return None
+    data = bytes(row['image_data'])
+    response = Response(data, mimetype=meta['content_type'], headers={
+        'Content-Disposition': f'inline; filename="{meta["filename"]}"',
+        'Cache-Control': IMAGE_CACHE_CONTROL,
+    })
+    response.set_etag(hashlib.sha256(data).hexdigest())
+    return response.make_conditional(request, accept_ranges=True)
+
+
+def move_image_blobs(connection, batch_size: int = 50) -> int:
+    """Mover los bytes de ``uploaded_images.image_data`` al almacenamiento.
+
+    Pensado para la migración 0009 (autocommit): cada fila se confirma por
+    separado después de guardar el objeto, así que se puede interrumpir y
+    volver a ejecutar. Retorna la cantidad de filas movidas.
+    """
+    storage = get_image_storage()
+    moved = 0
+    last_id = 0
+    cursor = connection.cursor()
+    try:
+        while True:
+            cursor.execute("""
+                SELECT id, image_data, content_type FROM uploaded_images
+                WHERE image_data IS NOT NULL AND id > %s
+                ORDER BY id LIMIT %s
+            """, (last_id, batch_size))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+
+            for image_id, image_data, content_type in rows:
+                data = bytes(image_data)
+                digest = hashlib.sha256(data).hexdigest()
+                # En autocommit el lock de transacción no duraría: se toma el de sesión
+                lock_key = int(digest[:15], 16)
+                cursor.execute("SELECT pg_advisory_lock(%s)", (lock_key,))
+                try:
+                    with tempfile.SpooledTemporaryFile(max_size=1024 * 1024) as spooled:
+                        spooled.write(data)
+                        storage.put(digest, spooled, content_type)
+                    cursor.execute("""
+                        UPDATE uploaded_images
+                        SET sha256 = %s, storage_backend = %s, file_size = %s, image_data = NULL
+                        WHERE id = %s
+                    """, (digest, storage.name, len(data), image_id))
+                    moved += cursor.rowcount
+                finally:
+                    cursor.execute("SELECT pg_advisory_unlock(%s)", (lock_key,))
+            print(f"Imágenes movidas al almacenamiento '{storage.name}': {moved}")
+    finally:
+        cursor.close()
+    return moved
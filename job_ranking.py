@@ -0,0 +1,195 @@
+"""Pre-ranking léxico (BM25) de empleos antes de puntuarlos con la IA
+
+``ai_job_search`` puede reunir cientos de empleos, pero solo vale la pena pagar
+llamadas a la IA por los más prometedores. Se indexa título + descripción de
+cada empleo con BM25 y se usa como consulta el análisis del CV (``keywords``,
+``experience_areas`` y, con menos peso, ``strengths``); solo los
+``JOB_PRERANK_TOP_K`` mejores pasan a la puntuación con IA.
+
+Normalización español/inglés: minúsculas, sin acentos, sin stopwords y con un
+stemming liviano por sufijos (el mismo para empleos y consulta).
+
+El índice guarda la matriz término × empleo en formato disperso por columnas
+(CSC: ``term_ptr``/``doc_ids``/``weights`` en arreglos de NumPy) con la
+contribución BM25 de cada posting ya calculada, así que puntuar la consulta es
+un producto matriz-vector disperso: una suma vectorizada por término.
+"""
+
+import os
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Dict, Any, List, Tuple, Iterable
+
+import numpy as np
+
+JOB_PRERANK_TOP_K = int(os.getenv('JOB_PRERANK_TOP_K', 30))
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Peso de cada campo del análisis del CV en la consulta
+QUERY_FIELD_WEIGHTS = {'keywords': 1.0, 'experience_areas': 1.0, 'strengths': 0.5}
+
+STOPWORDS = frozenset("""
+a al algo algun alguna algunas alguno algunos ante antes asi aun bajo bien cada como con contra cual
+cuales cuando de del desde donde dos durante e el ella ellas ellos en entre era es esa esas ese eso esos
+esta estan estar estas este esto estos fue ha hace hacia han hasta hay la las le les lo los mas me mi
+mis mucho muy nada ni no nos nosotros o otra otras otro otros para pero poco por porque que quien se
+sea ser si sin sobre solo son su sus tambien tan te tiene tienen todo todos tu tus un una unas uno unos
+usted y ya yo buscamos busca requisitos experiencia empresa trabajo puesto
+about above after again all also am an and any are as at be been before being below between both but
+by can could did do does doing down during each few for from further had has have having he her here
+hers him his how i if in into is it its itself just me more most my no nor not now of off on once only
+or other our out over own same she should so some such than that the their them then there these they
+this those through to too under until up very was we were what when where which while who whom why will
+with would you your job work team years
+""".split())
+
+# Sufijos de derivación (sin acentos), del más largo al más corto
+_SUFFIXES = (
+    'amientos', 'imientos', 'amiento', 'imiento', 'aciones', 'iciones', 'uciones', 'ations',
+    'idades', 'adoras', 'adores', 'mente', 'acion', 'icion', 'ucion', 'ation', 'idad', 'ments',
+    'istas', 'ismos', 'ables', 'ibles', 'adora', 'ador', 'ista', 'ismo', 'able', 'ible', 'ment',
+    'ness', 'ings', 'ing', 'ers', 'er', 'ed', 'ly',
+)
+
+# Palabras (letras Unicode y dígitos) más formas como c++, c# o node.js
+_TOKEN_RE = re.compile(r'[^\W_]+(?:[+#]+|\.[^\W_]+)*')
+
+
+def fold_accents(text: str) -> str:
+    """Minúsculas y sin acentos (``Programación`` → ``programacion``); la ñ queda como n"""
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+@lru_cache(maxsize=50000)
+def stem(token: str) -> str:
+    """Stemming liviano español/inglés: sufijos de derivación, plural y vocal final"""
+    if not token.isalpha() or len(token) <= 3:
+        return token
+    for suffix in _SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            token = token[:-len(suffix)]
+            break
+    if token.endswith('es') and len(token) > 4:
+        token = token[:-2]
+    elif token.endswith('s') and len(token) > 3:
+        token = token[:-1]
+    if token[-1] in 'aeo' and len(token) > 4:
+        token = token[:-1]
+    return token
+
+
+@lru_cache(maxsize=100000)
+def _term(token: str) -> str:
+    """Término indexado de una palabra en minúsculas; vacío si es una stopword"""
+    if not token.isascii():
+        token = fold_accents(token)
+    if token in STOPWORDS or len(token) <= 1:
+        return ''
+    return stem(token)
+
+
+def tokenize(text: str) -> List[str]:
+    """Términos normalizados de un texto (sin stopwords)"""
+    terms = [_term(token) for token in _TOKEN_RE.findall((text or '').lower())]
+    return [term for term in terms if term]
+
+
+def job_text(job: Dict[str, Any]) -> str:
+    # El título pesa más que la descripción
+    title = job.get('title') or ''
+    return f"{title} {title} {job.get('description') or ''}"
+
+
+def build_query(cv_analysis: Dict[str, Any]) -> Dict[str, float]:
+    """Términos de la consulta con su peso a partir del análisis del CV"""
+    query: Dict[str, float] = {}
+    for field, weight in QUERY_FIELD_WEIGHTS.items():
+        values = cv_analysis.get(field) or []
+        if isinstance(values, str):
+            values = [values]
+        for value in values:
+            if isinstance(value, str):
+                for term in tokenize(value):
+                    query[term] = query.get(term, 0.0) + weight
+    return query
+
+
+class BM25Index:
+    """Índice BM25 de un conjunto de documentos, disperso por término (CSC)"""
+
+    def __init__(self, documents: Iterable[str], k1: float = BM25_K1, b: float = BM25_B):
+        vocabulary: Dict[str, int] = {}
+        token_ids: List[int] = []
+        lengths: List[int] = []
+        for text in documents:
+            tokens = tokenize(text)
+            lengths.append(len(tokens))
+            token_ids.extend([vocabulary.setdefault(term, len(vocabulary)) for term in tokens])
+
+        self.vocabulary = vocabulary
+        self.doc_count = len(lengths)
+        doc_length = np.asarray(lengths, dtype=np.int64)
+        average_length = float(doc_length.mean()) if self.doc_count and doc_length.mean() > 0 else 1.0
+
+        # Frecuencia de cada (término, documento): claves ordenadas por término y luego documento
+        stride = max(self.doc_count, 1)
+        token_docs = np.repeat(np.arange(self.doc_count, dtype=np.int64), doc_length)
+        keys, tf = np.unique(np.asarray(token_ids, dtype=np.int64) * stride + token_docs, return_counts=True)
+        terms = keys // stride
+        self.doc_ids = (keys % stride).astype(np.int32)
+        document_frequency = np.bincount(terms, minlength=len(vocabulary))
+        self.term_ptr = np.concatenate(([0], np.cumsum(document_frequency))).astype(np.int64)
+
+        tf = tf.astype(np.float32)
+        idf = np.log1p((self.doc_count - document_frequency + 0.5) / (document_frequency + 0.5)).astype(np.float32)
+        norm = k1 * (1 - b + b * doc_length[self.doc_ids] / average_length)
+        self.weights = (idf[terms] * tf * (k1 + 1) / (tf + norm)).astype(np.float32)
+
+    def score(self, query: Dict[str, float]) -> np.ndarray:
+        """Puntaje BM25 de cada documento para la consulta ``{término: peso}``"""
+        scores = np.zeros(self.doc_count, dtype=np.float32)
+        for term, weight in query.items():
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                continue
+            start, end = self.term_ptr[term_id], self.term_ptr[term_id + 1]
+            # Cada documento aparece una vez por término: la suma indexada no tiene colisiones
+            scores[self.doc_ids[start:end]] += weight * self.weights[start:end]
+        return scores
+
+    def top(self, query: Dict[str, float], k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Índices de los ``k`` mejores documentos (de mayor a menor) y todos los puntajes"""
+        scores = self.score(query)
+        if k >= self.doc_count:
+            best = np.argsort(-scores, kind='stable')
+        else:
+            best = np.argpartition(-scores, k)[:k]
+            best = best[np.argsort(-scores[best], kind='stable')]
+        return best, scores
+
+
+def prerank_jobs(jobs: List[Dict[str, Any]], cv_analysis: Dict[str, Any],
+                 top_k: int = None) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Separar ``jobs`` en ``(candidatos, resto)`` por puntaje léxico contra el CV.
+
+    Los candidatos son los ``top_k`` mejores (en orden); cada empleo recibe su
+    ``lexical_score``. Con ``top_k`` <= 0 o sin términos en la consulta todos son
+    candidatos.
+    """
+    top_k = JOB_PRERANK_TOP_K if top_k is None else top_k
+    query = build_query(cv_analysis)
+    if top_k <= 0 or len(jobs) <= top_k or not query:
+        return list(jobs), []
+
+    index = BM25Index(job_text(job) for job in jobs)
+    best, scores = index.top(query, top_k)
+    for job, score in zip(jobs, scores.tolist()):
+        job['lexical_score'] = round(score, 3)
+    selected = set(best.tolist())
+    candidates = [jobs[i] for i in best.tolist()]
+    others = [job for i, job in enumerate(jobs) if i not in selected]
+    return candidates, others
@@ -0,0 +1,266 @@
+"""Puntuación de compatibilidad de empleos con concurrencia acotada y plazo
+
+``search_jobs`` y ``ai_job_search`` puntúan hasta 100 empleos contra el CV del
+usuario. Cada puntuación con IA es un round trip a OpenAI, así que se lanzan en
+paralelo en un executor del proceso con ``JOB_SCORING_CONCURRENCY`` hilos (el
+límite es por worker de gunicorn y lo comparten todos sus requests).
+
+Todo el lote tiene ``JOB_SCORING_DEADLINE`` segundos: los empleos que no
+recibieron puntuación de la IA a tiempo (en cola, en curso o con error) usan la
+puntuación heurística, y cada empleo indica su origen en ``score_source``
+(``'ai'`` o ``'heuristic'``).
+
+Con un ``batch_scorer`` los empleos se agrupan de a ``JOB_SCORING_BATCH_SIZE``
+en un solo prompt (el perfil del candidato se envía una vez por grupo) y la IA
+responde un arreglo JSON ``[{"id": ..., "score": ...}]``. La respuesta se valida
+y se repara si llega truncada o con otro formato; solo los ids que faltan se
+vuelven a pedir, hasta ``JOB_SCORING_BATCH_RETRIES`` veces.
+"""
+
+import os
+import re
+import json
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, Any, List, Callable, Optional, Tuple, Iterable
+
+logger = logging.getLogger(__name__)
+
+JOB_SCORING_CONCURRENCY = int(os.getenv('JOB_SCORING_CONCURRENCY', 8))
+JOB_SCORING_DEADLINE = float(os.getenv('JOB_SCORING_DEADLINE', 45))
+# Tiempo máximo de cada llamada a la IA (una llamada en curso no se puede cancelar)
+JOB_SCORING_CALL_TIMEOUT = float(os.getenv('JOB_SCORING_CALL_TIMEOUT', 20))
+# Empleos por prompt en el modo agrupado (1 = una llamada por empleo)
+JOB_SCORING_BATCH_SIZE = int(os.getenv('JOB_SCORING_BATCH_SIZE', 15))
+JOB_SCORING_BATCH_RETRIES = int(os.getenv('JOB_SCORING_BATCH_RETRIES', 1))
+
+SCORE_SOURCE_AI = 'ai'
+SCORE_SOURCE_HEURISTIC = 'heuristic'
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+_stats = {'scorings': 0, 'ai_scores': 0, 'heuristic_scores': 0, 'deadline_fallbacks': 0, 'errors': 0,
+          'ai_calls': 0, 'batched_jobs': 0, 'batch_calls': 0, 'batch_retries': 0, 'batch_tokens': 0,
+          'batch_tokens_estimate': 0, 'per_job_tokens_estimate': 0}
+_stats_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Executor del proceso (los hilos no sobreviven al fork de gunicorn)"""
+    global _executor, _executor_pid
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers=max(JOB_SCORING_CONCURRENCY, 1),
+                                           thread_name_prefix='job-scoring')
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimación de tokens de un texto (~4 caracteres por token)"""
+    return len(text) // 4 + 1
+
+
+def _clamp_score(value) -> Optional[int]:
+    try:
+        return max(0, min(int(round(float(value))), 100))
+    except (TypeError, ValueError):
+        return None
+
+
+# Par id/score completo (el valor final debe estar cerrado: un número cortado no cuenta)
+_SCORE_PAIR_RE = re.compile(
+    r'"?id"?\s*:\s*"?([\w-]+)"?\s*,\s*"?score"?\s*:\s*"?(-?\d+(?:\.\d+)?)"?(?=\s*[,}\]])'
+    r'|"?score"?\s*:\s*"?(-?\d+(?:\.\d+)?)"?\s*,\s*"?id"?\s*:\s*"?([\w-]+)"?(?=\s*[,}\]])'
+)
+
+
+def parse_batch_scores(text: str, expected_ids: Iterable[str]) -> Dict[str, int]:
+    """Puntuaciones ``{id: 0-100}`` de la respuesta de un prompt agrupado.
+
+    Acepta el arreglo pedido, un objeto ``{id: score}`` o ``{"scores": [...]}``,
+    con o sin bloque de markdown. Si el JSON no es válido (respuesta truncada)
+    se rescatan los pares id/score completos. Se ignoran los ids desconocidos.
+    """
+    expected = {str(job_id) for job_id in expected_ids}
+    text = (text or '').strip()
+    if '```' in text:
+        text = text.split('```')[1]
+        text = text[4:] if text.startswith('json') else text
+
+    pairs: List[Tuple[Any, Any]] = []
+    try:
+        data = json.loads(text)
+        if isinstance(data, dict):
+            data = data.get('scores', data)
+        if isinstance(data, dict):
+            pairs = list(data.items())
+        elif isinstance(data, list):
+            pairs = [(item.get('id'), item.get('score')) for item in data if isinstance(item, dict)]
+    except ValueError:
+        for match in _SCORE_PAIR_RE.finditer(text):
+            if match.group(1) is not None:
+                pairs.append((match.group(1), match.group(2)))
+            else:
+                pairs.append((match.group(4), match.group(3)))
+
+    scores = {}
+    for job_id, value in pairs:
+        job_id = str(job_id)
+        score = _clamp_score(value)
+        if job_id in expected and score is not None:
+            scores.setdefault(job_id, score)
+    return scores
+
+
+def _ai_score(ai_scorer: Callable, job: Dict[str, Any], cv_analysis: Dict[str, Any]) -> Optional[int]:
+    with _stats_lock:
+        _stats['ai_calls'] += 1
+    try:
+        return ai_scorer(job, cv_analysis)
+    except Exception as e:
+        logger.warning(f"Error puntuando empleo con IA: {e}")
+        with _stats_lock:
+            _stats['errors'] += 1
+        return None
+
+
+def _batch_score(batch_scorer: Callable, batch: List[Tuple[int, Dict[str, Any]]],
+                 cv_analysis: Dict[str, Any]) -> Dict[str, Any]:
+    """Puntuar un grupo de ``(índice, empleo)``; retorna ``{'scores': {índice: score}, ...}``"""
+    pending = dict(batch)
+    scores: Dict[int, int] = {}
+    calls = tokens = tokens_estimate = per_job_tokens = 0
+    for attempt in range(1 + max(JOB_SCORING_BATCH_RETRIES, 0)):
+        # Ids cortos por prompt; en un reintento solo van los que faltan
+        ids = {str(number): index for number, index in enumerate(pending, 1)}
+        try:
+            text, usage = batch_scorer({job_id: pending[index] for job_id, index in ids.items()}, cv_analysis)
+        except Exception as e:
+            logger.warning(f"Error puntuando {len(ids)} empleos con IA: {e}")
+            with _stats_lock:
+                _stats['errors'] += 1
+            break
+        # Una llamada por empleo habría enviado cada empleo una sola vez: los reintentos no suman
+        estimate = usage.get('per_job_tokens', 0) if attempt == 0 else 0
+        calls += 1
+        tokens += usage.get('tokens', 0)
+        tokens_estimate += usage.get('tokens_estimate', 0)
+        per_job_tokens += estimate
+        with _stats_lock:
+            _stats['ai_calls'] += 1
+            _stats['batch_calls'] += 1
+            _stats['batch_tokens'] += usage.get('tokens', 0)
+            _stats['batch_tokens_estimate'] += usage.get('tokens_estimate', 0)
+            _stats['per_job_tokens_estimate'] += estimate
+
+        for job_id, score in parse_batch_scores(text, ids).items():
+            scores[ids[job_id]] = score
+            del pending[ids[job_id]]
+        if not pending:
+            break
+        if attempt < JOB_SCORING_BATCH_RETRIES:
+            logger.info(f"Respuesta agrupada incompleta: se reintentan {len(pending)} de {len(batch)} empleos")
+            with _stats_lock:
+                _stats['batch_retries'] += 1
+    return {'scores': scores, 'calls': calls, 'tokens': tokens, 'tokens_estimate': tokens_estimate,
+            'per_job_tokens': per_job_tokens}
+
+
+def score_jobs(jobs: List[Dict[str, Any]], cv_analysis: Dict[str, Any],
+               ai_scorer: Callable[[Dict[str, Any], Dict[str, Any]], Optional[int]],
+               heuristic_scorer: Callable[[Dict[str, Any], Dict[str, Any]], int],
+               deadline: float = None, batch_scorer: Callable = None,
+               batch_size: int = None) -> Dict[str, Any]:
+    """Asignar ``compatibility_score`` y ``score_source`` a cada empleo de ``jobs``.
+
+    ``ai_scorer`` retorna la puntuación de la IA, o None (o una excepción) si no
+    pudo calcularla. ``batch_scorer({id: empleo}, cv_analysis)`` puntúa un grupo
+    en una llamada y retorna ``(texto, {'tokens', 'tokens_estimate', 'per_job_tokens'})``
+    (los tokens que informó la API y las estimaciones con estimate_tokens() del
+    grupo y de una llamada por empleo); se usa cuando ``batch_size`` es mayor que
+    1. Retorna un resumen con la cantidad de puntuaciones de cada origen y las
+    llamadas y tokens usados.
+    """
+    deadline = JOB_SCORING_DEADLINE if deadline is None else deadline
+    batch_size = JOB_SCORING_BATCH_SIZE if batch_size is None else batch_size
+    batched = batch_scorer is not None and batch_size > 1
+    started = time.monotonic()
+
+    scores: List[Optional[int]] = [None] * len(jobs)
+    calls = tokens = tokens_estimate = per_job_tokens = timed_out = 0
+    if jobs and JOB_SCORING_CONCURRENCY > 0 and deadline > 0:
+        executor = _get_executor()
+        if batched:
+            indexed = list(enumerate(jobs))
+            futures = {executor.submit(_batch_score, batch_scorer, indexed[start:start + batch_size], cv_analysis):
+                       [index for index, _ in indexed[start:start + batch_size]]
+                       for start in range(0, len(jobs), batch_size)}
+        else:
+            futures = {executor.submit(_ai_score, ai_scorer, job, cv_analysis): [index]
+                       for index, job in enumerate(jobs)}
+        done, pending = wait(futures, timeout=deadline)
+        for future in done:
+            if batched:
+                result = future.result()
+                for index, score in result['scores'].items():
+                    scores[index] = score
+                calls += result['calls']
+                tokens += result['tokens']
+                tokens_estimate += result['tokens_estimate']
+                per_job_tokens += result['per_job_tokens']
+            else:
+                scores[futures[future][0]] = future.result()
+                calls += 1
+        for future in pending:
+            # Los que siguen en cola se descartan; los que están en curso terminan solos
+            future.cancel()
+            timed_out += len(futures[future])
+
+    ai_count = 0
+    for job, score in zip(jobs, scores):
+        if score is None:
+            job['compatibility_score'] = heuristic_scorer(job, cv_analysis)
+            job['score_source'] = SCORE_SOURCE_HEURISTIC
+        else:
+            job['compatibility_score'] = score
+            job['score_source'] = SCORE_SOURCE_AI
+            ai_count += 1
+
+    summary = {
+        'ai': ai_count,
+        'heuristic': len(jobs) - ai_count,
+        'deadline_exceeded': timed_out,
+        'ai_calls': calls,
+        'elapsed_ms': round((time.monotonic() - started) * 1000, 1)
+    }
+    if batched:
+        summary.update(batch_size=batch_size, tokens=tokens, tokens_estimate=tokens_estimate,
+                       per_job_tokens_estimate=per_job_tokens)
+    with _stats_lock:
+        _stats['scorings'] += 1
+        _stats['ai_scores'] += summary['ai']
+        _stats['heuristic_scores'] += summary['heuristic']
+        _stats['deadline_fallbacks'] += timed_out
+        if batched:
+            _stats['batched_jobs'] += len(jobs) - timed_out
+    if timed_out:
+        logger.warning(f"⚠️ Plazo de puntuación agotado: {timed_out} de {len(jobs)} empleos con puntuación heurística")
+    return summary
+
+
+def get_job_scoring_stats() -> Dict[str, Any]:
+    """Puntuaciones por origen y ahorro del modo agrupado frente a una llamada por empleo"""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats['calls_saved'] = max(stats['batched_jobs'] - stats['batch_calls'], 0)
+    # Ambos lados con estimate_tokens(): restar los tokens reales de la API a una
+    # estimación por caracteres mezclaría dos escalas distintas
+    stats['tokens_saved_estimate'] = stats['per_job_tokens_estimate'] - stats['batch_tokens_estimate']
+    stats.update(concurrency=JOB_SCORING_CONCURRENCY, deadline=JOB_SCORING_DEADLINE,
+                 batch_size=JOB_SCORING_BATCH_SIZE)
+    return stats
@@ -0,0 +1,145 @@
+"""Persistencia en bloque de empleos encontrados por las búsquedas
+
+Cada empleo se identifica por ``content_hash``: md5 del título, empresa y url
+normalizados (minúsculas, espacios colapsados). La columna tiene un índice único
+(migración 0002), así que guardar un lote es un solo ``INSERT ... ON CONFLICT DO
+NOTHING`` por página en lugar de un SELECT y un INSERT por empleo.
+"""
+
+import re
+import hashlib
+import logging
+from typing import List, Dict, Any, Optional
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+logger = logging.getLogger(__name__)
+
+# Filas por sentencia; cada página es un viaje a la base de datos
+JOB_PAGE_SIZE = 1000
+
+_WHITESPACE = re.compile(r'\s+')
+
+# Inserta los nuevos y retorna (id, hash) tanto de los insertados como de los que ya existían.
+# La rama de SELECT no ve las filas del INSERT (mismo snapshot), así que no hay repetidos.
+BULK_INSERT_JOBS_SQL = """
+    WITH input (title, company, location, description, url, source, content_hash) AS (
+        VALUES %s
+    ), inserted AS (
+        INSERT INTO jobs (title, company, location, description, url, source, content_hash)
+        SELECT title, company, location, description, url, source, content_hash FROM input
+        ON CONFLICT (content_hash) DO NOTHING
+        RETURNING id, content_hash
+    )
+    SELECT id, content_hash FROM inserted
+    UNION ALL
+    SELECT j.id, j.content_hash FROM jobs j JOIN input i ON i.content_hash = j.content_hash
+"""
+
+
+def _normalize(value: Optional[str]) -> str:
+    return _WHITESPACE.sub(' ', value or '').strip().lower()
+
+
+def job_content_hash(job: Dict[str, Any]) -> str:
+    """Clave de deduplicación del empleo"""
+    key = '\x1f'.join(_normalize(job.get(field)) for field in ('title', 'company', 'url'))
+    return hashlib.md5(key.encode('utf-8')).hexdigest()
+
+
+def bulk_save_jobs(connection, jobs: List[Dict[str, Any]], page_size: int = JOB_PAGE_SIZE) -> List[Optional[int]]:
+    """Guardar empleos en lote sin duplicar los existentes.
+
+    Retorna el id de cada empleo en el mismo orden de ``jobs``. No hace commit:
+    la transacción la controla el llamador.
+    """
+    if not jobs:
+        return []
+
+    hashes = [job_content_hash(job) for job in jobs]
+    rows = {}
+    for job, content_hash in zip(jobs, hashes):
+        if content_hash not in rows:
+            rows[content_hash] = (
+                job.get('title'), job.get('company'), job.get('location'),
+                job.get('description'), job.get('url'), job.get('source'), content_hash
+            )
+
+    cursor = connection.cursor()
+    try:
+        result = execute_values(cursor, BULK_INSERT_JOBS_SQL, list(rows.values()),
+                                page_size=page_size, fetch=True)
+    finally:
+        cursor.close()
+
+    ids = {}
+    for row in result:
+        if isinstance(row, dict):
+            ids[row['content_hash']] = row['id']
+        else:
+            ids[row[1]] = row[0]
+    return [ids.get(content_hash) for content_hash in hashes]
+
+
+def backfill_job_hashes(connection, batch_size: int = 5000) -> int:
+    """Calcular content_hash de los empleos guardados antes de la columna.
+
+    Se ejecuta en autocommit con el índice único ya creado: cada lote se confirma
+    por separado y, ante duplicados históricos, solo el empleo más antiguo recibe
+    el hash (el resto queda en NULL). Retorna la cantidad de filas actualizadas.
+    """
+    updated = 0
+    last_id = 0
+    cursor = connection.cursor()
+    try:
+        while True:
+            cursor.execute(
+                "SELECT id, title, company, url FROM jobs WHERE content_hash IS NULL AND id > %s ORDER BY id LIMIT %s",
+                (last_id, batch_size)
+            )
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+
+            pending = {}
+            for job_id, title, company, url in rows:
+                content_hash = job_content_hash({'title': title, 'company': company, 'url': url})
+                pending.setdefault(content_hash, job_id)
+            values = [(job_id, content_hash) for content_hash, job_id in pending.items()]
+
+            try:
+                updated += _update_job_hashes(cursor, values)
+            except psycopg2.IntegrityError:
+                # Un empleo nuevo con el mismo hash llegó entre el SELECT y el UPDATE
+                for value in values:
+                    try:
+                        updated += _update_job_hashes(cursor, [value])
+                    except psycopg2.IntegrityError:
+                        continue
+    finally:
+        cursor.close()
+    return updated
+
+
+def _update_job_hashes(cursor, values) -> int:
+    execute_values(cursor, """
+        UPDATE jobs j SET content_hash = v.content_hash
+        FROM (VALUES %s) v (id, content_hash)
+        WHERE j.id = v.id
+          AND NOT EXISTS (SELECT 1 FROM jobs e WHERE e.content_hash = v.content_hash)
+    """, values, page_size=len(values))
+    return cursor.rowcount
+
+
+def save_jobs(connection, jobs: List[Dict[str, Any]]) -> List[Optional[int]]:
+    """Guardar empleos y confirmar; ante error se revierte y retorna lista vacía"""
+    try:
+        ids = bulk_save_jobs(connection, jobs)
+        connection.commit()
+        return ids
+    except psycopg2.Error as e:
+        logger.error(f"Error guardando {len(jobs)} empleos: {e}")
+        connection.rollback()
+        return []
@@ -0,0 +1,177 @@
+"""Paginación por keyset de los listados del panel de administración
+
+Los listados (usuarios, cupones, ofertas, posts del blog) se ordenan por
+``(created_at, id)`` descendente y cada página se pide con la clave de la última
+fila de la anterior (``after``) o de la primera de la siguiente (``before``), en
+lugar de ``LIMIT/OFFSET``: con el índice ``(created_at, id)`` (migración 0007) el
+costo de una página no depende de su profundidad.
+
+El total del listado no se cuenta en cada página: sin filtros se usa la
+estimación del planificador (``pg_class.reltuples``) y con filtros un conteo
+cacheado ``LISTING_COUNT_CACHE_TTL`` segundos. El conteo exacto se calcula solo
+cuando se pide (``exact=True``).
+"""
+
+import os
+import base64
+import hashlib
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import List, Optional, Tuple, Dict, Any
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+from cache_service import TwoTierCache
+
+logger = logging.getLogger(__name__)
+
+LISTING_PAGE_SIZE = 20
+LISTING_COUNT_CACHE_TTL = int(os.getenv('LISTING_COUNT_CACHE_TTL', 300))
+
+_listing_count_cache = TwoTierCache(
+    'listing_counts',
+    local_ttl=min(LISTING_COUNT_CACHE_TTL, 60),
+    redis_ttl=max(LISTING_COUNT_CACHE_TTL, 1),
+    max_entries=256
+)
+
+
+@dataclass
+class KeysetPage:
+    """Página de un listado y los tokens para navegar a las vecinas"""
+    items: List[Dict[str, Any]] = field(default_factory=list)
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+    total: Optional[int] = None
+    total_is_estimate: bool = True
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self) -> bool:
+        return self.prev_cursor is not None
+
+
+def encode_cursor(row: Dict[str, Any]) -> str:
+    """Token opaco con el ``(created_at, id)`` de una fila"""
+    created_at = row['created_at'].isoformat() if row.get('created_at') else ''
+    raw = f"{created_at}|{row['id']}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token: Optional[str]) -> Optional[Tuple[datetime, int]]:
+    """Interpretar un token de página; None si falta o es inválido"""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode('utf-8')
+        created_at, row_id = raw.split('|', 1)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def fetch_keyset_page(connection, query: str, params=None, after: Optional[str] = None,
+                      before: Optional[str] = None, per_page: int = LISTING_PAGE_SIZE) -> KeysetPage:
+    """Obtener una página de ``query`` ordenada por ``(created_at, id)`` descendente.
+
+    ``query`` es el SELECT del listado sin ORDER BY ni LIMIT y debe exponer las
+    columnas ``created_at`` e ``id``. PostgreSQL integra la subconsulta, así que el
+    rango del keyset se resuelve con el índice de la tabla.
+    """
+    params = list(params or [])
+    after_key, before_key = decode_cursor(after), decode_cursor(before)
+
+    if before_key is not None:
+        # Hacia atrás se recorre en orden ascendente y luego se invierte
+        keyset = "WHERE (listing.created_at, listing.id) > (%s, %s)"
+        order = "ORDER BY listing.created_at ASC, listing.id ASC"
+        params.extend(before_key)
+    elif after_key is not None:
+        keyset = "WHERE (listing.created_at, listing.id) < (%s, %s)"
+        order = "ORDER BY listing.created_at DESC, listing.id DESC"
+        params.extend(after_key)
+    else:
+        keyset = ""
+        order = "ORDER BY listing.created_at DESC, listing.id DESC"
+    params.append(per_page + 1)
+
+    cursor = connection.cursor(cursor_factory=RealDictCursor)
+    try:
+        cursor.execute(f"SELECT * FROM ({query}) listing {keyset} {order} LIMIT %s", params)
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+
+    # Se pide una fila de más para saber si hay otra página en esa dirección
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    page = KeysetPage(items=rows)
+    if before_key is not None:
+        rows.reverse()
+        if rows:
+            page.next_cursor = encode_cursor(rows[-1])
+            if has_more:
+                page.prev_cursor = encode_cursor(rows[0])
+    elif rows:
+        if has_more:
+            page.next_cursor = encode_cursor(rows[-1])
+        if after_key is not None:
+            page.prev_cursor = encode_cursor(rows[0])
+    return page
+
+
+def estimate_table_rows(connection, table: str) -> Optional[int]:
+    """Filas estimadas por el planificador; None si la tabla no se ha analizado"""
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SELECT reltuples::bigint AS estimate FROM pg_class WHERE oid = to_regclass(%s)", (table,))
+        row = cursor.fetchone()
+    finally:
+        cursor.close()
+    if row is None:
+        return None
+    estimate = row['estimate'] if isinstance(row, dict) else row[0]
+    # -1: la tabla nunca se analizó (o no tiene filas registradas)
+    return estimate if estimate is not None and estimate >= 0 else None
+
+
+def _exact_count(connection, query: str, params) -> int:
+    cursor = connection.cursor()
+    try:
+        cursor.execute(f"SELECT COUNT(*) AS total FROM ({query}) listing", params)
+        row = cursor.fetchone()
+    finally:
+        cursor.close()
+    return int(row['total'] if isinstance(row, dict) else row[0])
+
+
+def count_listing(connection, query: str, params=None, table: Optional[str] = None,
+                  exact: bool = False) -> Tuple[Optional[int], bool]:
+    """Total de filas de un listado como ``(total, es_estimación)``.
+
+    Con ``table`` (listado sin filtros) se usa ``pg_class.reltuples``; si no hay
+    estimación, o el listado está filtrado, se usa el conteo cacheado. ``exact``
+    cuenta siempre y refresca el cache.
+    """
+    params = list(params or [])
+    key = hashlib.md5(f"{query}|{params!r}".encode('utf-8')).hexdigest()
+    try:
+        if exact:
+            total = _exact_count(connection, query, params)
+            _listing_count_cache.set(key, total)
+            return total, False
+        if table:
+            estimate = estimate_table_rows(connection, table)
+            if estimate is not None:
+                return estimate, True
+        total = _listing_count_cache.get_or_load(key, lambda: _exact_count(connection, query, params))
+        return total, True
+    except psycopg2.Error as e:
+        logger.warning(f"No se pudo contar el listado: {e}")
+        connection.rollback()
+        return None, True
@@ -0,0 +1,718 @@
+"""Migraciones versionadas del esquema de ARMind
+
+Las tablas siguen creándose con ``init_database()``, ``create_subscription_tables()``
+e ``init_sales_tables()``; este módulo agrega encima los cambios versionados
+(principalmente índices para las consultas calientes) y registra cuáles ya se
+aplicaron en ``schema_migrations``.
+
+Uso:
+    python migrations.py migrate          # aplicar migraciones pendientes
+    python migrations.py status           # listar migraciones aplicadas y pendientes
+    python migrations.py check [--seed N] # EXPLAIN de las consultas calientes
+"""
+
+import sys
+import json
+import argparse
+import logging
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple, Dict, Any, Callable, Union
+
+import psycopg2
+
+from db_pool import PoolConfig
+from job_store import backfill_job_hashes, bulk_save_jobs, job_content_hash
+from cv_search import CV_SEARCH_TEXT_SQL, CV_SEARCH_VECTOR_SQL
+from sales_rollup import rebuild_sales_rollup
+from image_store import move_image_blobs
+from blog_feed import rebuild_reaction_counts
+from dashboard_summary import USER_SUMMARY_SQL
+from subscription_system import prepare_usage_tracking_key
+
+logger = logging.getLogger(__name__)
+
+# Clave del advisory lock que evita dos ejecuciones simultáneas (p.ej. varios workers)
+_MIGRATION_LOCK_KEY = 4827301
+
+SCHEMA_MIGRATIONS_SQL = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INTEGER PRIMARY KEY,
+        name VARCHAR(255) NOT NULL,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+
+@dataclass
+class Migration:
+    """Cambio de esquema con número de versión.
+
+    Con ``concurrent=True`` cada sentencia se ejecuta en autocommit (requisito de
+    ``CREATE INDEX CONCURRENTLY``) y debe ser idempotente; en otro caso todas las
+    sentencias se aplican en una sola transacción. Un paso puede ser también una
+    función que recibe la conexión (p.ej. para rellenar datos calculados en Python).
+    """
+    version: int
+    name: str
+    statements: List[Union[str, Callable]] = field(default_factory=list)
+    concurrent: bool = False
+
+
+def _index(name: str, definition: str, unique: bool = False) -> str:
+    kind = 'UNIQUE INDEX' if unique else 'INDEX'
+    return f"CREATE {kind} CONCURRENTLY IF NOT EXISTS {name} ON {definition}"
+
+
+def _create_trigram_index(connection) -> None:
+    """Índice de trigramas para ILIKE '%término%' sobre el texto del CV.
+
+    pg_trgm es una extensión de contrib que no todos los servidores tienen
+    disponible; sin ella la búsqueda usa solo el índice de texto completo.
+    """
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        except psycopg2.Error as e:
+            print(f"⚠️ pg_trgm no disponible, se omite el índice de trigramas: {e}")
+            return
+        _drop_invalid_index(cursor, 'idx_user_cvs_search_trgm')
+        cursor.execute(_index('idx_user_cvs_search_trgm',
+                              f"user_cvs USING gin ({CV_SEARCH_TEXT_SQL.format(alias='')} gin_trgm_ops)"))
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, 'hot_path_indexes', [
+        # Último CV subido y conteo de CVs del usuario
+        _index('idx_resumes_user_created', 'resumes (user_id, created_at DESC)'),
+        # Análisis por CV, tipo y proveedor (get_latest_cv_analysis, get_user_cv_analyses)
+        _index('idx_feedback_resume_type_provider',
+               'feedback (resume_id, analysis_type, ai_provider, created_at DESC)'),
+        # Deduplicación de empleos por (title, company, url). La url puede medir hasta
+        # 1000 caracteres, así que se usa un índice hash (sin límite de tamaño de
+        # clave) y el resto de la igualdad se filtra sobre la fila encontrada
+        _index('idx_jobs_url_hash', 'jobs USING hash (url)'),
+        # Tokens de verificación y reseteo: solo las filas con token pendiente
+        _index('idx_users_verification_token',
+               'users (verification_token) WHERE verification_token IS NOT NULL'),
+        _index('idx_users_reset_token', 'users (reset_token) WHERE reset_token IS NOT NULL'),
+        # CVs activos del usuario ordenados por última edición
+        _index('idx_user_cvs_user_active_updated',
+               'user_cvs (user_id, updated_at DESC) WHERE is_active = TRUE'),
+        # Reacciones del usuario sobre una página de posts; (post_id, user_id) ya lo cubre
+        # la restricción UNIQUE(post_id, user_id, emoji)
+        _index('idx_blog_reactions_user_post', 'blog_reactions (user_id, post_id)'),
+    ], concurrent=True),
+    Migration(2, 'jobs_content_hash', [
+        "ALTER TABLE jobs ADD COLUMN IF NOT EXISTS content_hash VARCHAR(32)",
+        # El índice se crea con la columna aún vacía para que save_jobs_to_db ya
+        # pueda usar ON CONFLICT (content_hash) mientras se rellenan las filas viejas
+        _index('uq_jobs_content_hash', 'jobs (content_hash)', unique=True),
+        # El hash se calcula en Python: lower() en SQL depende del locale de la base
+        backfill_job_hashes,
+        # La búsqueda por (title, company, url) ahora usa content_hash
+        "DROP INDEX CONCURRENTLY IF EXISTS idx_jobs_url_hash",
+    ], concurrent=True),
+    Migration(3, 'users_last_login_index', [
+        # Rangos de last_login de admin_stats (últimos 5 minutos, día, semana, mes)
+        _index('idx_users_last_login', 'users (last_login)'),
+    ], concurrent=True),
+    Migration(4, 'user_activity_rollup', [
+        """
+        CREATE TABLE IF NOT EXISTS user_activity_rollup (
+            period VARCHAR(10) NOT NULL,
+            period_start TIMESTAMP NOT NULL,
+            user_count INTEGER NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (period, period_start)
+        )
+        """,
+        # Cuenta a un usuario en el día/semana/mes de su login solo la primera vez que
+        # entra en ese período (el last_login anterior quedó antes del inicio), y lleva
+        # el total de usuarios con las altas y bajas
+        """
+        CREATE OR REPLACE FUNCTION track_user_activity() RETURNS trigger AS $$
+        DECLARE
+            v_period TEXT;
+            v_start TIMESTAMP;
+            v_previous TIMESTAMP;
+        BEGIN
+            IF TG_OP IN ('INSERT', 'DELETE') THEN
+                INSERT INTO user_activity_rollup (period, period_start, user_count)
+                VALUES ('total', TIMESTAMP 'epoch', CASE WHEN TG_OP = 'INSERT' THEN 1 ELSE -1 END)
+                ON CONFLICT (period, period_start) DO UPDATE
+                SET user_count = user_activity_rollup.user_count + EXCLUDED.user_count, updated_at = NOW();
+                IF TG_OP = 'DELETE' THEN
+                    RETURN NULL;
+                END IF;
+            ELSE
+                v_previous := OLD.last_login;
+            END IF;
+
+            IF NEW.last_login IS NULL THEN
+                RETURN NULL;
+            END IF;
+            FOREACH v_period IN ARRAY ARRAY['day', 'week', 'month'] LOOP
+                v_start := DATE_TRUNC(v_period, NEW.last_login);
+                IF v_previous IS NULL OR v_previous < v_start THEN
+                    INSERT INTO user_activity_rollup (period, period_start, user_count)
+                    VALUES (v_period, v_start, 1)
+                    ON CONFLICT (period, period_start) DO UPDATE
+                    SET user_count = user_activity_rollup.user_count + 1, updated_at = NOW();
+                END IF;
+            END LOOP;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+        "DROP TRIGGER IF EXISTS users_activity_rollup ON users",
+        """
+        CREATE TRIGGER users_activity_rollup
+        AFTER UPDATE OF last_login ON users
+        FOR EACH ROW WHEN (NEW.last_login IS NOT NULL AND NEW.last_login IS DISTINCT FROM OLD.last_login)
+        EXECUTE FUNCTION track_user_activity()
+        """,
+        "DROP TRIGGER IF EXISTS users_count_rollup ON users",
+        """
+        CREATE TRIGGER users_count_rollup
+        AFTER INSERT OR DELETE ON users
+        FOR EACH ROW EXECUTE FUNCTION track_user_activity()
+        """,
+        # Punto de partida de los períodos actuales; los triggers ya tienen bloqueada
+        # la tabla users hasta el commit, así que no se pierden logins concurrentes
+        """
+        INSERT INTO user_activity_rollup (period, period_start, user_count)
+        SELECT 'day', DATE_TRUNC('day', LOCALTIMESTAMP), COUNT(*)
+        FROM users WHERE last_login >= DATE_TRUNC('day', LOCALTIMESTAMP)
+        UNION ALL
+        SELECT 'week', DATE_TRUNC('week', LOCALTIMESTAMP), COUNT(*)
+        FROM users WHERE last_login >= DATE_TRUNC('week', LOCALTIMESTAMP)
+        UNION ALL
+        SELECT 'month', DATE_TRUNC('month', LOCALTIMESTAMP), COUNT(*)
+        FROM users WHERE last_login >= DATE_TRUNC('month', LOCALTIMESTAMP)
+        UNION ALL
+        SELECT 'total', TIMESTAMP 'epoch', COUNT(*) FROM users
+        ON CONFLICT (period, period_start) DO UPDATE
+        SET user_count = EXCLUDED.user_count, updated_at = NOW()
+        """,
+    ]),
+    Migration(5, 'user_cvs_search_vector', [
+        # Columna generada: PostgreSQL la recalcula en cada INSERT/UPDATE del CV
+        f"""
+        ALTER TABLE user_cvs ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS ({CV_SEARCH_VECTOR_SQL}) STORED
+        """,
+    ]),
+    Migration(6, 'user_cvs_search_indexes', [
+        _index('idx_user_cvs_search_vector', 'user_cvs USING gin (search_vector)'),
+        _create_trigram_index,
+    ], concurrent=True),
+    Migration(7, 'listing_keyset_indexes', [
+        # Paginación por keyset de los listados del panel: (created_at, id) < (...)
+        _index('idx_users_created_id', 'users (created_at, id)'),
+        _index('idx_discount_coupons_created_id', 'discount_coupons (created_at, id)'),
+        _index('idx_promotional_offers_created_id', 'promotional_offers (created_at, id)'),
+        _index('idx_blog_posts_created_id', 'blog_posts (created_at, id)'),
+    ], concurrent=True),
+    Migration(8, 'sales_daily_rollup', [
+        """
+        CREATE TABLE IF NOT EXISTS sales_daily_rollup (
+            day DATE NOT NULL,
+            seller_id INTEGER,
+            transaction_count INTEGER NOT NULL DEFAULT 0,
+            total_original DECIMAL(14,2) NOT NULL DEFAULT 0,
+            total_discount DECIMAL(14,2) NOT NULL DEFAULT 0,
+            total_final DECIMAL(14,2) NOT NULL DEFAULT 0,
+            total_commission DECIMAL(14,2) NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        # Las ventas sin vendedor (seller_id NULL) se agrupan en la misma fila del día
+        """
+        CREATE UNIQUE INDEX IF NOT EXISTS uq_sales_daily_rollup_day_seller
+        ON sales_daily_rollup (day, (COALESCE(seller_id, 0)))
+        """,
+        # Resta la venta anterior y suma la nueva: cubre cambios de estado, montos,
+        # vendedor o fecha, además de altas y bajas
+        """
+        CREATE OR REPLACE FUNCTION track_sales_rollup() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'TRUNCATE' THEN
+                DELETE FROM sales_daily_rollup;
+                RETURN NULL;
+            END IF;
+
+            IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.status = 'completed' AND OLD.created_at IS NOT NULL THEN
+                UPDATE sales_daily_rollup
+                SET transaction_count = transaction_count - 1,
+                    total_original = total_original - COALESCE(OLD.original_amount, 0),
+                    total_discount = total_discount - COALESCE(OLD.discount_amount, 0),
+                    total_final = total_final - COALESCE(OLD.final_amount, 0),
+                    total_commission = total_commission - COALESCE(OLD.commission_amount, 0),
+                    updated_at = NOW()
+                WHERE day = OLD.created_at::date AND COALESCE(seller_id, 0) = COALESCE(OLD.seller_id, 0);
+                DELETE FROM sales_daily_rollup
+                WHERE day = OLD.created_at::date AND COALESCE(seller_id, 0) = COALESCE(OLD.seller_id, 0)
+                  AND transaction_count <= 0;
+            END IF;
+
+            IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.status = 'completed' AND NEW.created_at IS NOT NULL THEN
+                INSERT INTO sales_daily_rollup (day, seller_id, transaction_count, total_original,
+                                                total_discount, total_final, total_commission)
+                VALUES (NEW.created_at::date, NEW.seller_id, 1, COALESCE(NEW.original_amount, 0),
+                        COALESCE(NEW.discount_amount, 0), COALESCE(NEW.final_amount, 0),
+                        COALESCE(NEW.commission_amount, 0))
+                ON CONFLICT (day, (COALESCE(seller_id, 0))) DO UPDATE
+                SET transaction_count = sales_daily_rollup.transaction_count + 1,
+                    total_original = sales_daily_rollup.total_original + EXCLUDED.total_original,
+                    total_discount = sales_daily_rollup.total_discount + EXCLUDED.total_discount,
+                    total_final = sales_daily_rollup.total_final + EXCLUDED.total_final,
+                    total_commission = sales_daily_rollup.total_commission + EXCLUDED.total_commission,
+                    updated_at = NOW();
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+        "DROP TRIGGER IF EXISTS sales_transactions_rollup ON sales_transactions",
+        """
+        CREATE TRIGGER sales_transactions_rollup
+        AFTER INSERT OR DELETE OR UPDATE OF status, created_at, seller_id, original_amount,
+                                            discount_amount, final_amount, commission_amount
+        ON sales_transactions
+        FOR EACH ROW EXECUTE FUNCTION track_sales_rollup()
+        """,
+        "DROP TRIGGER IF EXISTS sales_transactions_rollup_truncate ON sales_transactions",
+        """
+        CREATE TRIGGER sales_transactions_rollup_truncate
+        AFTER TRUNCATE ON sales_transactions
+        FOR EACH STATEMENT EXECUTE FUNCTION track_sales_rollup()
+        """,
+        # Punto de partida con las ventas existentes (el trigger ya está activo y la
+        # tabla bloqueada para escrituras hasta el commit)
+        rebuild_sales_rollup,
+    ]),
+    Migration(9, 'content_addressed_images', [
+        # Los bytes pasan al almacenamiento de image_store.py; la fila queda con el hash
+        "ALTER TABLE uploaded_images ADD COLUMN IF NOT EXISTS sha256 CHAR(64)",
+        "ALTER TABLE uploaded_images ADD COLUMN IF NOT EXISTS storage_backend VARCHAR(20)",
+        "ALTER TABLE uploaded_images ALTER COLUMN image_data DROP NOT NULL",
+        # Referencias al mismo contenido antes de eliminar un objeto compartido
+        _index('idx_uploaded_images_sha256', 'uploaded_images (sha256)'),
+        # Fila por fila, confirmando cada una: se puede interrumpir y reanudar
+        move_image_blobs,
+    ], concurrent=True),
+    Migration(10, 'uploaded_image_variants', [
+        # Variantes WebP generadas al subir (image_ingest.py); se borran con la imagen
+        """
+        CREATE TABLE IF NOT EXISTS uploaded_image_variants (
+            image_id INTEGER NOT NULL REFERENCES uploaded_images(id) ON DELETE CASCADE,
+            variant VARCHAR(20) NOT NULL,
+            sha256 CHAR(64) NOT NULL,
+            storage_backend VARCHAR(20) NOT NULL,
+            content_type VARCHAR(100) NOT NULL,
+            file_size INTEGER NOT NULL,
+            width INTEGER,
+            height INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (image_id, variant)
+        )
+        """,
+        # Referencias al mismo contenido antes de eliminar un objeto compartido
+        "CREATE INDEX IF NOT EXISTS idx_uploaded_image_variants_sha256 ON uploaded_image_variants (sha256)",
+    ]),
+    Migration(11, 'site_content_version', [
+        # Versión del contenido editable que cachea cada worker (site_content_cache.py)
+        "CREATE SEQUENCE IF NOT EXISTS site_content_version_seq",
+    ]),
+    Migration(12, 'blog_reaction_counts', [
+        """
+        CREATE TABLE IF NOT EXISTS blog_reaction_counts (
+            post_id INTEGER NOT NULL REFERENCES blog_posts(id) ON DELETE CASCADE,
+            emoji VARCHAR(10) NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (post_id, emoji)
+        )
+        """,
+        # Contador por post y emoji en la misma transacción de cada reacción
+        """
+        CREATE OR REPLACE FUNCTION track_blog_reaction_counts() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'TRUNCATE' THEN
+                DELETE FROM blog_reaction_counts;
+                RETURN NULL;
+            END IF;
+
+            IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.post_id IS NOT NULL THEN
+                UPDATE blog_reaction_counts SET count = count - 1
+                WHERE post_id = OLD.post_id AND emoji = OLD.emoji;
+                DELETE FROM blog_reaction_counts
+                WHERE post_id = OLD.post_id AND emoji = OLD.emoji AND count <= 0;
+            END IF;
+
+            IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.post_id IS NOT NULL THEN
+                INSERT INTO blog_reaction_counts (post_id, emoji, count)
+                VALUES (NEW.post_id, NEW.emoji, 1)
+                ON CONFLICT (post_id, emoji) DO UPDATE
+                SET count = blog_reaction_counts.count + 1;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+        "DROP TRIGGER IF EXISTS blog_reactions_counts ON blog_reactions",
+        """
+        CREATE TRIGGER blog_reactions_counts
+        AFTER INSERT OR DELETE OR UPDATE OF post_id, emoji ON blog_reactions
+        FOR EACH ROW EXECUTE FUNCTION track_blog_reaction_counts()
+        """,
+        "DROP TRIGGER IF EXISTS blog_reactions_counts_truncate ON blog_reactions",
+        """
+        CREATE TRIGGER blog_reactions_counts_truncate
+        AFTER TRUNCATE ON blog_reactions
+        FOR EACH STATEMENT EXECUTE FUNCTION track_blog_reaction_counts()
+        """,
+        # Conteos iniciales (la tabla de reacciones queda bloqueada hasta el commit)
+        rebuild_reaction_counts,
+    ]),
+    Migration(13, 'usage_tracking_period_key', [
+        # Columnas de reserva y fusión de duplicados: sin ella el índice único falla
+        # en bases donde nunca se ejecutó create_subscription_tables()
+        prepare_usage_tracking_key,
+        # Clave del contador de uso (ON CONFLICT de increment_usage y reserve_usage)
+        _index('uq_usage_tracking_period', 'usage_tracking (user_id, resource_type, reset_date)',
+               unique=True),
+    ], concurrent=True),
+]
+
+
+def get_migration_connection():
+    """Conexión dedicada para migraciones (fuera del pool, admite autocommit)"""
+    try:
+        return psycopg2.connect(**PoolConfig().dsn)
+    except psycopg2.Error as e:
+        print(f"Error conectando a PostgreSQL para migraciones: {e}")
+        return None
+
+
+def get_applied_versions(connection) -> List[int]:
+    with connection.cursor() as cursor:
+        cursor.execute(SCHEMA_MIGRATIONS_SQL)
+        cursor.execute("SELECT version FROM schema_migrations ORDER BY version")
+        versions = [row[0] for row in cursor.fetchall()]
+    connection.commit()
+    return versions
+
+
+def _index_name(statement: str) -> Optional[str]:
+    """Nombre del índice de una sentencia CREATE INDEX generada por _index()"""
+    marker = 'IF NOT EXISTS '
+    if not statement.startswith('CREATE') or marker not in statement:
+        return None
+    return statement.split(marker, 1)[1].split()[0]
+
+
+def _drop_invalid_index(cursor, name: str) -> None:
+    """Un CREATE INDEX CONCURRENTLY interrumpido deja el índice INVALID; IF NOT
+    EXISTS lo daría por creado, así que se elimina antes de reintentar"""
+    cursor.execute("""
+        SELECT 1 FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE c.relname = %s AND NOT i.indisvalid
+    """, (name,))
+    if cursor.fetchone():
+        print(f"Eliminando índice inválido {name} de una ejecución anterior")
+        cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+
+def apply_migration(connection, migration: Migration) -> None:
+    """Aplicar una migración y registrar su versión"""
+    if migration.concurrent:
+        connection.autocommit = True
+        try:
+            with connection.cursor() as cursor:
+                for statement in migration.statements:
+                    if callable(statement):
+                        statement(connection)
+                        continue
+                    name = _index_name(statement)
+                    if name:
+                        _drop_invalid_index(cursor, name)
+                    cursor.execute(statement)
+        finally:
+            connection.autocommit = False
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO schema_migrations (version, name) VALUES (%s, %s) ON CONFLICT (version) DO NOTHING",
+                (migration.version, migration.name)
+            )
+        connection.commit()
+        return
+
+    try:
+        with connection.cursor() as cursor:
+            for statement in migration.statements:
+                if callable(statement):
+                    statement(connection)
+                else:
+                    cursor.execute(statement)
+            cursor.execute(
+                "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                (migration.version, migration.name)
+            )
+        connection.commit()
+    except psycopg2.Error:
+        connection.rollback()
+        raise
+
+
+def run_migrations(connection=None) -> List[int]:
+    """Aplicar las migraciones pendientes en orden; retorna las versiones aplicadas"""
+    own_connection = connection is None
+    if own_connection:
+        connection = get_migration_connection()
+        if not connection:
+            return []
+
+    applied_now = []
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_lock(%s)", (_MIGRATION_LOCK_KEY,))
+        connection.commit()
+        try:
+            applied = set(get_applied_versions(connection))
+            for migration in sorted(MIGRATIONS, key=lambda m: m.version):
+                if migration.version in applied:
+                    continue
+                print(f"Aplicando migración {migration.version:04d}_{migration.name}...")
+                apply_migration(connection, migration)
+                applied_now.append(migration.version)
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_unlock(%s)", (_MIGRATION_LOCK_KEY,))
+            connection.commit()
+    finally:
+        if own_connection:
+            connection.close()
+
+    if applied_now:
+        print(f"Migraciones aplicadas: {', '.join(str(v) for v in applied_now)}")
+    else:
+        print("El esquema ya está al día")
+    return applied_now
+
+
+def migration_status(connection) -> List[Tuple[int, str, bool]]:
+    applied = set(get_applied_versions(connection))
+    return [(m.version, m.name, m.version in applied) for m in sorted(MIGRATIONS, key=lambda m: m.version)]
+
+
+# Consultas calientes: (descripción, tabla que no debe recorrerse entera, SQL, parámetros).
+# Los parámetros son claves de la muestra que retorna seed_explain_data().
+HOT_QUERIES = [
+    ('conteo de CVs del usuario', 'resumes',
+     "SELECT COUNT(*) FROM resumes WHERE user_id = %s", ('user_id',)),
+    ('último CV del usuario', 'resumes',
+     "SELECT * FROM resumes WHERE user_id = %s ORDER BY created_at DESC LIMIT 1", ('user_id',)),
+    ('resumen del dashboard del usuario', 'resumes', USER_SUMMARY_SQL, ('user_id',)),
+    ('último análisis del usuario', 'feedback',
+     """SELECT f.s3_key, f.analysis_type, f.ai_provider, f.created_at
+        FROM feedback f INNER JOIN resumes r ON f.resume_id = r.id
+        WHERE r.user_id = %s AND f.s3_key IS NOT NULL
+        ORDER BY f.created_at DESC LIMIT 1""", ('user_id',)),
+    ('análisis por tipo y proveedor', 'feedback',
+     """SELECT f.s3_key, f.analysis_type, f.ai_provider, f.created_at, f.score
+        FROM feedback f INNER JOIN resumes r ON f.resume_id = r.id
+        WHERE r.user_id = %s AND f.s3_key IS NOT NULL
+        ORDER BY f.analysis_type, f.ai_provider, f.created_at DESC""", ('user_id',)),
+    ('empleo existente', 'jobs',
+     "SELECT id FROM jobs WHERE content_hash = %s", ('job_hash',)),
+    ('contador de uso del período', 'usage_tracking',
+     """SELECT used_count FROM usage_tracking
+        WHERE user_id = %s AND resource_type = %s AND reset_date = %s""",
+     ('user_id', 'resource_type', 'reset_date')),
+    ('usuarios activos por período', 'users',
+     """SELECT COUNT(*) FILTER (WHERE last_login >= DATE_TRUNC('day', LOCALTIMESTAMP))
+        FROM users WHERE last_login >= DATE_TRUNC('month', LOCALTIMESTAMP)""", ()),
+    ('token de verificación', 'users',
+     "SELECT id FROM users WHERE verification_token = %s", ('verification_token',)),
+    ('token de reseteo', 'users',
+     "SELECT id FROM users WHERE reset_token = %s AND reset_token_expires > NOW()", ('reset_token',)),
+    ('CV activo más reciente', 'user_cvs',
+     """SELECT id, cv_name FROM user_cvs WHERE user_id = %s AND is_active = TRUE
+        ORDER BY updated_at DESC LIMIT 1""", ('user_id',)),
+    ('búsqueda de CVs por palabra', 'user_cvs',
+     """SELECT id FROM user_cvs
+        WHERE is_active = TRUE AND search_vector @@ (to_tsquery('spanish', %s) || to_tsquery('english', %s))""",
+     ('cv_tsquery', 'cv_tsquery')),
+    ('reacciones del usuario', 'blog_reactions',
+     "SELECT post_id, emoji FROM blog_reactions WHERE user_id = %s AND post_id = ANY(%s)",
+     ('user_id', 'post_ids')),
+    ('página del listado de usuarios', 'users',
+     """SELECT id, username FROM users WHERE (created_at, id) < (%s, %s)
+        ORDER BY created_at DESC, id DESC LIMIT 21""", ('user_created_at', 'user_id')),
+    ('reacciones de un post', 'blog_reactions',
+     "SELECT emoji, COUNT(*) FROM blog_reactions WHERE post_id = %s GROUP BY emoji", ('post_id',)),
+]
+
+
+def seed_explain_data(cursor, rows: int) -> Dict[str, Any]:
+    """Insertar datos sintéticos (dentro de la transacción de check) y retornar
+    los valores de ejemplo para los parámetros de HOT_QUERIES"""
+    cursor.execute("""
+        INSERT INTO users (username, email, password_hash, verification_token, reset_token, reset_token_expires,
+                           last_login)
+        SELECT 'seed_user_' || g, 'seed_user_' || g || '@example.com', 'x',
+               CASE WHEN g %% 10 = 0 THEN 'seed-verify-' || g END,
+               CASE WHEN g %% 50 = 0 THEN 'seed-reset-' || g END,
+               NOW() + INTERVAL '1 hour',
+               LOCALTIMESTAMP - (g %% 365) * INTERVAL '1 day'
+        FROM generate_series(1, %s) g
+        RETURNING id
+    """, (rows,))
+    user_ids = [row[0] for row in cursor.fetchall()]
+    first_user, last_user = min(user_ids), max(user_ids)
+
+    cursor.execute("""
+        INSERT INTO resumes (user_id, filename, file_path, created_at)
+        SELECT u, 'cv.pdf', '/tmp/cv.pdf', NOW() - (k || ' days')::interval
+        FROM generate_series(%s, %s) u, generate_series(1, 3) k
+    """, (first_user, last_user))
+    cursor.execute("""
+        INSERT INTO feedback (resume_id, score, s3_key, analysis_type, ai_provider, created_at)
+        SELECT r.id, 70, 'analyses/' || r.id, t, 'openai', r.created_at
+        FROM resumes r, unnest(ARRAY['general', 'ats']) t
+        WHERE r.user_id BETWEEN %s AND %s
+    """, (first_user, last_user))
+    seed_jobs = [{
+        'title': f'Seed job {i}', 'company': f'Seed company {i % 500}',
+        'url': f'https://example.com/seed-job/{i}', 'source': 'seed'
+    } for i in range(1, rows * 4 + 1)]
+    bulk_save_jobs(cursor.connection, seed_jobs)
+    cursor.execute("""
+        INSERT INTO usage_tracking (user_id, resource_type, used_count, reset_date)
+        SELECT u, t, 1, DATE '2026-01-01' + m * INTERVAL '1 month'
+        FROM generate_series(%s, %s) u, unnest(ARRAY['cv_analysis', 'cv_creation']) t,
+             generate_series(0, 2) m
+        ON CONFLICT DO NOTHING
+    """, (first_user, last_user))
+    cursor.execute("""
+        INSERT INTO user_cvs (user_id, cv_name, is_active, updated_at, professional_summary, skills)
+        SELECT u, 'CV ' || k, k <> 3, NOW() - (k || ' days')::interval,
+               (ARRAY['Desarrollador Python', 'Diseñadora gráfica', 'Contador auditor',
+                      'Enfermera clínica', 'Data engineer'])[1 + (u + k) %% 5] || ' con experiencia',
+               (ARRAY['python sql', 'photoshop figma', 'excel sap', 'cuidados', 'spark airflow'])[1 + (u + k) %% 5] ||
+               CASE WHEN u %% 500 = 0 THEN ' kubernetes' ELSE '' END
+        FROM generate_series(%s, %s) u, generate_series(1, 3) k
+    """, (first_user, last_user))
+    cursor.execute("""
+        INSERT INTO blog_posts (title, content, is_published)
+        SELECT 'Seed post ' || g, 'contenido', TRUE FROM generate_series(1, 200) g
+        RETURNING id
+    """)
+    post_ids = [row[0] for row in cursor.fetchall()]
+    cursor.execute("""
+        INSERT INTO blog_reactions (post_id, user_id, emoji)
+        SELECT p, u, '👍'
+        FROM unnest(%s) p, generate_series(%s, %s) u
+        WHERE (p + u) %% 7 = 0
+    """, (post_ids, first_user, last_user))
+
+    # En producción autovacuum vacía la lista pendiente de los índices GIN; sin esto
+    # el planificador ve miles de entradas sin indexar y prefiere el Seq Scan
+    cursor.execute("""
+        SELECT gin_clean_pending_list(i.indexrelid)
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        JOIN pg_am am ON am.oid = c.relam
+        WHERE am.amname = 'gin' AND i.indrelid = 'user_cvs'::regclass
+    """)
+    for table in ('users', 'resumes', 'feedback', 'jobs', 'usage_tracking', 'user_cvs',
+                  'blog_posts', 'blog_reactions'):
+        cursor.execute(f"ANALYZE {table}")
+    cursor.execute("SELECT created_at FROM users WHERE id = %s", (last_user,))
+    user_created_at = cursor.fetchone()[0]
+    return {
+        'user_id': first_user,
+        'user_created_at': user_created_at,
+        'post_id': post_ids[0],
+        'post_ids': post_ids[:20],
+        'job_hash': job_content_hash({'title': 'Seed job 1', 'company': 'Seed company 1',
+                                      'url': 'https://example.com/seed-job/1'}),
+        'resource_type': 'cv_analysis',
+        'reset_date': '2026-01-01',
+        'verification_token': 'seed-verify-10',
+        'reset_token': 'seed-reset-50',
+        'cv_tsquery': 'kubernetes',
+    }
+
+
+def _seq_scanned_relations(plan) -> List[str]:
+    """Relaciones recorridas con Seq Scan en un plan de EXPLAIN (FORMAT JSON)"""
+    found = []
+    if plan.get('Node Type') == 'Seq Scan':
+        found.append(plan.get('Relation Name'))
+    for child in plan.get('Plans', []):
+        found.extend(_seq_scanned_relations(child))
+    return found
+
+
+def check_query_plans(connection, seed_rows: int = 5000) -> List[Tuple[str, str, List[str]]]:
+    """Ejecutar EXPLAIN sobre las consultas calientes y retornar las que hacen
+    Seq Scan sobre su tabla. Los datos sintéticos se revierten al terminar."""
+    failures = []
+    try:
+        with connection.cursor() as cursor:
+            sample = seed_explain_data(cursor, seed_rows)
+            for description, table, query, keys in HOT_QUERIES:
+                cursor.execute("EXPLAIN (FORMAT JSON) " + query, tuple(sample[key] for key in keys))
+                plan = cursor.fetchone()[0]
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                scanned = _seq_scanned_relations(plan[0]['Plan'])
+                status = 'SEQ SCAN' if table in scanned else 'ok'
+                print(f"  [{status:>8}] {description} ({table})")
+                if table in scanned:
+                    failures.append((description, table, scanned))
+    finally:
+        connection.rollback()
+    return failures
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Migraciones de esquema de ARMind')
+    parser.add_argument('command', choices=['migrate', 'status', 'check'])
+    parser.add_argument('--seed', type=int, default=5000,
+                        help='usuarios sintéticos que check inserta antes del EXPLAIN')
+    args = parser.parse_args(argv)
+
+    connection = get_migration_connection()
+    if not connection:
+        return 2
+
+    try:
+        if args.command == 'migrate':
+            run_migrations(connection)
+            return 0
+
+        if args.command == 'status':
+            for version, name, applied in migration_status(connection):
+                print(f"  {'✓' if applied else '·'} {version:04d}_{name}")
+            return 0
+
+        pending = [v for v, _, applied in migration_status(connection) if not applied]
+        if pending:
+            print(f"Hay migraciones pendientes: {pending}. Ejecuta 'python migrations.py migrate'")
+            return 1
+        print(f"EXPLAIN de {len(HOT_QUERIES)} consultas calientes (seed={args.seed}):")
+        failures = check_query_plans(connection, max(args.seed, 1))
+        if failures:
+            print(f"❌ {len(failures)} consultas hacen Seq Scan sobre su tabla")
+            return 1
+        print("✅ Todas las consultas calientes usan índices")
+        return 0
+    finally:
+        connection.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -324,8 +324,15 @@ def init_monitoring(app):
     # Registrar verificaciones básicas de salud
     def check_database():
         try:
-            # Aquí iría la verificación de la base de datos
-            return {'healthy': True, 'message': 'Database connection OK'}
+            from db_pool import get_pool_stats
+            pool_stats = get_pool_stats()
+            for name in ('in_use', 'idle', 'saturation', 'wait_time_avg_ms', 'timeouts'):
+                if name in pool_stats:
+                    metrics_collector.set_gauge(f'db.pool.{name}', pool_stats[name])
+            return {
+                'healthy': pool_stats.get('saturation', 0) < 100,
+                'message': f"Database pool {pool_stats.get('in_use', 0)}/{pool_stats.get('max_size', 0)} en uso"
+            }
         except Exception as e:
             return {'healthy': False, 'message': f'Database error: {e}'}
     
@@ -6,7 +6,7 @@ import hashlib
 import hmac
 import base64
 from dotenv import load_dotenv
-from subscription_system import create_subscription, get_db_connection
+from subscription_system import create_subscription, get_db_connection, invalidate_entitlements
 import logging
 
 # Configurar logging
@@ -355,6 +355,9 @@ def process_payment_success(user_id, plan_type, gateway, transaction_id, gateway
         subscription_id = create_subscription(user_id, plan_type, gateway, transaction_id)
         
         if subscription_id:
+            # El nuevo plan y sus límites deben verse de inmediato
+            invalidate_entitlements(user_id)
+            
             # Guardar la transacción
             save_payment_transaction(
                 user_id=user_id,
@@ -0,0 +1,135 @@
+"""Sentencias preparadas del servidor para las consultas más frecuentes
+
+Cada sentencia se registra una vez con su SQL en el formato de psycopg2
+(``%s`` o ``%(nombre)s``). La primera vez que se usa en una conexión física se
+envía ``PREPARE`` y desde entonces se ejecuta con ``EXECUTE nombre(...)``, así
+que PostgreSQL no vuelve a analizar ni planificar la consulta en cada llamada
+(tras cinco ejecuciones puede pasar a un plan genérico).
+
+Las sentencias preparadas pertenecen a la sesión: las conexiones que el pool
+recicla o crea de nuevo simplemente las preparan otra vez. Si el servidor ya no
+la tiene (``DISCARD ALL``, un pooler delante de PostgreSQL) se vuelve a preparar;
+fuera de una transacción además se reintenta en el momento. Con
+``DB_PREPARED_STATEMENTS=false`` (PgBouncer en modo transacción) se ejecuta el
+SQL original.
+"""
+
+import os
+import re
+import logging
+import threading
+import weakref
+from typing import Dict, Tuple, Any
+
+import psycopg2
+import psycopg2.errors
+import psycopg2.extensions
+
+logger = logging.getLogger(__name__)
+
+PREPARED_STATEMENTS_ENABLED = os.getenv('DB_PREPARED_STATEMENTS', 'true').lower() == 'true'
+
+_PLACEHOLDER = re.compile(r'%\((\w+)\)s|%s|%%')
+
+# Conexión física -> nombres ya preparados en esa sesión
+_prepared_by_connection: 'weakref.WeakKeyDictionary' = weakref.WeakKeyDictionary()
+_prepared_lock = threading.Lock()
+
+_stats = {'prepares': 0, 'executions': 0, 'reprepares': 0}
+
+
+def _to_server_placeholders(sql: str) -> Tuple[str, Tuple[str, ...], int]:
+    """Convertir ``%s``/``%(nombre)s`` en ``$n``; retorna (sql, nombres, cantidad)"""
+    names = []
+    positional = 0
+
+    def replace(match):
+        nonlocal positional
+        token = match.group(0)
+        if token == '%%':
+            return '%'
+        name = match.group(1)
+        if name is None:
+            positional += 1
+            return f'${positional}'
+        if name not in names:
+            names.append(name)
+        return f'${names.index(name) + 1}'
+
+    converted = _PLACEHOLDER.sub(replace, sql)
+    if names and positional:
+        raise ValueError("No se pueden mezclar parámetros %s y %(nombre)s en una sentencia preparada")
+    return converted, tuple(names), positional or len(names)
+
+
+class PreparedStatement:
+    """Sentencia registrada que se prepara una vez por conexión física"""
+
+    def __init__(self, name: str, sql: str, types: Tuple[str, ...] = ()):
+        self.name = name
+        self.sql = sql
+        server_sql, self.param_names, self.param_count = _to_server_placeholders(sql)
+        signature = f" ({', '.join(types)})" if types else ''
+        self.prepare_sql = f"PREPARE {name}{signature} AS {server_sql}"
+        placeholders = ', '.join(['%s'] * self.param_count)
+        self.execute_sql = f"EXECUTE {name} ({placeholders})" if self.param_count else f"EXECUTE {name}"
+
+    def _params(self, params) -> Tuple[Any, ...]:
+        if self.param_names:
+            return tuple(params[name] for name in self.param_names)
+        return tuple(params or ())
+
+    def execute(self, cursor, params=None):
+        """Ejecutar en ``cursor``; los resultados se leen del cursor como siempre"""
+        if not PREPARED_STATEMENTS_ENABLED:
+            return cursor.execute(self.sql, params)
+
+        connection = cursor.connection
+        prepared = _prepared_names(connection)
+        in_transaction = connection.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE
+        if self.name not in prepared:
+            cursor.execute(self.prepare_sql)
+            prepared.add(self.name)
+            _stats['prepares'] += 1
+
+        try:
+            result = cursor.execute(self.execute_sql, self._params(params))
+        except psycopg2.errors.InvalidSqlStatementName:
+            # La sesión perdió sus sentencias: se preparan de nuevo al usarlas
+            prepared.clear()
+            _stats['reprepares'] += 1
+            if in_transaction:
+                raise
+            connection.rollback()
+            cursor.execute(self.prepare_sql)
+            prepared.add(self.name)
+            result = cursor.execute(self.execute_sql, self._params(params))
+        _stats['executions'] += 1
+        return result
+
+
+def _prepared_names(connection) -> set:
+    prepared = _prepared_by_connection.get(connection)
+    if prepared is None:
+        with _prepared_lock:
+            prepared = _prepared_by_connection.setdefault(connection, set())
+    return prepared
+
+
+STATEMENTS: Dict[str, PreparedStatement] = {}
+
+
+def prepared(name: str, sql: str, types: Tuple[str, ...] = ()) -> PreparedStatement:
+    """Registrar una sentencia con un nombre único"""
+    existing = STATEMENTS.get(name)
+    if existing is not None:
+        if existing.sql != sql:
+            raise ValueError(f"Sentencia preparada duplicada: {name}")
+        return existing
+    statement = PreparedStatement(name, sql, types)
+    STATEMENTS[name] = statement
+    return statement
+
+
+def get_prepared_statement_stats() -> Dict[str, Any]:
+    return dict(_stats, enabled=PREPARED_STATEMENTS_ENABLED, registered=len(STATEMENTS))
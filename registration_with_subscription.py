@@ -10,7 +10,7 @@ import re
 import logging
 import os
 from security_improvements import SecurityManager
-from subscription_system import create_subscription, get_db_connection, SUBSCRIPTION_PLANS
+from subscription_system import create_subscription, get_db_connection, SUBSCRIPTION_PLANS, invalidate_entitlements
 from payment_gateways import WebpayGateway, PayPalGateway
 
 # Configurar logging
@@ -377,6 +377,7 @@ class RegistrationWithSubscription:
             
             conn.commit()
             conn.close()
+            invalidate_entitlements(user_id)
             return True
             
         except Exception as e:
@@ -0,0 +1,383 @@
+"""Unidad de trabajo de base de datos por request para ARMind
+
+Durante un request de Flask todas las llamadas a get_db_connection() (load_user,
+verificaciones de suscripción y el cuerpo de la ruta) comparten una sola
+conexión del pool. Los commit() intermedios se convierten en savepoints y la
+transacción real se confirma una sola vez en after_request, antes de enviar la
+respuesta: si ese COMMIT falla el request responde 500 en lugar de informar un
+éxito que no quedó guardado. Las rutas que esperan llamadas externas largas (IA)
+llaman antes a end_request_unit() para confirmar y devolver la conexión al pool.
+Las acciones que otros workers no deben ver antes de tiempo (invalidar caches
+compartidos, tareas en segundo plano) se registran con call_after_commit().
+
+Las rutas marcadas con @read_only abren su unidad de trabajo en la réplica
+(``DB_REPLICA_HOST``) mientras su atraso no supere ``DB_REPLICA_MAX_LAG``. Después
+de un request que escribió, la sesión del usuario lee del primario durante ese
+mismo margen para ver sus propios cambios. Lo que se carga para un cache
+compartido (identidad, derechos de uso, feed del blog) se lee siempre del
+primario con get_cache_fill_connection().
+"""
+
+import time
+import threading
+import logging
+from typing import Optional, Dict, Any, Callable
+
+import psycopg2
+import psycopg2.extensions
+from flask import g, has_request_context, request, session
+
+from db_pool import (get_pooled_connection, get_replica_connection, replica_configured,
+                     DB_REPLICA_MAX_LAG, DB_REPLICA_LAG_CHECK_INTERVAL)
+
+logger = logging.getLogger(__name__)
+
+_SAVEPOINT = 'armind_uow'
+
+# Marca de sesión: hasta cuándo leer del primario después de escribir
+_PRIMARY_UNTIL_KEY = '_db_primary_until'
+_SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Métricas agregadas de los requests atendidos por este worker
+_request_stats = {
+    'requests': 0,
+    'queries_total': 0,
+    'queries_max': 0,
+    'leases_total': 0,
+    'replica_requests': 0
+}
+_request_stats_lock = threading.Lock()
+
+
+class _CountingCursor:
+    """Cursor que cuenta las sentencias ejecutadas dentro de la unidad de trabajo"""
+
+    def __init__(self, cursor, unit):
+        self._cursor = cursor
+        self._unit = unit
+
+    def execute(self, query, vars=None):
+        self._unit.queries += 1
+        return self._cursor.execute(query, vars)
+
+    def executemany(self, query, vars_list):
+        self._unit.queries += 1
+        return self._cursor.executemany(query, vars_list)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._cursor.close()
+        return False
+
+
+class RequestConnection:
+    """Préstamo de la conexión del request a un helper.
+
+    Mantiene la interfaz de una conexión psycopg2: ``cursor()`` usa la fábrica
+    de cursores del helper, ``commit()`` marca un savepoint, ``rollback()``
+    vuelve al último savepoint y ``close()`` no cierra nada (la conexión vuelve
+    al pool al confirmar la unidad, ver end_request_unit()).
+    """
+
+    def __init__(self, unit, cursor_factory=None):
+        self._unit = unit
+        self._cursor_factory = cursor_factory
+        self.closed = 0
+
+    def cursor(self, *args, **kwargs):
+        if self._cursor_factory is not None and 'cursor_factory' not in kwargs and not args:
+            kwargs['cursor_factory'] = self._cursor_factory
+        return _CountingCursor(self._unit.connection.cursor(*args, **kwargs), self._unit)
+
+    def commit(self):
+        self._unit.checkpoint()
+
+    def rollback(self):
+        self._unit.rollback_to_checkpoint()
+
+    def close(self):
+        if not self.closed:
+            self.closed = 1
+            # Un préstamo cerrado después de end_request_unit() ya no tiene conexión
+            if not self._unit.finished:
+                self._unit.recover()
+
+    def __getattr__(self, name):
+        return getattr(self._unit.connection, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+        return False
+
+
+class UnitOfWork:
+    """Conexión compartida por todos los helpers de un request"""
+
+    def __init__(self, read_only: bool = False):
+        self.connection = get_replica_connection() if read_only else None
+        self.replica = self.connection is not None
+        if self.connection is None:
+            self.connection = get_pooled_connection()
+        self.started = time.monotonic()
+        self.queries = 0
+        self.leases = 0
+        self.has_checkpoint = False
+        self.finished = False
+        self.after_commit = []
+
+    def lease(self, cursor_factory=None) -> RequestConnection:
+        self.recover()
+        self.leases += 1
+        return RequestConnection(self, cursor_factory)
+
+    def _in_transaction(self) -> bool:
+        status = self.connection.get_transaction_status()
+        return status != psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    def recover(self):
+        """Sacar la transacción del estado abortado que dejó un helper sin rollback()"""
+        status = self.connection.get_transaction_status()
+        if status == psycopg2.extensions.TRANSACTION_STATUS_INERROR:
+            self.rollback_to_checkpoint()
+
+    def checkpoint(self):
+        """Equivalente a commit() dentro del request: fija lo hecho hasta ahora"""
+        if not self._in_transaction():
+            return
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"SAVEPOINT {_SAVEPOINT}")
+        self.has_checkpoint = True
+
+    def rollback_to_checkpoint(self):
+        """Descartar solo lo ejecutado desde el último commit() de un helper"""
+        if self.has_checkpoint:
+            try:
+                with self.connection.cursor() as cursor:
+                    cursor.execute(f"ROLLBACK TO SAVEPOINT {_SAVEPOINT}")
+                return
+            except psycopg2.Error as e:
+                logger.warning(f"No se pudo volver al savepoint de la unidad de trabajo: {e}")
+        self.connection.rollback()
+        self.has_checkpoint = False
+
+    def finish(self, error=None):
+        """Confirmar la transacción del request y devolver la conexión.
+
+        Con ``error`` se descarta antes lo posterior al último commit() de un
+        helper. Si el COMMIT falla la transacción queda revertida y el error se
+        propaga; las acciones de call_after_commit() solo corren si se confirmó.
+        """
+        self.finished = True
+        try:
+            if error is not None:
+                self.rollback_to_checkpoint()
+            self.connection.commit()
+        except psycopg2.Error:
+            try:
+                self.connection.rollback()
+            except psycopg2.Error:
+                pass
+            raise
+        finally:
+            self.connection.close()
+        self.run_after_commit()
+
+    def run_after_commit(self):
+        callbacks, self.after_commit = self.after_commit, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.warning(f"Error en una acción posterior al commit del request: {e}")
+
+
+def get_request_connection(cursor_factory=None) -> Optional[RequestConnection]:
+    """Obtener la conexión del request actual, abriendo la unidad de trabajo si hace falta"""
+    if not has_request_context():
+        return None
+    unit = g.get('_db_unit')
+    if unit is None:
+        unit = UnitOfWork(read_only=is_read_only_request())
+        g._db_unit = unit
+    return unit.lease(cursor_factory)
+
+
+def end_request_unit() -> None:
+    """Confirmar ya la unidad de trabajo del request y devolver su conexión al pool.
+
+    Para llamar antes de esperar una llamada externa larga (IA, scraping): así no
+    queda una transacción abierta con sus locks ni una conexión prestada durante
+    la espera. La próxima consulta del request abre una unidad nueva. Si el
+    COMMIT falla se propaga el error.
+    """
+    if not has_request_context():
+        return
+    unit = g.pop('_db_unit', None)
+    if unit is not None:
+        g.setdefault('_db_finished_units', []).append(unit)
+        unit.finish()
+
+
+def read_only(view):
+    """Marcar una ruta de solo lectura: su unidad de trabajo puede ir a la réplica.
+
+    Solo marca la función (no la envuelve), así que funciona en cualquier
+    posición debajo de @app.route; los decoradores con functools.wraps copian
+    la marca.
+    """
+    view.db_read_only = True
+    return view
+
+
+def is_read_only_request() -> bool:
+    """True si el request actual puede leer de la réplica"""
+    return has_request_context() and g.get('_db_read_only', False)
+
+
+def get_pooled_read_connection(cursor_factory=None):
+    """Conexión propia del pool (no la del request) que respeta @read_only"""
+    if is_read_only_request():
+        connection = get_replica_connection(cursor_factory=cursor_factory)
+        if connection is not None:
+            return connection
+    return get_pooled_connection(cursor_factory=cursor_factory)
+
+
+def get_cache_fill_connection(cursor_factory=None):
+    """Conexión para cargar un valor que se guardará en un cache compartido.
+
+    Es la del request, salvo en los requests @read_only: lo leído de una réplica
+    atrasada quedaría en Redis para todos los workers hasta el TTL, aun después
+    de la invalidación que sigue al cambio, así que ahí se usa una conexión
+    propia del primario. Fuera de un request, una del pool. Se devuelve con
+    close().
+    """
+    if not is_read_only_request():
+        connection = get_request_connection(cursor_factory=cursor_factory)
+        if connection is not None:
+            return connection
+    return get_pooled_connection(cursor_factory=cursor_factory)
+
+
+def call_after_commit(callback: Callable[[], Any]) -> None:
+    """Ejecutar ``callback`` cuando la transacción del request quede confirmada.
+
+    Dentro del request los commit() son savepoints, así que avisar a otros
+    workers (p.ej. invalidar un cache compartido) antes del COMMIT real les
+    permitiría releer los datos viejos. Si la transacción se revierte la acción
+    se descarta. Sin unidad de trabajo abierta se ejecuta enseguida.
+    """
+    unit = g.get('_db_unit') if has_request_context() else None
+    if unit is None:
+        callback()
+        return
+    unit.after_commit.append(callback)
+
+
+def request_memo(key, loader: Callable[[], Any]):
+    """Memorizar un valor solo durante el request actual (p.ej. el rol del usuario)"""
+    if not has_request_context():
+        return loader()
+    memo = g.setdefault('_db_memo', {})
+    if key not in memo:
+        memo[key] = loader()
+    return memo[key]
+
+
+def forget_request_memo(*keys):
+    """Olvidar valores memorizados tras una escritura que los cambia"""
+    if not has_request_context():
+        return
+    memo = g.get('_db_memo')
+    if memo:
+        for key in keys:
+            memo.pop(key, None)
+
+
+def get_request_db_stats() -> Dict[str, Any]:
+    """Obtener métricas de consultas por request de este worker"""
+    with _request_stats_lock:
+        stats = dict(_request_stats)
+    requests = stats['requests']
+    stats['avg_queries_per_request'] = round(stats['queries_total'] / requests, 2) if requests else 0.0
+    stats['avg_leases_per_request'] = round(stats['leases_total'] / requests, 2) if requests else 0.0
+    return stats
+
+
+def init_request_db(app):
+    """Registrar los hooks de la unidad de trabajo en la aplicación Flask"""
+
+    @app.before_request
+    def route_read_only_request():
+        if not replica_configured():
+            return
+        view = app.view_functions.get(request.endpoint)
+        if getattr(view, 'db_read_only', False) and session.get(_PRIMARY_UNTIL_KEY, 0) < time.time():
+            g._db_read_only = True
+
+    @app.after_request
+    def commit_request_unit(response):
+        # Registrado antes que los after_request de la aplicación, así que corre último
+        unit = g.pop('_db_unit', None)
+        if unit is not None:
+            g.setdefault('_db_finished_units', []).append(unit)
+            try:
+                unit.finish(error=response.status_code if response.status_code >= 500 else None)
+            except psycopg2.Error as e:
+                logger.error(f"Error al confirmar la unidad de trabajo del request: {e}")
+                raise
+
+        units = g.get('_db_finished_units')
+        if units:
+            replica = all(finished.replica for finished in units)
+            response.headers['X-DB-Queries'] = str(sum(finished.queries for finished in units))
+            response.headers['X-DB-Leases'] = str(sum(finished.leases for finished in units))
+            response.headers['X-DB-Route'] = 'replica' if replica else 'primary'
+            if not replica and request.method not in _SAFE_METHODS and replica_configured():
+                # Leer del primario hasta que la réplica alcance esta escritura
+                session[_PRIMARY_UNTIL_KEY] = time.time() + DB_REPLICA_MAX_LAG + DB_REPLICA_LAG_CHECK_INTERVAL
+        return response
+
+    @app.teardown_request
+    def finish_request_unit(error=None):
+        # Solo queda una unidad abierta si la vista lanzó una excepción o si algo
+        # consultó la base después de after_request
+        unit = g.pop('_db_unit', None)
+        units = g.pop('_db_finished_units', [])
+        if unit is not None:
+            units.append(unit)
+            try:
+                unit.finish(error)
+            except psycopg2.Error as e:
+                logger.error(f"Error al confirmar la unidad de trabajo del request: {e}")
+        if not units:
+            return
+        queries = sum(finished.queries for finished in units)
+        leases = sum(finished.leases for finished in units)
+        with _request_stats_lock:
+            _request_stats['requests'] += 1
+            _request_stats['queries_total'] += queries
+            _request_stats['queries_max'] = max(_request_stats['queries_max'], queries)
+            _request_stats['leases_total'] += leases
+            if all(finished.replica for finished in units):
+                _request_stats['replica_requests'] += 1
+        logger.debug(
+            f"Request con {queries} consultas en {leases} préstamos de conexión "
+            f"({(time.monotonic() - units[0].started) * 1000:.1f} ms)"
+        )
+
+    return app
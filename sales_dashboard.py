@@ -0,0 +1,183 @@
+"""Snapshot del dashboard de ventas del panel de administración
+
+Las cuatro consultas del dashboard (cupones, ofertas, ventas del mes y ventas
+recientes) son independientes: ante un fallo de cache se ejecutan en paralelo,
+cada una con su propia conexión del pool, y el resultado se cachea
+``SALES_DASHBOARD_CACHE_TTL`` segundos. Crear, editar o eliminar cupones y
+ofertas invalida el snapshot; las ventas (que se registran fuera de la
+aplicación) se reflejan al expirar el TTL.
+"""
+
+import os
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Any, Optional
+
+from psycopg2.extras import RealDictCursor
+
+from cache_service import TwoTierCache
+from db_pool import get_pooled_connection
+from sales_rollup import sales_rollup_available
+
+logger = logging.getLogger(__name__)
+
+SALES_DASHBOARD_CACHE_TTL = int(os.getenv('SALES_DASHBOARD_CACHE_TTL', 30))
+
+COUPON_STATS_SQL = """
+    SELECT
+        COUNT(*) as total_coupons,
+        COUNT(CASE WHEN is_active = TRUE THEN 1 END) as active_coupons,
+        SUM(usage_count) as total_usage
+    FROM discount_coupons
+"""
+
+OFFER_STATS_SQL = """
+    SELECT
+        COUNT(*) as total_offers,
+        COUNT(CASE WHEN status = 'active' AND start_date <= CURRENT_DATE AND end_date >= CURRENT_DATE THEN 1 END) as active_offers,
+        COUNT(CASE WHEN end_date < CURRENT_DATE THEN 1 END) as expired_offers
+    FROM promotional_offers
+"""
+
+# Ventas del mes actual desde el resumen diario (migración 0008)
+MONTH_SALES_ROLLUP_SQL = """
+    SELECT
+        COALESCE(SUM(transaction_count), 0) as total_transactions,
+        COALESCE(SUM(total_final), 0) as total_revenue,
+        COALESCE(SUM(total_commission), 0) as total_commissions
+    FROM sales_daily_rollup
+    WHERE day >= DATE_TRUNC('month', CURRENT_DATE)
+      AND day < DATE_TRUNC('month', CURRENT_DATE) + INTERVAL '1 month'
+"""
+
+MONTH_SALES_SQL = """
+    SELECT
+        COUNT(*) as total_transactions,
+        COALESCE(SUM(final_amount), 0) as total_revenue,
+        COALESCE(SUM(commission_amount), 0) as total_commissions
+    FROM sales_transactions
+    WHERE created_at >= DATE_TRUNC('month', CURRENT_DATE)
+      AND created_at < DATE_TRUNC('month', CURRENT_DATE) + INTERVAL '1 month'
+      AND status = 'completed'
+"""
+
+RECENT_SALES_SQL = """
+    SELECT st.*, s.name as seller_name, u.username
+    FROM sales_transactions st
+    LEFT JOIN sellers s ON st.seller_id = s.id
+    LEFT JOIN users u ON st.user_id = u.id
+    ORDER BY st.created_at DESC
+    LIMIT 10
+"""
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Executor del proceso (los hilos no sobreviven al fork de gunicorn)"""
+    global _executor, _executor_pid
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='sales-dashboard')
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def _month_sales_sql(connection) -> str:
+    return MONTH_SALES_ROLLUP_SQL if sales_rollup_available(connection) else MONTH_SALES_SQL
+
+
+def _fetch(query, many: bool = False):
+    """Ejecutar una consulta del dashboard con una conexión propia del pool.
+
+    ``query`` puede ser una función que recibe la conexión y retorna el SQL.
+    """
+    connection = get_pooled_connection()
+    try:
+        if callable(query):
+            query = query(connection)
+        cursor = connection.cursor(cursor_factory=RealDictCursor)
+        cursor.execute(query)
+        result = cursor.fetchall() if many else cursor.fetchone()
+        cursor.close()
+        return [dict(row) for row in result] if many else dict(result or {})
+    finally:
+        connection.rollback()
+        connection.close()
+
+
+def load_dashboard_snapshot() -> Dict[str, Any]:
+    """Ejecutar las consultas del dashboard en paralelo"""
+    executor = _get_executor()
+    futures = {
+        'coupon_stats': executor.submit(_fetch, COUPON_STATS_SQL),
+        'offer_stats': executor.submit(_fetch, OFFER_STATS_SQL),
+        'sales_stats': executor.submit(_fetch, _month_sales_sql),
+        'recent_sales': executor.submit(_fetch, RECENT_SALES_SQL, True),
+    }
+    snapshot = {name: future.result() for name, future in futures.items()}
+    snapshot['generated_at'] = datetime.now()
+    return snapshot
+
+
+def _to_json(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, dict):
+        return {key: _to_json(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_to_json(item) for item in value]
+    return value
+
+
+def dump_snapshot(snapshot: Dict[str, Any]) -> Dict[str, Any]:
+    """Snapshot serializable a JSON (montos como float, fechas ISO 8601)"""
+    return _to_json(snapshot)
+
+
+def _parse_datetime(value):
+    return datetime.fromisoformat(value) if isinstance(value, str) else value
+
+
+def load_snapshot(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Reconstruir las fechas de un snapshot leído de Redis"""
+    snapshot = dict(data)
+    snapshot['generated_at'] = _parse_datetime(snapshot.get('generated_at'))
+    snapshot['recent_sales'] = [
+        dict(sale, created_at=_parse_datetime(sale.get('created_at')))
+        for sale in snapshot.get('recent_sales', [])
+    ]
+    return snapshot
+
+
+_dashboard_cache = TwoTierCache(
+    'sales_dashboard',
+    # TTL local corto: la invalidación borra Redis y los demás workers la ven pronto
+    local_ttl=min(SALES_DASHBOARD_CACHE_TTL, 5),
+    redis_ttl=max(SALES_DASHBOARD_CACHE_TTL, 1),
+    max_entries=2,
+    dump=dump_snapshot,
+    load=load_snapshot
+)
+
+
+def get_dashboard_snapshot() -> Optional[Dict[str, Any]]:
+    """Obtener el snapshot desde el cache o calcularlo"""
+    if SALES_DASHBOARD_CACHE_TTL <= 0:
+        return load_dashboard_snapshot()
+    return _dashboard_cache.get_or_load('snapshot', load_dashboard_snapshot)
+
+
+def invalidate_sales_dashboard() -> None:
+    """Descartar el snapshot (tras escribir cupones u ofertas)"""
+    try:
+        _dashboard_cache.delete('snapshot')
+    except Exception as e:
+        logger.warning(f"No se pudo invalidar el dashboard de ventas: {e}")
@@ -0,0 +1,107 @@
+"""Resumen diario de ventas (``sales_daily_rollup``)
+
+Una fila por día y vendedor con la cantidad y los montos de las ventas
+completadas. El trigger ``sales_transactions_rollup`` (migración 0008) la
+mantiene en la misma transacción que inserta, modifica o elimina una venta, así
+que los reportes agrupan días ya sumados en lugar de recorrer las transacciones.
+Semanas, meses y años se obtienen sumando los días.
+
+Reconstruir el resumen (p.ej. después de cargar ventas con el trigger deshabilitado):
+    python sales_rollup.py backfill [--start AAAA-MM-DD] [--end AAAA-MM-DD]
+"""
+
+import sys
+import argparse
+import logging
+
+import psycopg2
+
+from db_pool import PoolConfig
+
+logger = logging.getLogger(__name__)
+
+# Solo se cachea la respuesta positiva: tras aplicar la migración se detecta sin reiniciar
+_rollup_available = False
+
+
+def sales_rollup_available(connection) -> bool:
+    """Indica si la tabla del resumen existe (migración 0008 aplicada)"""
+    global _rollup_available
+    if not _rollup_available:
+        cursor = connection.cursor()
+        try:
+            cursor.execute("SELECT to_regclass('sales_daily_rollup') IS NOT NULL AS available")
+            row = cursor.fetchone()
+        finally:
+            cursor.close()
+        _rollup_available = bool(row['available'] if isinstance(row, dict) else row[0])
+    return _rollup_available
+
+
+def rebuild_sales_rollup(connection, start_date=None, end_date=None) -> int:
+    """Recalcular el resumen desde ``sales_transactions`` para un rango de días.
+
+    Bloquea las escrituras de ventas (no las lecturas) hasta el commit, para que
+    ninguna venta concurrente quede fuera del recálculo. No hace commit.
+    Retorna la cantidad de filas (día, vendedor) escritas.
+    """
+    day_conditions = []
+    sale_conditions = ["status = 'completed'", "created_at IS NOT NULL"]
+    params = []
+    if start_date:
+        day_conditions.append("day >= %s")
+        sale_conditions.append("created_at >= %s::date")
+        params.append(start_date)
+    if end_date:
+        day_conditions.append("day <= %s")
+        sale_conditions.append("created_at < %s::date + 1")
+        params.append(end_date)
+    day_where = "WHERE " + " AND ".join(day_conditions) if day_conditions else ""
+
+    cursor = connection.cursor()
+    try:
+        cursor.execute("LOCK TABLE sales_transactions IN SHARE MODE")
+        cursor.execute(f"DELETE FROM sales_daily_rollup {day_where}", params)
+        cursor.execute(f"""
+            INSERT INTO sales_daily_rollup (day, seller_id, transaction_count, total_original,
+                                            total_discount, total_final, total_commission)
+            SELECT created_at::date, seller_id, COUNT(*), SUM(COALESCE(original_amount, 0)),
+                   SUM(COALESCE(discount_amount, 0)), SUM(COALESCE(final_amount, 0)),
+                   SUM(COALESCE(commission_amount, 0))
+            FROM sales_transactions
+            WHERE {" AND ".join(sale_conditions)}
+            GROUP BY created_at::date, seller_id
+        """, params)
+        return cursor.rowcount
+    finally:
+        cursor.close()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Resumen diario de ventas')
+    parser.add_argument('command', choices=['backfill'])
+    parser.add_argument('--start', help='primer día a recalcular (AAAA-MM-DD)')
+    parser.add_argument('--end', help='último día a recalcular (AAAA-MM-DD)')
+    args = parser.parse_args(argv)
+
+    try:
+        connection = psycopg2.connect(**PoolConfig().dsn)
+    except psycopg2.Error as e:
+        print(f"Error conectando a PostgreSQL: {e}")
+        return 2
+
+    try:
+        rows = rebuild_sales_rollup(connection, args.start, args.end)
+        connection.commit()
+        print(f"✅ Resumen de ventas recalculado: {rows} filas (día, vendedor)")
+        return 0
+    except psycopg2.Error as e:
+        connection.rollback()
+        print(f"❌ Error recalculando el resumen de ventas: {e}")
+        return 1
+    finally:
+        connection.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
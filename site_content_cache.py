@@ -0,0 +1,191 @@
+"""Cache por worker del contenido editable del sitio (``site_content`` y ``daily_tips``)
+
+Cada worker guarda una copia ya decodificada del contenido junto con la versión
+con la que se cargó. La versión es la secuencia ``site_content_version_seq``
+(migración 0011): las rutas de administración que modifican el contenido la
+incrementan después del commit y los demás workers, que la consultan como
+mucho cada ``SITE_CONTENT_VERSION_CHECK_INTERVAL`` segundos, recargan al verla
+cambiar. Renderizar una página no ejecuta consultas de contenido.
+
+Se usa una secuencia y no un contador en Redis porque sobrevive a reinicios de
+Redis; si la secuencia no existe todavía, la copia se recarga al cumplir
+``SITE_CONTENT_CACHE_MAX_AGE`` (que además cubre ediciones hechas por fuera de
+la aplicación).
+"""
+
+import os
+import time
+import logging
+import threading
+from typing import Dict, Any, List, Optional
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+from db_pool import get_pooled_connection
+from request_db import call_after_commit
+
+logger = logging.getLogger(__name__)
+
+SITE_CONTENT_VERSION_CHECK_INTERVAL = float(os.getenv('SITE_CONTENT_VERSION_CHECK_INTERVAL', 1))
+SITE_CONTENT_CACHE_MAX_AGE = float(os.getenv('SITE_CONTENT_CACHE_MAX_AGE', 300))
+
+SITE_CONTENT_SQL = "SELECT section, content_key, content_value FROM site_content"
+
+ACTIVE_TIPS_SQL = """
+    SELECT id, title, description, icon, color, is_active
+    FROM daily_tips
+    WHERE is_active = true
+    ORDER BY id
+"""
+
+
+def load_site_content(connection) -> Dict[str, Any]:
+    """Leer todo el contenido editable: ``site_content`` por sección y consejos activos"""
+    cursor = connection.cursor(cursor_factory=RealDictCursor)
+    try:
+        cursor.execute(SITE_CONTENT_SQL)
+        site_content: Dict[str, Dict[str, str]] = {}
+        for row in cursor.fetchall():
+            site_content.setdefault(row['section'], {})[row['content_key']] = row['content_value']
+
+        cursor.execute(ACTIVE_TIPS_SQL)
+        # Formato que esperan las plantillas del dashboard
+        daily_tips = [
+            {
+                'id': tip['id'],
+                'title': tip['title'],
+                'description': tip['description'],
+                'icon': tip['icon'],
+                'icon_color': tip['color']
+            }
+            for tip in cursor.fetchall()
+        ]
+    finally:
+        cursor.close()
+    return {'site_content': site_content, 'daily_tips': daily_tips}
+
+
+def _read_version(connection) -> Optional[int]:
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SELECT last_value, is_called FROM site_content_version_seq")
+        row = cursor.fetchone()
+    finally:
+        cursor.close()
+    if isinstance(row, dict):
+        return row['last_value'] if row['is_called'] else 0
+    return row[0] if row[1] else 0
+
+
+class SiteContentCache:
+    """Copia del contenido del worker, recargada solo al cambiar la versión"""
+
+    def __init__(self, check_interval: float = None, max_age: float = None):
+        self.check_interval = SITE_CONTENT_VERSION_CHECK_INTERVAL if check_interval is None else check_interval
+        self.max_age = SITE_CONTENT_CACHE_MAX_AGE if max_age is None else max_age
+        self._lock = threading.Lock()
+        self._content: Optional[Dict[str, Any]] = None
+        self._version: Optional[int] = None
+        self._loaded_at = 0.0
+        self._checked_at = 0.0
+        self.stats = {'hits': 0, 'version_checks': 0, 'reloads': 0}
+
+    def _is_fresh(self, now: float) -> bool:
+        return (self._content is not None
+                and now - self._checked_at < self.check_interval
+                and now - self._loaded_at < self.max_age)
+
+    def get(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        if self._is_fresh(now):
+            self.stats['hits'] += 1
+            return self._content
+
+        with self._lock:
+            now = time.monotonic()
+            if self._is_fresh(now):
+                self.stats['hits'] += 1
+                return self._content
+            self._refresh(now)
+            return self._content
+
+    def _refresh(self, now: float) -> None:
+        connection = get_pooled_connection()
+        try:
+            try:
+                version = _read_version(connection)
+            except psycopg2.Error as e:
+                # Migración 0011 sin aplicar: solo recarga por antigüedad
+                logger.debug(f"Versión de contenido no disponible: {e}")
+                connection.rollback()
+                version = None
+            self.stats['version_checks'] += 1
+
+            expired = now - self._loaded_at >= self.max_age
+            if self._content is None or version != self._version or expired:
+                # La versión se lee antes que el contenido: si cambia en el medio,
+                # la próxima verificación vuelve a recargar
+                self._content = load_site_content(connection)
+                self._version = version
+                self._loaded_at = now
+                self.stats['reloads'] += 1
+            self._checked_at = now
+        finally:
+            connection.rollback()
+            connection.close()
+
+    def invalidate(self) -> None:
+        """Forzar la recarga en el próximo acceso de este worker"""
+        with self._lock:
+            self._content = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(self.stats, version=self._version,
+                    age_seconds=round(time.monotonic() - self._loaded_at, 1) if self._content else None)
+
+
+_site_content_cache = SiteContentCache()
+
+
+def get_site_content() -> Dict[str, Any]:
+    """Contenido del sitio agrupado por sección (``{section: {key: value}}``)"""
+    return _site_content_cache.get()['site_content']
+
+
+def get_daily_tips() -> List[Dict[str, Any]]:
+    """Consejos del día activos, en el formato de las plantillas"""
+    return _site_content_cache.get()['daily_tips']
+
+
+def bump_content_version() -> None:
+    """Avisar a todos los workers que el contenido cambió.
+
+    Dentro de un request se incrementa recién al confirmarse su transacción:
+    antes, otro worker podría recargar el contenido viejo con la versión nueva.
+    """
+    call_after_commit(_increment_version)
+
+
+def _increment_version() -> None:
+    _site_content_cache.invalidate()
+    try:
+        connection = get_pooled_connection()
+    except Exception as e:
+        logger.warning(f"No se pudo incrementar la versión del contenido: {e}")
+        return
+    try:
+        cursor = connection.cursor()
+        cursor.execute("SELECT nextval('site_content_version_seq')")
+        cursor.close()
+        connection.commit()
+    except psycopg2.Error as e:
+        connection.rollback()
+        logger.warning(f"No se pudo incrementar la versión del contenido: {e}")
+    finally:
+        connection.close()
+
+
+def get_site_content_stats() -> Dict[str, Any]:
+    """Aciertos, verificaciones de versión y recargas del worker"""
+    return _site_content_cache.get_stats()
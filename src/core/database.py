@@ -1,8 +1,7 @@
 # Servicios de base de datos
-import os
-import psycopg2
 from psycopg2.extras import RealDictCursor
 from typing import Optional, Dict, Any, List
+from db_pool import get_pooled_connection
 from .models import UserProfile, CVDocument, CVAnalysisResult
 import logging
 
@@ -11,34 +10,21 @@ logger = logging.getLogger(__name__)
 class DatabaseService:
     """Servicio centralizado para operaciones de base de datos"""
     
-    def __init__(self):
-        self.connection = None
-    
     def get_connection(self):
-        """Obtener conexión a la base de datos"""
-        if self.connection and not self.connection.closed:
-            return self.connection
+        """Obtener conexión a la base de datos
         
+        Cada llamada toma una conexión del pool compartido del proceso;
+        el llamador debe devolverla con connection.close().
+        """
         try:
-            # Configuración de PostgreSQL
-            db_config = {
-                'host': os.getenv('DB_HOST', 'localhost'),
-                'port': os.getenv('DB_PORT', '5432'),
-                'database': os.getenv('DB_NAME', 'armind_db'),
-                'user': os.getenv('DB_USER', 'postgres'),
-                'password': os.getenv('DB_PASSWORD', '')
-            }
-            
-            self.connection = psycopg2.connect(**db_config)
-            logger.info("Conexión a PostgreSQL establecida")
-            return self.connection
-            
+            return get_pooled_connection()
         except Exception as e:
             logger.error(f"Error conectando a PostgreSQL: {e}")
             return None
     
     def test_connection(self) -> bool:
         """Probar conexión a la base de datos"""
+        connection = None
         try:
             connection = self.get_connection()
             if connection and not connection.closed:
@@ -52,12 +38,9 @@ class DatabaseService:
         except Exception as e:
             logger.error(f"Error probando conexión a base de datos: {e}")
             return False
-    
-    def close_connection(self):
-        """Cerrar conexión a la base de datos"""
-        if self.connection and not self.connection.closed:
-            self.connection.close()
-            logger.info("Conexión a base de datos cerrada")
+        finally:
+            if connection:
+                connection.close()
     
     def execute_query(self, query: str, params: tuple = None, fetch: bool = False):
         """Ejecutar consulta SQL"""
@@ -71,9 +54,11 @@ class DatabaseService:
                 
                 if fetch:
                     if 'SELECT' in query.upper():
-                        return cursor.fetchall()
+                        result = cursor.fetchall()
                     else:
-                        return cursor.fetchone()
+                        result = cursor.fetchone()
+                    connection.commit()
+                    return result
                 else:
                     connection.commit()
                     return cursor.rowcount
@@ -82,6 +67,8 @@ class DatabaseService:
             logger.error(f"Error ejecutando consulta: {e}")
             connection.rollback()
             return None
+        finally:
+            connection.close()
     
     def get_user_by_id(self, user_id: int) -> Optional[UserProfile]:
         """Obtener usuario por ID"""
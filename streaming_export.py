@@ -0,0 +1,217 @@
+"""Exportaciones de reportes con memoria acotada
+
+Las filas se leen con un cursor con nombre (server-side) en bloques de
+``EXPORT_CHUNK_SIZE`` y se escriben directamente en la respuesta:
+
+- CSV: cada bloque se envía al cliente apenas se formatea (respuesta chunked).
+- XLSX: openpyxl en modo ``write_only`` escribe la hoja en disco fila a fila; el
+  archivo terminado se envía en bloques desde un archivo temporal.
+
+Así la memoria del worker no depende de la cantidad de filas. El XLSX ya
+escrito informa su cantidad de filas en la cabecera ``X-Export-Rows``; el CSV
+envía ``X-Export-Rows-Estimate`` con las filas que estima el planificador
+(``EXPLAIN``, sin ejecutar la consulta), porque contarlas antes de transmitir
+obligaría a ejecutarla dos veces. En las rutas @read_only la lectura va a la
+réplica cuando está al día.
+
+Límite del XLSX: el archivo se escribe completo antes de enviar el primer byte,
+así que la exportación entera debe terminar dentro del ``--timeout`` de
+gunicorn (120 s en el Dockerfile) o el worker se reinicia a mitad de la
+descarga. Para volúmenes que no entran en ese tiempo se debe usar el CSV, que
+empieza a transmitir con el primer bloque.
+"""
+
+import os
+import io
+import csv
+import json
+import time
+import uuid
+import logging
+import tempfile
+from datetime import datetime, timezone
+from typing import Iterable, Iterator, List, Tuple, Union, Callable, Any, Optional, Dict
+
+import psycopg2
+from flask import Response, stream_with_context
+from psycopg2.extras import RealDictCursor
+
+from db_pool import get_pooled_connection, get_replica_connection
+from request_db import is_read_only_request
+
+logger = logging.getLogger(__name__)
+
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', 2000))
+
+# Tamaño de cada bloque enviado al cliente al transmitir un archivo ya generado
+_FILE_CHUNK_BYTES = 64 * 1024
+
+CSV_MIMETYPE = 'text/csv; charset=utf-8'
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# (encabezado, clave de la fila o función que recibe la fila)
+Column = Tuple[str, Union[str, Callable[[Dict[str, Any]], Any]]]
+
+
+def _read_connection():
+    connection = get_replica_connection() if is_read_only_request() else None
+    return connection if connection is not None else get_pooled_connection()
+
+
+def iter_query_rows(query: str, params=None, chunk_size: int = None) -> Iterator[Dict[str, Any]]:
+    """Iterar las filas de una consulta con un cursor server-side.
+
+    Usa su propia conexión del pool (no la del request): el generador se consume
+    mientras se envía la respuesta, después de que la ruta retornó.
+    """
+    chunk_size = chunk_size or EXPORT_CHUNK_SIZE
+    connection = _read_connection()
+    cursor = None
+    try:
+        cursor = connection.cursor(name=f"export_{uuid.uuid4().hex}", cursor_factory=RealDictCursor)
+        cursor.itersize = chunk_size
+        cursor.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            for row in rows:
+                yield row
+    finally:
+        if cursor is not None:
+            try:
+                cursor.close()
+            except Exception:
+                pass
+        # Solo lectura: se descarta la transacción del cursor y se devuelve la conexión
+        connection.rollback()
+        connection.close()
+
+
+def estimate_query_rows(query: str, params=None) -> Optional[int]:
+    """Filas que el planificador estima para la consulta; None si no se pudo estimar.
+
+    Solo planifica (``EXPLAIN`` sin ``ANALYZE``): el costo no depende de la
+    cantidad de filas. La precisión es la de las estadísticas de la tabla.
+    """
+    connection = _read_connection()
+    cursor = connection.cursor()
+    try:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {query}", params)
+        row = cursor.fetchone()
+        plan = next(iter(row.values())) if isinstance(row, dict) else row[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+    except (psycopg2.Error, LookupError, TypeError, ValueError) as e:
+        logger.warning(f"No se pudo estimar las filas de la exportación: {e}")
+        return None
+    finally:
+        cursor.close()
+        connection.rollback()
+        connection.close()
+
+
+def _cell_values(row: Dict[str, Any], columns: List[Column]) -> List[Any]:
+    return [source(row) if callable(source) else row.get(source) for _, source in columns]
+
+
+def iter_csv(rows: Iterable[Dict[str, Any]], columns: List[Column],
+             chunk_size: int = None) -> Iterator[bytes]:
+    """Formatear filas como CSV, un bloque de bytes cada ``chunk_size`` filas"""
+    chunk_size = chunk_size or EXPORT_CHUNK_SIZE
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([header for header, _ in columns])
+
+    written = 0
+    started = time.monotonic()
+    for row in rows:
+        writer.writerow(_cell_values(row, columns))
+        written += 1
+        if written % chunk_size == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate(0)
+            if written % (chunk_size * 10) == 0:
+                logger.info(f"Exportación CSV: {written} filas ({time.monotonic() - started:.1f} s)")
+    yield buffer.getvalue().encode('utf-8')
+    logger.info(f"Exportación CSV completa: {written} filas en {time.monotonic() - started:.1f} s")
+
+
+def write_xlsx(rows: Iterable[Dict[str, Any]], columns: List[Column], sheet_name: str = 'Datos'):
+    """Escribir un XLSX en modo write_only a un archivo temporal.
+
+    Retorna ``(archivo, cantidad_de_filas)`` con el archivo posicionado al inicio;
+    quien lo recibe debe cerrarlo.
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=sheet_name)
+    sheet.append([header for header, _ in columns])
+
+    written = 0
+    for row in rows:
+        values = []
+        for value in _cell_values(row, columns):
+            if isinstance(value, str):
+                # Caracteres de control que el formato XLSX no admite
+                value = ILLEGAL_CHARACTERS_RE.sub('', value)
+            elif isinstance(value, datetime) and value.tzinfo is not None:
+                # Excel no admite zonas horarias: se exporta en UTC
+                value = value.astimezone(timezone.utc).replace(tzinfo=None)
+            values.append(value)
+        sheet.append(values)
+        written += 1
+
+    output = tempfile.TemporaryFile()
+    try:
+        workbook.save(output)
+    except Exception:
+        output.close()
+        raise
+    output.seek(0)
+    return output, written
+
+
+def iter_file(file_obj) -> Iterator[bytes]:
+    """Enviar un archivo en bloques y cerrarlo al terminar"""
+    try:
+        while True:
+            chunk = file_obj.read(_FILE_CHUNK_BYTES)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        file_obj.close()
+
+
+def _attachment_headers(filename: str, row_count: Optional[int],
+                        row_header: str = 'X-Export-Rows') -> Dict[str, str]:
+    headers = {'Content-Disposition': f'attachment; filename="{filename}"'}
+    if row_count is not None:
+        headers[row_header] = str(row_count)
+    return headers
+
+
+def stream_query_export(query: str, params, columns: List[Column], filename: str,
+                        export_format: str = 'csv', sheet_name: str = 'Datos') -> Response:
+    """Respuesta de descarga de una consulta en CSV o XLSX con memoria acotada.
+
+    El XLSX se genera completo dentro del request (ver el límite de tiempo en
+    la documentación del módulo); el CSV se transmite por bloques.
+    """
+    if export_format == 'xlsx':
+        output, row_count = write_xlsx(iter_query_rows(query, params), columns, sheet_name)
+        output.seek(0, os.SEEK_END)
+        size = output.tell()
+        output.seek(0)
+        headers = _attachment_headers(filename, row_count)
+        headers['Content-Length'] = str(size)
+        return Response(iter_file(output), mimetype=XLSX_MIMETYPE, headers=headers)
+
+    body = stream_with_context(iter_csv(iter_query_rows(query, params), columns))
+    headers = _attachment_headers(filename, estimate_query_rows(query, params), 'X-Export-Rows-Estimate')
+    return Response(body, mimetype=CSV_MIMETYPE, headers=headers)
@@ -1,14 +1,14 @@
-from subscription_system import get_user_usage, get_user_subscription, SUBSCRIPTION_PLANS
+from subscription_system import get_user_subscription, SUBSCRIPTION_PLANS
+from entitlements import get_entitlements
 from datetime import datetime
 
 def get_complete_user_usage(user_id):
     """Obtener el uso completo del usuario para todas las funciones"""
     try:
-        # Obtener uso de análisis de CV
-        cv_analysis_count = get_user_usage(user_id, 'cv_analysis')
-        
-        # Obtener uso de creación de CV
-        cv_creation_count = get_user_usage(user_id, 'cv_creation')
+        # Un solo snapshot cacheado cubre todos los recursos
+        snapshot = get_entitlements(user_id)
+        cv_analysis_count = snapshot.get_usage('cv_analysis') if snapshot else 0
+        cv_creation_count = snapshot.get_usage('cv_creation') if snapshot else 0
         
         # Retornar objeto con la estructura esperada
         return {
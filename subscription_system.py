@@ -1,6 +1,9 @@
 import os
 import psycopg2
 from psycopg2.extras import RealDictCursor
+from db_pool import get_pooled_connection
+from request_db import get_request_connection
+from prepared_statements import prepared
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 import json
@@ -83,21 +86,72 @@ SUBSCRIPTION_PLANS = {
 }
 
 def get_db_connection():
-    """Obtener conexión a la base de datos PostgreSQL"""
+    """Obtener conexión a la base de datos PostgreSQL
+    
+    Dentro de un request reutiliza la conexión de la unidad de trabajo del
+    request; fuera de él la toma del pool del proceso.
+    """
     try:
-        connection = psycopg2.connect(
-            host=DB_CONFIG['host'],
-            database=DB_CONFIG['database'],
-            user=DB_CONFIG['user'],
-            password=DB_CONFIG['password'],
-            port=DB_CONFIG['port'],
-            cursor_factory=RealDictCursor
-        )
+        connection = get_request_connection(cursor_factory=RealDictCursor)
+        if connection is None:
+            connection = get_pooled_connection(cursor_factory=RealDictCursor)
         return connection
     except psycopg2.Error as err:
         print(f"Error de conexión a la base de datos: {err}")
         return None
 
+# Columnas de reserva de cupo y fusión de las filas duplicadas que dejaron
+# incrementos concurrentes, antes de crear la clave única por período
+USAGE_TRACKING_KEY_STATEMENTS = (
+    """
+    ALTER TABLE usage_tracking
+    ADD COLUMN IF NOT EXISTS reserved_count INTEGER DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS reserved_until TIMESTAMP
+    """,
+    """
+    UPDATE usage_tracking ut
+    SET used_count = dup.total
+    FROM (
+        SELECT MAX(id) AS keep_id, SUM(used_count) AS total
+        FROM usage_tracking
+        GROUP BY user_id, resource_type, reset_date
+        HAVING COUNT(*) > 1
+    ) dup
+    WHERE ut.id = dup.keep_id
+    """,
+    """
+    DELETE FROM usage_tracking ut
+    USING usage_tracking newer
+    WHERE ut.user_id = newer.user_id
+      AND ut.resource_type = newer.resource_type
+      AND ut.reset_date = newer.reset_date
+      AND ut.id < newer.id
+    """,
+)
+
+
+def prepare_usage_tracking_key(connection):
+    """Agregar las columnas de reserva y fusionar duplicados de usage_tracking.
+
+    Paso previo a ``uq_usage_tracking_period`` para las migraciones (que corren
+    en autocommit): todo va en una transacción que bloquea las escrituras de la
+    tabla para que la fusión no pierda incrementos concurrentes.
+    """
+    autocommit = connection.autocommit
+    connection.autocommit = False
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("LOCK TABLE usage_tracking IN SHARE ROW EXCLUSIVE MODE")
+            for statement in USAGE_TRACKING_KEY_STATEMENTS:
+                cursor.execute(statement)
+        connection.commit()
+    except psycopg2.Error:
+        connection.rollback()
+        raise
+    finally:
+        connection.autocommit = autocommit
+
+
 def create_subscription_tables():
     """Crear tablas necesarias para el sistema de suscripciones"""
     connection = get_db_connection()
@@ -139,6 +193,14 @@ def create_subscription_tables():
             )
         """)
         
+        # Columnas de reserva de cupo y clave única por período
+        for statement in USAGE_TRACKING_KEY_STATEMENTS:
+            cursor.execute(statement)
+        cursor.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS uq_usage_tracking_period
+            ON usage_tracking (user_id, resource_type, reset_date)
+        """)
+        
         # Tabla de transacciones de pago
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS payment_transactions (
@@ -176,200 +238,242 @@ def create_subscription_tables():
         connection.rollback()
         return False
 
+def get_user_role(user_id):
+    """Obtener el rol del usuario desde su snapshot de derechos de uso"""
+    from entitlements import get_entitlements
+    snapshot = get_entitlements(user_id)
+    return snapshot.role if snapshot else None
+
 def get_user_subscription(user_id):
     """Obtener la suscripción activa del usuario"""
-    connection = get_db_connection()
-    if not connection:
-        return None
-    
-    try:
-        cursor = connection.cursor(cursor_factory=RealDictCursor)
-        
-        # Primero verificar si es administrador
-        cursor.execute("SELECT role FROM users WHERE id = %s", (user_id,))
-        user_role = cursor.fetchone()
-        
-        if user_role and user_role['role'] == 'admin':
-            # Los administradores no necesitan suscripción, tienen acceso completo
-            cursor.close()
-            connection.close()
-            return None
-        
-        # Para usuarios normales, buscar en la tabla subscriptions
-        cursor.execute("""
-            SELECT s.id, s.user_id, s.plan_type, s.status, s.start_date, s.end_date, 
-                   s.payment_method, s.transaction_id, s.amount, s.currency,
-                   s.created_at, s.updated_at,
-                   u.current_plan, u.subscription_status, u.subscription_end_date
-            FROM subscriptions s
-            JOIN users u ON s.user_id = u.id
-            WHERE s.user_id = %s AND s.status = 'active'
-            ORDER BY s.start_date DESC
-            LIMIT 1
-        """, (user_id,))
-        
-        subscription = cursor.fetchone()
-        cursor.close()
-        connection.close()
-        
-        if subscription:
-            # Convertir a diccionario para compatibilidad con templates
-            return {
-                'id': subscription['id'],
-                'user_id': subscription['user_id'],
-                'plan_type': subscription['plan_type'],
-                'status': subscription['status'],
-                'start_date': subscription['start_date'],
-                'end_date': subscription['end_date'],
-                'payment_method': subscription['payment_method'],
-                'transaction_id': subscription['transaction_id'],
-                'amount': subscription['amount'],
-                'currency': subscription['currency'],
-                'created_at': subscription['created_at'],
-                'updated_at': subscription['updated_at'],
-                'expires_at': subscription['end_date'],  # Alias para compatibilidad con templates
-                'current_plan': subscription['current_plan'],
-                'subscription_status': subscription['subscription_status'],
-                'subscription_end_date': subscription['subscription_end_date']
-            }
-        
-        return None
-        
-    except Exception as e:
-        print(f"Error al obtener suscripción del usuario: {e}")
-        if connection:
-            connection.close()
-        return None
+    from entitlements import get_entitlements
+    snapshot = get_entitlements(user_id)
+    if snapshot and snapshot.subscription:
+        # Copia para que los llamadores no modifiquen el snapshot cacheado
+        return dict(snapshot.subscription)
+    return None
+
 def get_user_usage(user_id, resource_type):
     """Obtener el uso actual de recursos del usuario"""
-    connection = get_db_connection()
-    if not connection:
-        return 0
+    from entitlements import get_entitlements
+    snapshot = get_entitlements(user_id)
+    return snapshot.get_usage(resource_type) if snapshot else 0
+
+def check_user_limits(user_id, action_type):
+    """Verificar si el usuario puede realizar una acción específica
     
+    Usa el snapshot cacheado de derechos de uso, por lo que en el caso común
+    no consulta la base de datos.
+    """
     try:
-        cursor = connection.cursor(cursor_factory=RealDictCursor)
-        
-        # Verificar si es administrador
-        cursor.execute("SELECT role FROM users WHERE id = %s", (user_id,))
-        user_role = cursor.fetchone()
-        
-        if user_role and user_role['role'] == 'admin':
-            # Los administradores tienen uso ilimitado
-            cursor.close()
-            connection.close()
-            return 0
-        
-        # Obtener la suscripción activa para usuarios normales
-        subscription = get_user_subscription(user_id)
-        if not subscription:
-            cursor.close()
-            connection.close()
-            return 0
-        
-        # Obtener el uso actual del mes
-        cursor.execute("""
-            SELECT used_count FROM usage_tracking
-            WHERE user_id = %s AND resource_type = %s
-            AND reset_date >= %s
-            ORDER BY created_at DESC
-            LIMIT 1
-        """, (user_id, resource_type, subscription['start_date']))
-        
-        result = cursor.fetchone()
-        cursor.close()
-        connection.close()
-        
-        return result['used_count'] if result else 0
-        
+        from entitlements import get_entitlements
+        snapshot = get_entitlements(user_id)
+        if snapshot is None:
+            return False, "Error al verificar límites"
+        return snapshot.check(action_type)
+    
     except Exception as e:
-        print(f"Error al obtener uso de recursos: {e}")
-        return 0
+        print(f"Error checking user limits: {e}")
+        return False, "Error al verificar límites"
 
-def check_user_limits(user_id, action_type):
-    """Verificar si el usuario puede realizar una acción específica"""
+def invalidate_entitlements(user_id):
+    """Descartar el snapshot cacheado de derechos de uso del usuario"""
+    from entitlements import invalidate_entitlements as invalidate
+    invalidate(user_id)
+
+# Segundos que una reserva de cupo sigue vigente si el worker muere sin liberarla
+USAGE_RESERVATION_TTL = int(os.getenv('USAGE_RESERVATION_TTL', 300))
+
+# Reservas vigentes de la fila de uso (las vencidas no cuentan)
+_ACTIVE_RESERVED = """
+    (CASE WHEN usage_tracking.reserved_until > NOW() THEN usage_tracking.reserved_count ELSE 0 END)
+"""
+
+# Incremento atómico: crea la fila del período o suma 1 solo si no supera el límite
+INCREMENT_USAGE_SQL = """
+    INSERT INTO usage_tracking (user_id, subscription_id, resource_type, used_count, reset_date)
+    SELECT %(user_id)s, %(subscription_id)s, %(resource_type)s, 1, %(period)s
+    WHERE %(limit)s IS NULL OR %(limit)s > 0
+    ON CONFLICT (user_id, resource_type, reset_date) DO UPDATE
+    SET used_count = usage_tracking.used_count + 1, updated_at = CURRENT_TIMESTAMP
+    WHERE %(limit)s IS NULL
+       OR usage_tracking.used_count + """ + _ACTIVE_RESERVED + """ < %(limit)s
+    RETURNING id, used_count
+"""
+
+# Reserva atómica de un cupo: misma verificación de límite, pero suma a reserved_count.
+# La fila guarda un solo vencimiento para todas sus reservas: se fija con la primera
+# reserva de una tanda (no hay vigentes) y las siguientes no lo extienden. Así una
+# reserva que dejó un worker caído vence a más tardar USAGE_RESERVATION_TTL segundos
+# después de hecha aunque el usuario siga reintentando; a cambio, una reserva que se
+# suma tarde a la tanda puede dejar de contar antes de terminar su operación (su
+# commit() igual suma el uso consumido).
+RESERVE_USAGE_SQL = """
+    INSERT INTO usage_tracking (user_id, subscription_id, resource_type, used_count,
+                                reserved_count, reserved_until, reset_date)
+    SELECT %(user_id)s, %(subscription_id)s, %(resource_type)s, 0,
+           1, NOW() + make_interval(secs => %(ttl)s), %(period)s
+    WHERE %(limit)s IS NULL OR %(limit)s > 0
+    ON CONFLICT (user_id, resource_type, reset_date) DO UPDATE
+    SET reserved_count = """ + _ACTIVE_RESERVED + """ + 1,
+        reserved_until = CASE
+            WHEN usage_tracking.reserved_until > NOW() AND usage_tracking.reserved_count > 0
+            THEN usage_tracking.reserved_until
+            ELSE NOW() + make_interval(secs => %(ttl)s)
+        END,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE %(limit)s IS NULL
+       OR usage_tracking.used_count + """ + _ACTIVE_RESERVED + """ < %(limit)s
+    RETURNING id, used_count, reserved_count
+"""
+
+COMMIT_RESERVATION_SQL = """
+    UPDATE usage_tracking
+    SET used_count = used_count + 1,
+        reserved_count = GREATEST(reserved_count - 1, 0),
+        updated_at = CURRENT_TIMESTAMP
+    WHERE id = %(usage_id)s
+"""
+
+RELEASE_RESERVATION_SQL = """
+    UPDATE usage_tracking
+    SET reserved_count = GREATEST(reserved_count - 1, 0),
+        updated_at = CURRENT_TIMESTAMP
+    WHERE id = %(usage_id)s
+"""
+
+# Sentencias preparadas una vez por conexión (ver prepared_statements.py)
+INCREMENT_USAGE_STATEMENT = prepared('increment_usage', INCREMENT_USAGE_SQL,
+                                     ('integer', 'integer', 'varchar', 'timestamp', 'integer'))
+RESERVE_USAGE_STATEMENT = prepared('reserve_usage', RESERVE_USAGE_SQL,
+                                   ('integer', 'integer', 'varchar', 'double precision', 'timestamp', 'integer'))
+COMMIT_RESERVATION_STATEMENT = prepared('commit_usage_reservation', COMMIT_RESERVATION_SQL, ('integer',))
+RELEASE_RESERVATION_STATEMENT = prepared('release_usage_reservation', RELEASE_RESERVATION_SQL, ('integer',))
+
+def _get_usage_limit(subscription, resource_type):
+    """Límite del plan para el recurso, o None si el plan no lo limita"""
+    plan_type = subscription.get('plan_type', subscription.get('current_plan'))
+    return SUBSCRIPTION_PLANS.get(plan_type, {}).get('limits', {}).get(resource_type)
+
+def _execute_usage_statement(statement, params):
+    """Ejecutar una sentencia de contadores y confirmarla de inmediato
+    
+    Usa una conexión propia del pool y no la del request: el UPSERT bloquea la
+    fila de uso y ese bloqueo no debe mantenerse hasta el final del request.
+    """
+    connection = get_pooled_connection(cursor_factory=RealDictCursor)
     try:
-        # Verificar si es administrador primero
-        connection = get_db_connection()
-        cursor = connection.cursor(cursor_factory=RealDictCursor)
-        cursor.execute("SELECT role FROM users WHERE id = %s", (user_id,))
-        user_role = cursor.fetchone()
+        cursor = connection.cursor()
+        statement.execute(cursor, params)
+        row = cursor.fetchone() if cursor.description else None
+        connection.commit()
         cursor.close()
+        return row
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
         connection.close()
-        
-        if user_role and user_role['role'] == 'admin':
-            # Los administradores tienen acceso ilimitado a todo
-            return True, "Acceso administrativo completo"
-        
+
+def increment_usage(user_id, resource_type, enforce_limit=True):
+    """Incrementar el contador de uso de un recurso
+    
+    Verifica el límite del plan e incrementa en una sola sentencia atómica,
+    por lo que dos análisis concurrentes no pueden superar el límite ni crear
+    filas duplicadas. Retorna False si no hay suscripción o se alcanzó el límite.
+    """
+    try:
         subscription = get_user_subscription(user_id)
         if not subscription:
-            return False, "No tienes una suscripción activa"
-        
-        plan_type = subscription.get('plan_type', subscription.get('current_plan'))
-        if plan_type not in SUBSCRIPTION_PLANS:
-            return False, "Plan de suscripción no válido"
+            return False
         
-        plan_limits = SUBSCRIPTION_PLANS[plan_type]['limits']
+        row = _execute_usage_statement(INCREMENT_USAGE_STATEMENT, {
+            'user_id': user_id,
+            'subscription_id': subscription['id'],
+            'resource_type': resource_type,
+            'period': subscription['start_date'],
+            'limit': _get_usage_limit(subscription, resource_type) if enforce_limit else None
+        })
+        invalidate_entitlements(user_id)
         
-        # Verificar límites específicos
-        if action_type in plan_limits:
-            current_usage = get_user_usage(user_id, action_type)
-            if current_usage >= plan_limits[action_type]:
-                return False, f"Has alcanzado el límite de {plan_limits[action_type]} para {action_type}"
+        return row is not None
         
-        return True, "Acción permitida"
-    
     except Exception as e:
-        print(f"Error checking user limits: {e}")
-        return False, "Error al verificar límites"
+        print(f"Error al incrementar uso: {e}")
+        return False
 
-def increment_usage(user_id, resource_type):
-    """Incrementar el contador de uso de un recurso"""
-    connection = get_db_connection()
-    if not connection:
+class UsageReservation:
+    """Cupo reservado mientras dura una operación lenta (p.ej. un análisis con IA)
+    
+    commit() lo convierte en uso consumido y release() lo devuelve. Usado como
+    context manager confirma al salir sin errores y libera si hubo una excepción.
+    """
+    
+    def __init__(self, user_id, resource_type, usage_id):
+        self.user_id = user_id
+        self.resource_type = resource_type
+        self.usage_id = usage_id
+        self.done = usage_id is None
+    
+    def commit(self):
+        """Consumir el cupo reservado"""
+        if self.done:
+            return
+        self.done = True
+        _execute_usage_statement(COMMIT_RESERVATION_STATEMENT, {'usage_id': self.usage_id})
+        invalidate_entitlements(self.user_id)
+    
+    def release(self):
+        """Devolver el cupo sin consumirlo"""
+        if self.done:
+            return
+        self.done = True
+        try:
+            _execute_usage_statement(RELEASE_RESERVATION_STATEMENT, {'usage_id': self.usage_id})
+        except Exception as e:
+            # La reserva vence sola tras USAGE_RESERVATION_TTL
+            print(f"Error al liberar reserva de uso: {e}")
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.release()
         return False
+
+def reserve_usage(user_id, resource_type, ttl=None):
+    """Reservar un cupo del recurso si el plan lo permite
     
+    Retorna una UsageReservation o None si no hay suscripción o se alcanzó el
+    límite (contando las reservas vigentes de otras operaciones en curso).
+    """
     try:
-        cursor = connection.cursor(cursor_factory=RealDictCursor)
-        subscription = get_user_subscription(user_id)
+        # Los administradores tienen uso ilimitado y no llevan contador
+        if get_user_role(user_id) == 'admin':
+            return UsageReservation(user_id, resource_type, None)
         
+        subscription = get_user_subscription(user_id)
         if not subscription:
-            return False
-        
-        # Buscar registro de uso existente
-        cursor.execute("""
-            SELECT id, used_count FROM usage_tracking
-            WHERE user_id = %s AND resource_type = %s
-            AND reset_date >= %s
-            ORDER BY created_at DESC
-            LIMIT 1
-        """, (user_id, resource_type, subscription['start_date']))
-        
-        existing = cursor.fetchone()
-        
-        if existing:
-            # Actualizar contador existente
-            cursor.execute("""
-                UPDATE usage_tracking
-                SET used_count = used_count + 1, updated_at = CURRENT_TIMESTAMP
-                WHERE id = %s
-            """, (existing['id'],))
-        else:
-            # Crear nuevo registro
-            cursor.execute("""
-                INSERT INTO usage_tracking (user_id, subscription_id, resource_type, used_count, reset_date)
-                VALUES (%s, %s, %s, 1, %s)
-            """, (user_id, subscription['id'], resource_type, subscription['start_date']))
-        
-        connection.commit()
-        cursor.close()
-        connection.close()
+            return None
         
-        return True
+        row = _execute_usage_statement(RESERVE_USAGE_STATEMENT, {
+            'user_id': user_id,
+            'subscription_id': subscription['id'],
+            'resource_type': resource_type,
+            'period': subscription['start_date'],
+            'limit': _get_usage_limit(subscription, resource_type),
+            'ttl': USAGE_RESERVATION_TTL if ttl is None else ttl
+        })
+        if row is None:
+            return None
+        return UsageReservation(user_id, resource_type, row['id'])
         
     except Exception as e:
-        print(f"Error al incrementar uso: {e}")
-        connection.rollback()
-        return False
+        print(f"Error al reservar uso: {e}")
+        return None
 
 def create_subscription(user_id, plan_type, payment_method=None, transaction_id=None):
     """Crear una nueva suscripción para el usuario"""
@@ -414,6 +518,7 @@ def create_subscription(user_id, plan_type, payment_method=None, transaction_id=
         connection.commit()
         cursor.close()
         connection.close()
+        invalidate_entitlements(user_id)
         
         print(f"✅ Suscripción {plan_type} creada para usuario {user_id}")
         return subscription_id
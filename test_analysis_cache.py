@@ -0,0 +1,61 @@
+"""Tests para el cache de análisis de CV (analysis_cache.py)"""
+
+import unittest
+import sys
+import os
+from unittest.mock import MagicMock, patch
+
+# Agregar el directorio del proyecto al path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import analysis_cache
+from analysis_cache import get_or_analyze, analysis_cache_key, normalize_cv_text
+
+CV_TEXT = "Juan Pérez\r\nIngeniero   de software\n\n\n  Python, SQL  \n"
+
+
+class TestAnalysisCache(unittest.TestCase):
+    """Tests para la reutilización de análisis de la IA"""
+
+    def setUp(self):
+        analysis_cache._analysis_cache.local.clear()
+
+    def test_same_cv_reuses_analysis(self):
+        """Test que el mismo CV re-subido no vuelve a llamar a la IA"""
+        analyze = MagicMock(return_value={'score': 80, 'keywords': ['python']})
+
+        first = get_or_analyze(CV_TEXT, 'general_health_check', 'openai', 'gpt-3.5-turbo', analyze)
+        first['keywords'].append('modificado')
+        reuploaded = "Juan Pérez\nIngeniero de software\n\nPython, SQL"
+        second = get_or_analyze(reuploaded, 'general_health_check', 'openai', 'gpt-3.5-turbo', analyze)
+
+        analyze.assert_called_once()
+        self.assertEqual(second, {'score': 80, 'keywords': ['python']})
+
+    def test_key_depends_on_type_provider_model_and_prompt(self):
+        """Test que cambiar tipo, proveedor, modelo o versión del prompt cambia la clave"""
+        base = analysis_cache_key(CV_TEXT, 'general_health_check', 'openai', 'gpt-3.5-turbo')
+        self.assertEqual(base, analysis_cache_key(normalize_cv_text(CV_TEXT), 'general_health_check',
+                                                  'openai', 'gpt-3.5-turbo'))
+        variants = [
+            analysis_cache_key(CV_TEXT, 'content_quality_analysis', 'openai', 'gpt-3.5-turbo'),
+            analysis_cache_key(CV_TEXT, 'general_health_check', 'gemini', 'gpt-3.5-turbo'),
+            analysis_cache_key(CV_TEXT, 'general_health_check', 'openai', 'gpt-4o'),
+        ]
+        with patch('analysis_cache.ANALYSIS_PROMPT_VERSION', '2'):
+            variants.append(analysis_cache_key(CV_TEXT, 'general_health_check', 'openai', 'gpt-3.5-turbo'))
+        self.assertNotIn(base, variants)
+        self.assertEqual(len(set(variants)), len(variants))
+
+    def test_error_analysis_is_not_cached(self):
+        """Test que un análisis de error no se guarda y el reintento llama a la IA"""
+        analyze = MagicMock(side_effect=[{'score': 0, 'error': True}, {'score': 75}])
+
+        self.assertTrue(get_or_analyze(CV_TEXT, 'general_health_check', 'anthropic', 'claude', analyze)['error'])
+        self.assertEqual(get_or_analyze(CV_TEXT, 'general_health_check', 'anthropic', 'claude', analyze),
+                         {'score': 75})
+        self.assertEqual(analyze.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
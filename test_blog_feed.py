@@ -0,0 +1,78 @@
+"""Tests para el feed del blog y las reacciones (blog_feed.py)"""
+
+import unittest
+import sys
+import os
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+# Agregar el directorio del proyecto al path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import blog_feed
+from blog_feed import toggle_reaction, invalidate_blog_feed, _dump_feed, _load_feed
+
+
+def mock_connection(removed, counts):
+    cursor = MagicMock()
+    cursor.fetchall.side_effect = [
+        [{'emoji': emoji} for emoji in removed],
+        [{'emoji': emoji, 'count': count} for emoji, count in counts.items()],
+    ]
+    connection = MagicMock()
+    connection.cursor.return_value = cursor
+    return connection, cursor
+
+
+class TestBlogFeed(unittest.TestCase):
+    """Tests para el toggle de reacciones y el cache del feed"""
+
+    def test_same_emoji_removes_reaction(self):
+        """Test que repetir el emoji quita la reacción sin insertar otra"""
+        connection, cursor = mock_connection(['👍'], {'❤️': 2})
+
+        action, reactions = toggle_reaction(connection, 5, 9, '👍')
+
+        self.assertEqual(action, 'removed')
+        self.assertEqual(reactions, {'❤️': 2})
+        statements = [call.args[0] for call in cursor.execute.call_args_list]
+        self.assertFalse(any('INSERT' in sql for sql in statements))
+        self.assertIn('blog_reaction_counts', statements[-1])
+        connection.commit.assert_not_called()
+
+    def test_other_emoji_replaces_reaction(self):
+        """Test que un emoji distinto reemplaza la reacción anterior"""
+        connection, cursor = mock_connection(['👍'], {'❤️': 3})
+
+        action, reactions = toggle_reaction(connection, 5, 9, '❤️')
+
+        self.assertEqual(action, 'added')
+        self.assertEqual(reactions, {'❤️': 3})
+        insert_sql, insert_params = cursor.execute.call_args_list[1].args
+        self.assertIn('ON CONFLICT', insert_sql)
+        self.assertEqual(insert_params, (5, 9, '❤️'))
+
+    def test_cached_feed_round_trip(self):
+        """Test que el feed serializado recupera fechas y claves numéricas"""
+        feed = {
+            'posts': [{'id': 1, 'title': 'Tip', 'created_at': datetime(2025, 3, 1, 12, 30)}],
+            'reactions_count': {1: {'👍': 4}},
+        }
+        data = _dump_feed(feed)
+        data['reactions_count'] = {str(key): value for key, value in data['reactions_count'].items()}
+
+        self.assertEqual(_load_feed(data), feed)
+
+    @patch('blog_feed.call_after_commit')
+    def test_invalidation_waits_for_commit(self, mock_after_commit):
+        """Test que el feed se descarta recién después del commit"""
+        with patch.object(blog_feed._blog_feed_cache, 'delete') as mock_delete:
+            invalidate_blog_feed()
+            mock_delete.assert_not_called()
+
+            mock_after_commit.call_args.args[0]()
+            mock_delete.assert_called_once_with('published')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+"""Tests para la compatibilidad básica por lotes (compatibility_matcher.py)"""
+
+import unittest
+import sys
+import os
+
+# Agregar el directorio del proyecto al path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from compatibility_matcher import CompatibilityMatcher, get_compatibility_matcher, fold_text
+
+CV_ANALYSIS = {
+    'strengths': ['Liderazgo de equipos', 'Comunicación'],
+    'keywords': ['Python', 'SQL', 'Java', 'C++'],
+    'experience_areas': ['Desarrollo web', 'Datos'],
+    'score': 80
+}
+
+
+class TestCompatibilityMatcher(unittest.TestCase):
+    """Tests para las coincidencias por término y el puntaje del lote"""
+
+    def test_accents_and_word_boundaries(self):
+        """Test que los acentos no impiden coincidir y que un término no coincide dentro de otra palabra"""
+        matcher = CompatibilityMatcher(keywords=['Java', 'SQL', 'C++', 'Programación'])
+        hits = matcher.hits({'title': 'Programacion JavaScript', 'description': 'PostgreSQL y c++\nen equipo'})
+        self.assertEqual(dict(zip(matcher.terms, hits.tolist())),
+                         {'java': False, 'sql': False, 'c++': True, 'programacion': True})
+
+    def test_text_outside_latin1(self):
+        """Test que viñetas, emojis y letras fuera de latin-1 se normalizan sin cambiar las coincidencias"""
+        self.assertEqual(fold_text('ŁÓDŹ Ökonom 🚀'), 'łodz okonom 🚀')
+        matcher = CompatibilityMatcher(keywords=['Python', 'SQL', 'C++', 'Kubernetes'],
+                                       experience_areas=['Ingeniería de datos'])
+        hits = matcher.hits({'title': '🚀 Ingeniería de datos', 'description': '• Python/SQL — c++ • Kubernetesя'})
+        self.assertEqual(dict(zip(matcher.terms, hits.tolist())),
+                         {'python': True, 'sql': True, 'c++': True, 'kubernetes': False,
+                          'ingenieria de datos': True})
+
+    def test_batch_rows_match_single_jobs(self):
+        """Test que los términos solapados se marcan y cada fila del lote es la del empleo por separado"""
+        matcher = CompatibilityMatcher(keywords=['Python', 'Python  Django', 'Django'])
+        jobs = [
+            {'title': 'Python Django', 'description': ''},
+            {'title': 'Python', 'description': 'Flask'},
+            {'title': 'Sin título', 'description': 'Django\x1fPython'},
+            {'title': 'Django', 'description': None},
+        ]
+        hits = matcher.hit_matrix(jobs)
+        self.assertEqual(matcher.terms, ['python', 'python django', 'django'])
+        self.assertEqual(hits.tolist(), [[True, True, True], [True, False, False],
+                                         [True, False, True], [False, False, True]])
+        self.assertEqual(hits.tolist(), [matcher.hits(job).tolist() for job in jobs])
+
+    def test_score_formula(self):
+        """Test de los puntos, las penalizaciones y los límites 15-85"""
+        matcher = get_compatibility_matcher(CV_ANALYSIS)
+        jobs = [
+            # Fortaleza + 2 palabras clave + área: 12 + 16 + 20 + 16 = 64
+            {'title': 'Desarrollo web', 'description': 'Python, SQL y liderazgo de equipos'},
+            # Sin fortalezas ni área: (8 + 16) * 0.7 * 0.8 = 13.44 -> 15
+            {'title': 'Analista', 'description': 'Java'},
+            # Todo: 24 + 32 + 20 + 16 = 92 -> 85
+            {'title': 'Datos', 'description': 'Comunicación, liderazgo de equipos, Python, SQL, Java, C++'},
+        ]
+        self.assertEqual(matcher.scores(jobs), [64, 15, 85])
+        self.assertEqual([matcher.score(job) for job in jobs], [64, 15, 85])
+        self.assertIs(get_compatibility_matcher(dict(CV_ANALYSIS)), matcher)
+        self.assertEqual(get_compatibility_matcher({}).scores(jobs), [15, 15, 15])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+"""Tests para la búsqueda de CVs del panel de administración (cv_search.py)"""
+
+import unittest
+import sys
+import os
+
+# Agregar el directorio del proyecto al path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from cv_search import build_tsquery, build_search_sql, highlight_snippet, encode_cursor, decode_cursor
+
+
+class TestCVSearch(unittest.TestCase):
+    """Tests para la construcción de consultas y la paginación"""
+
+    def test_tsquery_uses_prefixes_and_drops_operators(self):
+        """Test que el texto del usuario no puede inyectar operadores de tsquery"""
+        self.assertEqual(build_tsquery('Desarrollador  Python'), 'desarrollador:* & python:*')
+        self.assertEqual(build_tsquery("diseño | !ux' & (web)"), 'diseño:* & ux:* & web:*')
+        self.assertIsNone(build_tsquery('!! &'))
+
+    def test_trigram_match_only_when_available(self):
+        """Test que ILIKE solo se agrega con pg_trgm y términos de 3+ caracteres"""
+        sql, params = build_search_sql('pyth', use_trigram=False)
+        self.assertNotIn('ILIKE', sql)
+        sql, params = build_search_sql('pyth', use_trigram=True)
+        self.assertIn('ILIKE %(pattern)s', sql)
+        self.assertEqual(build_search_sql('50%_off', use_trigram=True)[1]['pattern'], '%50\\%\\_off%')
+
+    def test_snippet_is_escaped_before_highlighting(self):
+        """Test que el HTML del CV se escapa y solo las coincidencias llevan <mark>"""
+        snippet = highlight_snippet('<script>x</script> \x02python\x03')
+        self.assertEqual(str(snippet), '&lt;script&gt;x&lt;/script&gt; <mark>python</mark>')
+
+    def test_cursor_round_trip(self):
+        """Test que el token de página conserva rank e id"""
+        token = encode_cursor({'rank': 0.0607927, 'id': 42})
+        self.assertEqual(decode_cursor(token), (0.0607927, 42))
+        self.assertIsNone(decode_cursor('no-es-un-cursor'))
+        self.assertIsNone(decode_cursor(None))
+
+
+if __name__ == '__main__':
+    unittest.main()
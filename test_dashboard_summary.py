@@ -0,0 +1,73 @@
+"""Tests para el resumen cacheado del dashboard (dashboard_summary.py)"""
+
+import unittest
+import sys
+import os
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+# Agregar el directorio del proyecto al path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import dashboard_summary
+from dashboard_summary import get_dashboard_summary, invalidate_dashboard_summary, invalidate_jobs_total
+
+
+def mock_connection(*rows):
+    cursor = MagicMock()
+    cursor.fetchone.side_effect = list(rows)
+    connection = MagicMock()
+    connection.cursor.return_value = cursor
+    return connection, cursor
+
+
+class TestDashboardSummary(unittest.TestCase):
+    """Tests para el resumen por usuario y el total de empleos"""
+
+    def setUp(self):
+        dashboard_summary._user_summary_cache.delete('7')
+        dashboard_summary._jobs_total_cache.delete('total')
+
+    def test_summary_is_cached(self):
+        """Test que la segunda carga no consulta la base de datos"""
+        last = datetime(2025, 5, 2, 10, 0)
+        connection, cursor = mock_connection({'cvs_analyzed': 3, 'last_analysis': last}, {'total': 1200})
+
+        first = get_dashboard_summary(connection, 7)
+        second = get_dashboard_summary(connection, 7)
+
+        expected = {'cvs_analyzed': 3, 'last_analysis': last, 'jobs_found': 1200}
+        self.assertEqual(first, expected)
+        self.assertEqual(second, expected)
+        self.assertEqual(cursor.fetchone.call_count, 2)
+
+    @patch('dashboard_summary.call_after_commit')
+    def test_saving_analysis_invalidates_user(self, mock_after_commit):
+        """Test que un análisis nuevo recarga el resumen del usuario tras el commit"""
+        connection, cursor = mock_connection({'cvs_analyzed': 3, 'last_analysis': None}, {'total': 10},
+                                             {'cvs_analyzed': 4, 'last_analysis': None})
+        get_dashboard_summary(connection, 7)
+
+        invalidate_dashboard_summary(7)
+        mock_after_commit.call_args.args[0]()
+
+        summary = get_dashboard_summary(connection, 7)
+        self.assertEqual(summary['cvs_analyzed'], 4)
+        self.assertEqual(summary['jobs_found'], 10)
+
+    @patch('dashboard_summary.call_after_commit')
+    def test_saving_jobs_recounts_total(self, mock_after_commit):
+        """Test que guardar empleos fuerza el recuento sin tocar los resúmenes"""
+        connection, cursor = mock_connection({'cvs_analyzed': 1, 'last_analysis': None}, {'total': 10},
+                                             {'total': 25})
+        get_dashboard_summary(connection, 7)
+
+        invalidate_jobs_total()
+        mock_after_commit.call_args.args[0]()
+
+        self.assertEqual(get_dashboard_summary(connection, 7)['jobs_found'], 25)
+        self.assertEqual(cursor.fetchone.call_count, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+"""Tests para el pool de conexiones compartido (db_pool.py)"""
+
+import unittest
+import sys
+import os
+from unittest.mock import patch, MagicMock
+
+# Agregar el directorio del proyecto al path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import psycopg2.extensions
+from db_pool import ConnectionPool, PoolConfig, PoolTimeout
+
+
+def make_fake_connection():
+    """Crear una conexión falsa con la interfaz mínima de psycopg2"""
+    connection = MagicMock()
+    connection.closed = 0
+    connection.autocommit = False
+    connection.get_transaction_status.return_value = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+    return connection
+
+
+class TestConnectionPool(unittest.TestCase):
+    """Tests para ConnectionPool"""
+
+    def setUp(self):
+        self.config = PoolConfig()
+        self.config.min_size = 0
+        self.config.max_size = 2
+        self.config.checkout_timeout = 0.05
+        self.config.health_check_after = 60
+        patcher = patch('db_pool.psycopg2.connect', side_effect=lambda **kwargs: make_fake_connection())
+        self.connect = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_close_returns_connection_to_pool(self):
+        """Test que close() devuelve la conexión en lugar de cerrarla"""
+        pool = ConnectionPool(self.config)
+        first = pool.getconn()
+        raw = first._entry.connection
+        first.close()
+
+        second = pool.getconn()
+        self.assertIs(second._entry.connection, raw)
+        raw.close.assert_not_called()
+        self.assertEqual(self.connect.call_count, 1)
+
+    def test_checkout_timeout_when_saturated(self):
+        """Test que el pool lanza PoolTimeout al agotarse"""
+        pool = ConnectionPool(self.config)
+        held = [pool.getconn(), pool.getconn()]
+
+        with self.assertRaises(PoolTimeout):
+            pool.getconn()
+
+        stats = pool.get_stats()
+        self.assertEqual(stats['in_use'], 2)
+        self.assertEqual(stats['saturation'], 100.0)
+        self.assertEqual(stats['timeouts'], 1)
+        for connection in held:
+            connection.close()
+        self.assertEqual(pool.get_stats()['idle'], 2)
+
+    def test_release_rolls_back_open_transaction(self):
+        """Test que una transacción abierta se revierte al devolverla"""
+        pool = ConnectionPool(self.config)
+        connection = pool.getconn()
+        raw = connection._entry.connection
+        raw.get_transaction_status.return_value = psycopg2.extensions.TRANSACTION_STATUS_INTRANS
+        connection.close()
+        raw.rollback.assert_called_once()
+
+    def test_expired_connection_is_recycled(self):
+        """Test que las conexiones más viejas que max_age se reemplazan"""
+        self.config.max_age = 1
+        pool = ConnectionPool(self.config)
+        connection = pool.getconn()
+        entry = connection._entry
+        connection.close()
+        entry.created_at -= 10
+
+        fresh = pool.getconn()
+        self.assertIsNot(fresh._entry, entry)
+        entry.connection.close.assert_called_once()
+        self.assertEqual(pool.get_stats()['connections_recycled'], 1)
+
+    def test_cursor_factory_is_set_per_checkout(self):
+        """Test que cada checkout fija la fábrica de cursores del llamador"""
+        pool = ConnectionPool(self.config)
+        factory = object()
+        connection = pool.getconn(cursor_factory=factory)
+        self.assertIs(connection._entry.connection.cursor_factory, factory)
+        connection.close()
+
+        plain = pool.getconn()
+        self.assertIsNone(plain._entry.connection.cursor_factory)
+
+
+if __name__ == '__main__':
+    unittest.main()
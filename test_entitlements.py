@@ -0,0 +1,102 @@
+"""Tests para el snapshot de derechos de uso (entitlements.py)"""
+
+import unittest
+import sys
+import os
+import json
+from datetime import datetime, timedelta
+from decimal import Decimal
+from unittest.mock import patch
+
+# Agregar el directorio del proyecto al path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import entitlements
+from entitlements import EntitlementSnapshot, get_entitlements, invalidate_entitlements
+
+
+def make_snapshot(usage=None, role='user', plan_type='standard'):
+    """Crear un snapshot de prueba con suscripción activa"""
+    start = datetime(2026, 1, 1, 10, 0, 0)
+    return EntitlementSnapshot(
+        user_id=7,
+        role=role,
+        plan_type=plan_type,
+        limits={'cv_analysis': 10, 'cv_creation': 5},
+        period_start=start,
+        usage=usage or {},
+        subscription={
+            'id': 3,
+            'plan_type': plan_type,
+            'start_date': start,
+            'end_date': start + timedelta(days=30),
+            'expires_at': start + timedelta(days=30),
+            'amount': Decimal('10000.00')
+        }
+    )
+
+
+class TestEntitlementSnapshot(unittest.TestCase):
+    """Tests para EntitlementSnapshot"""
+
+    def test_check_enforces_plan_limits(self):
+        """Test que check() aplica los límites del plan"""
+        self.assertEqual(make_snapshot({'cv_analysis': 9}).check('cv_analysis'), (True, "Acción permitida"))
+        allowed, message = make_snapshot({'cv_analysis': 10}).check('cv_analysis')
+        self.assertFalse(allowed)
+        self.assertIn('10', message)
+
+    def test_admin_has_unlimited_access(self):
+        """Test que los administradores no tienen límites"""
+        snapshot = EntitlementSnapshot(user_id=1, role='admin')
+        self.assertEqual(snapshot.check('cv_analysis'), (True, "Acceso administrativo completo"))
+        self.assertEqual(snapshot.get_usage('cv_analysis'), 0)
+
+    def test_without_subscription_is_denied(self):
+        """Test que sin suscripción activa se deniega la acción"""
+        snapshot = EntitlementSnapshot(user_id=2)
+        self.assertEqual(snapshot.check('cv_analysis'), (False, "No tienes una suscripción activa"))
+
+    def test_redis_round_trip_keeps_datetimes(self):
+        """Test que la serialización JSON conserva las fechas como datetime"""
+        snapshot = make_snapshot({'cv_analysis': 2})
+        restored = EntitlementSnapshot.from_dict(json.loads(json.dumps(snapshot.to_dict())))
+        self.assertEqual(restored.subscription['expires_at'], snapshot.subscription['expires_at'])
+        self.assertIsInstance(restored.period_start, datetime)
+        self.assertEqual(restored.get_usage('cv_analysis'), 2)
+
+
+class TestEntitlementCache(unittest.TestCase):
+    """Tests para el cache de snapshots"""
+
+    def setUp(self):
+        invalidate_entitlements(7)
+        self.addCleanup(invalidate_entitlements, 7)
+
+    def test_cached_until_invalidated(self):
+        """Test que el snapshot se calcula una vez hasta invalidarlo"""
+        with patch.object(entitlements, 'load_entitlements', return_value=make_snapshot()) as load:
+            get_entitlements(7)
+            get_entitlements(7)
+            self.assertEqual(load.call_count, 1)
+
+            invalidate_entitlements(7)
+            get_entitlements(7)
+            self.assertEqual(load.call_count, 2)
+
+    @patch('entitlements.call_after_commit')
+    def test_invalidation_waits_for_commit(self, mock_after_commit):
+        """Test que el snapshot se descarta recién cuando se confirma el cambio"""
+        with patch.object(entitlements, 'load_entitlements', return_value=make_snapshot()) as load:
+            get_entitlements(7)
+            invalidate_entitlements(7)
+            get_entitlements(7)
+            self.assertEqual(load.call_count, 1)
+
+            mock_after_commit.call_args.args[0]()
+            get_entitlements(7)
+            self.assertEqual(load.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
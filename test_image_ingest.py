@@ -0,0 +1,91 @@
+"""Tests para el procesamiento de imágenes subidas (image_ingest.py)"""
+
+import unittest
+import sys
+import os
+import io
+from unittest.mock import patch
+
+from PIL import Image
+from werkzeug.datastructures import MIMEAccept
+
+# Agregar el directorio del proyecto al path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from image_ingest import prepare_image, generate_variants, schedule_variants, ImageValidationError
+from image_store import select_image_variant
+
+BROWSER_ACCEPT = MIMEAccept([('image/avif', 1), ('image/webp', 1), ('*/*', 0.8)])
+ANY_ACCEPT = MIMEAccept([('*/*', 1)])
+
+
+def _phone_photo(width=800, height=600):
+    """JPEG con orientación EXIF (rotar 90°) y datos del dispositivo"""
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    exif[0x010F] = 'Fabricante'
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), (200, 30, 30)).save(buffer, 'JPEG', exif=exif.tobytes())
+    buffer.seek(0)
+    return buffer
+
+
+class TestImageIngest(unittest.TestCase):
+    """Tests para la validación, las variantes y su elección"""
+
+    @patch('image_ingest.IMAGE_MAX_DIMENSION', 400)
+    def test_prepare_rotates_strips_metadata_and_caps_size(self):
+        """Test que se aplica la orientación, se quitan los metadatos y se acota el lado mayor"""
+        prepared = prepare_image(_phone_photo())
+
+        stored = Image.open(io.BytesIO(prepared.data))
+        self.assertEqual(prepared.content_type, 'image/jpeg')
+        self.assertEqual(stored.size, (300, 400))
+        self.assertEqual(dict(stored.getexif()), {})
+
+    def test_rejects_non_images(self):
+        """Test que un archivo que no es imagen se rechaza"""
+        with self.assertRaises(ImageValidationError):
+            prepare_image(io.BytesIO(b'%PDF-1.4 no es una imagen'))
+
+    def test_small_images_skip_redundant_variants(self):
+        """Test que no se generan variantes del mismo tamaño que la completa"""
+        variants = generate_variants(Image.new('RGB', (500, 250)))
+
+        self.assertEqual([(name, width) for name, _, width, _ in variants], [('thumb', 320), ('webp', 500)])
+        self.assertTrue(all(Image.open(io.BytesIO(data)).format == 'WEBP' for _, data, _, _ in variants))
+
+    @patch('image_ingest._get_executor')
+    @patch('image_ingest.call_after_commit')
+    def test_variants_wait_for_upload_commit(self, mock_after_commit, mock_executor):
+        """Test que las variantes se encolan recién cuando se confirma la fila de la imagen"""
+        prepared = prepare_image(_phone_photo())
+
+        schedule_variants(42, prepared)
+        mock_executor.return_value.submit.assert_not_called()
+
+        mock_after_commit.call_args.args[0]()
+        mock_executor.return_value.submit.assert_called_once()
+        self.assertEqual(mock_executor.return_value.submit.call_args.args[1], 42)
+
+    def test_variant_selection(self):
+        """Test de la elección por ?v= y por Accept"""
+        meta = {'filename': 'foto.jpg', 'file_size': 5000, 'sha256': 'o' * 64, 'content_type': 'image/jpeg',
+                'variants': {
+                    'medium': {'variant': 'medium', 'sha256': 'm' * 64, 'content_type': 'image/webp', 'file_size': 900},
+                    'webp': {'variant': 'webp', 'sha256': 'w' * 64, 'content_type': 'image/webp', 'file_size': 2000},
+                }}
+
+        selected, negotiated = select_image_variant(meta, None, BROWSER_ACCEPT)
+        self.assertEqual((selected['sha256'], negotiated), ('w' * 64, True))
+        selected, _ = select_image_variant(meta, None, ANY_ACCEPT)
+        self.assertEqual(selected['sha256'], 'o' * 64)
+        # Sin miniatura se usa la siguiente variante más grande
+        selected, negotiated = select_image_variant(meta, 'thumb', ANY_ACCEPT)
+        self.assertEqual((selected['filename'], negotiated), ('foto-medium.webp', False))
+        selected, _ = select_image_variant(meta, 'original', BROWSER_ACCEPT)
+        self.assertEqual(selected['sha256'], 'o' * 64)
+
+
+if __name__ == '__main__':
+    unittest.main()
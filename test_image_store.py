@@ -0,0 +1,149 @@
+"""Tests para el almacenamiento de imágenes por contenido (image_store.py)"""
+
+import unittest
+import sys
+import os
+import io
+import hashlib
+import tempfile
+import shutil
+from unittest.mock import MagicMock, patch
+
+from flask import Flask
+
+# Agregar el directorio del proyecto al path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from image_store import LocalImageStorage, store_image, delete_image, image_response
+
+IMAGE_BYTES = bytes(range(256)) * 40
+IMAGE_SHA = hashlib.sha256(IMAGE_BYTES).hexdigest()
+
+
+class TestImageStore(unittest.TestCase):
+    """Tests para la deduplicación y las respuestas condicionales"""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.storage = LocalImageStorage(self.root)
+        self.storage.put(IMAGE_SHA, io.BytesIO(IMAGE_BYTES))
+        self.app = Flask(__name__)
+        self.meta = {'id': 1, 'filename': 'foto.png', 'content_type': 'image/png',
+                     'file_size': len(IMAGE_BYTES), 'sha256': IMAGE_SHA, 'storage_backend': 'local'}
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def _objects(self):
+        return [name for _, _, names in os.walk(self.root) for name in names]
+
+    @patch('image_store.get_image_storage')
+    def test_same_content_is_stored_once(self, mock_get_storage):
+        """Test que dos subidas iguales comparten el objeto y registran su hash"""
+        mock_get_storage.return_value = self.storage
+        cursor = MagicMock()
+        cursor.fetchone.return_value = {'id': 7}
+        connection = MagicMock()
+        connection.cursor.return_value = cursor
+
+        for _ in range(2):
+            image_id = store_image(connection, io.BytesIO(IMAGE_BYTES), 'a.png', 'foto.png', 'image/png')
+
+        self.assertEqual(image_id, 7)
+        self.assertEqual(self._objects(), [IMAGE_SHA])
+        insert_params = cursor.execute.call_args.args[1]
+        self.assertEqual(insert_params[3:6], (len(IMAGE_BYTES), IMAGE_SHA, 'local'))
+        connection.commit.assert_not_called()
+
+    @patch('image_store.get_pooled_connection')
+    @patch('image_store.get_image_storage')
+    def test_shared_object_survives_delete(self, mock_get_storage, mock_get_connection):
+        """Test que el objeto solo se elimina con la última referencia"""
+        mock_get_storage.return_value = self.storage
+        cursor = MagicMock()
+        cursor.fetchall.return_value = [{'sha256': IMAGE_SHA, 'storage_backend': 'local'}]
+        cursor.rowcount = 1
+        cursor.fetchone.return_value = {'?column?': 1}
+        connection = MagicMock()
+        connection.cursor.return_value = cursor
+        mock_get_connection.return_value = connection
+
+        self.assertTrue(delete_image(connection, 1))
+        self.assertEqual(self._objects(), [IMAGE_SHA])
+        mock_get_connection.assert_not_called()
+
+        # Sin referencias en la baja, candado obtenido y sin referencias al confirmar
+        cursor.fetchone.side_effect = [None, {'locked': True}, None]
+        delete_image(connection, 2)
+        self.assertEqual(self._objects(), [])
+
+    @patch('image_store.get_pooled_connection')
+    @patch('image_store.get_image_storage')
+    def test_object_deleted_only_after_commit(self, mock_get_storage, mock_get_connection):
+        """Test que el objeto sigue en el almacenamiento hasta que se confirma la baja
+        y que se conserva si otra subida lo reutilizó mientras tanto"""
+        mock_get_storage.return_value = self.storage
+        cursor = MagicMock()
+        cursor.fetchall.return_value = [{'sha256': IMAGE_SHA, 'storage_backend': 'local'}]
+        cursor.rowcount = 1
+        connection = MagicMock()
+        connection.cursor.return_value = cursor
+        mock_get_connection.return_value = connection
+        callbacks = []
+
+        with patch('image_store.call_after_commit', side_effect=callbacks.append):
+            cursor.fetchone.side_effect = [None]
+            self.assertTrue(delete_image(connection, 1))
+            self.assertEqual(self._objects(), [IMAGE_SHA])
+            self.assertEqual(len(callbacks), 2)
+
+            # Otra subida del mismo contenido se confirmó antes del callback
+            cursor.fetchone.side_effect = [{'locked': True}, {'?column?': 1}]
+            for callback in callbacks:
+                callback()
+            self.assertEqual(self._objects(), [IMAGE_SHA])
+
+            callbacks.clear()
+            cursor.fetchone.side_effect = [None, {'locked': True}, None]
+            delete_image(connection, 1)
+            for callback in callbacks:
+                callback()
+            self.assertEqual(self._objects(), [])
+
+    def test_matching_etag_returns_304(self):
+        """Test que If-None-Match con el hash no abre el archivo"""
+        storage = MagicMock()
+        with self.app.test_request_context('/image/1', headers={'If-None-Match': f'"{IMAGE_SHA}"'}):
+            response = image_response(self.meta, storage)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.get_etag(), (IMAGE_SHA, False))
+        storage.open.assert_not_called()
+
+    def test_byte_ranges(self):
+        """Test de rangos válidos (206) y fuera del archivo (416)"""
+        with self.app.test_request_context('/image/1', headers={'Range': 'bytes=10-19'}):
+            response = image_response(self.meta, self.storage)
+            body = b''.join(response.response)
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.headers['Content-Range'], f'bytes 10-19/{len(IMAGE_BYTES)}')
+        self.assertEqual(body, IMAGE_BYTES[10:20])
+
+        with self.app.test_request_context('/image/1', headers={'Range': f'bytes={len(IMAGE_BYTES)}-'}):
+            response = image_response(self.meta, self.storage)
+        self.assertEqual(response.status_code, 416)
+
+    def test_unsupported_ranges_return_full_file(self):
+        """Test que varios rangos u otras unidades se ignoran y se envía el archivo completo"""
+        for header in ('bytes=0-1,5-6', 'items=0-1'):
+            with self.app.test_request_context('/image/1', headers={'Range': header}):
+                response = image_response(self.meta, self.storage)
+                response.direct_passthrough = False
+                body = response.get_data()
+            self.assertEqual(response.status_code, 200, header)
+            self.assertNotIn('Content-Range', response.headers)
+            self.assertEqual(body, IMAGE_BYTES)
+
+
+if __name__ == '__main__':
+    unittest.main()
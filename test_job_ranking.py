@@ -0,0 +1,60 @@
+"""Tests para el pre-ranking léxico de empleos (job_ranking.py)"""
+
+import unittest
+import sys
+import os
+
+# Agregar el directorio del proyecto al path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from job_ranking import tokenize, build_query, BM25Index, prerank_jobs
+
+CV_ANALYSIS = {
+    'keywords': ['Python', 'Django', 'PostgreSQL'],
+    'experience_areas': ['Desarrollo web'],
+    'strengths': ['Liderazgo de equipos técnicos']
+}
+
+
+class TestJobRanking(unittest.TestCase):
+    """Tests para la normalización, el índice BM25 y la selección de candidatos"""
+
+    def test_spanish_and_english_forms_match(self):
+        """Test que acentos, plurales, género y stopwords no impiden la coincidencia"""
+        self.assertEqual(tokenize('Programación'), tokenize('programador'))
+        self.assertEqual(tokenize('Desarrolladores'), tokenize('desarrolladora'))
+        self.assertEqual(tokenize('Ingeniero'), tokenize('ingenieras'))
+        self.assertEqual(tokenize('developers'), tokenize('Developer'))
+        self.assertEqual(tokenize('el equipo de la empresa y the team'), ['equip'])
+        self.assertEqual(tokenize('C++ y Node.js'), ['c++', 'node.js'])
+
+    def test_bm25_prefers_matching_and_rare_terms(self):
+        """Test que el documento con más términos de la consulta (y más raros) queda primero"""
+        index = BM25Index([
+            'Vendedor de seguros en terreno',
+            'Desarrollador Python con Django y PostgreSQL',
+            'Desarrollador Java',
+            'Desarrollador Python',
+        ])
+        best, scores = index.top(build_query(CV_ANALYSIS), 3)
+        self.assertEqual(best.tolist()[:2], [1, 3])
+        self.assertEqual(scores[0], 0)
+
+    def test_prerank_splits_top_k(self):
+        """Test que solo los ``top_k`` mejores quedan como candidatos para la IA"""
+        jobs = [{'title': f'Cajero {i}', 'description': 'Atención de clientes'} for i in range(8)]
+        jobs[5] = {'title': 'Desarrollador Django', 'description': 'Python y PostgreSQL para desarrollo web'}
+        jobs[2] = {'title': 'Analista web', 'description': 'Reportes con Python'}
+
+        candidates, others = prerank_jobs(jobs, CV_ANALYSIS, top_k=2)
+
+        self.assertEqual(candidates, [jobs[5], jobs[2]])
+        self.assertEqual(len(others), 6)
+        self.assertGreater(jobs[5]['lexical_score'], jobs[2]['lexical_score'])
+
+        everything, rest = prerank_jobs(jobs, CV_ANALYSIS, top_k=0)
+        self.assertEqual((len(everything), rest), (8, []))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+"""Tests para la puntuación de empleos en paralelo (job_scoring.py)"""
+
+import unittest
+import sys
+import os
+import time
+import threading
+
+# Agregar el directorio del proyecto al path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from job_scoring import score_jobs, parse_batch_scores, get_job_scoring_stats
+
+
+def heuristic(job, cv_analysis):
+    return 30
+
+
+class TestJobScoring(unittest.TestCase):
+    """Tests para la concurrencia, el plazo y el origen de cada puntuación"""
+
+    def test_ai_scores_run_concurrently(self):
+        """Test que las llamadas a la IA se solapan en lugar de ir una tras otra"""
+        jobs = [{'title': f'Empleo {i}', 'score': 60 + i} for i in range(6)]
+
+        def slow_ai(job, cv_analysis):
+            time.sleep(0.1)
+            return job['score']
+
+        started = time.monotonic()
+        summary = score_jobs(jobs, {}, slow_ai, heuristic, deadline=5)
+
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertEqual(summary['ai'], 6)
+        self.assertEqual([job['compatibility_score'] for job in jobs], [60, 61, 62, 63, 64, 65])
+        self.assertTrue(all(job['score_source'] == 'ai' for job in jobs))
+
+    def test_deadline_falls_back_to_heuristic(self):
+        """Test que los empleos sin respuesta al vencer el plazo usan la heurística"""
+        release = threading.Event()
+        jobs = [{'title': 'rápido'}, {'title': 'lento'}]
+
+        def ai(job, cv_analysis):
+            if job['title'] == 'lento':
+                release.wait(2)
+            return 90
+
+        try:
+            summary = score_jobs(jobs, {}, ai, heuristic, deadline=0.2)
+        finally:
+            release.set()
+
+        self.assertEqual(summary['deadline_exceeded'], 1)
+        self.assertEqual((jobs[0]['compatibility_score'], jobs[0]['score_source']), (90, 'ai'))
+        self.assertEqual((jobs[1]['compatibility_score'], jobs[1]['score_source']), (30, 'heuristic'))
+
+    def test_ai_errors_are_marked_heuristic(self):
+        """Test que un error o una respuesta sin número usan la heurística"""
+        jobs = [{'title': 'error'}, {'title': 'sin número'}, {'title': 'ok'}]
+        answers = {'sin número': None, 'ok': 70}
+
+        def ai(job, cv_analysis):
+            if job['title'] == 'error':
+                raise RuntimeError('rate limit')
+            return answers[job['title']]
+
+        summary = score_jobs(jobs, {}, ai, heuristic, deadline=5)
+
+        self.assertEqual((summary['ai'], summary['heuristic']), (1, 2))
+        self.assertEqual([job['score_source'] for job in jobs], ['heuristic', 'heuristic', 'ai'])
+
+
+class TestBatchedJobScoring(unittest.TestCase):
+    """Tests para el modo agrupado (varios empleos por prompt)"""
+
+    def test_partial_outputs_are_repaired(self):
+        """Test de respuestas con markdown, objeto por id, truncadas o con ids desconocidos"""
+        ids = ['1', '2', '3']
+        self.assertEqual(parse_batch_scores('```json\n[{"id": "1", "score": 65}, {"id": 2, "score": "80"}]\n```', ids),
+                         {'1': 65, '2': 80})
+        self.assertEqual(parse_batch_scores('{"1": 120, "3": -5, "9": 50}', ids), {'1': 100, '3': 0})
+        self.assertEqual(parse_batch_scores('[{"id": "1", "score": 70}, {"id": "2", "score": 45}, {"id": "3", "sc', ids),
+                         {'1': 70, '2': 45})
+        self.assertEqual(parse_batch_scores('[{"id": "1", "score": 70}, {"id": "2", "score": 4', ids), {'1': 70})
+        self.assertEqual(parse_batch_scores('[{"score": 55, "id": "3"}, {"id": "2"', ids), {'3': 55})
+        self.assertEqual(parse_batch_scores('No puedo evaluar estos empleos', ids), {})
+
+    def test_only_missing_ids_are_retried(self):
+        """Test que el reintento pide solo los empleos que faltaron en la respuesta"""
+        jobs = [{'title': f'Empleo {i}'} for i in range(5)]
+        prompts = []
+
+        def batch_ai(jobs_by_id, cv_analysis):
+            prompts.append([job['title'] for job in jobs_by_id.values()])
+            if len(prompts) == 1:
+                # Respuesta cortada después del tercer empleo
+                return '[{"id": "1", "score": 81}, {"id": "2", "score": 72}, {"id": "3", "score": 6', \
+                       {'tokens': 400, 'tokens_estimate': 380, 'per_job_tokens': 1500}
+            return '[{"id": "1", "score": 63}, {"id": "2", "score": 54}, {"id": "3", "score": 45}]', \
+                {'tokens': 250, 'tokens_estimate': 240, 'per_job_tokens': 600}
+
+        before = get_job_scoring_stats()
+        summary = score_jobs(jobs, {}, None, heuristic, deadline=5, batch_scorer=batch_ai, batch_size=10)
+        after = get_job_scoring_stats()
+
+        self.assertEqual(prompts, [[job['title'] for job in jobs], ['Empleo 2', 'Empleo 3', 'Empleo 4']])
+        self.assertEqual([job['compatibility_score'] for job in jobs], [81, 72, 63, 54, 45])
+        self.assertEqual((summary['ai'], summary['ai_calls']), (5, 2))
+        self.assertEqual((summary['tokens'], summary['per_job_tokens_estimate']), (650, 1500))
+        # El ahorro compara estimaciones: 1500 por empleo contra 380 + 240 agrupado
+        self.assertEqual(after['tokens_saved_estimate'] - before['tokens_saved_estimate'], 880)
+
+    def test_jobs_are_split_into_batches(self):
+        """Test que se envían grupos de ``batch_size`` empleos y la falta de respuesta usa la heurística"""
+        jobs = [{'title': f'Empleo {i}'} for i in range(7)]
+        sizes = []
+
+        def batch_ai(jobs_by_id, cv_analysis):
+            sizes.append(len(jobs_by_id))
+            if len(jobs_by_id) == 1:
+                raise RuntimeError('rate limit')
+            return '[' + ', '.join(f'{{"id": "{job_id}", "score": 60}}' for job_id in jobs_by_id) + ']', {}
+
+        summary = score_jobs(jobs, {}, None, heuristic, deadline=5, batch_scorer=batch_ai, batch_size=3)
+
+        self.assertEqual(sorted(sizes), [1, 3, 3])
+        self.assertEqual((summary['ai'], summary['heuristic']), (6, 1))
+        self.assertEqual(jobs[6]['score_source'], 'heuristic')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+"""Tests para el guardado en lote de empleos (job_store.py)"""
+
+import unittest
+import sys
+import os
+from unittest.mock import patch, MagicMock
+
+# Agregar el directorio del proyecto al path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from job_store import bulk_save_jobs, job_content_hash
+
+
+def make_job(title, company='ACME', url='https://example.com/job'):
+    return {'title': title, 'company': company, 'location': 'Santiago',
+            'description': 'Descripción', 'url': url, 'source': 'test'}
+
+
+class TestJobStore(unittest.TestCase):
+    """Tests para bulk_save_jobs y job_content_hash"""
+
+    def test_hash_ignores_case_and_whitespace(self):
+        """Test que la normalización iguala mayúsculas y espacios"""
+        self.assertEqual(job_content_hash(make_job('  Senior   Dev ')), job_content_hash(make_job('senior dev')))
+        self.assertNotEqual(job_content_hash(make_job('Senior Dev')), job_content_hash(make_job('Junior Dev')))
+
+    def test_bulk_save_sends_one_row_per_hash(self):
+        """Test que los duplicados del lote se envían una sola vez y todos reciben id"""
+        jobs = [make_job('Dev'), make_job('QA'), make_job('DEV ')]
+        connection = MagicMock()
+
+        def fake_execute_values(cursor, sql, rows, page_size, fetch):
+            return [(index + 1, row[-1]) for index, row in enumerate(rows)]
+
+        with patch('job_store.execute_values', side_effect=fake_execute_values) as execute_values:
+            ids = bulk_save_jobs(connection, jobs)
+
+        self.assertEqual(execute_values.call_count, 1)
+        self.assertEqual(len(execute_values.call_args[0][2]), 2)
+        self.assertEqual(ids, [1, 2, 1])
+        connection.commit.assert_not_called()
+
+    def test_empty_batch_skips_database(self):
+        """Test que una lista vacía no consulta la base de datos"""
+        connection = MagicMock()
+        self.assertEqual(bulk_save_jobs(connection, []), [])
+        connection.cursor.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
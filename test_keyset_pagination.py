@@ -0,0 +1,78 @@
+"""Tests para la paginación por keyset de los listados (keyset_pagination.py)"""
+
+import unittest
+import sys
+import os
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+# Agregar el directorio del proyecto al path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from keyset_pagination import encode_cursor, decode_cursor, fetch_keyset_page, count_listing
+
+
+def _rows(*ids):
+    return [{'id': row_id, 'created_at': datetime(2025, 1, 1, 0, row_id)} for row_id in ids]
+
+
+def _connection(rows=None, fetchone=None):
+    cursor = MagicMock()
+    cursor.fetchall.return_value = rows or []
+    cursor.fetchone.return_value = fetchone
+    connection = MagicMock()
+    connection.cursor.return_value = cursor
+    return connection, cursor
+
+
+class TestKeysetPagination(unittest.TestCase):
+    """Tests para los tokens de página y la navegación"""
+
+    def test_cursor_round_trip(self):
+        """Test que el token conserva created_at e id y rechaza basura"""
+        token = encode_cursor({'created_at': datetime(2025, 3, 4, 5, 6, 7, 890), 'id': 42})
+        self.assertEqual(decode_cursor(token), (datetime(2025, 3, 4, 5, 6, 7, 890), 42))
+        self.assertIsNone(decode_cursor('no-es-un-token'))
+        self.assertIsNone(decode_cursor(None))
+
+    def test_next_page_uses_keyset_instead_of_offset(self):
+        """Test que la página siguiente filtra por (created_at, id) y detecta más filas"""
+        connection, cursor = _connection(_rows(9, 8, 7))
+        after = encode_cursor(_rows(10)[0])
+
+        page = fetch_keyset_page(connection, "SELECT * FROM users", [], after=after, per_page=2)
+
+        sql, params = cursor.execute.call_args.args
+        self.assertIn("(listing.created_at, listing.id) < (%s, %s)", sql)
+        self.assertNotIn('OFFSET', sql)
+        self.assertEqual(params[-1], 3)
+        self.assertEqual([row['id'] for row in page.items], [9, 8])
+        self.assertEqual(decode_cursor(page.next_cursor)[1], 8)
+        self.assertEqual(decode_cursor(page.prev_cursor)[1], 9)
+
+    def test_previous_page_is_reversed(self):
+        """Test que al retroceder las filas vuelven en orden descendente"""
+        connection, cursor = _connection(_rows(5, 6))
+
+        page = fetch_keyset_page(connection, "SELECT * FROM users", [], before=encode_cursor(_rows(4)[0]),
+                                 per_page=2)
+
+        self.assertIn("ORDER BY listing.created_at ASC", cursor.execute.call_args.args[0])
+        self.assertEqual([row['id'] for row in page.items], [6, 5])
+        self.assertFalse(page.has_prev)
+        self.assertTrue(page.has_next)
+
+    @patch('keyset_pagination._listing_count_cache')
+    def test_unfiltered_total_comes_from_planner_estimate(self, mock_cache):
+        """Test que sin filtros no se ejecuta COUNT(*)"""
+        connection, cursor = _connection(fetchone={'estimate': 1234})
+
+        total, is_estimate = count_listing(connection, "SELECT * FROM users", table='users')
+
+        self.assertEqual((total, is_estimate), (1234, True))
+        self.assertIn('reltuples', cursor.execute.call_args.args[0])
+        mock_cache.get_or_load.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+"""Tests para el runner de migraciones (migrations.py)"""
+
+import unittest
+import sys
+import os
+from unittest.mock import MagicMock
+
+# Agregar el directorio del proyecto al path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from migrations import MIGRATIONS, Migration, apply_migration, _index_name, _seq_scanned_relations
+
+
+class TestMigrations(unittest.TestCase):
+    """Tests para el registro y aplicación de migraciones"""
+
+    def test_versions_are_unique_and_ordered(self):
+        """Test que las versiones no se repiten"""
+        versions = [migration.version for migration in MIGRATIONS]
+        self.assertEqual(versions, sorted(set(versions)))
+
+    def test_index_statements_are_concurrent_and_idempotent(self):
+        """Test que los índices se crean sin bloquear escrituras y se pueden reintentar"""
+        for migration in MIGRATIONS:
+            if not migration.concurrent:
+                continue
+            for statement in migration.statements:
+                if callable(statement) or not statement.startswith('CREATE'):
+                    continue
+                self.assertIn('CONCURRENTLY IF NOT EXISTS', statement)
+                self.assertIsNotNone(_index_name(statement))
+
+    def test_concurrent_migration_runs_in_autocommit(self):
+        """Test que CREATE INDEX CONCURRENTLY se ejecuta fuera de una transacción"""
+        connection = MagicMock()
+        cursor = connection.cursor.return_value.__enter__.return_value
+        cursor.fetchone.return_value = None
+        modes = []
+        cursor.execute.side_effect = lambda sql, *args: modes.append((sql, connection.autocommit))
+
+        apply_migration(connection, Migration(99, 'test', ['CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_x ON t (a)'],
+                                              concurrent=True))
+
+        create = [autocommit for sql, autocommit in modes if sql.startswith('CREATE INDEX')]
+        self.assertEqual(create, [True])
+        self.assertFalse(connection.autocommit)
+        connection.commit.assert_called_once()
+
+    def test_usage_key_merges_duplicates_before_index(self):
+        """Test que la migración del índice único de usage_tracking fusiona duplicados antes, en una transacción"""
+        migration = next(migration for migration in MIGRATIONS if migration.name == 'usage_tracking_period_key')
+        connection = MagicMock()
+        cursor = connection.cursor.return_value.__enter__.return_value
+        cursor.fetchone.return_value = None
+        events = []
+        cursor.execute.side_effect = lambda sql, *args: events.append((' '.join(sql.split()), connection.autocommit))
+        connection.commit.side_effect = lambda: events.append(('COMMIT', connection.autocommit))
+
+        apply_migration(connection, migration)
+
+        def position(prefix):
+            return next(i for i, (sql, _) in enumerate(events) if sql.startswith(prefix))
+
+        self.assertLess(position('ALTER TABLE usage_tracking'), position('CREATE UNIQUE INDEX CONCURRENTLY'))
+        self.assertLess(position('DELETE FROM usage_tracking'), position('COMMIT'))
+        self.assertLess(position('COMMIT'), position('CREATE UNIQUE INDEX CONCURRENTLY'))
+        self.assertFalse(events[position('LOCK TABLE usage_tracking')][1])
+
+class TestQueryPlanCheck(unittest.TestCase):
+    """Tests para la detección de Seq Scan en planes de EXPLAIN"""
+
+    def test_seq_scan_found_in_nested_plan(self):
+        """Test que se detectan Seq Scan en nodos anidados"""
+        plan = {
+            'Node Type': 'Nested Loop',
+            'Plans': [
+                {'Node Type': 'Index Scan', 'Relation Name': 'resumes'},
+                {'Node Type': 'Seq Scan', 'Relation Name': 'feedback'}
+            ]
+        }
+        self.assertEqual(_seq_scanned_relations(plan), ['feedback'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+"""Tests para el registro de sentencias preparadas (prepared_statements.py)"""
+
+import unittest
+import sys
+import os
+from unittest.mock import MagicMock, patch
+
+import psycopg2.errors
+import psycopg2.extensions
+
+# Agregar el directorio del proyecto al path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from prepared_statements import PreparedStatement
+
+
+def mock_cursor(status=psycopg2.extensions.TRANSACTION_STATUS_IDLE):
+    cursor = MagicMock()
+    cursor.connection.get_transaction_status.return_value = status
+    return cursor
+
+
+class TestPreparedStatements(unittest.TestCase):
+    """Tests para la conversión de parámetros y la preparación por conexión"""
+
+    def test_placeholders_are_converted(self):
+        """Test de parámetros posicionales, con nombre y % literal"""
+        positional = PreparedStatement('t_pos', "SELECT * FROM t WHERE a = %s AND b LIKE 'x%%' AND c = %s",
+                                       ('integer', 'text'))
+        self.assertEqual(positional.prepare_sql,
+                         "PREPARE t_pos (integer, text) AS SELECT * FROM t WHERE a = $1 AND b LIKE 'x%' AND c = $2")
+        self.assertEqual(positional.execute_sql, "EXECUTE t_pos (%s, %s)")
+
+        named = PreparedStatement('t_named', "SELECT %(a)s WHERE %(b)s IS NULL OR %(a)s > %(b)s")
+        self.assertEqual(named.prepare_sql, "PREPARE t_named AS SELECT $1 WHERE $2 IS NULL OR $1 > $2")
+        self.assertEqual(named._params({'b': 2, 'a': 1}), (1, 2))
+
+    def test_prepared_once_per_connection(self):
+        """Test que cada conexión física prepara la sentencia una sola vez"""
+        statement = PreparedStatement('t_once', "SELECT %s")
+        cursor = mock_cursor()
+        statement.execute(cursor, (1,))
+        statement.execute(cursor, (2,))
+        sql = [call.args[0] for call in cursor.execute.call_args_list]
+        self.assertEqual(sql, [statement.prepare_sql, statement.execute_sql, statement.execute_sql])
+
+        # Una conexión reciclada por el pool es otro objeto: se prepara de nuevo
+        recycled = mock_cursor()
+        statement.execute(recycled, (3,))
+        self.assertEqual(recycled.execute.call_args_list[0].args[0], statement.prepare_sql)
+
+    def test_lost_statement_is_prepared_again(self):
+        """Test que si la sesión perdió la sentencia se prepara y reintenta"""
+        statement = PreparedStatement('t_lost', "SELECT %s")
+        cursor = mock_cursor()
+        statement.execute(cursor, (1,))
+        cursor.execute.reset_mock()
+        cursor.execute.side_effect = [psycopg2.errors.InvalidSqlStatementName(), None, None]
+
+        statement.execute(cursor, (2,))
+
+        sql = [call.args[0] for call in cursor.execute.call_args_list]
+        self.assertEqual(sql, [statement.execute_sql, statement.prepare_sql, statement.execute_sql])
+        cursor.connection.rollback.assert_called_once()
+
+    def test_disabled_runs_original_sql(self):
+        """Test que con DB_PREPARED_STATEMENTS=false se ejecuta el SQL original"""
+        statement = PreparedStatement('t_off', "SELECT %s")
+        cursor = mock_cursor()
+        with patch('prepared_statements.PREPARED_STATEMENTS_ENABLED', False):
+            statement.execute(cursor, (1,))
+        cursor.execute.assert_called_once_with("SELECT %s", (1,))
+
+
+if __name__ == '__main__':
+    unittest.main()
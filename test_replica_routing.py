@@ -0,0 +1,143 @@
+"""Tests para el ruteo de lecturas a la réplica (db_pool.py y request_db.py)"""
+
+import unittest
+import sys
+import os
+from unittest.mock import patch, MagicMock
+
+# Agregar el directorio del proyecto al path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import psycopg2
+import psycopg2.extensions
+from flask import Flask
+
+import db_pool
+from db_pool import ReplicaMonitor
+from request_db import init_request_db, get_request_connection, get_cache_fill_connection, read_only
+
+
+def make_fake_connection(lag=0.0):
+    """Crear una conexión falsa que responde ``lag`` a la consulta de atraso"""
+    connection = MagicMock()
+    connection.get_transaction_status.return_value = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+    connection.cursor.return_value.__enter__.return_value.fetchone.return_value = (lag,)
+    return connection
+
+
+class TestReplicaMonitor(unittest.TestCase):
+    """Tests para la medición del atraso de la réplica"""
+
+    def test_lagging_replica_is_skipped_until_next_check(self):
+        """Test que una réplica atrasada no se usa hasta la siguiente medición"""
+        monitor = ReplicaMonitor(max_lag=5, check_interval=60)
+        self.assertFalse(monitor.check(make_fake_connection(lag=12.5)))
+        self.assertTrue(monitor.skip())
+        self.assertEqual(monitor.get_stats()['lag_seconds'], 12.5)
+
+        monitor.checked_at -= 61
+        self.assertFalse(monitor.skip())
+        self.assertTrue(monitor.check(make_fake_connection(lag=0.2)))
+        self.assertEqual(monitor.stats['lag_checks'], 2)
+
+    def test_lag_is_measured_once_per_interval(self):
+        """Test que dentro del intervalo no se repite la consulta de atraso"""
+        monitor = ReplicaMonitor(max_lag=5, check_interval=60)
+        first, second = make_fake_connection(), make_fake_connection()
+        self.assertTrue(monitor.check(first))
+        self.assertTrue(monitor.check(second))
+        second.cursor.assert_not_called()
+
+    @patch.dict(os.environ, {'DB_REPLICA_HOST': 'replica'})
+    def test_unreachable_replica_falls_back(self):
+        """Test que si la réplica no responde se usa el primario"""
+        monitor = ReplicaMonitor(max_lag=5, check_interval=60)
+        pool = MagicMock()
+        pool.getconn.side_effect = psycopg2.OperationalError('connection refused')
+        with patch('db_pool._replica_monitor', monitor), \
+                patch('db_pool.get_replica_pool', return_value=pool):
+            self.assertIsNone(db_pool.get_replica_connection())
+            self.assertIsNone(db_pool.get_replica_connection())
+        pool.getconn.assert_called_once()
+        self.assertEqual(monitor.stats['errors'], 1)
+
+
+class TestReadOnlyRoutes(unittest.TestCase):
+    """Tests para el ruteo de las rutas @read_only"""
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.secret_key = 'test'
+        init_request_db(self.app)
+        self.primary = make_fake_connection()
+        self.replica = make_fake_connection()
+        for target, value in (('request_db.get_pooled_connection', self.primary),
+                              ('request_db.get_replica_connection', self.replica),
+                              ('request_db.replica_configured', True)):
+            patcher = patch(target, return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        def make_view():
+            def query():
+                connection = get_request_connection()
+                cursor = connection.cursor()
+                cursor.execute("SELECT 1")
+                cursor.close()
+                connection.close()
+                return 'ok'
+            return query
+
+        self.app.add_url_rule('/report', 'report', read_only(make_view()))
+        self.app.add_url_rule('/page', 'page', make_view())
+        self.app.add_url_rule('/save', 'save', make_view(), methods=['POST'])
+
+    def test_read_only_route_uses_replica(self):
+        """Test que solo las rutas marcadas leen de la réplica"""
+        client = self.app.test_client()
+        self.assertEqual(client.get('/report').headers['X-DB-Route'], 'replica')
+        self.assertEqual(client.get('/page').headers['X-DB-Route'], 'primary')
+        self.replica.close.assert_called_once()
+        self.primary.close.assert_called_once()
+
+    def test_reads_after_write_stay_on_primary(self):
+        """Test que después de escribir la sesión lee del primario"""
+        client = self.app.test_client()
+        client.post('/save')
+        self.assertEqual(client.get('/report').headers['X-DB-Route'], 'primary')
+
+        # Otro usuario (otra sesión) sigue leyendo de la réplica
+        self.assertEqual(self.app.test_client().get('/report').headers['X-DB-Route'], 'replica')
+
+    def test_unavailable_replica_uses_primary(self):
+        """Test que sin réplica al día la ruta marcada usa el primario"""
+        with patch('request_db.get_replica_connection', return_value=None):
+            response = self.app.test_client().get('/report')
+        self.assertEqual(response.headers['X-DB-Route'], 'primary')
+
+    def test_cache_fill_reads_primary(self):
+        """Test que lo que se carga para un cache compartido no sale de la réplica"""
+        @read_only
+        def feed():
+            connection = get_cache_fill_connection()
+            self.assertIs(connection, self.primary)
+            connection.close()
+            return 'ok'
+
+        def feed_page():
+            get_cache_fill_connection().close()
+            return 'ok'
+
+        self.app.add_url_rule('/feed', 'feed', feed)
+        self.app.add_url_rule('/feed-page', 'feed_page', feed_page)
+        client = self.app.test_client()
+        self.assertEqual(client.get('/feed').status_code, 200)
+        self.replica.cursor.assert_not_called()
+        self.primary.close.assert_called_once()
+
+        # Fuera de @read_only es la conexión del request (un préstamo de la unidad)
+        self.assertEqual(client.get('/feed-page').headers['X-DB-Leases'], '1')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,151 @@
+"""Tests para la unidad de trabajo por request (request_db.py)"""
+
+import unittest
+import sys
+import os
+from unittest.mock import patch, MagicMock
+
+# Agregar el directorio del proyecto al path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import psycopg2.extensions
+from flask import Flask
+
+from request_db import init_request_db, get_request_connection, request_memo, call_after_commit, end_request_unit
+
+
+def make_fake_connection():
+    """Crear una conexión falsa con la interfaz mínima de psycopg2"""
+    connection = MagicMock()
+    connection.get_transaction_status.return_value = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+    return connection
+
+
+class TestRequestUnitOfWork(unittest.TestCase):
+    """Tests para la conexión compartida del request"""
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        init_request_db(self.app)
+        self.connection = make_fake_connection()
+        patcher = patch('request_db.get_pooled_connection', return_value=self.connection)
+        self.get_pooled_connection = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_helpers_share_one_connection(self):
+        """Test que varios préstamos usan una sola conexión del pool"""
+        @self.app.route('/uow')
+        def uow():
+            for _ in range(3):
+                connection = get_request_connection()
+                cursor = connection.cursor()
+                cursor.execute("SELECT 1")
+                cursor.close()
+                connection.close()
+            return 'ok'
+
+        response = self.app.test_client().get('/uow')
+
+        self.assertEqual(self.get_pooled_connection.call_count, 1)
+        self.assertEqual(response.headers['X-DB-Queries'], '3')
+        self.assertEqual(response.headers['X-DB-Leases'], '3')
+        self.connection.commit.assert_called_once()
+        self.connection.close.assert_called_once()
+
+    def test_helper_commit_becomes_savepoint(self):
+        """Test que commit() de un helper no confirma la transacción real"""
+        self.connection.get_transaction_status.return_value = psycopg2.extensions.TRANSACTION_STATUS_INTRANS
+        raw_cursor = self.connection.cursor.return_value.__enter__.return_value
+
+        with self.app.test_request_context('/'):
+            connection = get_request_connection()
+            connection.commit()
+            self.connection.commit.assert_not_called()
+            raw_cursor.execute.assert_called_with("SAVEPOINT armind_uow")
+
+    def test_request_memo_loads_once(self):
+        """Test que request_memo solo ejecuta el loader una vez por request"""
+        loader = MagicMock(return_value='admin')
+        with self.app.test_request_context('/'):
+            self.assertEqual(request_memo(('user_role', '1'), loader), 'admin')
+            self.assertEqual(request_memo(('user_role', '1'), loader), 'admin')
+        loader.assert_called_once()
+
+    def test_after_commit_waits_for_real_commit(self):
+        """Test que las acciones posteriores al commit corren recién tras el COMMIT real"""
+        events = []
+        self.connection.commit.side_effect = lambda: events.append('commit')
+
+        @self.app.route('/write')
+        def write():
+            connection = get_request_connection()
+            connection.commit()
+            call_after_commit(lambda: events.append('callback'))
+            events.append('response')
+            return 'ok'
+
+        self.app.test_client().get('/write')
+
+        self.assertEqual(events, ['response', 'commit', 'callback'])
+
+    def test_failed_commit_returns_500(self):
+        """Test que si el COMMIT falla el request no informa éxito ni corre las acciones posteriores"""
+        events = []
+        self.connection.commit.side_effect = psycopg2.OperationalError('server closed the connection')
+
+        @self.app.route('/save', methods=['POST'])
+        def save():
+            get_request_connection().commit()
+            call_after_commit(lambda: events.append('callback'))
+            return {'success': True}
+
+        response = self.app.test_client().post('/save')
+
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(events, [])
+        self.connection.rollback.assert_called()
+        self.connection.close.assert_called_once()
+
+    def test_end_request_unit_before_external_call(self):
+        """Test que end_request_unit confirma y devuelve la conexión antes de una llamada larga"""
+        second = make_fake_connection()
+        self.get_pooled_connection.side_effect = [self.connection, second]
+
+        @self.app.route('/analyze')
+        def analyze():
+            get_request_connection().cursor().execute("SELECT 1")
+            end_request_unit()
+            self.connection.commit.assert_called_once()
+            self.connection.close.assert_called_once()
+            get_request_connection().cursor().execute("INSERT INTO cv_analyses DEFAULT VALUES")
+            return 'ok'
+
+        response = self.app.test_client().get('/analyze')
+
+        self.assertEqual(response.headers['X-DB-Queries'], '2')
+        second.commit.assert_called_once()
+
+    def test_close_after_end_request_unit(self):
+        """Test que cerrar un préstamo tras end_request_unit no toca la conexión devuelta al pool"""
+        @self.app.route('/preview')
+        def preview():
+            connection = get_request_connection()
+            connection.cursor().execute("SELECT 1")
+            end_request_unit()
+            self.connection.get_transaction_status.reset_mock()
+            connection.close()
+            self.connection.get_transaction_status.assert_not_called()
+            return 'ok'
+
+        response = self.app.test_client().get('/preview')
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_no_connection_outside_request(self):
+        """Test que fuera de un request no se abre unidad de trabajo"""
+        self.assertIsNone(get_request_connection())
+        self.get_pooled_connection.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
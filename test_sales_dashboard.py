@@ -0,0 +1,67 @@
+"""Tests para el snapshot del dashboard de ventas (sales_dashboard.py)"""
+
+import unittest
+import sys
+import os
+import json
+from datetime import datetime
+from decimal import Decimal
+from unittest.mock import patch
+
+# Agregar el directorio del proyecto al path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import sales_dashboard
+from sales_dashboard import load_dashboard_snapshot, dump_snapshot, load_snapshot
+
+
+class TestSalesDashboard(unittest.TestCase):
+    """Tests para el cálculo y la serialización del snapshot"""
+
+    @patch('sales_dashboard._fetch')
+    def test_snapshot_runs_every_query(self, mock_fetch):
+        """Test que cada consulta del dashboard se ejecuta una vez en el executor"""
+        mock_fetch.side_effect = lambda query, many=False: [] if many else {'ok': True}
+
+        snapshot = load_dashboard_snapshot()
+
+        self.assertEqual(mock_fetch.call_count, 4)
+        self.assertEqual(snapshot['recent_sales'], [])
+        self.assertEqual(snapshot['coupon_stats'], {'ok': True})
+        self.assertIsInstance(snapshot['generated_at'], datetime)
+
+    def test_snapshot_round_trips_through_json(self):
+        """Test que montos y fechas sobreviven a Redis (JSON)"""
+        created_at = datetime(2025, 5, 1, 10, 30)
+        snapshot = {
+            'coupon_stats': {'total_coupons': 3},
+            'offer_stats': {'total_offers': 1},
+            'sales_stats': {'total_revenue': Decimal('150.50')},
+            'recent_sales': [{'id': 1, 'final_amount': Decimal('9.90'), 'created_at': created_at}],
+            'generated_at': created_at,
+        }
+
+        restored = load_snapshot(json.loads(json.dumps(dump_snapshot(snapshot))))
+
+        self.assertEqual(restored['sales_stats']['total_revenue'], 150.5)
+        self.assertEqual(restored['recent_sales'][0]['created_at'], created_at)
+        self.assertEqual(restored['generated_at'], created_at)
+
+    @patch('sales_dashboard.load_dashboard_snapshot')
+    def test_writes_invalidate_cached_snapshot(self, mock_load):
+        """Test que tras invalidar se vuelve a calcular el snapshot"""
+        mock_load.return_value = {'generated_at': datetime.now()}
+        with patch.object(sales_dashboard, 'SALES_DASHBOARD_CACHE_TTL', 30):
+            sales_dashboard.invalidate_sales_dashboard()
+            sales_dashboard.get_dashboard_snapshot()
+            sales_dashboard.get_dashboard_snapshot()
+            self.assertEqual(mock_load.call_count, 1)
+
+            sales_dashboard.invalidate_sales_dashboard()
+            sales_dashboard.get_dashboard_snapshot()
+            self.assertEqual(mock_load.call_count, 2)
+        sales_dashboard.invalidate_sales_dashboard()
+
+
+if __name__ == '__main__':
+    unittest.main()
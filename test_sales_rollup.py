@@ -0,0 +1,55 @@
+"""Tests para el resumen diario de ventas (sales_rollup.py y reportes de ventas)"""
+
+import unittest
+import sys
+import os
+from unittest.mock import MagicMock
+
+# Agregar el directorio del proyecto al path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sales_rollup import rebuild_sales_rollup
+from admin_sales_system import build_sales_summary_query
+
+
+class TestSalesRollup(unittest.TestCase):
+    """Tests para la consulta de reportes y la reconstrucción del resumen"""
+
+    def test_summary_reads_daily_rollup(self):
+        """Test que los períodos se agrupan desde los días del resumen"""
+        query, params = build_sales_summary_query('2025-01-01', '2025-01-31', 3, 'month', use_rollup=True)
+
+        self.assertIn('FROM sales_daily_rollup r', query)
+        self.assertIn("DATE_TRUNC('month', r.day::timestamp)", query)
+        self.assertIn('SUM(r.transaction_count)', query)
+        self.assertNotIn('sales_transactions', query)
+        self.assertEqual(params, ['2025-01-01', '2025-01-31', 3])
+
+    def test_raw_fallback_filters_are_index_ranges(self):
+        """Test que sin resumen el rango de fechas no envuelve la columna en DATE()"""
+        query, params = build_sales_summary_query('2025-01-01', '2025-01-31', None, 'day', use_rollup=False)
+
+        self.assertIn('st.created_at >= %s::date', query)
+        self.assertIn('st.created_at < %s::date + 1', query)
+        self.assertNotIn('DATE(st.created_at) >=', query)
+        self.assertEqual(params, ['2025-01-01', '2025-01-31'])
+
+    def test_rebuild_locks_sales_and_replaces_range(self):
+        """Test que el recálculo bloquea escrituras y reemplaza solo el rango pedido"""
+        cursor = MagicMock()
+        cursor.rowcount = 12
+        connection = MagicMock()
+        connection.cursor.return_value = cursor
+
+        rows = rebuild_sales_rollup(connection, '2025-02-01', '2025-02-28')
+
+        statements = [call.args[0] for call in cursor.execute.call_args_list]
+        self.assertEqual(statements[0], "LOCK TABLE sales_transactions IN SHARE MODE")
+        self.assertIn('DELETE FROM sales_daily_rollup WHERE day >= %s AND day <= %s', statements[1])
+        self.assertIn('created_at < %s::date + 1', statements[2])
+        self.assertEqual(rows, 12)
+        connection.commit.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+"""Tests para el cache versionado del contenido del sitio (site_content_cache.py)"""
+
+import unittest
+import sys
+import os
+from unittest.mock import MagicMock, patch
+
+# Agregar el directorio del proyecto al path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from site_content_cache import SiteContentCache, load_site_content, bump_content_version
+
+
+def _connection(version):
+    """Conexión falsa: la secuencia retorna ``version[0]`` y el contenido es fijo"""
+    cursor = MagicMock()
+    queries = []
+
+    def execute(sql, params=None):
+        queries.append(sql)
+        if 'site_content_version_seq' in sql:
+            cursor.fetchone.return_value = (version[0], True)
+        elif 'FROM site_content' in sql:
+            cursor.fetchall.return_value = [
+                {'section': 'dashboard', 'content_key': 'title', 'content_value': 'Hola'},
+            ]
+        else:
+            cursor.fetchall.return_value = [
+                {'id': 1, 'title': 'Formato', 'description': 'd', 'icon': 'fas fa-file', 'color': 'text-info',
+                 'is_active': True},
+            ]
+
+    cursor.execute.side_effect = execute
+    connection = MagicMock()
+    connection.cursor.return_value = cursor
+    return connection, queries
+
+
+class TestSiteContentCache(unittest.TestCase):
+    """Tests para la recarga por versión"""
+
+    def test_load_groups_sections_and_formats_tips(self):
+        """Test que el contenido queda en el formato de las plantillas"""
+        connection, _ = _connection([1])
+
+        content = load_site_content(connection)
+
+        self.assertEqual(content['site_content'], {'dashboard': {'title': 'Hola'}})
+        self.assertEqual(content['daily_tips'][0]['icon_color'], 'text-info')
+
+    def test_reloads_only_when_version_changes(self):
+        """Test que sin cambio de versión no se vuelve a leer el contenido"""
+        version = [5]
+        connection, queries = _connection(version)
+        cache = SiteContentCache(check_interval=0, max_age=3600)
+
+        with patch('site_content_cache.get_pooled_connection', return_value=connection):
+            cache.get()
+            cache.get()
+            content_queries = [sql for sql in queries if 'site_content_version_seq' not in sql]
+            self.assertEqual(len(content_queries), 2)
+
+            version[0] = 6
+            cache.get()
+
+        content_queries = [sql for sql in queries if 'site_content_version_seq' not in sql]
+        self.assertEqual(len(content_queries), 4)
+        self.assertEqual(cache.stats['reloads'], 2)
+
+    def test_renders_within_check_interval_do_not_query(self):
+        """Test que dentro del intervalo no se consulta ni la versión"""
+        connection, queries = _connection([1])
+        cache = SiteContentCache(check_interval=60, max_age=3600)
+
+        with patch('site_content_cache.get_pooled_connection', return_value=connection) as mock_pool:
+            for _ in range(10):
+                cache.get()
+
+        self.assertEqual(mock_pool.call_count, 1)
+        self.assertEqual(cache.stats['hits'], 9)
+
+    @patch('site_content_cache.call_after_commit')
+    def test_bump_is_deferred_to_commit(self, mock_after_commit):
+        """Test que el incremento de versión espera al commit del request"""
+        bump_content_version()
+
+        mock_after_commit.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+"""Tests para las exportaciones en streaming (streaming_export.py)"""
+
+import unittest
+import sys
+import os
+from datetime import datetime, timezone, timedelta
+from unittest.mock import MagicMock, patch
+
+# Agregar el directorio del proyecto al path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask
+
+from streaming_export import iter_query_rows, iter_csv, write_xlsx, stream_query_export
+
+
+class TestStreamingExport(unittest.TestCase):
+    """Tests para la lectura por bloques y el formato de salida"""
+
+    @patch('streaming_export.get_pooled_connection')
+    def test_rows_are_read_in_chunks_with_named_cursor(self, mock_get_connection):
+        """Test que se usa un cursor server-side y la conexión se libera al terminar"""
+        cursor = MagicMock()
+        cursor.fetchmany.side_effect = [[{'id': 1}, {'id': 2}], [{'id': 3}], []]
+        connection = MagicMock()
+        connection.cursor.return_value = cursor
+        mock_get_connection.return_value = connection
+
+        rows = list(iter_query_rows("SELECT id FROM users", None, chunk_size=2))
+
+        self.assertEqual([row['id'] for row in rows], [1, 2, 3])
+        self.assertTrue(connection.cursor.call_args.kwargs['name'].startswith('export_'))
+        cursor.fetchmany.assert_called_with(2)
+        connection.rollback.assert_called_once()
+        connection.close.assert_called_once()
+
+    def test_csv_is_emitted_per_chunk(self):
+        """Test que el CSV se entrega en bloques y las columnas pueden ser funciones"""
+        rows = [{'code': f'C{i}', 'is_active': i % 2 == 0} for i in range(5)]
+        columns = [('Código', 'code'), ('Activo', lambda row: 'Sí' if row['is_active'] else 'No')]
+
+        chunks = list(iter_csv(iter(rows), columns, chunk_size=2))
+
+        self.assertEqual(len(chunks), 3)
+        lines = b''.join(chunks).decode('utf-8').splitlines()
+        self.assertEqual(lines[0], 'Código,Activo')
+        self.assertEqual(lines[1:3], ['C0,Sí', 'C1,No'])
+        self.assertEqual(len(lines), 6)
+
+    def test_xlsx_cleans_values_excel_rejects(self):
+        """Test que se quitan caracteres de control y zonas horarias antes de escribir"""
+        from openpyxl import load_workbook
+
+        login = datetime(2024, 5, 1, 12, 0, tzinfo=timezone(timedelta(hours=-3)))
+        rows = [{'name': 'Ana\x01', 'last_login': login}]
+        output, row_count = write_xlsx(rows, [('Nombre', 'name'), ('Login', 'last_login')], 'Usuarios')
+        try:
+            sheet = load_workbook(output)['Usuarios']
+            values = list(sheet.iter_rows(values_only=True))
+        finally:
+            output.close()
+
+        self.assertEqual(row_count, 1)
+        self.assertEqual(values[1], ('Ana', datetime(2024, 5, 1, 15, 0)))
+
+    @patch('streaming_export.get_pooled_connection')
+    def test_csv_sends_planner_row_estimate(self, mock_get_connection):
+        """Test que el CSV informa las filas estimadas por EXPLAIN sin contar la consulta"""
+        cursor = MagicMock()
+        cursor.fetchone.return_value = ([{'Plan': {'Node Type': 'Seq Scan', 'Plan Rows': 1234}}],)
+        connection = MagicMock()
+        connection.cursor.return_value = cursor
+        mock_get_connection.return_value = connection
+
+        with Flask(__name__).test_request_context('/'):
+            response = stream_query_export("SELECT id FROM users", None, [('ID', 'id')], 'usuarios.csv')
+
+        self.assertEqual(response.headers['X-Export-Rows-Estimate'], '1234')
+        self.assertNotIn('X-Export-Rows', response.headers)
+        cursor.execute.assert_called_once_with("EXPLAIN (FORMAT JSON) SELECT id FROM users", None)
+        connection.close.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
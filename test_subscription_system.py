@@ -0,0 +1,174 @@
+"""Tests para los contadores y reservas de uso (subscription_system.py)"""
+
+import unittest
+import sys
+import os
+from datetime import datetime
+from unittest.mock import patch
+
+# Agregar el directorio del proyecto al path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import subscription_system
+from subscription_system import (increment_usage, reserve_usage, UsageReservation, USAGE_RESERVATION_TTL,
+                                 INCREMENT_USAGE_SQL, RESERVE_USAGE_SQL, COMMIT_RESERVATION_SQL,
+                                 RELEASE_RESERVATION_SQL, INCREMENT_USAGE_STATEMENT, RESERVE_USAGE_STATEMENT,
+                                 COMMIT_RESERVATION_STATEMENT, RELEASE_RESERVATION_STATEMENT)
+
+SUBSCRIPTION = {'id': 3, 'plan_type': 'free_trial', 'start_date': datetime(2026, 1, 1, 10, 0, 0)}
+
+
+def normalize(sql):
+    return ' '.join(sql.split())
+
+
+class TestUsageCounters(unittest.TestCase):
+    """Tests para increment_usage y reserve_usage"""
+
+    def setUp(self):
+        for name, value in (('get_user_subscription', SUBSCRIPTION), ('get_user_role', 'user')):
+            patcher = patch.object(subscription_system, name, return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = patch.object(subscription_system, 'invalidate_entitlements')
+        self.invalidate = patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch.object(subscription_system, '_execute_usage_statement')
+        self.execute = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_increment_usage_returns_false_at_limit(self):
+        """Test que increment_usage retorna False cuando el UPSERT no actualiza la fila (límite alcanzado)"""
+        self.execute.return_value = None
+
+        self.assertFalse(increment_usage(7, 'cv_analysis'))
+
+        statement, params = self.execute.call_args.args
+        self.assertIs(statement, INCREMENT_USAGE_STATEMENT)
+        self.assertEqual(params['limit'], 5)
+        self.assertEqual(params['period'], SUBSCRIPTION['start_date'])
+
+    def test_increment_usage_within_limit(self):
+        """Test que increment_usage retorna True e invalida el snapshot cuando se sumó el uso"""
+        self.execute.return_value = {'id': 11, 'used_count': 3}
+
+        self.assertTrue(increment_usage(7, 'cv_analysis'))
+        self.invalidate.assert_called_once_with(7)
+
+    def test_increment_usage_without_enforcing_limit(self):
+        """Test que enforce_limit=False no envía límite a la sentencia"""
+        self.execute.return_value = {'id': 11, 'used_count': 6}
+
+        self.assertTrue(increment_usage(7, 'cv_analysis', enforce_limit=False))
+        self.assertIsNone(self.execute.call_args.args[1]['limit'])
+
+    def test_limit_counts_active_reservations(self):
+        """Test que el límite de incrementos y reservas suma las reservas vigentes al uso consumido"""
+        for sql in (INCREMENT_USAGE_SQL, RESERVE_USAGE_SQL):
+            condition = normalize(sql).split('WHERE %(limit)s IS NULL OR ', 1)[1]
+            self.assertIn('usage_tracking.used_count + (CASE WHEN usage_tracking.reserved_until > NOW() '
+                          'THEN usage_tracking.reserved_count ELSE 0 END) < %(limit)s', condition)
+
+    def test_reservation_does_not_extend_active_deadline(self):
+        """Test que una reserva nueva no extiende el vencimiento de las reservas vigentes de la fila"""
+        update = normalize(RESERVE_USAGE_SQL).split('DO UPDATE', 1)[1]
+        self.assertIn('reserved_until = CASE WHEN usage_tracking.reserved_until > NOW() '
+                      'AND usage_tracking.reserved_count > 0 THEN usage_tracking.reserved_until '
+                      'ELSE NOW() + make_interval(secs => %(ttl)s) END', update)
+
+    def test_reserve_usage_returns_none_at_limit(self):
+        """Test que reserve_usage retorna None si uso más reservas vigentes alcanzan el límite"""
+        self.execute.return_value = None
+
+        self.assertIsNone(reserve_usage(7, 'cv_analysis'))
+
+        statement, params = self.execute.call_args.args
+        self.assertIs(statement, RESERVE_USAGE_STATEMENT)
+        self.assertEqual(params['limit'], 5)
+        self.assertEqual(params['ttl'], USAGE_RESERVATION_TTL)
+
+    def test_reserve_usage_returns_reservation(self):
+        """Test que reserve_usage devuelve la reserva de la fila de uso del período"""
+        self.execute.return_value = {'id': 42, 'used_count': 2, 'reserved_count': 1}
+
+        reservation = reserve_usage(7, 'cv_analysis', ttl=30)
+
+        self.assertEqual(reservation.usage_id, 42)
+        self.assertFalse(reservation.done)
+        self.assertEqual(self.execute.call_args.args[1]['ttl'], 30)
+
+    def test_reserve_usage_handles_errors(self):
+        """Test que un error de base de datos no deja pasar la operación sin cupo"""
+        self.execute.side_effect = Exception('connection refused')
+
+        self.assertIsNone(reserve_usage(7, 'cv_analysis'))
+
+    def test_admin_reservation_skips_counter(self):
+        """Test que los administradores reservan sin tocar el contador"""
+        with patch.object(subscription_system, 'get_user_role', return_value='admin'):
+            reservation = reserve_usage(1, 'cv_analysis')
+
+        reservation.commit()
+        self.assertTrue(reservation.done)
+        self.execute.assert_not_called()
+
+
+class TestUsageReservation(unittest.TestCase):
+    """Tests para confirmar y liberar una reserva de uso"""
+
+    def setUp(self):
+        patcher = patch.object(subscription_system, 'invalidate_entitlements')
+        self.invalidate = patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch.object(subscription_system, '_execute_usage_statement')
+        self.execute = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_commit_and_release_decrement_reserved_count(self):
+        """Test que confirmar suma el uso y liberar no; ambos descuentan la reserva"""
+        self.assertIn('used_count = used_count + 1', normalize(COMMIT_RESERVATION_SQL))
+        self.assertNotIn('used_count', normalize(RELEASE_RESERVATION_SQL).replace('reserved_count', ''))
+        for sql in (COMMIT_RESERVATION_SQL, RELEASE_RESERVATION_SQL):
+            self.assertIn('reserved_count = GREATEST(reserved_count - 1, 0)', normalize(sql))
+
+    def test_commit_runs_once(self):
+        """Test que commit() consume el cupo una sola vez e invalida el snapshot"""
+        reservation = UsageReservation(7, 'cv_analysis', 42)
+
+        reservation.commit()
+        reservation.commit()
+        reservation.release()
+
+        self.execute.assert_called_once_with(COMMIT_RESERVATION_STATEMENT, {'usage_id': 42})
+        self.invalidate.assert_called_once_with(7)
+
+    def test_release_swallows_errors(self):
+        """Test que un error al liberar no se propaga (la reserva vence sola)"""
+        self.execute.side_effect = Exception('connection refused')
+        reservation = UsageReservation(7, 'cv_analysis', 42)
+
+        reservation.release()
+
+        self.execute.assert_called_once_with(RELEASE_RESERVATION_STATEMENT, {'usage_id': 42})
+        self.assertTrue(reservation.done)
+
+    def test_context_manager_commits_on_success(self):
+        """Test que el context manager confirma la reserva al salir sin errores"""
+        with UsageReservation(7, 'cv_analysis', 42) as reservation:
+            self.execute.assert_not_called()
+
+        self.assertTrue(reservation.done)
+        self.execute.assert_called_once_with(COMMIT_RESERVATION_STATEMENT, {'usage_id': 42})
+
+    def test_context_manager_releases_on_error(self):
+        """Test que el context manager libera la reserva y deja pasar la excepción"""
+        with self.assertRaises(ValueError):
+            with UsageReservation(7, 'cv_analysis', 42):
+                raise ValueError('la IA no respondió')
+
+        self.execute.assert_called_once_with(RELEASE_RESERVATION_STATEMENT, {'usage_id': 42})
+        self.invalidate.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+"""Tests para la identidad cacheada de load_user (user_identity.py)"""
+
+import unittest
+import sys
+import os
+from unittest.mock import MagicMock, patch
+
+# Agregar el directorio del proyecto al path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import user_identity
+from user_identity import get_user_identity, invalidate_user_identity
+
+USER_ROW = {'id': 42, 'email': 'ana@example.com', 'username': 'ana', 'role': 'admin'}
+
+
+def mock_connection(*rows):
+    cursor = MagicMock()
+    cursor.fetchone.side_effect = list(rows)
+    connection = MagicMock()
+    connection.cursor.return_value = cursor
+    return connection
+
+
+class TestUserIdentity(unittest.TestCase):
+    """Tests para el cache de identidad y su invalidación"""
+
+    def setUp(self):
+        user_identity._user_identity_cache.delete('42')
+
+    @patch('user_identity.get_cache_fill_connection')
+    def test_warm_request_does_not_connect(self, mock_get_connection):
+        """Test que con el cache caliente no se toma conexión"""
+        mock_get_connection.return_value = mock_connection(USER_ROW)
+
+        self.assertEqual(get_user_identity('42'), USER_ROW)
+        self.assertEqual(get_user_identity('42'), USER_ROW)
+        mock_get_connection.assert_called_once()
+
+    @patch('user_identity.call_after_commit')
+    @patch('user_identity.get_cache_fill_connection')
+    def test_role_change_is_visible_after_commit(self, mock_get_connection, mock_after_commit):
+        """Test que la invalidación recarga la identidad recién tras el commit"""
+        mock_get_connection.return_value = mock_connection(USER_ROW, dict(USER_ROW, role='user'))
+        get_user_identity('42')
+
+        invalidate_user_identity(42)
+        self.assertEqual(get_user_identity('42')['role'], 'admin')
+
+        mock_after_commit.call_args.args[0]()
+        self.assertEqual(get_user_identity('42')['role'], 'user')
+
+    @patch('user_identity.get_cache_fill_connection')
+    def test_missing_user_is_not_cached(self, mock_get_connection):
+        """Test que un usuario inexistente no queda cacheado"""
+        mock_get_connection.side_effect = lambda **kwargs: mock_connection(None)
+
+        self.assertIsNone(get_user_identity('42'))
+        self.assertIsNone(get_user_identity('42'))
+        self.assertEqual(mock_get_connection.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
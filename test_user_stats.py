@@ -0,0 +1,53 @@
+"""Tests para las estadísticas de usuarios del panel de administración (user_stats.py)"""
+
+import unittest
+import sys
+import os
+from unittest.mock import patch, MagicMock
+
+# Agregar el directorio del proyecto al path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import psycopg2
+
+import user_stats
+from user_stats import load_user_stats, get_user_stats, invalidate_user_stats, USER_STATS_SQL, ROLLUP_STATS_SQL
+
+STATS_ROW = {'active_users': 2, 'daily_users': 5, 'weekly_users': 9, 'monthly_users': 20, 'total_users': 100}
+
+
+class TestUserStats(unittest.TestCase):
+    """Tests para load_user_stats y su cache"""
+
+    def setUp(self):
+        self.connection = MagicMock()
+        self.cursor = self.connection.cursor.return_value
+        self.cursor.fetchone.return_value = dict(STATS_ROW)
+        patcher = patch('user_stats.get_db_connection', return_value=self.connection)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        invalidate_user_stats()
+        self.addCleanup(invalidate_user_stats)
+
+    def test_single_query(self):
+        """Test que todas las cifras salen de una sola consulta"""
+        self.assertEqual(load_user_stats(use_rollup=False), STATS_ROW)
+        self.cursor.execute.assert_called_once_with(USER_STATS_SQL)
+
+    def test_rollup_falls_back_to_users_query(self):
+        """Test que sin la tabla de rollup se usa la consulta directa"""
+        self.cursor.execute.side_effect = [psycopg2.ProgrammingError('no existe user_activity_rollup'), None]
+        self.assertEqual(load_user_stats(use_rollup=True), STATS_ROW)
+        self.assertEqual([c[0][0] for c in self.cursor.execute.call_args_list], [ROLLUP_STATS_SQL, USER_STATS_SQL])
+        self.connection.rollback.assert_called_once()
+
+    def test_cached_between_requests(self):
+        """Test que las estadísticas se calculan una vez mientras dura el TTL"""
+        with patch.object(user_stats, 'load_user_stats', return_value=dict(STATS_ROW)) as load:
+            get_user_stats()
+            get_user_stats()
+        self.assertEqual(load.call_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
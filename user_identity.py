@@ -0,0 +1,75 @@
+"""Identidad cacheada de los usuarios autenticados (load_user de Flask-Login)
+
+Flask-Login carga el usuario en cada request autenticado, incluidos los polls
+AJAX del panel. La fila ``(id, email, username, role)`` se cachea por id en
+memoria del worker (LRU, ``USER_IDENTITY_LOCAL_TTL``) y en Redis
+(``USER_IDENTITY_CACHE_TTL``), así que un request con el cache caliente no
+toma conexión ni consulta la base de datos para autenticarse.
+
+Las rutas que cambian estos datos o dejan de permitir el acceso (baneo, cambio
+de rol o plan, eliminación y cambio de contraseña) llaman a
+invalidate_user_identity(); las copias locales de otros workers expiran a más
+tardar en ``USER_IDENTITY_LOCAL_TTL`` segundos.
+"""
+
+import os
+import logging
+from typing import Dict, Any, Optional
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+from cache_service import TwoTierCache
+from prepared_statements import prepared
+from request_db import call_after_commit, get_cache_fill_connection
+
+logger = logging.getLogger(__name__)
+
+USER_IDENTITY_SQL = "SELECT id, email, username, role FROM users WHERE id = %s"
+USER_IDENTITY_STATEMENT = prepared('user_identity', USER_IDENTITY_SQL, ('integer',))
+
+_user_identity_cache = TwoTierCache(
+    'user_identity',
+    local_ttl=float(os.getenv('USER_IDENTITY_LOCAL_TTL', 5)),
+    redis_ttl=int(os.getenv('USER_IDENTITY_CACHE_TTL', 60)),
+    max_entries=int(os.getenv('USER_IDENTITY_CACHE_SIZE', 4096))
+)
+
+
+def load_user_identity(user_id) -> Optional[Dict[str, Any]]:
+    """Leer la identidad del usuario (del primario, se cachea); None si no existe"""
+    try:
+        connection = get_cache_fill_connection(cursor_factory=RealDictCursor)
+    except psycopg2.Error as e:
+        logger.warning(f"Error de conexión al cargar la identidad del usuario: {e}")
+        return None
+
+    try:
+        cursor = connection.cursor()
+        USER_IDENTITY_STATEMENT.execute(cursor, (int(user_id),))
+        row = cursor.fetchone()
+        cursor.close()
+    finally:
+        connection.close()
+
+    if not row:
+        return None
+    return {'id': row['id'], 'email': row['email'], 'username': row['username'],
+            'role': row.get('role') or 'user'}
+
+
+def get_user_identity(user_id) -> Optional[Dict[str, Any]]:
+    """Identidad del usuario desde el cache o la base de datos"""
+    if user_id is None:
+        return None
+    return _user_identity_cache.get_or_load(str(user_id), lambda: load_user_identity(user_id))
+
+
+def invalidate_user_identity(user_id) -> None:
+    """Descartar la identidad cacheada cuando se confirme el cambio del usuario"""
+    if user_id is not None:
+        call_after_commit(lambda: _user_identity_cache.delete(str(user_id)))
+
+
+def get_user_identity_cache_stats() -> Dict[str, Any]:
+    return _user_identity_cache.get_stats()
@@ -0,0 +1,108 @@
+"""Estadísticas de actividad de usuarios para el panel de administración
+
+Las cifras se calculan con una sola consulta sobre ``users`` (un rango del índice
+de ``last_login`` más el total) o, con ``USER_STATS_ROLLUP=true``, leyendo
+``user_activity_rollup``, que un trigger mantiene al actualizar ``last_login``
+(migración 0004). En ambos casos el resultado se cachea ``ADMIN_STATS_CACHE_TTL``
+segundos.
+"""
+
+import os
+import logging
+from typing import Optional, Dict
+
+import psycopg2
+
+from cache_service import TwoTierCache
+from subscription_system import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+ADMIN_STATS_CACHE_TTL = int(os.getenv('ADMIN_STATS_CACHE_TTL', 60))
+USE_ACTIVITY_ROLLUP = os.getenv('USER_STATS_ROLLUP', 'false').lower() == 'true'
+
+# Los conteos por período solo recorren el rango [inicio del mes o semana, ahora]
+# del índice de last_login; el total es el único recorrido completo
+USER_STATS_SQL = """
+    SELECT
+        COUNT(*) FILTER (WHERE last_login >= LOCALTIMESTAMP - INTERVAL '5 minutes') AS active_users,
+        COUNT(*) FILTER (WHERE last_login >= DATE_TRUNC('day', LOCALTIMESTAMP)) AS daily_users,
+        COUNT(*) FILTER (WHERE last_login >= DATE_TRUNC('week', LOCALTIMESTAMP)) AS weekly_users,
+        COUNT(*) FILTER (WHERE last_login >= DATE_TRUNC('month', LOCALTIMESTAMP)) AS monthly_users,
+        (SELECT COUNT(*) FROM users) AS total_users
+    FROM users
+    WHERE last_login >= LEAST(DATE_TRUNC('week', LOCALTIMESTAMP), DATE_TRUNC('month', LOCALTIMESTAMP))
+"""
+
+# Lectura de costo constante: cuatro filas del rollup y los logins de los últimos 5 minutos
+ROLLUP_STATS_SQL = """
+    SELECT
+        (SELECT COUNT(*) FROM users
+         WHERE last_login >= LOCALTIMESTAMP - INTERVAL '5 minutes') AS active_users,
+        COALESCE(MAX(user_count) FILTER (WHERE period = 'day'), 0) AS daily_users,
+        COALESCE(MAX(user_count) FILTER (WHERE period = 'week'), 0) AS weekly_users,
+        COALESCE(MAX(user_count) FILTER (WHERE period = 'month'), 0) AS monthly_users,
+        COALESCE(MAX(user_count) FILTER (WHERE period = 'total'), 0) AS total_users
+    FROM user_activity_rollup
+    WHERE (period, period_start) IN (
+        ('day', DATE_TRUNC('day', LOCALTIMESTAMP)),
+        ('week', DATE_TRUNC('week', LOCALTIMESTAMP)),
+        ('month', DATE_TRUNC('month', LOCALTIMESTAMP)),
+        ('total', TIMESTAMP 'epoch')
+    )
+"""
+
+_STAT_KEYS = ('active_users', 'daily_users', 'weekly_users', 'monthly_users', 'total_users')
+
+_admin_stats_cache = TwoTierCache(
+    'admin_stats',
+    local_ttl=ADMIN_STATS_CACHE_TTL,
+    redis_ttl=max(ADMIN_STATS_CACHE_TTL, 1),
+    max_entries=4
+)
+
+
+def load_user_stats(use_rollup: bool = USE_ACTIVITY_ROLLUP) -> Optional[Dict[str, int]]:
+    """Calcular las estadísticas con una sola consulta"""
+    connection = get_db_connection()
+    if not connection:
+        return None
+
+    try:
+        cursor = connection.cursor()
+        row = None
+        if use_rollup:
+            try:
+                cursor.execute(ROLLUP_STATS_SQL)
+                row = cursor.fetchone()
+            except psycopg2.Error as e:
+                # Sin la migración del rollup se vuelve a la consulta directa
+                logger.warning(f"Rollup de actividad no disponible, usando users: {e}")
+                connection.rollback()
+                cursor = connection.cursor()
+        if row is None:
+            cursor.execute(USER_STATS_SQL)
+            row = cursor.fetchone()
+        cursor.close()
+        connection.close()
+    except psycopg2.Error as e:
+        print(f"Error obteniendo estadísticas de usuarios: {e}")
+        connection.rollback()
+        connection.close()
+        return None
+
+    if isinstance(row, dict):
+        return {key: int(row[key] or 0) for key in _STAT_KEYS}
+    return {key: int(value or 0) for key, value in zip(_STAT_KEYS, row)}
+
+
+def get_user_stats() -> Optional[Dict[str, int]]:
+    """Obtener las estadísticas desde el cache o calcularlas"""
+    if ADMIN_STATS_CACHE_TTL <= 0:
+        return load_user_stats()
+    return _admin_stats_cache.get_or_load('users', load_user_stats)
+
+
+def invalidate_user_stats() -> None:
+    """Descartar las estadísticas cacheadas"""
+    _admin_stats_cache.delete('users')